@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""メール本文抽出のベンチマークスクリプト
+
+合成メールボックスに対して ``_extract_body``、``extract_email_content`` と
+並列抽出ステージ ``extract_messages`` を実行し、
+スループットとピークメモリを計測する。
+
+使い方:
+	uv run python scripts/benchmark_extraction.py --count 5000 --seed 0
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+# プロジェクトルートを追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.extraction import extract_messages  # noqa: E402
+from src.gmail_notifier import GmailNotifier  # noqa: E402
+from tests.fixtures.mailbox_generator import iter_mailbox  # noqa: E402
+
+
+def inline_body_bytes(payload: dict[str, Any]) -> int:
+	"""添付ファイルを除いた本文データのバイト数"""
+	size = int(payload['body']['size']) if 'data' in payload.get('body', {}) else 0
+	return size + sum(inline_body_bytes(part) for part in payload.get('parts', []))
+
+
+def measure(
+	name: str, func: Callable[[list[dict[str, Any]]], Any], messages: list[dict[str, Any]], raw_bytes: int
+) -> None:
+	"""1 つの処理について処理時間とピークメモリを計測 (ワーカープロセスのメモリは含まない)"""
+	tracemalloc.start()
+	started = time.perf_counter()
+	func(messages)
+	elapsed = time.perf_counter() - started
+	_, peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	print(f'📊 {name}')
+	print(f'   ⏱️  {elapsed:.3f}s ({len(messages) / elapsed:,.0f} msg/s, {raw_bytes / elapsed / 1e6:,.1f} MB/s)')
+	print(f'   🧠 ピークメモリ: {peak / 1e6:,.2f} MB')
+
+
+def main() -> None:
+	"""ベンチマークのエントリーポイント"""
+	parser = argparse.ArgumentParser(description='メール本文抽出のベンチマーク')
+	parser.add_argument('--count', type=int, default=5000, help='生成するメッセージ数')
+	parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+	args = parser.parse_args()
+
+	print(f'🏭 合成メールボックスを生成中... ({args.count} 件, seed={args.seed})')
+	kinds: Counter[str] = Counter()
+	messages = []
+	for kind, message in iter_mailbox(args.count, args.seed):
+		kinds[kind] += 1
+		messages.append(message)
+	raw_bytes = sum(inline_body_bytes(message['payload']) for message in messages)
+	print(f'   本文合計 {raw_bytes / 1e6:,.1f} MB, 内訳: {dict(kinds)}')
+
+	measure(
+		'_extract_body',
+		lambda batch: [GmailNotifier._extract_body(message['payload']) for message in batch],
+		messages,
+		raw_bytes,
+	)
+	measure(
+		'extract_email_content',
+		lambda batch: [GmailNotifier.extract_email_content(message) for message in batch],
+		messages,
+		raw_bytes,
+	)
+	measure('extract_messages (並列)', extract_messages, messages, raw_bytes)
+
+
+if __name__ == '__main__':
+	main()
@@ -6,13 +6,13 @@ import os
 import sys
 import tempfile
 from pathlib import Path
-from typing import Any
 from unittest.mock import MagicMock, patch
 
 # プロジェクトルートを追加
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.email_content import EmailContent  # noqa: E402
 from src.gmail_notifier import GmailNotifier, LineNotifier, SlackNotifier  # noqa: E402
 
 
@@ -33,12 +33,12 @@ def load_test_env() -> None:
 	print('✅ テスト用環境変数を読み込みました')
 
 
-def test_gmail_notifier() -> dict[str, Any] | None:
+def test_gmail_notifier() -> EmailContent | None:
 	"""Gmail通知のテスト"""
 	print('\n🔍 Gmail通知のテスト開始...')
 
 	# モックサービスを作成
-	with patch('src.gmail_notifier.pickle'), patch('src.gmail_notifier.build') as mock_build:
+	with patch('src.credentials.pickle'), patch('src.gmail_notifier.build') as mock_build:
 		mock_service = MagicMock()
 		mock_build.return_value = mock_service
 
@@ -61,7 +61,7 @@ def test_gmail_notifier() -> dict[str, Any] | None:
 		mock_service.users().messages().get().execute.return_value = mock_message
 
 		# テスト実行（ダミートークンを使用）
-		with patch('src.gmail_notifier.GmailNotifier._load_token_from_string') as mock_load:
+		with patch('src.credentials.load_token') as mock_load:
 			mock_load.return_value = MagicMock()
 			notifier = GmailNotifier(oauth_token='dummy_token')
 			message = notifier.get_unread_family_package_emails()
@@ -69,16 +69,16 @@ def test_gmail_notifier() -> dict[str, Any] | None:
 		if message:
 			email_content = notifier.extract_email_content(message)
 			print('✅ メール取得成功:')
-			print(f'   📧 件名: {email_content["subject"]}')
-			print(f'   👤 差出人: {email_content["from"]}')
-			print(f'   📝 本文: {email_content["body"][:50]}...')
+			print(f'   📧 件名: {email_content.subject}')
+			print(f'   👤 差出人: {email_content.sender}')
+			print(f'   📝 本文: {email_content.body[:50]}...')
 			return email_content
 		else:
 			print('⚠️  未読メールなし')
 			return None
 
 
-def test_line_notifier(email_content: dict[str, Any]) -> None:
+def test_line_notifier(email_content: EmailContent) -> None:
 	"""LINE通知のテスト"""
 	print('\n📱 LINE通知のテスト開始...')
 
@@ -134,10 +134,10 @@ def test_main_workflow() -> None:
 		os.environ['GITHUB_OUTPUT'] = f.name
 
 		with (
-			patch('src.gmail_notifier.pickle'),
+			patch('src.credentials.pickle'),
 			patch('src.gmail_notifier.build') as mock_build,
 			patch('requests.post') as mock_post,
-			patch('src.gmail_notifier.GmailNotifier._load_token_from_string') as mock_load,
+			patch('src.credentials.load_token') as mock_load,
 		):
 			# Gmail APIモック
 			mock_service = MagicMock()
@@ -177,6 +177,27 @@ def test_main_workflow() -> None:
 		os.unlink(f.name)
 
 
+def test_replay() -> None:
+	"""記録済み通信の再生テスト"""
+	print('\n📼 記録済み通信の再生テスト...')
+
+	from src.cassette import Cassette, replay
+
+	cassette_path = project_root / 'tests' / 'fixtures' / 'cassettes' / 'notification.json'
+	with tempfile.NamedTemporaryFile(mode='w+', delete=False) as f:
+		os.environ['GITHUB_OUTPUT'] = f.name
+		player = replay(Cassette.load(str(cassette_path)))
+
+		with open(f.name) as output_f:
+			output = output_f.read()
+		if 'status=success' in output:
+			print(f'✅ 再生成功: {len(player.played)}件のリクエスト')
+		else:
+			print(f'⚠️  予期しない出力: {output}')
+
+	os.unlink(f.name)
+
+
 def main() -> None:
 	"""メインテスト関数"""
 	print('🧪 ローカルテスト開始')
@@ -194,12 +215,7 @@ def main() -> None:
 			test_line_notifier(email_content)
 		else:
 			# テスト用のダミーデータ
-			email_content = {
-				'id': 'dummy_id',
-				'subject': 'ダミーテスト件名',
-				'from': 'dummy@example.com',
-				'body': 'ダミーテスト本文',
-			}
+			email_content = EmailContent('dummy_id', 'ダミーテスト件名', 'dummy@example.com', 'ダミーテスト本文')
 			test_line_notifier(email_content)
 
 		# Slack通知テスト
@@ -208,6 +224,9 @@ def main() -> None:
 		# 統合テスト
 		test_main_workflow()
 
+		# 記録済み通信の再生
+		test_replay()
+
 		print('\n' + '=' * 50)
 		print('🎉 すべてのテストが完了しました！')
 
@@ -0,0 +1,88 @@
+"""Concurrent polling of several Gmail accounts and other mail sources."""
+
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import requests
+from google.auth.transport.requests import Request
+from requests.adapters import HTTPAdapter
+
+from .email_content import EmailContent
+
+DEFAULT_MAX_WORKERS = 8
+
+
+class Account(Protocol):
+	"""Anything polled under an account name: a GoogleConfig or a mail source."""
+
+	account: str
+
+
+@dataclass
+class AccountEmail:
+	"""An unread email and the mailbox and label it came from.
+
+	With ``whole_thread``, the email stands for its unread thread and
+	``mark_as_read`` takes the thread ID, so the whole thread is acknowledged.
+	"""
+
+	account: str
+	label: str
+	email_content: EmailContent
+	mark_as_read: Callable[[str], None]
+	whole_thread: bool = False
+
+	@property
+	def read_id(self) -> str:
+		"""ID passed to mark_as_read: the thread ID for a whole thread, otherwise the message ID."""
+		if self.whole_thread and self.email_content.thread_id:
+			return self.email_content.thread_id
+		return self.email_content.id
+
+
+def create_auth_request(pool_size: int = DEFAULT_MAX_WORKERS) -> Request:
+	"""Create a token refresh transport whose connection pool is shared by every account.
+
+	Refreshing several tokens at once then reuses connections to the Google
+	token endpoint instead of opening a new session per account.
+	"""
+	session = requests.Session()
+	session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+	return Request(session=session)
+
+
+def poll_accounts(
+	accounts: Sequence[Account],
+	poll: Callable[[Any], list[AccountEmail]],
+	max_workers: int = DEFAULT_MAX_WORKERS,
+) -> tuple[list[AccountEmail], dict[str, BaseException]]:
+	"""Poll every account concurrently.
+
+	``poll`` runs in a worker thread per account, a GoogleConfig or a mail
+	source. A Gmail client should be created there, because the httplib2
+	connection behind a client is not thread-safe. An account that fails does
+	not stop the others.
+
+	Returns:
+		Unread emails in account order, and account name -> exception for accounts that failed.
+	"""
+
+	def poll_safely(account: Account) -> list[AccountEmail] | BaseException:
+		try:
+			return poll(account)
+		except Exception as e:
+			return e
+
+	with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(accounts)))) as executor:
+		results = list(executor.map(poll_safely, accounts))
+
+	account_emails = []
+	errors: dict[str, BaseException] = {}
+	for account, result in zip(accounts, results, strict=True):
+		if isinstance(result, BaseException):
+			errors[account.account] = result
+		else:
+			account_emails.extend(result)
+	return account_emails, errors
@@ -0,0 +1,168 @@
+"""Slack error alerts aggregated by fingerprint, so a recurring error is posted once and then summarized."""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from datetime import UTC, datetime, timedelta
+
+from .sinks import SinkError, SlackSink
+
+logger = logging.getLogger(__name__)
+
+# File under the state directory holding the posted alerts
+ALERTS_FILE = 'alerts.json'
+
+# A repeat within this time of the last occurrence is not posted as a new alert
+DEFAULT_SUPPRESS_WINDOW = timedelta(days=7)
+
+# Suppressed repeats are summarized in the thread of their alert at most this often
+DEFAULT_SUMMARY_INTERVAL = timedelta(days=1)
+
+# Parts of an error message that differ between occurrences of the same error: URLs, IDs and numbers
+VOLATILE_PATTERN = re.compile(r'https?://\S+|\b[0-9a-f]*[0-9][0-9a-f]*\b', re.IGNORECASE)
+
+
+def fingerprint(message: str) -> str:
+	"""Identify an error by its message, ignoring URLs, IDs, numbers, case and spacing."""
+	normalized = ' '.join(VOLATILE_PATTERN.sub('#', message).lower().split())
+	return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def _format_time(timestamp: float) -> str:
+	"""Format a Unix time for an alert message."""
+	return datetime.fromtimestamp(timestamp, UTC).strftime('%Y-%m-%d %H:%M UTC')
+
+
+@dataclass
+class AlertRecord:
+	"""A posted alert and the repeats of its error since then."""
+
+	message: str
+	thread_ts: str
+	first_seen: float
+	last_seen: float
+	summarized_at: float
+	count: int = 1
+	unreported: int = 0
+
+
+class AlertAggregator:
+	"""Posts each distinct error to Slack once and reports its repeats as thread replies.
+
+	Errors are grouped by ``fingerprint``. The first occurrence is posted as a
+	channel message. Repeats within ``window`` of the last occurrence are only
+	counted, and ``flush_summaries`` posts the count as a reply in the thread of
+	the alert at most every ``summary_interval``. An error that has not occurred
+	for ``window`` is forgotten, so its next occurrence is a new alert. The
+	records are persisted to a JSON file between runs.
+	"""
+
+	def __init__(
+		self,
+		state_file: str,
+		slack: SlackSink,
+		window: timedelta = DEFAULT_SUPPRESS_WINDOW,
+		summary_interval: timedelta = DEFAULT_SUMMARY_INTERVAL,
+		clock: Callable[[], float] = time.time,
+	):
+		"""Initialize alert aggregator, loading any saved records.
+
+		Args:
+			state_file: JSON file holding the records between runs.
+			slack: Channel the alerts are posted to.
+			window: Time after the last occurrence during which repeats are suppressed.
+			summary_interval: Shortest time between two summaries of the same alert.
+			clock: Returns the current Unix time.
+		"""
+		self.state_file = state_file
+		self.slack = slack
+		self.window = window
+		self.summary_interval = summary_interval
+		self._clock = clock
+		self.records: dict[str, AlertRecord] = {}
+		if os.path.exists(state_file):
+			with open(state_file, encoding='utf-8') as f:
+				self.records = {key: AlertRecord(**record) for key, record in json.load(f).items()}
+
+	def _save(self) -> None:
+		"""Persist the records."""
+		os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+		tmp_path = f'{self.state_file}.tmp'
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			json.dump({key: asdict(record) for key, record in self.records.items()}, f, ensure_ascii=False)
+		os.replace(tmp_path, self.state_file)
+
+	def _post(self, text: str, thread_ts: str | None = None) -> str | None:
+		"""Post a message and return its ts, or None if Slack rejected it."""
+		try:
+			response = self.slack.post(text, thread_ts)
+		except SinkError as e:
+			logger.error('Slack notification failed', extra={'stage': 'alert', 'error': str(e)})
+			return None
+		logger.info('Slack notification sent', extra={'stage': 'alert', 'thread_ts': thread_ts})
+		return str(response.get('ts', ''))
+
+	def alert(self, message: str) -> bool:
+		"""Post an error, or count it if the same error was posted within the window.
+
+		Returns:
+			True if a new alert was posted.
+		"""
+		now = self._clock()
+		key = fingerprint(message)
+		record = self.records.get(key)
+		if record is not None and now - record.last_seen < self.window.total_seconds():
+			record.count += 1
+			record.unreported += 1
+			record.last_seen = now
+			self._save()
+			logger.info('Repeated alert suppressed', extra={'stage': 'alert', 'fingerprint': key})
+			return False
+		if record is not None:
+			# Repeats of the expired alert are reported in its old thread before it is replaced
+			self._summarize(record)
+		thread_ts = self._post(message)
+		if thread_ts is None:
+			# Not recorded, so the next occurrence tries to post again
+			return False
+		self.records[key] = AlertRecord(message, thread_ts, now, now, now)
+		self._save()
+		return True
+
+	def _summarize(self, record: AlertRecord) -> bool:
+		"""Reply with the repeats of an alert since its last summary.
+
+		Returns:
+			True if a summary was posted.
+		"""
+		if not record.unreported or not record.thread_ts:
+			return False
+		times = 'time' if record.unreported == 1 else 'times'
+		text = (
+			f'Occurred {record.unreported} more {times} since {_format_time(record.summarized_at)}'
+			f' ({record.count} in total, last at {_format_time(record.last_seen)})'
+		)
+		if self._post(text, record.thread_ts) is None:
+			return False
+		record.unreported = 0
+		record.summarized_at = self._clock()
+		return True
+
+	def flush_summaries(self) -> None:
+		"""Post the summaries that are due and forget errors that have not occurred within the window."""
+		now = self._clock()
+		changed = False
+		for key, record in list(self.records.items()):
+			expired = now - record.last_seen >= self.window.total_seconds()
+			if expired or now - record.summarized_at >= self.summary_interval.total_seconds():
+				changed |= self._summarize(record)
+			if expired and not record.unreported:
+				del self.records[key]
+				changed = True
+		if changed:
+			self._save()
@@ -0,0 +1,233 @@
+"""Image attachments: download, downscale and upload for LINE image messages."""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+import requests
+
+from .config import AppConfig, ImageHostConfig
+from .errors import describe
+from .settings import AttachmentSettings
+
+logger = logging.getLogger(__name__)
+
+# Image types LINE can show directly, without converting
+LINE_IMAGE_TYPES = ('image/jpeg', 'image/png')
+# LINE rejects preview images over 1 MB
+LINE_PREVIEW_MAX_BYTES = 1024 * 1024
+
+HASH_CHUNK_SIZE = 64 * 1024
+JPEG_QUALITY = 85
+UPLOAD_TIMEOUT = 30.0
+
+
+@dataclass(frozen=True)
+class AttachmentPart:
+	"""An image attachment of a message, not yet downloaded."""
+
+	attachment_id: str
+	filename: str
+	mime_type: str
+	size: int
+
+
+@dataclass(frozen=True)
+class UploadedImage:
+	"""URLs of an uploaded image and its preview."""
+
+	url: str
+	preview_url: str
+
+
+def find_image_parts(payload: dict[str, Any]) -> list[AttachmentPart]:
+	"""Find image attachments in a message payload, including nested multiparts."""
+
+	def walk(part: dict[str, Any]) -> Iterator[AttachmentPart]:
+		body = part.get('body', {})
+		if part.get('mimeType', '').startswith('image/') and body.get('attachmentId'):
+			yield AttachmentPart(body['attachmentId'], part.get('filename', ''), part['mimeType'], body.get('size', 0))
+		for child in part.get('parts', []):
+			yield from walk(child)
+
+	return list(walk(payload))
+
+
+def file_sha256(path: str) -> str:
+	"""Hash a file in chunks."""
+	digest = hashlib.sha256()
+	with open(path, 'rb') as f:
+		for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+def downscale(source: str, destination: str, max_dimension: int) -> str:
+	"""Shrink an image to fit ``max_dimension`` and save it as JPEG, using the optional Pillow package.
+
+	Returns:
+		``destination``, or ``source`` unchanged if Pillow is not installed.
+	"""
+	try:
+		from PIL import Image
+	except ImportError:
+		return source
+	with Image.open(source) as image:
+		image.thumbnail((max_dimension, max_dimension))
+		image.convert('RGB').save(destination, 'JPEG', quality=JPEG_QUALITY)
+	return destination
+
+
+class ImageStore:
+	"""Uploads images by PUT and remembers them by content hash, so an image is uploaded once."""
+
+	def __init__(self, host: ImageHostConfig, index_path: str):
+		"""Initialize image store.
+
+		Raises:
+			ValueError: If no upload URL is configured.
+		"""
+		if not host.upload_url or not host.public_url:
+			raise ValueError('Attachments need IMAGE_UPLOAD_URL to upload images for LINE')
+		self.host = host
+		self.index_path = index_path
+		self._lock = threading.Lock()
+
+	def _load_index(self) -> dict[str, dict[str, str]]:
+		"""Load content hash -> uploaded URLs."""
+		if not os.path.exists(self.index_path):
+			return {}
+		with open(self.index_path, encoding='utf-8') as f:
+			index: dict[str, dict[str, str]] = json.load(f)
+		return index
+
+	def lookup(self, digest: str) -> UploadedImage | None:
+		"""Get the URLs of an image uploaded earlier."""
+		with self._lock:
+			entry = self._load_index().get(digest)
+		return UploadedImage(**entry) if entry else None
+
+	def _put(self, name: str, path: str) -> str:
+		"""Upload one file and return its public URL."""
+		headers = {'Content-Type': 'image/jpeg' if path.endswith('.jpg') else 'image/png'}
+		if self.host.token:
+			headers['Authorization'] = f'Bearer {self.host.token}'
+		with open(path, 'rb') as f:
+			requests.put(
+				f'{self.host.upload_url}/{name}', data=f, headers=headers, timeout=UPLOAD_TIMEOUT
+			).raise_for_status()
+		return f'{self.host.public_url}/{name}'
+
+	def upload(self, digest: str, image_path: str, preview_path: str) -> UploadedImage:
+		"""Upload an image and its preview, and record them under ``digest``."""
+		extension = os.path.splitext(image_path)[1]
+		uploaded = UploadedImage(
+			url=self._put(f'{digest}{extension}', image_path),
+			preview_url=self._put(f'{digest}-preview{os.path.splitext(preview_path)[1]}', preview_path),
+		)
+		with self._lock:
+			index = self._load_index()
+			index[digest] = {'url': uploaded.url, 'preview_url': uploaded.preview_url}
+			os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+			tmp_path = f'{self.index_path}.tmp'
+			with open(tmp_path, 'w', encoding='utf-8') as f:
+				json.dump(index, f)
+			os.replace(tmp_path, self.index_path)
+		return uploaded
+
+
+class AttachmentProcessor:
+	"""Turns the image attachments of a message into uploaded LINE images."""
+
+	def __init__(self, settings: AttachmentSettings, store: ImageStore):
+		"""Initialize attachment processor."""
+		self.settings = settings
+		self.store = store
+
+	def _prepare(self, source: str, workdir: str, mime_type: str) -> tuple[str, str] | None:
+		"""Create the image and preview files LINE accepts, or None if that is not possible."""
+		image = downscale(source, os.path.join(workdir, 'image.jpg'), self.settings.max_dimension)
+		preview = downscale(source, os.path.join(workdir, 'preview.jpg'), self.settings.preview_dimension)
+		if image == source:
+			# Without Pillow, only small JPEG and PNG files can be sent as they are
+			if mime_type not in LINE_IMAGE_TYPES or os.path.getsize(source) > LINE_PREVIEW_MAX_BYTES:
+				logger.warning(
+					'Skipping attachment that needs resizing. Install Pillow with: uv sync --extra images',
+					extra={'stage': 'attachments'},
+				)
+				return None
+			extension = '.jpg' if mime_type == 'image/jpeg' else '.png'
+			image = preview = os.path.join(workdir, f'original{extension}')
+			os.replace(source, image)
+		return image, preview
+
+	def _process_part(self, download: Callable[[str, str], int], part: AttachmentPart) -> UploadedImage | None:
+		"""Download, deduplicate, downscale and upload one attachment."""
+		if part.size > self.settings.max_bytes:
+			logger.info(
+				'Skipping attachment over the size limit',
+				extra={'stage': 'attachments', 'attachment': part.filename, 'bytes': part.size},
+			)
+			return None
+		with tempfile.TemporaryDirectory(prefix='notifier-attachment-') as workdir:
+			source = os.path.join(workdir, 'download')
+			download(part.attachment_id, source)
+			digest = file_sha256(source)
+			uploaded = self.store.lookup(digest)
+			if uploaded is not None:
+				logger.debug(
+					'Reusing attachment uploaded before', extra={'stage': 'attachments', 'attachment': part.filename}
+				)
+				return uploaded
+			prepared = self._prepare(source, workdir, part.mime_type)
+			return self.store.upload(digest, *prepared) if prepared else None
+
+	def process(self, message: dict[str, Any], download: Callable[[str, str], int]) -> list[UploadedImage]:
+		"""Upload the image attachments of a message.
+
+		A failing attachment is skipped so the text notification is still sent.
+
+		Args:
+			message: Full Gmail message.
+			download: Writes an attachment ID to a path and returns the bytes written.
+
+		Returns:
+			The uploaded images, in message order.
+		"""
+		uploaded = []
+		for part in find_image_parts(message['payload'])[: self.settings.max_images]:
+			try:
+				image = self._process_part(download, part)
+			except Exception as e:
+				logger.warning(
+					'Skipping attachment that could not be sent',
+					extra={
+						'stage': 'attachments',
+						'msg_id': message['id'],
+						'attachment': part.filename,
+						'error': describe(e),
+					},
+				)
+				continue
+			if image is not None:
+				uploaded.append(image)
+		return uploaded
+
+
+def build_attachment_processor(config: AppConfig) -> AttachmentProcessor | None:
+	"""Create the attachment processor if attachments are enabled in the settings.
+
+	Raises:
+		ValueError: If attachments are enabled without an image host.
+	"""
+	settings = config.settings.attachments
+	if not settings.enabled:
+		return None
+	store = ImageStore(config.image_host, os.path.join(config.state_dir, 'attachments', 'index.json'))
+	return AttachmentProcessor(settings, store)
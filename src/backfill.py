@@ -0,0 +1,329 @@
+"""Historical backfill of labelled Gmail messages to the notification destinations.
+
+Usage:
+	python -m src.backfill --after 2025-01-01 --before 2025-04-01
+"""
+
+import argparse
+import json
+import logging
+import os
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass, replace
+from datetime import date, datetime, timedelta
+from functools import partial
+from typing import Any
+from zoneinfo import ZoneInfo
+
+from .circuit_breaker import GuardedSink
+from .config import AppConfig
+from .email_content import EmailContent
+from .errors import RetryClass, classify, describe
+from .extraction import Extractor, extract_messages
+from .gmail_notifier import GmailNotifier
+from .log import configure_logging, correlate
+from .query import compile_query
+from .quota import QuotaLedger
+from .report import Outcome, RunReport, outcome_for
+from .settings import FilterSettings
+from .sinks import build_sinks, deliver
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BackfillCheckpoint:
+	"""Resumable position of a backfill run."""
+
+	label: str
+	after: str
+	before: str
+	window_start: str
+	page_token: str | None = None
+	page_offset: int = 0
+	delivered: int = 0
+	completed: bool = False
+
+	@classmethod
+	def load(cls, path: str) -> 'BackfillCheckpoint | None':
+		"""Load a checkpoint file, or return None if it does not exist."""
+		if not os.path.exists(path):
+			return None
+		with open(path, encoding='utf-8') as f:
+			return cls(**json.load(f))
+
+	def save(self, path: str) -> None:
+		"""Atomically write the checkpoint file."""
+		tmp_path = f'{path}.tmp'
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			json.dump(asdict(self), f, ensure_ascii=False, indent=2)
+		os.replace(tmp_path, path)
+
+	def matches(self, label: str, after: datetime, before: datetime) -> bool:
+		"""Check whether this checkpoint belongs to the given backfill range."""
+		return self.label == label and self.after == after.isoformat() and self.before == before.isoformat()
+
+
+class Backfill:
+	"""Walks a date range in query windows and delivers every matching message.
+
+	A message that cannot be fetched (for example deleted since it was listed) is
+	skipped, and one that cannot be delivered is recorded as failed or retry-later,
+	so one bad message does not stop or restart the backfill. Gmail
+	errors that affect every message (auth, quota, transient) stop the run,
+	which resumes from the checkpoint. Gmail calls are paced by the quota
+	ledger of ``gmail_notifier``, which slows down before and after quota errors.
+	"""
+
+	def __init__(
+		self,
+		gmail_notifier: GmailNotifier,
+		deliver: Callable[[EmailContent], Outcome],
+		checkpoint_path: str,
+		window: timedelta = timedelta(days=7),
+		page_size: int = 100,
+		extractor: Extractor = GmailNotifier.extract_email_content,
+		report: RunReport | None = None,
+		max_workers: int | None = None,
+		filters: FilterSettings | None = None,
+	):
+		"""Initialize backfill.
+
+		Args:
+			gmail_notifier: Gmail client used for list and get calls.
+			deliver: Called once per extracted email, in listing order, returning its outcome.
+			checkpoint_path: File where progress is saved after every delivery.
+			window: Width of each after:/before: query window.
+			page_size: maxResults for each list call.
+			extractor: Picklable function converting one message to email content.
+			report: Report receiving one result per message.
+			max_workers: Extraction workers, or None to let src.extraction decide.
+			filters: Conditions from the [filters] settings, as applied by the regular check.
+		"""
+		self.gmail_notifier = gmail_notifier
+		self.deliver = deliver
+		self.checkpoint_path = checkpoint_path
+		self.window = window
+		self.page_size = page_size
+		self.extractor = extractor
+		self.report = report or RunReport()
+		self.max_workers = max_workers
+		self.filters = filters or FilterSettings()
+
+	@staticmethod
+	def build_query(
+		label: str, window_start: datetime, window_end: datetime, filters: FilterSettings | None = None
+	) -> str:
+		"""Build a Gmail query for one window, using epoch seconds for exact bounds.
+
+		The filters apply as in the regular check, except ``newer_than``: the window sets the dates.
+		"""
+		window = f'after:{int(window_start.timestamp())} before:{int(window_end.timestamp())}'
+		return compile_query(label, replace(filters or FilterSettings(), newer_than=None), window)
+
+	def _resume(self, label: str, after: datetime, before: datetime) -> BackfillCheckpoint:
+		"""Load a matching checkpoint or start a new one."""
+		checkpoint = BackfillCheckpoint.load(self.checkpoint_path)
+		if checkpoint is None:
+			return BackfillCheckpoint(
+				label=label, after=after.isoformat(), before=before.isoformat(), window_start=after.isoformat()
+			)
+		if not checkpoint.matches(label, after, before):
+			raise ValueError(
+				f'Checkpoint {self.checkpoint_path} belongs to a different backfill '
+				f'({checkpoint.label} {checkpoint.after} - {checkpoint.before}). '
+				'Remove it or pass another --checkpoint path.'
+			)
+		logger.info(
+			'Resuming backfill',
+			extra={'stage': 'backfill', 'window_start': checkpoint.window_start, 'delivered': checkpoint.delivered},
+		)
+		return checkpoint
+
+	def _fetch(self, ids: Sequence[str]) -> tuple[list[dict[str, Any]], dict[str, BaseException]]:
+		"""Fetch full messages.
+
+		Returns:
+			The fetched messages in order, and message ID -> error for messages that
+			failed permanently (for example deleted since they were listed).
+		"""
+		messages = []
+		failures: dict[str, BaseException] = {}
+		for msg_id in ids:
+			try:
+				messages.append(self.gmail_notifier.get_message(msg_id))
+			except Exception as e:
+				if classify(e) != RetryClass.PERMANENT:
+					raise
+				failures[msg_id] = e
+		return messages, failures
+
+	def _deliver(self, email_content: EmailContent) -> Outcome:
+		"""Deliver one email and record its outcome."""
+		try:
+			with correlate(email_content.id):
+				outcome = self.deliver(email_content)
+		except Exception as e:
+			logger.warning(
+				'Delivery failed', extra={'stage': 'deliver', 'msg_id': email_content.id, 'error': describe(e)}
+			)
+			return self.report.add_error(email_content.id, e).outcome
+		self.report.add(email_content.id, outcome)
+		return outcome
+
+	def _process_page(self, checkpoint: BackfillCheckpoint, ids: Sequence[str]) -> None:
+		"""Deliver the messages of one page, saving the checkpoint after each one."""
+		messages, failures = self._fetch(ids)
+		email_contents = iter(extract_messages(messages, self.extractor, max_workers=self.max_workers))
+		for msg_id in ids:
+			if msg_id in failures:
+				logger.info(
+					'Skipping message', extra={'stage': 'fetch', 'msg_id': msg_id, 'error': describe(failures[msg_id])}
+				)
+				self.report.add(msg_id, Outcome.SKIPPED, detail=describe(failures[msg_id]))
+			elif self._deliver(next(email_contents)) == Outcome.DELIVERED:
+				checkpoint.delivered += 1
+			checkpoint.page_offset += 1
+			checkpoint.save(self.checkpoint_path)
+
+	def run(self, label: str, after: datetime, before: datetime) -> int:
+		"""Deliver every message with ``label`` received in [after, before).
+
+		Returns:
+			Total number of messages delivered for this range, including earlier runs.
+		"""
+		checkpoint = self._resume(label, after, before)
+
+		while not checkpoint.completed:
+			window_start = datetime.fromisoformat(checkpoint.window_start)
+			window_end = min(window_start + self.window, before)
+			query = self.build_query(label, window_start, window_end, self.filters)
+
+			ids, next_page_token = self.gmail_notifier.list_message_ids(
+				query, page_token=checkpoint.page_token, max_results=self.page_size
+			)
+			pending = ids[checkpoint.page_offset :]
+			logger.info(
+				'Backfilling page',
+				extra={
+					'stage': 'backfill',
+					'window_start': window_start.isoformat(),
+					'window_end': window_end.isoformat(),
+					'messages': len(pending),
+				},
+			)
+
+			self._process_page(checkpoint, pending)
+
+			checkpoint.page_offset = 0
+			if next_page_token:
+				checkpoint.page_token = next_page_token
+			else:
+				checkpoint.page_token = None
+				checkpoint.window_start = window_end.isoformat()
+				checkpoint.completed = window_end >= before
+			checkpoint.save(self.checkpoint_path)
+
+		return checkpoint.delivered
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+	"""Parse command line arguments."""
+	parser = argparse.ArgumentParser(
+		description='Replay labelled Gmail messages from a date range to the configured destinations.'
+	)
+	parser.add_argument('--after', type=date.fromisoformat, required=True, help='First day to include (YYYY-MM-DD)')
+	parser.add_argument('--before', type=date.fromisoformat, required=True, help='Day to stop before (YYYY-MM-DD)')
+	parser.add_argument('--label', help='Gmail label to backfill (defaults to the configured label)')
+	parser.add_argument('--window-days', type=int, default=7, help='Days covered by each query window')
+	parser.add_argument('--page-size', type=int, default=100, help='Messages per list call')
+	parser.add_argument(
+		'--quota-per-second',
+		type=float,
+		help='Gmail quota units to spend per second at most (defaults to rate_limits.gmail_quota_per_second)',
+	)
+	parser.add_argument('--checkpoint', default='backfill_checkpoint.json', help='Checkpoint file for resuming')
+	parser.add_argument('--timezone', default='Asia/Tokyo', help='Timezone for --after/--before')
+	parser.add_argument(
+		'--sink',
+		action='append',
+		help='Only deliver to this destination (line, slack, discord, webhook, file). Repeatable.',
+	)
+	return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	"""Run a backfill from the command line."""
+	args = _parse_args(argv)
+	tz = ZoneInfo(args.timezone)
+	after = datetime(args.after.year, args.after.month, args.after.day, tzinfo=tz)
+	before = datetime(args.before.year, args.before.month, args.before.day, tzinfo=tz)
+	if after >= before:
+		raise ValueError('--after must be earlier than --before')
+
+	config = AppConfig.from_env()
+	configure_logging(config.settings.logging)
+	logger.info(config.get_mode_display(), extra={'stage': 'start'})
+
+	rate_limits = config.settings.rate_limits
+	quota = QuotaLedger(args.quota_per_second or rate_limits.gmail_quota_per_second, rate_limits.gmail_units_per_minute)
+	gmail_notifier = GmailNotifier(
+		oauth_credentials_json=config.google.oauth_credentials,
+		oauth_token=config.google.oauth_token,
+		quota=quota,
+		api_endpoint=config.gmail_api_url,
+	)
+	label = args.label or config.gmail_label
+	# --sink overrides the route configured for the label
+	sink_names = args.sink or config.settings.sinks_for(label)
+	sinks = [
+		GuardedSink.for_state_dir(sink, config.state_dir)
+		for sink in build_sinks(config)
+		if sink_names is None or sink.name in sink_names
+	]
+	if not sinks:
+		raise ValueError(f'No configured destination matches {", ".join(sink_names or [])}')
+
+	def deliver_to_sinks(email_content: EmailContent) -> Outcome:
+		if config.sandbox_mode:
+			email_content = replace(email_content, subject=f'[SANDBOX] {email_content.subject}')
+		# Retryable failures are queued in the sink outboxes and sent by the next run
+		failed = {name: error for name, error in deliver(sinks, email_content).items() if error is not None}
+		for name, error in failed.items():
+			logger.warning(
+				'Delivery failed',
+				extra={'stage': 'deliver', 'msg_id': email_content.id, 'sink': name, 'error': describe(error)},
+			)
+		return outcome_for(failed.values())
+
+	backfill = Backfill(
+		gmail_notifier,
+		deliver_to_sinks,
+		checkpoint_path=args.checkpoint,
+		window=timedelta(days=args.window_days),
+		page_size=args.page_size,
+		extractor=partial(GmailNotifier.extract_email_content, body_max_length=config.body_max_length),
+		max_workers=config.settings.concurrency.extraction_workers,
+		filters=config.settings.filters,
+	)
+	try:
+		delivered = backfill.run(label, after, before)
+	finally:
+		backfill.report.add_quota(config.google.account, quota.usage)
+		backfill.report.write_github_output(config.github_output_file, config.get_status_suffix())
+		backfill.report.write_step_summary(config.github_step_summary_file, 'Backfill')
+	logger.info(
+		'Backfill completed',
+		extra={
+			'stage': 'backfill',
+			'delivered': delivered,
+			'counts': backfill.report.counts(),
+			'quota_units': quota.usage.units,
+		},
+	)
+	if backfill.report.failed:
+		raise RuntimeError(f'{len(backfill.report.failed)} messages failed, see the report for details')
+
+
+if __name__ == '__main__':
+	main()
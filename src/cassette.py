@@ -0,0 +1,559 @@
+"""Record and replay the HTTP traffic of a notifier run.
+
+A recording captures every Gmail (httplib2) and LINE, Slack and webhook
+(requests) call of a real run in a JSON cassette, with secrets replaced by
+placeholders. Replaying the cassette runs the same pipeline offline and
+deterministically, optionally with the recorded latencies, for regression
+and performance testing::
+
+	python -m src.cassette record run.json
+	python -m src.cassette replay run.json --latency-scale 1
+"""
+
+import argparse
+import base64
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import UTC, datetime
+from typing import Any
+from urllib.parse import urlsplit
+
+import httplib2
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from .credentials import replay_token
+from .errors import PermanentError
+
+CASSETTE_VERSION = 1
+
+# Environment variables stored in the cassette, so a replay builds the same configuration
+RECORDED_VARIABLES = (
+	'SANDBOX_MODE',
+	'BODY_MAX_LENGTH',
+	'LINE_CHANNEL_ACCESS_TOKEN',
+	'LINE_USER_ID',
+	'LINE_CHANNEL_ACCESS_TOKEN_SANDBOX',
+	'LINE_USER_ID_SANDBOX',
+	'SLACK_BOT_TOKEN',
+	'SLACK_CHANNEL_ID',
+	'SLACK_NOTIFY_CHANNEL_ID',
+	'DISCORD_WEBHOOK_URL',
+	'NOTIFY_WEBHOOK_URL',
+	'IMAGE_UPLOAD_URL',
+	'IMAGE_PUBLIC_URL',
+	'IMAGE_UPLOAD_TOKEN',
+)
+
+# Recorded variables whose values are replaced by placeholders wherever they appear
+SECRET_VARIABLES = (
+	'LINE_CHANNEL_ACCESS_TOKEN',
+	'LINE_USER_ID',
+	'LINE_CHANNEL_ACCESS_TOKEN_SANDBOX',
+	'LINE_USER_ID_SANDBOX',
+	'SLACK_BOT_TOKEN',
+	'DISCORD_WEBHOOK_URL',
+	'NOTIFY_WEBHOOK_URL',
+	'IMAGE_UPLOAD_TOKEN',
+)
+
+# Request headers, which carry the credentials, are never recorded. These response
+# headers describe the raw transfer rather than the recorded body
+DROPPED_RESPONSE_HEADERS = frozenset(
+	{'status', 'content-encoding', '-content-encoding', 'content-length', 'transfer-encoding', 'set-cookie'}
+)
+
+# OAuth fields in token refresh requests and responses
+OAUTH_FIELD_PATTERN = re.compile(
+	r'(?P<key>access_token|refresh_token|id_token|client_secret)(?P<sep>"?\s*[:=]\s*"?)[^"&\s,}]+'
+)
+
+# Gmail message headers kept when mail content is scrubbed, by lowercase name
+KEPT_MAIL_HEADERS = frozenset({'date'})
+
+# Text that replaces scrubbed mail content
+SCRUBBED_MAIL_TEXT = 'scrubbed'
+
+# Path segments that vary per call, such as message IDs, are grouped in timing profiles
+ID_SEGMENT_PATTERN = re.compile(r'(?=.*\d)[A-Za-z0-9_-]{10,}')
+
+
+class CassetteMismatchError(PermanentError):
+	"""A replayed run made a request that is not in the cassette."""
+
+
+@dataclass
+class Interaction:
+	"""One recorded HTTP request and its response."""
+
+	method: str
+	url: str
+	status: int
+	body: str
+	headers: dict[str, str] = field(default_factory=dict)
+	request_body: str | None = None
+	base64_body: bool = False
+	elapsed: float = 0.0
+
+	@property
+	def content(self) -> bytes:
+		"""Response body as bytes."""
+		return base64.b64decode(self.body) if self.base64_body else self.body.encode('utf-8')
+
+	@property
+	def endpoint(self) -> str:
+		"""Method, host and path with per-call IDs replaced, for grouping calls."""
+		parts = urlsplit(self.url)
+		path = '/'.join(ID_SEGMENT_PATTERN.sub('{id}', segment) for segment in parts.path.split('/'))
+		return f'{self.method} {parts.netloc}{path}'
+
+
+@dataclass
+class EndpointTiming:
+	"""Calls made to one endpoint and their recorded latency."""
+
+	endpoint: str
+	calls: int = 0
+	seconds: float = 0.0
+
+
+@dataclass
+class Cassette:
+	"""Recorded interactions and the environment of the recorded run."""
+
+	interactions: list[Interaction] = field(default_factory=list)
+	environment: dict[str, str] = field(default_factory=dict)
+	accounts: list[str] | None = None
+	recorded_at: str = ''
+
+	@classmethod
+	def load(cls, path: str) -> 'Cassette':
+		"""Load a cassette file.
+
+		Raises:
+			ValueError: If the file was written by an unsupported version.
+		"""
+		with open(path, encoding='utf-8') as f:
+			data = json.load(f)
+		if data.get('version') != CASSETTE_VERSION:
+			raise ValueError(f'Unsupported cassette version in {path}: {data.get("version")}')
+		return cls(
+			interactions=[Interaction(**interaction) for interaction in data['interactions']],
+			environment=data.get('environment', {}),
+			accounts=data.get('accounts'),
+			recorded_at=data.get('recorded_at', ''),
+		)
+
+	def save(self, path: str) -> None:
+		"""Write the cassette as indented JSON, so changes can be reviewed as diffs."""
+		data = {'version': CASSETTE_VERSION, **asdict(self)}
+		with open(path, 'w', encoding='utf-8') as f:
+			json.dump(data, f, ensure_ascii=False, indent=2)
+			f.write('\n')
+
+	def timing_profile(self) -> list[EndpointTiming]:
+		"""Sum the recorded latency per endpoint, slowest first."""
+		timings: dict[str, EndpointTiming] = {}
+		for interaction in self.interactions:
+			timing = timings.setdefault(interaction.endpoint, EndpointTiming(interaction.endpoint))
+			timing.calls += 1
+			timing.seconds += interaction.elapsed
+		return sorted(timings.values(), key=lambda timing: timing.seconds, reverse=True)
+
+
+class Scrubber:
+	"""Replaces secrets in recorded URLs and bodies with stable placeholders.
+
+	Unless ``keep_mail`` is set, the content of Gmail messages in JSON responses
+	is replaced too: the ``snippet``, the ``raw`` message and the header values
+	and body data of each ``payload`` part. The part structure, MIME types and
+	attachment IDs are kept, so a replay makes the same requests.
+	"""
+
+	def __init__(self, secrets: dict[str, str], keep_mail: bool = False):
+		"""Initialize scrubber.
+
+		Args:
+			secrets: Environment variable name -> secret value. Comma-separated
+				values (LINE multicast user IDs) are scrubbed item by item.
+			keep_mail: Record email subjects, senders and bodies as received.
+		"""
+		self.keep_mail = keep_mail
+		self.replacements: dict[str, str] = {}
+		for name, value in secrets.items():
+			items = [item.strip() for item in value.split(',') if item.strip()]
+			for index, item in enumerate(items, 1):
+				suffix = f'-{index}' if len(items) > 1 else ''
+				self.replacements[item] = _placeholder(name, item, suffix)
+
+	def scrub(self, text: str) -> str:
+		"""Replace every secret and OAuth token in ``text``."""
+		# Longest first, so a secret containing another is replaced whole
+		for secret in sorted(self.replacements, key=len, reverse=True):
+			text = text.replace(secret, self.replacements[secret])
+		return OAUTH_FIELD_PATTERN.sub(r'\g<key>\g<sep>scrubbed', text)
+
+	def scrub_response(self, text: str) -> str:
+		"""Replace secrets in a response body and, unless mail is kept, the content of Gmail messages."""
+		text = self.scrub(text)
+		if self.keep_mail:
+			return text
+		try:
+			data = json.loads(text)
+		except ValueError:
+			return text
+		return json.dumps(_scrub_mail(data), ensure_ascii=False)
+
+
+def _encoded_text(text: str) -> str:
+	"""Encode text as Gmail encodes body data and raw messages."""
+	return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def _scrub_mail(value: Any) -> Any:
+	"""Replace the mail content of every Gmail message found in a decoded JSON response."""
+	if isinstance(value, list):
+		return [_scrub_mail(item) for item in value]
+	if not isinstance(value, dict):
+		return value
+	scrubbed = {key: _scrub_mail(item) for key, item in value.items()}
+	if 'snippet' in scrubbed:
+		scrubbed['snippet'] = SCRUBBED_MAIL_TEXT
+	if 'raw' in scrubbed:
+		scrubbed['raw'] = _encoded_text(f'Subject: {SCRUBBED_MAIL_TEXT}\r\n\r\n{SCRUBBED_MAIL_TEXT}\r\n')
+	if isinstance(scrubbed.get('payload'), dict):
+		scrubbed['payload'] = _scrub_part(scrubbed['payload'])
+	return scrubbed
+
+
+def _scrub_part(part: dict[str, Any]) -> dict[str, Any]:
+	"""Replace the header values, file name and body data of a message part and its children."""
+	scrubbed = dict(part)
+	if 'headers' in part:
+		scrubbed['headers'] = [
+			header if header['name'].lower() in KEPT_MAIL_HEADERS else {**header, 'value': SCRUBBED_MAIL_TEXT}
+			for header in part['headers']
+		]
+	if part.get('filename'):
+		scrubbed['filename'] = SCRUBBED_MAIL_TEXT + os.path.splitext(part['filename'])[1]
+	if 'data' in part.get('body', {}):
+		scrubbed['body'] = {**part['body'], 'data': _encoded_text(SCRUBBED_MAIL_TEXT)}
+	if 'parts' in part:
+		scrubbed['parts'] = [_scrub_part(child) for child in part['parts']]
+	return scrubbed
+
+
+def _placeholder(name: str, value: str, suffix: str = '') -> str:
+	"""Build the placeholder of a secret. URLs stay URLs so they can still be requested."""
+	slug = name.lower().replace('_', '-') + suffix
+	return f'https://scrubbed.invalid/{slug}' if value.startswith(('http://', 'https://')) else f'scrubbed-{slug}'
+
+
+def _decode_body(body: Any) -> str | None:
+	"""Decode a request body for the cassette, or None if it is a stream or binary."""
+	if isinstance(body, bytes):
+		try:
+			return body.decode('utf-8')
+		except UnicodeDecodeError:
+			return None
+	return body if isinstance(body, str) else None
+
+
+def _encode_content(content: bytes) -> tuple[str, bool]:
+	"""Encode a response body for the cassette, as text if possible."""
+	try:
+		return content.decode('utf-8'), False
+	except UnicodeDecodeError:
+		return base64.b64encode(content).decode('ascii'), True
+
+
+@contextmanager
+def _patched(owner: Any, name: str, replacement: Callable[..., Any]) -> Iterator[None]:
+	"""Replace an attribute for the duration of the block."""
+	original = getattr(owner, name)
+	setattr(owner, name, replacement)
+	try:
+		yield
+	finally:
+		setattr(owner, name, original)
+
+
+class Recorder:
+	"""Records the HTTP traffic of requests and httplib2 into a cassette."""
+
+	def __init__(self, environ: dict[str, str] | None = None, keep_mail: bool = False):
+		"""Initialize recorder.
+
+		Args:
+			environ: Environment of the recorded run, defaults to ``os.environ``.
+			keep_mail: Record email content as received. Otherwise Gmail message
+				content is scrubbed and request bodies, which carry the notification
+				text, are not recorded.
+		"""
+		environ = dict(os.environ if environ is None else environ)
+		self.scrubber = Scrubber({name: environ[name] for name in SECRET_VARIABLES if environ.get(name)}, keep_mail)
+		tokens = environ.get('GOOGLE_OAUTH_TOKENS')
+		self.cassette = Cassette(
+			environment={name: self.scrubber.scrub(environ[name]) for name in RECORDED_VARIABLES if name in environ},
+			accounts=list(json.loads(tokens)) if tokens else None,
+			recorded_at=datetime.now(UTC).isoformat(),
+		)
+		self._lock = threading.Lock()
+
+	def _add(
+		self,
+		method: str,
+		url: str,
+		request_body: Any,
+		status: int,
+		headers: dict[str, str],
+		content: bytes,
+		elapsed: float,
+	) -> None:
+		"""Scrub and append one interaction."""
+		body, base64_body = _encode_content(content)
+		request_text = _decode_body(request_body) if self.scrubber.keep_mail else None
+		interaction = Interaction(
+			method=method.upper(),
+			url=self.scrubber.scrub(url),
+			status=status,
+			body=body if base64_body else self.scrubber.scrub_response(body),
+			headers={
+				key.lower(): self.scrubber.scrub(value)
+				for key, value in headers.items()
+				if key.lower() not in DROPPED_RESPONSE_HEADERS
+			},
+			request_body=self.scrubber.scrub(request_text) if request_text is not None else None,
+			base64_body=base64_body,
+			elapsed=round(elapsed, 4),
+		)
+		with self._lock:
+			self.cassette.interactions.append(interaction)
+
+	@contextmanager
+	def recording(self) -> Iterator[Cassette]:
+		"""Record every request made in the block, including failed ones, into ``self.cassette``."""
+		send = requests.Session.send
+		http_request = httplib2.Http.request
+
+		def recording_send(session: requests.Session, request: requests.PreparedRequest, **kwargs: Any) -> Any:
+			started = time.perf_counter()
+			response = send(session, request, **kwargs)
+			self._add(
+				request.method or 'GET',
+				request.url or '',
+				request.body,
+				response.status_code,
+				dict(response.headers),
+				response.content,
+				time.perf_counter() - started,
+			)
+			return response
+
+		def recording_request(
+			http: httplib2.Http, uri: str, method: str = 'GET', body: Any = None, **kwargs: Any
+		) -> Any:
+			started = time.perf_counter()
+			response, content = http_request(http, uri, method, body, **kwargs)
+			self._add(method, uri, body, response.status, dict(response), content, time.perf_counter() - started)
+			return response, content
+
+		with _patched(requests.Session, 'send', recording_send), _patched(httplib2.Http, 'request', recording_request):
+			yield self.cassette
+
+
+class Player:
+	"""Answers requests and httplib2 calls from a cassette instead of the network.
+
+	Requests are matched by method and URL, in recorded order for repeated
+	requests, so concurrent account polling replays deterministically.
+	"""
+
+	def __init__(self, cassette: Cassette, latency_scale: float = 0.0, sleep: Callable[[float], None] = time.sleep):
+		"""Initialize player.
+
+		Args:
+			latency_scale: Share of the recorded latency to wait before each response;
+				0 replays as fast as possible, 1 at the recorded speed.
+		"""
+		self.cassette = cassette
+		self.latency_scale = latency_scale
+		self.sleep = sleep
+		self.played: list[Interaction] = []
+		self.misses: list[str] = []
+		self._queues: dict[tuple[str, str], deque[Interaction]] = defaultdict(deque)
+		for interaction in cassette.interactions:
+			self._queues[interaction.method, interaction.url].append(interaction)
+		self._lock = threading.Lock()
+
+	@property
+	def unplayed(self) -> int:
+		"""Number of recorded interactions no request asked for."""
+		return sum(len(queue) for queue in self._queues.values())
+
+	def _next(self, method: str, url: str) -> Interaction:
+		"""Take the next recorded response for a request.
+
+		Raises:
+			CassetteMismatchError: If the cassette has no (more) responses for it.
+		"""
+		with self._lock:
+			queue = self._queues.get((method.upper(), url))
+			if not queue:
+				self.misses.append(f'{method.upper()} {url}')
+				raise CassetteMismatchError(f'No recorded response for {method.upper()} {url}')
+			interaction = queue.popleft()
+			self.played.append(interaction)
+		if self.latency_scale > 0:
+			self.sleep(interaction.elapsed * self.latency_scale)
+		return interaction
+
+	@contextmanager
+	def playing(self) -> Iterator['Player']:
+		"""Serve every request made in the block from the cassette."""
+
+		def playing_send(session: requests.Session, request: requests.PreparedRequest, **kwargs: Any) -> Any:
+			interaction = self._next(request.method or 'GET', request.url or '')
+			response = requests.Response()
+			response.status_code = interaction.status
+			response.headers = CaseInsensitiveDict(interaction.headers)
+			response._content = interaction.content
+			response.encoding = requests.utils.get_encoding_from_headers(response.headers) or 'utf-8'
+			response.url = request.url or ''
+			response.request = request
+			return response
+
+		def playing_request(http: httplib2.Http, uri: str, method: str = 'GET', *args: Any, **kwargs: Any) -> Any:
+			interaction = self._next(method, uri)
+			return httplib2.Response({**interaction.headers, 'status': str(interaction.status)}), interaction.content
+
+		with _patched(requests.Session, 'send', playing_send), _patched(httplib2.Http, 'request', playing_request):
+			yield self
+
+
+def replay_environment(cassette: Cassette, state_dir: str) -> dict[str, str]:
+	"""Build the environment variables that configure a replay like the recorded run."""
+	environment = {**cassette.environment, 'NOTIFIER_STATE_DIR': state_dir}
+	if cassette.accounts:
+		environment['GOOGLE_OAUTH_TOKENS'] = json.dumps({account: replay_token() for account in cassette.accounts})
+	else:
+		environment['GOOGLE_OAUTH_TOKEN'] = replay_token()
+	return environment
+
+
+@contextmanager
+def _environment(values: dict[str, str], removed: Sequence[str] = ()) -> Iterator[None]:
+	"""Set environment variables for the duration of the block."""
+	saved = dict(os.environ)
+	for name in removed:
+		os.environ.pop(name, None)
+	os.environ.update(values)
+	try:
+		yield
+	finally:
+		os.environ.clear()
+		os.environ.update(saved)
+
+
+def format_profile(timings: Sequence[EndpointTiming]) -> str:
+	"""Format a timing profile as a plain text table."""
+	lines = [f'{"Calls":>6} {"Seconds":>9}  Endpoint']
+	lines.extend(f'{timing.calls:>6} {timing.seconds:>9.3f}  {timing.endpoint}' for timing in timings)
+	return '\n'.join(lines)
+
+
+def _run_notifier() -> None:
+	"""Run one notification check like the workflow does."""
+	from .gmail_notifier import main
+
+	main([])
+
+
+def record(
+	path: str, state_dir: str | None = None, run: Callable[[], None] = _run_notifier, keep_mail: bool = False
+) -> Cassette:
+	"""Run the notifier against the real services and save its traffic to ``path``.
+
+	The run uses an empty state directory unless ``state_dir`` is given, so
+	cached messages and queued notifications do not hide requests from the cassette.
+	Email content is scrubbed unless ``keep_mail`` is set. The cassette is saved
+	even if the run fails.
+	"""
+	recorder = Recorder(keep_mail=keep_mail)
+	with tempfile.TemporaryDirectory(prefix='notifier-record-') as empty_state_dir:
+		try:
+			with _environment({'NOTIFIER_STATE_DIR': state_dir or empty_state_dir}), recorder.recording():
+				run()
+		finally:
+			recorder.cassette.save(path)
+	return recorder.cassette
+
+
+def replay(cassette: Cassette, latency_scale: float = 0.0, run: Callable[[], None] = _run_notifier) -> Player:
+	"""Run the notifier against a cassette, with an empty state directory.
+
+	Raises:
+		CassetteMismatchError: If the run made requests the cassette cannot answer.
+	"""
+	player = Player(cassette, latency_scale)
+	removed = ('GOOGLE_OAUTH_TOKEN', 'GOOGLE_OAUTH_TOKENS', 'GOOGLE_OAUTH_CREDENTIALS', *RECORDED_VARIABLES)
+	with tempfile.TemporaryDirectory(prefix='notifier-replay-') as state_dir:
+		with _environment(replay_environment(cassette, state_dir), removed), player.playing():
+			error: Exception | None = None
+			try:
+				run()
+			except Exception as e:
+				error = e
+		if player.misses:
+			# A missing response usually causes the run to fail, so report the cause
+			raise CassetteMismatchError(
+				f'{len(player.misses)} requests were not in the cassette: {", ".join(player.misses)}'
+			) from error
+		if error is not None:
+			raise error
+	return player
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+	"""Parse command line arguments."""
+	parser = argparse.ArgumentParser(description='Record or replay the HTTP traffic of a notification check.')
+	commands = parser.add_subparsers(dest='command', required=True)
+	record_parser = commands.add_parser('record', help='Run a real check and save its traffic')
+	record_parser.add_argument('cassette', help='Cassette file to write')
+	record_parser.add_argument('--state-dir', help='State directory to use instead of an empty one')
+	record_parser.add_argument(
+		'--keep-mail', action='store_true', help='Record email subjects, senders and bodies instead of scrubbing them'
+	)
+	replay_parser = commands.add_parser('replay', help='Run a check offline against a cassette')
+	replay_parser.add_argument('cassette', help='Cassette file to read')
+	replay_parser.add_argument(
+		'--latency-scale', type=float, default=0.0, help='Share of the recorded latency to wait (default: 0)'
+	)
+	return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	"""Record or replay from the command line, then print the timing profile."""
+	args = _parse_args(argv)
+	started = time.perf_counter()
+	if args.command == 'record':
+		cassette = record(args.cassette, args.state_dir, keep_mail=args.keep_mail)
+		print(f'Recorded {len(cassette.interactions)} requests to {args.cassette}')
+	else:
+		cassette = Cassette.load(args.cassette)
+		player = replay(cassette, args.latency_scale)
+		print(f'Replayed {len(player.played)} requests, {player.unplayed} recorded requests were not made')
+	print(format_profile(cassette.timing_profile()))
+	print(f'Finished in {time.perf_counter() - started:.3f}s')
+
+
+if __name__ == '__main__':
+	main()
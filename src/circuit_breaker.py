@@ -0,0 +1,279 @@
+"""Per-destination circuit breaker with a persistent outbox."""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections.abc import Callable, Sequence
+from contextlib import suppress
+from datetime import timedelta
+from enum import StrEnum
+
+from .email_content import EmailContent
+from .errors import RetryClass, classify, describe
+from .sinks import Sink, SinkError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 2
+DEFAULT_RESET_TIMEOUT = timedelta(minutes=30)
+
+
+class CircuitState(StrEnum):
+	"""Circuit breaker states."""
+
+	CLOSED = 'closed'
+	OPEN = 'open'
+	HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(SinkError):
+	"""Raised instead of calling a destination whose circuit is open."""
+
+	retry_class = RetryClass.TRANSIENT
+
+
+class CircuitBreaker:
+	"""Circuit breaker whose state is persisted to a JSON file between runs."""
+
+	def __init__(
+		self,
+		state_file: str,
+		failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+		reset_timeout: timedelta = DEFAULT_RESET_TIMEOUT,
+		clock: Callable[[], float] = time.time,
+	):
+		"""Initialize circuit breaker, loading any saved state.
+
+		Args:
+			state_file: JSON file holding the state between runs.
+			failure_threshold: Consecutive failures that open the circuit.
+			reset_timeout: Time the circuit stays open before a half-open probe is allowed.
+		"""
+		self.state_file = state_file
+		self.failure_threshold = failure_threshold
+		self.reset_timeout = reset_timeout
+		self._clock = clock
+
+		self.state = CircuitState.CLOSED
+		self.failures = 0
+		self.opened_at = 0.0
+		if os.path.exists(state_file):
+			with open(state_file, encoding='utf-8') as f:
+				saved = json.load(f)
+			self.state = CircuitState(saved['state'])
+			self.failures = saved['failures']
+			self.opened_at = saved['opened_at']
+
+	def _save(self) -> None:
+		"""Persist the current state."""
+		os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+		tmp_path = f'{self.state_file}.tmp'
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			json.dump({'state': self.state, 'failures': self.failures, 'opened_at': self.opened_at}, f)
+		os.replace(tmp_path, self.state_file)
+
+	def allow_request(self) -> bool:
+		"""Check whether a request may be sent now.
+
+		An open circuit turns half-open once ``reset_timeout`` has passed, letting
+		a single probe request through. A probe that never reported back, because
+		the run was killed, is retried after another ``reset_timeout``.
+		"""
+		if self.state == CircuitState.CLOSED:
+			return True
+		now = self._clock()
+		if now - self.opened_at >= self.reset_timeout.total_seconds():
+			self.state = CircuitState.HALF_OPEN
+			# The probe gets its own timeout, so a stale half-open state can be retried
+			self.opened_at = now
+			self._save()
+			return True
+		return False
+
+	def record_success(self) -> None:
+		"""Close the circuit after a successful request."""
+		if self.state != CircuitState.CLOSED or self.failures:
+			self.state = CircuitState.CLOSED
+			self.failures = 0
+			self._save()
+
+	def record_failure(self) -> None:
+		"""Count a failure, opening the circuit at the threshold or when a probe fails."""
+		self.failures += 1
+		if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+			self.state = CircuitState.OPEN
+			self.opened_at = self._clock()
+		self._save()
+
+
+class Outbox:
+	"""Notifications waiting for a destination, stored as JSON lines."""
+
+	def __init__(self, path: str):
+		"""Initialize outbox."""
+		self.path = path
+
+	def load(self) -> list[EmailContent]:
+		"""Return queued notifications, oldest first."""
+		if not os.path.exists(self.path):
+			return []
+		with open(self.path, encoding='utf-8') as f:
+			return [EmailContent.from_json(line) for line in f if line.strip()]
+
+	def extend(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Queue notifications, skipping ones already queued."""
+		queued_ids = {content.id for content in self.load()}
+		new_contents = []
+		for content in email_contents:
+			if content.id not in queued_ids:
+				queued_ids.add(content.id)
+				new_contents.append(content)
+		if not new_contents:
+			return
+		os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+		with open(self.path, 'a', encoding='utf-8') as f:
+			for content in new_contents:
+				f.write(content.to_json() + '\n')
+
+	def replace(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Replace the queue with ``email_contents``."""
+		if not email_contents:
+			self.clear()
+			return
+		os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+		tmp_path = f'{self.path}.tmp'
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			for content in email_contents:
+				f.write(content.to_json() + '\n')
+		os.replace(tmp_path, self.path)
+
+	def clear(self) -> None:
+		"""Remove every queued notification."""
+		with suppress(FileNotFoundError):
+			os.remove(self.path)
+
+
+class GuardedSink(Sink):
+	"""Wraps a sink with a circuit breaker and an outbox for undelivered notifications.
+
+	While the circuit is open, notifications are queued without calling the
+	destination. The next allowed request sends the queue first, in order, and
+	only the notifications that were not delivered stay queued after a failure.
+	Permanently rejected notifications are dropped instead of queued, since
+	resending cannot succeed. They still show the destination is answering, so
+	they close the circuit.
+	"""
+
+	def __init__(self, sink: Sink, breaker: CircuitBreaker, outbox: Outbox):
+		"""Initialize guarded sink."""
+		self.sink = sink
+		self.breaker = breaker
+		self.outbox = outbox
+		self.name = sink.name
+
+	@classmethod
+	def for_state_dir(cls, sink: Sink, state_dir: str) -> 'GuardedSink':
+		"""Guard a sink with breaker and outbox files under ``state_dir``."""
+		return cls(
+			sink,
+			CircuitBreaker(os.path.join(state_dir, 'circuits', f'{sink.name}.json')),
+			Outbox(os.path.join(state_dir, 'outbox', f'{sink.name}.jsonl')),
+		)
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Send queued and new notifications, queueing the undelivered ones if delivery fails."""
+		self._send(email_contents, self.sink.send_batch, self.sink.request_groups)
+
+	def send_digest(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Send queued and new notifications as a digest, queueing them if delivery is not possible."""
+		self._send(email_contents, self.sink.send_digest, lambda pending: [list(pending)])
+
+	def _send(
+		self,
+		email_contents: Sequence[EmailContent],
+		send: Callable[[Sequence[EmailContent]], None],
+		groups: Callable[[Sequence[EmailContent]], list[list[EmailContent]]],
+	) -> None:
+		"""Send through the breaker, prepending the outbox and queueing on retryable failures.
+
+		Notifications go out in the sink's request groups, so when a request fails,
+		the groups already delivered leave the outbox and are not sent twice. A group
+		rejected with a permanent error is dropped and the remaining groups are still
+		sent, so one rejected notification cannot block the queue behind it.
+		"""
+		if not self.breaker.allow_request():
+			self.outbox.extend(email_contents)
+			raise CircuitOpenError(f'Circuit for {self.name} is open, notification queued')
+
+		queued = self.outbox.load()
+		queued_ids = {content.id for content in queued}
+		pending = queued + [content for content in email_contents if content.id not in queued_ids]
+		if not pending:
+			return
+
+		done: set[str] = set()
+		rejected: Exception | None = None
+		try:
+			for group in groups(pending):
+				try:
+					send(group)
+				except Exception as e:
+					if classify(e) != RetryClass.PERMANENT:
+						raise
+					rejected = rejected or self._rejected(group, queued_ids, e)
+				done.update(content.id for content in group)
+		except Exception:
+			self.breaker.record_failure()
+			self.outbox.replace([content for content in pending if content.id not in done])
+			raise
+		# Permanent errors still show the destination is answering, and settle a half-open probe
+		self.breaker.record_success()
+		self.outbox.clear()
+		if rejected is not None:
+			raise rejected
+
+	def _rejected(self, group: Sequence[EmailContent], queued_ids: set[str], error: Exception) -> Exception | None:
+		"""Drop a permanently rejected group, returning the error if it held a new notification.
+
+		Queued notifications were already reported as queued by an earlier run, so
+		their rejection is only logged.
+		"""
+		if any(content.id not in queued_ids for content in group):
+			return error
+		logger.warning(
+			'Queued notifications rejected',
+			extra={
+				'stage': 'deliver',
+				'sink': self.name,
+				'msg_ids': [content.id for content in group],
+				'error': describe(error),
+			},
+		)
+		return None
+
+	def flush(self) -> int:
+		"""Try to deliver queued notifications when the circuit allows it.
+
+		Returns:
+			Number of notifications delivered.
+		"""
+		queued = len(self.outbox.load())
+		if queued:
+			self.send_batch([])
+		return queued
+
+
+async def _flush_all(sinks: Sequence[GuardedSink]) -> list[int | BaseException]:
+	"""Flush every outbox concurrently."""
+	return await asyncio.gather(*(asyncio.to_thread(sink.flush) for sink in sinks), return_exceptions=True)
+
+
+def flush_outboxes(sinks: Sequence[GuardedSink]) -> dict[str, int | BaseException]:
+	"""Deliver queued notifications for every sink whose circuit allows it.
+
+	Returns:
+		Sink name -> number of notifications delivered, or the exception raised.
+	"""
+	return dict(zip((sink.name for sink in sinks), asyncio.run(_flush_all(sinks)), strict=True))
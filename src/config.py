@@ -1,8 +1,15 @@
 """Configuration management for Gmail to LINE notification system."""
 
+import json
 import os
+import re
 from dataclasses import dataclass
 
+from .settings import Settings, settings_from_env
+
+DEFAULT_GOOGLE_ACCOUNT = 'default'
+ACCOUNT_NAME_PATTERN = re.compile(r'[A-Za-z0-9_.-]+')
+
 
 @dataclass
 class GoogleConfig:
@@ -10,6 +17,7 @@ class GoogleConfig:
 
 	oauth_token: str | None
 	oauth_credentials: str | None
+	account: str = DEFAULT_GOOGLE_ACCOUNT
 
 	@classmethod
 	def from_env(cls) -> 'GoogleConfig':
@@ -19,6 +27,34 @@ class GoogleConfig:
 			oauth_credentials=os.environ.get('GOOGLE_OAUTH_CREDENTIALS'),
 		)
 
+	@classmethod
+	def accounts_from_env(cls) -> list['GoogleConfig']:
+		"""Create one GoogleConfig per mailbox to poll.
+
+		GOOGLE_OAUTH_TOKENS holds a JSON object mapping account names to tokens.
+		Without it, the single GOOGLE_OAUTH_TOKEN account is used.
+		"""
+		tokens_json = os.environ.get('GOOGLE_OAUTH_TOKENS')
+		if not tokens_json:
+			return [cls.from_env()]
+
+		try:
+			tokens = json.loads(tokens_json)
+		except json.JSONDecodeError as e:
+			raise ValueError('GOOGLE_OAUTH_TOKENS must be a JSON object of account name to token') from e
+		if not isinstance(tokens, dict) or not tokens:
+			raise ValueError('GOOGLE_OAUTH_TOKENS must be a JSON object of account name to token')
+		for name, token in tokens.items():
+			if not ACCOUNT_NAME_PATTERN.fullmatch(name):
+				raise ValueError(f'Invalid account name in GOOGLE_OAUTH_TOKENS: {name!r}')
+			if not isinstance(token, str) or not token:
+				raise ValueError(f'Token for account {name} in GOOGLE_OAUTH_TOKENS must be a non-empty string')
+
+		oauth_credentials = os.environ.get('GOOGLE_OAUTH_CREDENTIALS')
+		return [
+			cls(oauth_token=token, oauth_credentials=oauth_credentials, account=name) for name, token in tokens.items()
+		]
+
 
 @dataclass
 class LineConfig:
@@ -54,6 +90,11 @@ class LineConfig:
 			user_id=user_id,
 		)
 
+	@property
+	def user_ids(self) -> list[str]:
+		"""Get recipient user IDs. A comma-separated user_id means multicast."""
+		return [user_id.strip() for user_id in self.user_id.split(',') if user_id.strip()]
+
 
 @dataclass
 class SlackConfig:
@@ -79,17 +120,66 @@ class SlackConfig:
 		)
 
 
+@dataclass
+class DestinationConfig:
+	"""Optional notification destinations in addition to LINE."""
+
+	slack_channel_id: str | None
+	discord_webhook_url: str | None
+	webhook_url: str | None
+	file_path: str | None
+
+	@classmethod
+	def from_env(cls) -> 'DestinationConfig':
+		"""Create DestinationConfig from environment variables."""
+		return cls(
+			slack_channel_id=os.environ.get('SLACK_NOTIFY_CHANNEL_ID'),
+			discord_webhook_url=os.environ.get('DISCORD_WEBHOOK_URL'),
+			webhook_url=os.environ.get('NOTIFY_WEBHOOK_URL'),
+			file_path=os.environ.get('NOTIFY_FILE_PATH'),
+		)
+
+
+@dataclass
+class ImageHostConfig:
+	"""Where image attachments are uploaded so LINE can fetch them over HTTPS."""
+
+	upload_url: str | None
+	public_url: str | None
+	token: str | None
+
+	@classmethod
+	def from_env(cls) -> 'ImageHostConfig':
+		"""Create ImageHostConfig from environment variables.
+
+		Files are uploaded with PUT to ``IMAGE_UPLOAD_URL/<name>`` and served from
+		``IMAGE_PUBLIC_URL/<name>``, which defaults to the upload URL.
+		"""
+		upload_url = os.environ.get('IMAGE_UPLOAD_URL')
+		public_url = os.environ.get('IMAGE_PUBLIC_URL') or upload_url
+		if public_url and not public_url.startswith('https://'):
+			raise ValueError('IMAGE_PUBLIC_URL must be an https:// URL, LINE only fetches images over HTTPS')
+		return cls(upload_url=upload_url, public_url=public_url, token=os.environ.get('IMAGE_UPLOAD_TOKEN'))
+
+
 @dataclass
 class AppConfig:
 	"""Application configuration."""
 
 	sandbox_mode: bool
 	github_output_file: str
-	gmail_label: str
+	github_step_summary_file: str
+	settings: Settings
+	state_dir: str
+	body_max_length: int
 
 	google: GoogleConfig
 	line: LineConfig
 	slack: SlackConfig
+	destinations: DestinationConfig
+	google_accounts: list[GoogleConfig]
+	image_host: ImageHostConfig
+	gmail_api_url: str | None = None
 
 	@classmethod
 	def from_env(cls) -> 'AppConfig':
@@ -99,12 +189,24 @@ class AppConfig:
 		return cls(
 			sandbox_mode=sandbox_mode,
 			github_output_file=os.environ.get('GITHUB_OUTPUT', '/dev/null'),
-			gmail_label='Family/お荷物滞留お知らせメール',
+			github_step_summary_file=os.environ.get('GITHUB_STEP_SUMMARY', '/dev/null'),
+			settings=settings_from_env(),
+			state_dir=os.environ.get('NOTIFIER_STATE_DIR', '.notifier-state'),
+			body_max_length=int(os.environ.get('BODY_MAX_LENGTH', '500')),
 			google=GoogleConfig.from_env(),
 			line=LineConfig.from_env(sandbox_mode=sandbox_mode),
 			slack=SlackConfig.from_env(),
+			destinations=DestinationConfig.from_env(),
+			google_accounts=GoogleConfig.accounts_from_env(),
+			image_host=ImageHostConfig.from_env(),
+			gmail_api_url=os.environ.get('GMAIL_API_URL'),
 		)
 
+	@property
+	def gmail_label(self) -> str:
+		"""Get the first configured Gmail label."""
+		return self.settings.labels[0]
+
 	def get_status_suffix(self) -> str:
 		"""Get suffix for status messages based on mode."""
 		return '_sandbox' if self.sandbox_mode else ''
@@ -0,0 +1,169 @@
+"""Gmail OAuth credentials shared by every Gmail client of the process and refreshed before they expire."""
+
+import base64
+import hashlib
+import logging
+import pickle
+import threading
+from collections.abc import Callable
+from datetime import UTC, datetime, timedelta
+
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+
+from .errors import AuthError
+from .profiling import phase
+
+logger = logging.getLogger(__name__)
+
+# Access tokens are refreshed when they expire within this margin, well before
+# google-auth would refresh them itself in the middle of a request
+DEFAULT_REFRESH_MARGIN = timedelta(minutes=10)
+
+# How often the background refresher looks for credentials about to expire
+DEFAULT_REFRESH_INTERVAL = timedelta(minutes=1)
+
+
+def _utcnow() -> datetime:
+	"""Current time as the naive UTC datetime used by ``Credentials.expiry``."""
+	return datetime.now(UTC).replace(tzinfo=None)
+
+
+def load_token(token_string: str) -> Credentials:
+	"""Load credentials from a base64 encoded pickled token, as stored in GOOGLE_OAUTH_TOKEN."""
+	# Add padding if needed
+	missing_padding = len(token_string) % 4
+	if missing_padding:
+		token_string += '=' * (4 - missing_padding)
+	creds: Credentials = pickle.loads(base64.b64decode(token_string.encode('utf-8')))
+	return creds
+
+
+def replay_token() -> str:
+	"""Build a GOOGLE_OAUTH_TOKEN whose credentials are valid without a refresh, for replays and emulators."""
+	return base64.b64encode(pickle.dumps(Credentials(token='scrubbed'))).decode('ascii')
+
+
+class CredentialManager:
+	"""Loads each OAuth token once and keeps its access token fresh.
+
+	Every Gmail client created with the same token gets the same Credentials
+	object, so a refresh is seen by all of them. Refreshes are single-flight:
+	a per-token lock makes concurrent callers wait for one refresh and reuse
+	its result instead of refreshing again. In long-running mode, ``start``
+	refreshes credentials in a background thread before they expire, so a
+	check never meets an expired token halfway through.
+	"""
+
+	def __init__(
+		self,
+		auth_request: Request | None = None,
+		refresh_margin: timedelta = DEFAULT_REFRESH_MARGIN,
+		clock: Callable[[], datetime] = _utcnow,
+	):
+		"""Initialize credential manager.
+
+		Args:
+			auth_request: Transport for token refreshes.
+			refresh_margin: Credentials expiring within this margin are refreshed.
+			clock: Returns the current naive UTC time, like ``Credentials.expiry``.
+		"""
+		self.auth_request = auth_request or Request()
+		self.refresh_margin = refresh_margin
+		self._clock = clock
+		self._lock = threading.Lock()
+		# Keyed by a digest of the token string, so the tokens themselves are not kept twice
+		self._credentials: dict[str, Credentials] = {}
+		self._refresh_locks: dict[str, threading.Lock] = {}
+		self._stop = threading.Event()
+		self._thread: threading.Thread | None = None
+
+	@staticmethod
+	def _key(token_string: str) -> str:
+		return hashlib.sha256(token_string.encode('utf-8')).hexdigest()
+
+	def get(self, token_string: str) -> Credentials:
+		"""Get valid credentials for a token, loading it on first use and refreshing it if needed.
+
+		Raises:
+			AuthError: If the token is expired and cannot be refreshed.
+		"""
+		key = self._key(token_string)
+		with self._lock:
+			if key not in self._credentials:
+				self._credentials[key] = load_token(token_string)
+				self._refresh_locks[key] = threading.Lock()
+		return self._refresh_if_needed(key)
+
+	def _needs_refresh(self, creds: Credentials) -> bool:
+		"""Check whether credentials are invalid or expire within the refresh margin."""
+		if not creds.valid:
+			return True
+		expiry = creds.expiry
+		# Credentials without an expiry never need refreshing
+		return isinstance(expiry, datetime) and expiry - self.refresh_margin <= self._clock()
+
+	def _refresh_if_needed(self, key: str) -> Credentials:
+		"""Refresh one token unless it is fresh, with at most one refresh in flight per token."""
+		creds = self._credentials[key]
+		if not self._needs_refresh(creds):
+			return creds
+		with self._refresh_locks[key]:
+			# Another caller may have refreshed the token while this one waited
+			if not self._needs_refresh(creds):
+				return creds
+			if not creds.refresh_token:
+				if creds.valid:
+					# Not refreshable, but still usable until it expires
+					return creds
+				raise AuthError(
+					'Token is expired and cannot be refreshed. No refresh_token available.'
+					' Please regenerate GOOGLE_OAUTH_TOKEN with offline access.'
+				)
+			logger.info('Refreshing token', extra={'stage': 'auth', 'expired': not creds.valid})
+			try:
+				with phase('token refresh'):
+					creds.refresh(self.auth_request)
+			except Exception as e:
+				raise AuthError(f'Failed to refresh token: {str(e)}. Please regenerate GOOGLE_OAUTH_TOKEN.') from e
+			logger.info('Token refreshed', extra={'stage': 'auth'})
+		return creds
+
+	def refresh_expiring(self) -> int:
+		"""Refresh every loaded token that expires within the refresh margin.
+
+		Failures are logged, not raised; the next ``get`` of that token raises them.
+
+		Returns:
+			Number of tokens that failed to refresh.
+		"""
+		with self._lock:
+			keys = list(self._credentials)
+		failed = 0
+		for key in keys:
+			try:
+				self._refresh_if_needed(key)
+			except AuthError as e:
+				logger.warning('Background token refresh failed', extra={'stage': 'auth', 'error': str(e)})
+				failed += 1
+		return failed
+
+	def start(self, interval: timedelta = DEFAULT_REFRESH_INTERVAL) -> None:
+		"""Refresh expiring tokens in a background thread every ``interval`` until ``stop``."""
+		if self._thread is not None:
+			return
+		self._stop.clear()
+
+		def run() -> None:
+			while not self._stop.wait(interval.total_seconds()):
+				self.refresh_expiring()
+
+		self._thread = threading.Thread(target=run, name='credential-refresher', daemon=True)
+		self._thread.start()
+
+	def stop(self) -> None:
+		"""Stop the background refresher and wait for it to finish."""
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join()
+			self._thread = None
@@ -0,0 +1,202 @@
+"""Long-running notifier that checks Gmail on the configured schedule.
+
+Each GitHub Actions run pays for a fresh runner, dependency install and token
+refresh. Running this module on an always-on host instead keeps one process
+alive and checks as often as ``[schedule]`` in the settings file says, for
+example every 5 minutes during delivery hours. IMAP sources with ``idle``
+enabled also trigger a check as soon as mail arrives.
+
+Usage:
+	python -m src.daemon
+"""
+
+import argparse
+import logging
+import os
+import signal
+import threading
+import time
+from collections.abc import Sequence
+from datetime import UTC, datetime, timedelta
+from types import FrameType
+
+from .accounts import create_auth_request
+from .config import AppConfig
+from .credentials import CredentialManager
+from .gmail_notifier import check_and_notify
+from .log import configure_logging
+from .scheduler import CronSchedule, IntervalSchedule, QuietHours, Schedule, Scheduler
+from .settings import Settings, SettingsWatcher
+from .sources import IdleWatcher, build_idle_watchers
+
+logger = logging.getLogger(__name__)
+
+# How often a wait for the next check looks for new mail reported by IMAP IDLE
+NEW_MAIL_POLL_SECONDS = 1.0
+
+
+def build_schedules(settings: Settings) -> tuple[list[Schedule], QuietHours | None]:
+	"""Create the schedules and quiet hours described by the [schedule] settings.
+
+	When [delivery] holds notifications during quiet hours, a check is also
+	scheduled at the end of that window so the digest goes out on time.
+	"""
+	schedule = settings.schedule
+	tz = schedule.tz
+	schedules: list[Schedule] = [CronSchedule(expression, tz) for expression in schedule.cron]
+	if schedule.interval_minutes is not None:
+		schedules.append(
+			IntervalSchedule(timedelta(minutes=schedule.interval_minutes), timedelta(seconds=schedule.jitter_seconds))
+		)
+	delivery_quiet_hours = settings.delivery.quiet_window()
+	if delivery_quiet_hours is not None:
+		end = delivery_quiet_hours.end
+		schedules.append(CronSchedule(f'{end.minute} {end.hour} * * *', delivery_quiet_hours.tz))
+	quiet_hours = QuietHours.parse(schedule.quiet_hours, tz) if schedule.quiet_hours else None
+	return schedules, quiet_hours
+
+
+class Daemon:
+	"""Runs checks on schedule, picking up settings file changes between checks.
+
+	OAuth tokens are loaded once and refreshed in the background before they
+	expire, so every check uses the same valid credentials. IMAP folders are
+	watched with IDLE while running, and new mail starts a check early.
+	"""
+
+	def __init__(
+		self, config: AppConfig, watcher: SettingsWatcher | None = None, credentials: CredentialManager | None = None
+	):
+		"""Initialize daemon.
+
+		Args:
+			config: Application configuration.
+			watcher: Watcher of the settings file, if one is used.
+			credentials: Credentials shared by every check.
+		"""
+		self.config = config
+		self.watcher = watcher
+		self.credentials = credentials or CredentialManager(
+			create_auth_request(pool_size=config.settings.concurrency.accounts)
+		)
+		self.new_mail = threading.Event()
+		self.idle_watchers: list[IdleWatcher] = []
+		self._watching = False
+		self.scheduler = Scheduler(*build_schedules(config.settings), wait=self._wait)
+
+	def _wait(self, stop: threading.Event, seconds: float) -> bool:
+		"""Wait for the next scheduled check, ending early when new mail arrives outside quiet hours.
+
+		Returns:
+			True if stopped.
+		"""
+		deadline = time.monotonic() + seconds
+		while (remaining := deadline - time.monotonic()) > 0:
+			if stop.wait(min(remaining, NEW_MAIL_POLL_SECONDS)):
+				return True
+			if self.new_mail.is_set():
+				self.new_mail.clear()
+				quiet_hours = self.scheduler.quiet_hours
+				if quiet_hours is None or not quiet_hours.contains(datetime.now(UTC)):
+					logger.info('Checking early for new mail', extra={'stage': 'schedule'})
+					return False
+		return stop.is_set()
+
+	def _start_watchers(self) -> None:
+		"""Watch the IMAP sources of the current settings."""
+		self._watching = True
+		self.idle_watchers = build_idle_watchers(self.config, self.new_mail)
+		for idle_watcher in self.idle_watchers:
+			idle_watcher.start()
+
+	def _stop_watchers(self) -> None:
+		"""Stop watching the IMAP sources."""
+		self._watching = False
+		for idle_watcher in self.idle_watchers:
+			idle_watcher.stop()
+		self.idle_watchers = []
+
+	def reload_settings(self) -> None:
+		"""Apply an edited settings file, including its schedule."""
+		if self.watcher is None or (settings := self.watcher.poll()) is None:
+			return
+		if settings.logging != self.config.settings.logging:
+			configure_logging(settings.logging)
+		sources_changed = settings.sources != self.config.settings.sources
+		self.config.settings = settings
+		self.scheduler.update(*build_schedules(settings))
+		if sources_changed and self._watching:
+			self._stop_watchers()
+			self._start_watchers()
+
+	def check(self) -> None:
+		"""Check every account once and deliver its unread emails."""
+		self.reload_settings()
+		report = check_and_notify(self.config, credentials=self.credentials)
+		logger.info(
+			'Check completed',
+			extra={
+				'stage': 'check',
+				'status': report.status(),
+				'counts': report.counts(),
+				'quota_units': report.quota_units(),
+			},
+		)
+		for result in report.failed:
+			logger.error(
+				'Email failed',
+				extra={
+					'stage': 'check',
+					'account': result.account,
+					'msg_id': result.message_id,
+					'error': result.detail,
+				},
+			)
+
+	def run(self, stop: threading.Event | None = None, max_runs: int | None = None) -> int:
+		"""Run checks until stopped.
+
+		Returns:
+			Number of checks run.
+		"""
+		self.credentials.start()
+		self._start_watchers()
+		try:
+			return self.scheduler.run(self.check, stop, max_runs)
+		finally:
+			self._stop_watchers()
+			self.credentials.stop()
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+	"""Parse command line arguments."""
+	parser = argparse.ArgumentParser(description='Check Gmail on the schedule in the settings file until stopped.')
+	parser.add_argument('--max-runs', type=int, help='Stop after this many checks')
+	return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	"""Run the daemon from the command line until SIGINT or SIGTERM."""
+	args = _parse_args(argv)
+	config = AppConfig.from_env()
+	configure_logging(config.settings.logging)
+	logger.info(config.get_mode_display(), extra={'stage': 'start'})
+
+	settings_path = os.environ.get('NOTIFIER_CONFIG')
+	watcher = SettingsWatcher(settings_path, config.settings) if settings_path else None
+	daemon = Daemon(config, watcher)
+
+	stop = threading.Event()
+
+	def request_stop(signum: int, frame: FrameType | None) -> None:
+		logger.info('Stopping after the current check', extra={'stage': 'stop', 'signal': signum})
+		stop.set()
+
+	signal.signal(signal.SIGINT, request_stop)
+	signal.signal(signal.SIGTERM, request_stop)
+	runs = daemon.run(stop, args.max_runs)
+	logger.info('Stopped', extra={'stage': 'stop', 'runs': runs})
+
+
+if __name__ == '__main__':
+	main()
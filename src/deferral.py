@@ -0,0 +1,61 @@
+"""Notifications held back during quiet hours and delivered afterwards as a digest."""
+
+import json
+import os
+from contextlib import suppress
+from dataclasses import dataclass
+from typing import Any
+
+from .email_content import EmailContent
+
+
+@dataclass
+class DeferredNotification:
+	"""An email whose notification waits for quiet hours to end."""
+
+	account: str
+	label: str
+	email_content: EmailContent
+
+	def to_dict(self) -> dict[str, Any]:
+		"""Convert to a JSON-compatible dict."""
+		return {'account': self.account, 'label': self.label, 'email_content': self.email_content.to_dict()}
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'DeferredNotification':
+		"""Create DeferredNotification from ``to_dict`` output."""
+		return cls(data['account'], data['label'], EmailContent.from_dict(data['email_content']))
+
+
+class DeferralQueue:
+	"""Deferred notifications, stored as JSON lines so they survive between runs."""
+
+	def __init__(self, path: str):
+		"""Initialize deferral queue."""
+		self.path = path
+
+	def load(self) -> list[DeferredNotification]:
+		"""Return deferred notifications, oldest first."""
+		if not os.path.exists(self.path):
+			return []
+		with open(self.path, encoding='utf-8') as f:
+			return [DeferredNotification.from_dict(json.loads(line)) for line in f if line.strip()]
+
+	def append(self, notification: DeferredNotification) -> bool:
+		"""Defer a notification unless the same email is already deferred.
+
+		Returns:
+			True if the notification was added.
+		"""
+		message_id = notification.email_content.id
+		if any(deferred.email_content.id == message_id for deferred in self.load()):
+			return False
+		os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+		with open(self.path, 'a', encoding='utf-8') as f:
+			f.write(json.dumps(notification.to_dict(), ensure_ascii=False) + '\n')
+		return True
+
+	def clear(self) -> None:
+		"""Remove every deferred notification."""
+		with suppress(FileNotFoundError):
+			os.remove(self.path)
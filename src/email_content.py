@@ -0,0 +1,80 @@
+"""Extracted email content: the record passed from Gmail to every destination."""
+
+import json
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any
+
+# Key of the sender in records stored before EmailContent, still found in old outboxes and caches
+LEGACY_SENDER_KEY = 'from'
+
+
+@dataclass(frozen=True, slots=True)
+class EmailContent:
+	"""One email as notified: headers, a truncated body and its parcel summary.
+
+	Immutable, so a change (the sandbox subject prefix, uploaded images) is a
+	``dataclasses.replace`` copy. Optional fields that are empty are left out
+	of the JSON form used by outboxes, caches and webhooks.
+	"""
+
+	id: str
+	subject: str
+	sender: str
+	body: str
+	thread_id: str | None = None
+	history_id: str | None = None
+	date: datetime | None = None
+	labels: tuple[str, ...] = ()
+	carrier: str | None = None
+	tracking_number: str | None = None
+	deadline: str | None = None
+	redelivery_url: str | None = None
+	image_urls: tuple[str, ...] = ()
+	preview_urls: tuple[str, ...] = ()
+
+	def has_summary(self) -> bool:
+		"""Check whether key parcel fields were found, so they can be sent instead of the body."""
+		return bool(self.tracking_number or self.deadline or self.redelivery_url)
+
+	def to_dict(self) -> dict[str, Any]:
+		"""Convert to JSON-compatible values, leaving out empty optional fields."""
+		data: dict[str, Any] = {}
+		for name in _FIELD_NAMES:
+			value = getattr(self, name)
+			if value is None or value == ():
+				continue
+			if isinstance(value, datetime):
+				value = value.isoformat()
+			elif isinstance(value, tuple):
+				value = list(value)
+			data[name] = value
+		return data
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'EmailContent':
+		"""Create EmailContent from ``to_dict`` output, or from a record of the older dict format.
+
+		Unknown keys are ignored, so records written by a newer version still load.
+		"""
+		values = {name: data[name] for name in _FIELD_NAMES if name in data}
+		if 'sender' not in values and LEGACY_SENDER_KEY in data:
+			values['sender'] = data[LEGACY_SENDER_KEY]
+		if values.get('date'):
+			values['date'] = datetime.fromisoformat(values['date'])
+		for name in ('labels', 'image_urls', 'preview_urls'):
+			if name in values:
+				values[name] = tuple(values[name])
+		return cls(**values)
+
+	def to_json(self) -> str:
+		"""Serialize to one line of JSON."""
+		return json.dumps(self.to_dict(), ensure_ascii=False)
+
+	@classmethod
+	def from_json(cls, text: str) -> 'EmailContent':
+		"""Deserialize from ``to_json`` output."""
+		return cls.from_dict(json.loads(text))
+
+
+_FIELD_NAMES = tuple(field.name for field in fields(EmailContent))
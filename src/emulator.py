@@ -0,0 +1,703 @@
+"""Local stand-in for the Gmail API, serving a mailbox read from an mbox file or a Maildir directory.
+
+The emulator answers the Gmail calls of the notifier over HTTP: messages and
+threads list (with label:, is:unread and the other terms of ``query``), get
+in every format, modify, batchModify, insert, attachments and history. Point
+the notifier at it with GMAIL_API_URL for end-to-end and load tests without
+credentials or network access::
+
+	python -m src.emulator mailbox.mbox --label Family/parcels --port 8025
+
+Messages exported by Google Takeout keep their labels and read state from
+the X-Gmail-Labels header. Other messages are unread unless their mbox Status
+or Maildir flags say otherwise, and get the labels given with --label.
+"""
+
+import argparse
+import base64
+import email
+import email.policy
+import hashlib
+import json
+import logging
+import mailbox
+import os
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from email.message import Message
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from .credentials import replay_token
+
+logger = logging.getLogger(__name__)
+
+# Labels with these names in X-Gmail-Labels are Gmail system labels
+SYSTEM_LABELS = {
+	'inbox': 'INBOX',
+	'unread': 'UNREAD',
+	'starred': 'STARRED',
+	'important': 'IMPORTANT',
+	'sent': 'SENT',
+	'draft': 'DRAFT',
+	'spam': 'SPAM',
+	'trash': 'TRASH',
+}
+
+# Takeout labels describing the export rather than the message
+IGNORED_LABELS = frozenset({'opened', 'archived'})
+
+DEFAULT_MAX_RESULTS = 100
+MAX_RESULTS_LIMIT = 500
+
+SNIPPET_LENGTH = 100
+
+# Query terms: an optional minus, an operator and a quoted, braced or bare value
+QUERY_TERM_PATTERN = re.compile(r'(-?)(\w+):("[^"]*"|\{[^}]*\}|\S+)|(\S+)')
+BRACED_VALUE_PATTERN = re.compile(r'"[^"]*"|[^\s"]+')
+AGE_PATTERN = re.compile(r'([1-9][0-9]*)([dmy])')
+SIZE_PATTERN = re.compile(r'([0-9]+)([KM]?)', re.IGNORECASE)
+
+AGE_SECONDS = {'d': 24 * 60 * 60, 'm': 30 * 24 * 60 * 60, 'y': 365 * 24 * 60 * 60}
+SIZE_FACTORS = {'': 1, 'K': 1024, 'M': 1024 * 1024}
+
+API_PREFIX = '/gmail/v1/users/'
+
+# historyTypes values and the keys of their changes in a history record
+HISTORY_KEYS = {'messageAdded': 'messagesAdded', 'labelAdded': 'labelsAdded', 'labelRemoved': 'labelsRemoved'}
+
+
+class QueryError(ValueError):
+	"""Raised for search terms and parameters the emulator does not support."""
+
+
+class NotFoundError(KeyError):
+	"""Raised for unknown message, thread or attachment IDs."""
+
+
+def _b64(data: bytes) -> str:
+	"""Encode bytes as base64url, as the Gmail API does."""
+	return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+@dataclass
+class EmulatedMessage:
+	"""One message of the emulated mailbox."""
+
+	id: str
+	thread_id: str
+	raw: bytes
+	label_ids: set[str]
+	internal_date: int
+	history_id: int
+	parsed: Message = field(repr=False)
+	attachments: dict[str, bytes] = field(default_factory=dict, repr=False)
+
+	def header(self, name: str) -> str:
+		"""Get a decoded header value, or an empty string."""
+		value = self.parsed.get(name)
+		return str(value) if value is not None else ''
+
+	def text(self) -> str:
+		"""Get the first text/plain part, decoded."""
+		for part in self.parsed.walk():
+			if part.get_content_type() == 'text/plain' and not part.get_filename():
+				data = part.get_payload(decode=True)
+				if isinstance(data, bytes):
+					return data.decode(part.get_content_charset() or 'utf-8', errors='replace')
+		return ''
+
+	def _payload(self, part: Message, part_id: str) -> dict[str, Any]:
+		"""Convert a MIME part to a Gmail payload, registering attachments by ID."""
+		payload: dict[str, Any] = {
+			'partId': part_id,
+			'mimeType': part.get_content_type(),
+			'filename': part.get_filename() or '',
+			'headers': [{'name': name, 'value': str(value)} for name, value in part.items()],
+		}
+		if part.is_multipart():
+			children = part.get_payload()
+			assert isinstance(children, list)
+			payload['body'] = {'size': 0}
+			payload['parts'] = [
+				self._payload(child, f'{part_id}.{index}' if part_id else str(index))
+				for index, child in enumerate(children)
+			]
+			return payload
+		data = part.get_payload(decode=True)
+		data = data if isinstance(data, bytes) else b''
+		if payload['filename']:
+			attachment_id = f'{self.id}-{part_id or "0"}'
+			self.attachments[attachment_id] = data
+			payload['body'] = {'size': len(data), 'attachmentId': attachment_id}
+		else:
+			payload['body'] = {'size': len(data), 'data': _b64(data)}
+		return payload
+
+	def resource(self, message_format: str = 'full', metadata_headers: Sequence[str] = ()) -> dict[str, Any]:
+		"""Build the users.messages resource in one of the formats full, metadata, minimal and raw."""
+		resource: dict[str, Any] = {
+			'id': self.id,
+			'threadId': self.thread_id,
+			'labelIds': sorted(self.label_ids),
+			'snippet': ' '.join(self.text().split())[:SNIPPET_LENGTH],
+			'historyId': str(self.history_id),
+			'internalDate': str(self.internal_date),
+			'sizeEstimate': len(self.raw),
+		}
+		if message_format == 'raw':
+			resource['raw'] = _b64(self.raw)
+		elif message_format == 'metadata':
+			wanted = {name.lower() for name in metadata_headers}
+			headers = [
+				{'name': name, 'value': str(value)}
+				for name, value in self.parsed.items()
+				if not wanted or name.lower() in wanted
+			]
+			resource['payload'] = {'mimeType': self.parsed.get_content_type(), 'headers': headers}
+		elif message_format == 'full':
+			resource['payload'] = self._payload(self.parsed, '')
+		elif message_format != 'minimal':
+			raise QueryError(f'Invalid format: {message_format}')
+		return resource
+
+
+def _values(value: str) -> list[str]:
+	"""Split a query value into its alternatives, without quotes."""
+	if value.startswith('{') and value.endswith('}'):
+		return [item.strip('"').strip() for item in BRACED_VALUE_PATTERN.findall(value[1:-1])]
+	return [value.strip('"').strip()]
+
+
+def _size(value: str) -> int:
+	"""Parse a larger: or smaller: size, such as 10M."""
+	match = SIZE_PATTERN.fullmatch(value)
+	if not match:
+		raise QueryError(f'Invalid size: {value}')
+	return int(match.group(1)) * SIZE_FACTORS[match.group(2).upper()]
+
+
+def _age(value: str) -> int:
+	"""Parse a newer_than: or older_than: age into seconds."""
+	match = AGE_PATTERN.fullmatch(value)
+	if not match:
+		raise QueryError(f'Invalid age: {value}')
+	return int(match.group(1)) * AGE_SECONDS[match.group(2)]
+
+
+def _date(value: str) -> int:
+	"""Parse an after: or before: date, a Unix time or YYYY/MM/DD in UTC."""
+	if value.isdigit():
+		return int(value)
+	try:
+		return int(datetime.strptime(value, '%Y/%m/%d').replace(tzinfo=UTC).timestamp())
+	except ValueError:
+		raise QueryError(f'Invalid date: {value}') from None
+
+
+class Mailbox:
+	"""Messages, labels and history of the emulated account. Safe to use from several threads."""
+
+	def __init__(self, clock: Callable[[], float] = time.time):
+		"""Initialize an empty mailbox.
+
+		Args:
+			clock: Returns the current Unix time, for newer_than: and older_than:.
+		"""
+		self._clock = clock
+		self._lock = threading.RLock()
+		self.messages: dict[str, EmulatedMessage] = {}
+		self.label_names: dict[str, str] = {label_id: label_id for label_id in SYSTEM_LABELS.values()}
+		self.history_id = 1
+		self.history: list[dict[str, Any]] = []
+		# Message-ID header -> thread ID, for threading replies
+		self._threads_by_message_id: dict[str, str] = {}
+
+	@classmethod
+	def load(cls, path: str, labels: Iterable[str] = (), clock: Callable[[], float] = time.time) -> 'Mailbox':
+		"""Read an mbox file, or a Maildir directory, into a new mailbox.
+
+		Args:
+			path: mbox file or Maildir directory.
+			labels: Label names added to every message.
+			clock: Returns the current Unix time.
+		"""
+		box = cls(clock)
+		labels = list(labels)
+		source: mailbox.Mailbox = mailbox.Maildir(path, create=False) if os.path.isdir(path) else mailbox.mbox(path)
+		try:
+			for stored in source:
+				flags = stored.get_flags() if isinstance(stored, mailbox.MaildirMessage | mailbox.mboxMessage) else ''
+				seen = 'S' in flags if isinstance(stored, mailbox.MaildirMessage) else 'R' in flags
+				box.add(stored.as_bytes(), labels, unread=not seen, record_history=False)
+		finally:
+			source.close()
+		return box
+
+	def label_id(self, name: str, create: bool = True) -> str | None:
+		"""Get the ID of a label by name or ID, creating a user label if needed."""
+		with self._lock:
+			system = SYSTEM_LABELS.get(name.lower())
+			if system is not None or name in self.label_names:
+				return system or name
+			for label_id, label_name in self.label_names.items():
+				if label_name.lower() == name.lower():
+					return label_id
+			if not create:
+				return None
+			label_id = f'Label_{len(self.label_names) - len(SYSTEM_LABELS) + 1}'
+			self.label_names[label_id] = name
+			return label_id
+
+	def _next_history_id(self) -> int:
+		self.history_id += 1
+		return self.history_id
+
+	def _record(self, message: EmulatedMessage, history_type: str, label_ids: Iterable[str] = ()) -> None:
+		"""Append a history record of one change to a message.
+
+		Args:
+			message: The changed message, which gets the new history ID.
+			history_type: messageAdded, labelAdded or labelRemoved.
+			label_ids: Labels added or removed.
+		"""
+		message.history_id = self._next_history_id()
+		summary = {'id': message.id, 'threadId': message.thread_id, 'labelIds': sorted(message.label_ids)}
+		change: dict[str, Any] = {'message': summary}
+		if history_type != 'messageAdded':
+			change['labelIds'] = sorted(label_ids)
+		self.history.append(
+			{'id': str(message.history_id), 'messages': [summary], HISTORY_KEYS[history_type]: [change]}
+		)
+
+	def _thread_id(self, parsed: Message, message_id: str) -> str:
+		"""Find the thread of a message from X-GM-THRID or the messages it replies to."""
+		gmail_thread = parsed.get('X-GM-THRID')
+		if gmail_thread:
+			return f'{int(str(gmail_thread)):x}' if str(gmail_thread).isdigit() else str(gmail_thread)
+		references = f'{parsed.get("References", "")} {parsed.get("In-Reply-To", "")}'.split()
+		for reference in references:
+			if reference in self._threads_by_message_id:
+				return self._threads_by_message_id[reference]
+		return message_id
+
+	def add(
+		self, raw: bytes, labels: Iterable[str] = (), unread: bool = True, record_history: bool = True
+	) -> EmulatedMessage:
+		"""Add a message from its RFC 822 bytes.
+
+		Args:
+			raw: The message.
+			labels: Label names or IDs. X-Gmail-Labels of a Takeout export are added as well.
+			unread: Whether the message is unread, unless X-Gmail-Labels says otherwise.
+			record_history: Whether the addition is a messagesAdded history record.
+		"""
+		parsed = email.message_from_bytes(raw, policy=email.policy.default)
+		names = list(labels)
+		gmail_labels = parsed.get('X-Gmail-Labels')
+		if gmail_labels is not None:
+			takeout = [name.strip() for name in str(gmail_labels).split(',') if name.strip()]
+			unread = any(name.lower() == 'unread' for name in takeout)
+			names += [name for name in takeout if name.lower() not in IGNORED_LABELS | {'unread'}]
+		with self._lock:
+			digest = hashlib.sha256(raw).hexdigest()
+			message_id = digest[:16]
+			while message_id in self.messages:
+				message_id = hashlib.sha256(message_id.encode('ascii')).hexdigest()[:16]
+			label_ids = {label_id for name in names if (label_id := self.label_id(name)) is not None}
+			if unread:
+				label_ids.add('UNREAD')
+			try:
+				date = parsedate_to_datetime(str(parsed['Date'])).timestamp() if parsed['Date'] else self._clock()
+			except (TypeError, ValueError):
+				date = self._clock()
+			message = EmulatedMessage(
+				id=message_id,
+				thread_id=self._thread_id(parsed, message_id),
+				raw=raw,
+				label_ids=label_ids,
+				internal_date=int(date * 1000),
+				history_id=self.history_id,
+				parsed=parsed,
+			)
+			if parsed['Message-ID']:
+				self._threads_by_message_id[str(parsed['Message-ID']).strip()] = message.thread_id
+			self.messages[message_id] = message
+			if record_history:
+				self._record(message, 'messageAdded')
+			return message
+
+	def get(self, message_id: str) -> EmulatedMessage:
+		"""Get a message by ID.
+
+		Raises:
+			NotFoundError: If there is no such message.
+		"""
+		try:
+			return self.messages[message_id]
+		except KeyError:
+			raise NotFoundError(message_id) from None
+
+	def thread(self, thread_id: str) -> list[EmulatedMessage]:
+		"""Get the messages of a thread, oldest first.
+
+		Raises:
+			NotFoundError: If there is no such thread.
+		"""
+		with self._lock:
+			messages = [message for message in self.messages.values() if message.thread_id == thread_id]
+		if not messages:
+			raise NotFoundError(thread_id)
+		return sorted(messages, key=lambda message: message.internal_date)
+
+	def _condition(self, operator: str, value: str) -> Callable[[EmulatedMessage], bool]:
+		"""Build the test of one query term."""
+		values = _values(value)
+		if operator == 'label':
+			label_ids = {self.label_id(name, create=False) for name in values}
+			return lambda message: bool(label_ids & message.label_ids)
+		if operator == 'is' and values in (['unread'], ['read']):
+			unread = values == ['unread']
+			return lambda message: ('UNREAD' in message.label_ids) == unread
+		if operator in ('from', 'subject'):
+			header = 'From' if operator == 'from' else 'Subject'
+			needles = [needle.lower() for needle in values]
+			return lambda message: any(needle in message.header(header).lower() for needle in needles)
+		if operator in ('newer_than', 'older_than'):
+			threshold = (self._clock() - _age(value)) * 1000
+			newer = operator == 'newer_than'
+			return lambda message: (message.internal_date > threshold) == newer
+		if operator in ('after', 'before'):
+			boundary = _date(value) * 1000
+			after = operator == 'after'
+			return lambda message: message.internal_date >= boundary if after else message.internal_date < boundary
+		if operator in ('larger', 'smaller'):
+			size = _size(value)
+			larger = operator == 'larger'
+			return lambda message: len(message.raw) > size if larger else len(message.raw) < size
+		raise QueryError(f'Unsupported search term: {operator}:{value}')
+
+	def search(self, query: str = '', label_ids: Sequence[str] = ()) -> list[EmulatedMessage]:
+		"""Find messages matching a Gmail search query and label IDs, newest first.
+
+		Raises:
+			QueryError: If the query uses terms the emulator does not support.
+		"""
+		conditions: list[Callable[[EmulatedMessage], bool]] = []
+		for match in QUERY_TERM_PATTERN.finditer(query):
+			negated, operator, value, bare = match.groups()
+			if bare is not None:
+				raise QueryError(f'Unsupported search term: {bare}')
+			condition = self._condition(operator.lower(), value)
+			conditions.append((lambda test: lambda message: not test(message))(condition) if negated else condition)
+		with self._lock:
+			messages = list(self.messages.values())
+		return sorted(
+			(
+				message
+				for message in messages
+				if set(label_ids) <= message.label_ids and all(condition(message) for condition in conditions)
+			),
+			key=lambda message: message.internal_date,
+			reverse=True,
+		)
+
+	def modify(self, message_ids: Iterable[str], add: Iterable[str] = (), remove: Iterable[str] = ()) -> None:
+		"""Add and remove labels of messages, recording the changes in the history.
+
+		Raises:
+			NotFoundError: If a message does not exist; no message is changed then.
+		"""
+		with self._lock:
+			messages = [self.get(message_id) for message_id in message_ids]
+			added = {label_id for name in add if (label_id := self.label_id(name)) is not None}
+			removed = {label_id for name in remove if (label_id := self.label_id(name, create=False)) is not None}
+			for message in messages:
+				labels_added = added - message.label_ids
+				labels_removed = removed & message.label_ids
+				message.label_ids |= labels_added
+				message.label_ids -= labels_removed
+				if labels_added:
+					self._record(message, 'labelAdded', labels_added)
+				if labels_removed:
+					self._record(message, 'labelRemoved', labels_removed)
+
+	def changes(
+		self, start_history_id: int, label_id: str | None = None, history_types: Sequence[str] = ()
+	) -> list[dict[str, Any]]:
+		"""Get the history records after ``start_history_id``, optionally of one label and some types.
+
+		A record is of a label if its message has the label, or the label was the one added or removed.
+		"""
+		try:
+			keys = [HISTORY_KEYS[history_type] for history_type in history_types or HISTORY_KEYS]
+		except KeyError as e:
+			raise QueryError(f'Invalid historyTypes: {e.args[0]}') from None
+		with self._lock:
+			records = [record for record in self.history if int(record['id']) > start_history_id]
+		selected = []
+		for record in records:
+			changes = [change for key in keys for change in record.get(key, [])]
+			labels = {
+				label for change in changes for label in change['message']['labelIds'] + change.get('labelIds', [])
+			}
+			if changes and (label_id is None or label_id in labels):
+				selected.append(record)
+		return selected
+
+
+class _Handler(BaseHTTPRequestHandler):
+	"""Routes Gmail API requests to the mailbox of the server."""
+
+	server: 'GmailEmulator'
+	protocol_version = 'HTTP/1.1'
+
+	def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+		"""Log requests at DEBUG instead of writing them to stderr."""
+		logger.debug('Emulator request', extra={'stage': 'emulator', 'request': format % args})
+
+	def _send(self, status: int, body: Any = None) -> None:
+		data = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+		self.send_response(status)
+		self.send_header('Content-Type', 'application/json; charset=UTF-8')
+		self.send_header('Content-Length', str(len(data)))
+		self.end_headers()
+		self.wfile.write(data)
+
+	def _error(self, status: HTTPStatus, message: str) -> None:
+		self._send(status, {'error': {'code': status.value, 'message': message, 'status': status.name}})
+
+	def _body(self) -> dict[str, Any]:
+		length = int(self.headers.get('Content-Length') or 0)
+		body: dict[str, Any] = json.loads(self.rfile.read(length) or b'{}') if length else {}
+		return body
+
+	def do_GET(self) -> None:  # noqa: N802
+		"""Answer list, get, attachments, labels and history calls."""
+		self._dispatch('GET')
+
+	def do_POST(self) -> None:  # noqa: N802
+		"""Answer modify, batchModify and insert calls."""
+		self._dispatch('POST')
+
+	def _dispatch(self, method: str) -> None:
+		url = urlsplit(self.path)
+		query = parse_qs(url.query)
+		if self.server.latency:
+			time.sleep(self.server.latency)
+		if not url.path.startswith(API_PREFIX):
+			self._error(HTTPStatus.NOT_FOUND, f'Unknown path: {url.path}')
+			return
+		# users/{userId}/<resource...>; every user ID reaches the same mailbox
+		segments = url.path[len(API_PREFIX) :].split('/')[1:]
+		try:
+			status, body = self.server.route(method, segments, query, self._body() if method == 'POST' else {})
+		except NotFoundError:
+			self._error(HTTPStatus.NOT_FOUND, 'Requested entity was not found.')
+		except ValueError as e:
+			self._error(HTTPStatus.BAD_REQUEST, str(e))
+		else:
+			self._send(status, body)
+
+
+class GmailEmulator(ThreadingHTTPServer):
+	"""HTTP server answering Gmail API calls from a Mailbox.
+
+	Use it as a context manager to serve from a background thread::
+
+		with GmailEmulator(Mailbox.load('mailbox.mbox', ['Family/parcels'])) as emulator:
+			GmailNotifier(oauth_token=replay_token(), api_endpoint=emulator.url)
+	"""
+
+	daemon_threads = True
+
+	def __init__(self, mailbox: Mailbox, host: str = '127.0.0.1', port: int = 0, latency: float = 0.0):
+		"""Initialize emulator and bind its port.
+
+		Args:
+			mailbox: Mailbox to serve.
+			host: Address to listen on.
+			port: Port to listen on; 0 picks a free one.
+			latency: Seconds to wait before answering each request, to mimic the network.
+		"""
+		super().__init__((host, port), _Handler)
+		self.mailbox = mailbox
+		self.latency = latency
+		self._thread: threading.Thread | None = None
+
+	@property
+	def url(self) -> str:
+		"""Base URL to pass as GMAIL_API_URL."""
+		host, port = self.server_address[:2]
+		return f'http://{host!s}:{port}/'
+
+	def __enter__(self) -> 'GmailEmulator':
+		"""Serve from a background thread."""
+		self._thread = threading.Thread(target=self.serve_forever, name='gmail-emulator', daemon=True)
+		self._thread.start()
+		return self
+
+	def __exit__(self, *exc_info: object) -> None:
+		"""Stop serving and close the socket."""
+		self.shutdown()
+		self.server_close()
+		if self._thread is not None:
+			self._thread.join()
+
+	def _list(self, resource: str, query: dict[str, list[str]]) -> dict[str, Any]:
+		"""Answer messages.list and threads.list, one page at a time."""
+		matches = self.mailbox.search(query.get('q', [''])[0], query.get('labelIds', []))
+		if resource == 'threads':
+			items = list({message.thread_id: {'id': message.thread_id} for message in matches}.values())
+		else:
+			items = [{'id': message.id, 'threadId': message.thread_id} for message in matches]
+		max_results = min(int(query.get('maxResults', [DEFAULT_MAX_RESULTS])[0]), MAX_RESULTS_LIMIT)
+		start = int(query.get('pageToken', ['0'])[0])
+		page: dict[str, Any] = {'resultSizeEstimate': len(items)}
+		if items[start : start + max_results]:
+			page[resource] = items[start : start + max_results]
+		if start + max_results < len(items):
+			page['nextPageToken'] = str(start + max_results)
+		return page
+
+	def _thread_resource(self, thread_id: str, query: dict[str, list[str]]) -> dict[str, Any]:
+		"""Answer threads.get."""
+		messages = self.mailbox.thread(thread_id)
+		message_format = query.get('format', ['full'])[0]
+		return {
+			'id': thread_id,
+			'historyId': str(max(message.history_id for message in messages)),
+			'messages': [message.resource(message_format, query.get('metadataHeaders', [])) for message in messages],
+		}
+
+	def _history(self, query: dict[str, list[str]]) -> dict[str, Any]:
+		"""Answer history.list."""
+		if 'startHistoryId' not in query:
+			raise QueryError('startHistoryId is required')
+		label_ids = query.get('labelId')
+		records = self.mailbox.changes(
+			int(query['startHistoryId'][0]), label_ids[0] if label_ids else None, query.get('historyTypes', [])
+		)
+		response: dict[str, Any] = {'historyId': str(self.mailbox.history_id)}
+		if records:
+			response['history'] = records
+		return response
+
+	def _attachment(self, message_id: str, attachment_id: str) -> dict[str, Any]:
+		"""Answer messages.attachments.get."""
+		message = self.mailbox.get(message_id)
+		# Registers the attachment IDs of the message
+		message.resource('full')
+		if attachment_id not in message.attachments:
+			raise NotFoundError(attachment_id)
+		data = message.attachments[attachment_id]
+		return {'attachmentId': attachment_id, 'size': len(data), 'data': _b64(data)}
+
+	def _labels(self) -> dict[str, Any]:
+		"""Answer labels.list."""
+		labels = [
+			{'id': label_id, 'name': name, 'type': 'system' if label_id == name else 'user'}
+			for label_id, name in self.mailbox.label_names.items()
+		]
+		return {'labels': labels}
+
+	def _get(self, segments: list[str], query: dict[str, list[str]]) -> dict[str, Any]:
+		"""Answer a GET request."""
+		match segments:
+			case ['messages' | 'threads' as resource]:
+				return self._list(resource, query)
+			case ['messages', message_id]:
+				message_format = query.get('format', ['full'])[0]
+				return self.mailbox.get(message_id).resource(message_format, query.get('metadataHeaders', []))
+			case ['messages', message_id, 'attachments', attachment_id]:
+				return self._attachment(message_id, attachment_id)
+			case ['threads', thread_id]:
+				return self._thread_resource(thread_id, query)
+			case ['labels']:
+				return self._labels()
+			case ['history']:
+				return self._history(query)
+		raise NotFoundError('/'.join(segments))
+
+	def _post(self, segments: list[str], body: dict[str, Any]) -> dict[str, Any] | None:
+		"""Answer a POST request."""
+		box = self.mailbox
+		add, remove = body.get('addLabelIds', []), body.get('removeLabelIds', [])
+		match segments:
+			case ['messages']:
+				raw = body.get('raw', '')
+				labels = body.get('labelIds', [])
+				message = box.add(
+					base64.urlsafe_b64decode(raw + '=' * (-len(raw) % 4)),
+					[label for label in labels if label != 'UNREAD'],
+					unread='UNREAD' in labels,
+				)
+				return message.resource('minimal')
+			case ['messages', 'batchModify']:
+				box.modify(body.get('ids', []), add, remove)
+				return None
+			case ['messages', message_id, 'modify']:
+				box.modify([message_id], add, remove)
+				return box.get(message_id).resource('minimal')
+			case ['threads', thread_id, 'modify']:
+				box.modify([message.id for message in box.thread(thread_id)], add, remove)
+				return self._thread_resource(thread_id, {'format': ['minimal']})
+		raise NotFoundError('/'.join(segments))
+
+	def route(
+		self, method: str, segments: list[str], query: dict[str, list[str]], body: dict[str, Any]
+	) -> tuple[int, Any]:
+		"""Answer one request for ``users/{userId}/<segments>``.
+
+		Returns:
+			HTTP status and JSON body, or None for an empty body.
+
+		Raises:
+			NotFoundError: For unknown IDs or paths.
+			QueryError: For invalid queries.
+		"""
+		if method == 'GET':
+			return HTTPStatus.OK, self._get(segments, query)
+		response = self._post(segments, body)
+		return (HTTPStatus.OK if response is not None else HTTPStatus.NO_CONTENT), response
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+	"""Parse command line arguments."""
+	parser = argparse.ArgumentParser(description='Serve an mbox file or Maildir directory as a local Gmail API.')
+	parser.add_argument('mailbox', help='mbox file or Maildir directory')
+	parser.add_argument(
+		'--label', action='append', default=[], help='Label added to every message (repeatable), such as Family/parcels'
+	)
+	parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: 127.0.0.1)')
+	parser.add_argument('--port', type=int, default=8025, help='Port to listen on (default: 8025)')
+	parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay before each response (default: 0)')
+	return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	"""Serve a mailbox until interrupted, printing the environment that points the notifier at it."""
+	args = _parse_args(argv)
+	box = Mailbox.load(args.mailbox, args.label)
+	emulator = GmailEmulator(box, args.host, args.port, args.latency_ms / 1000)
+	unread = len(box.search('is:unread'))
+	print(f'Serving {len(box.messages)} messages ({unread} unread) from {args.mailbox}')
+	print(f'GMAIL_API_URL={emulator.url}')
+	print(f'GOOGLE_OAUTH_TOKEN={replay_token()}')
+	try:
+		emulator.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		emulator.server_close()
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,146 @@
+"""Typed errors and their retry classification."""
+
+import json
+from enum import StrEnum
+from typing import Any
+
+import httplib2
+import requests
+from google.auth.exceptions import RefreshError, TransportError
+from googleapiclient.errors import HttpError
+
+
+class RetryClass(StrEnum):
+	"""How an error should be handled.
+
+	- auth: credentials are invalid or lack permission. Needs an operator.
+	- quota: a rate limit or quota was hit. Retry later.
+	- transient: network failures, timeouts and server errors. Retry later.
+	- permanent: the request itself was rejected. Retrying does not help.
+	"""
+
+	AUTH = 'auth'
+	QUOTA = 'quota'
+	TRANSIENT = 'transient'
+	PERMANENT = 'permanent'
+
+	@property
+	def retryable(self) -> bool:
+		"""Check whether retrying later without any change can succeed."""
+		return self in (RetryClass.QUOTA, RetryClass.TRANSIENT)
+
+
+class NotifierError(Exception):
+	"""Base class for errors raised by this package, carrying a retry classification."""
+
+	retry_class = RetryClass.PERMANENT
+
+	def __init__(self, message: str, retry_class: RetryClass | None = None):
+		"""Initialize error, overriding the class default retry classification if given."""
+		super().__init__(message)
+		if retry_class is not None:
+			self.retry_class = retry_class
+
+
+class AuthError(NotifierError):
+	"""Credentials are invalid, expired or lack permission."""
+
+	retry_class = RetryClass.AUTH
+
+
+class QuotaError(NotifierError):
+	"""A rate limit or quota was exceeded."""
+
+	retry_class = RetryClass.QUOTA
+
+
+class TransientError(NotifierError):
+	"""A temporary failure that is expected to pass."""
+
+	retry_class = RetryClass.TRANSIENT
+
+
+class PermanentError(NotifierError):
+	"""A request that will fail the same way every time."""
+
+	retry_class = RetryClass.PERMANENT
+
+
+# Google API error reasons that mean a quota was hit, even with status 403
+GOOGLE_QUOTA_REASONS = frozenset(
+	{'rateLimitExceeded', 'userRateLimitExceeded', 'quotaExceeded', 'dailyLimitExceeded', 'RATE_LIMIT_EXCEEDED'}
+)
+
+# Slack Web API error codes -> retry class (others are permanent)
+SLACK_ERROR_CLASSES: dict[str, RetryClass] = {
+	'ratelimited': RetryClass.QUOTA,
+	'not_authed': RetryClass.AUTH,
+	'invalid_auth': RetryClass.AUTH,
+	'account_inactive': RetryClass.AUTH,
+	'token_revoked': RetryClass.AUTH,
+	'token_expired': RetryClass.AUTH,
+	'missing_scope': RetryClass.AUTH,
+	'internal_error': RetryClass.TRANSIENT,
+	'fatal_error': RetryClass.TRANSIENT,
+	'service_unavailable': RetryClass.TRANSIENT,
+	'request_timeout': RetryClass.TRANSIENT,
+}
+
+
+def classify_status(status: int, reasons: frozenset[str] = frozenset()) -> RetryClass:
+	"""Classify an HTTP error status code.
+
+	Args:
+		status: HTTP status code.
+		reasons: Error reasons from the response body, used to tell quota errors from permission errors on 403.
+	"""
+	if status == 429 or (status == 403 and reasons & GOOGLE_QUOTA_REASONS):
+		return RetryClass.QUOTA
+	if status in (401, 403):
+		return RetryClass.AUTH
+	if status == 408 or status >= 500:
+		return RetryClass.TRANSIENT
+	return RetryClass.PERMANENT
+
+
+def _google_reasons(error: HttpError) -> frozenset[str]:
+	"""Collect the error reasons of a Google API error response.
+
+	Reasons appear in ``errors`` (legacy format) and in ``details`` (ErrorInfo).
+	"""
+	try:
+		body: Any = json.loads(error.content)
+	except (TypeError, ValueError):
+		return frozenset()
+	if not isinstance(body, dict) or not isinstance(body.get('error'), dict):
+		return frozenset()
+	entries = [*body['error'].get('errors', []), *body['error'].get('details', [])]
+	return frozenset(entry['reason'] for entry in entries if isinstance(entry, dict) and 'reason' in entry)
+
+
+def classify(error: BaseException) -> RetryClass:
+	"""Classify any exception raised while fetching or delivering a message."""
+	if isinstance(error, NotifierError):
+		return error.retry_class
+	if isinstance(error, HttpError):
+		return classify_status(error.resp.status, _google_reasons(error))
+	if isinstance(error, requests.HTTPError) and error.response is not None:
+		return classify_status(error.response.status_code)
+	if isinstance(error, RefreshError):
+		return RetryClass.AUTH
+	if isinstance(
+		error,
+		requests.ConnectionError
+		| requests.Timeout
+		| TransportError
+		| httplib2.HttpLib2Error
+		| ConnectionError
+		| TimeoutError,
+	):
+		return RetryClass.TRANSIENT
+	return RetryClass.PERMANENT
+
+
+def describe(error: BaseException) -> str:
+	"""Format an error with its retry class for logs and reports."""
+	return f'[{classify(error)}] {error}'
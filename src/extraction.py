@@ -0,0 +1,77 @@
+"""Parallel email content extraction stage."""
+
+import os
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any
+
+from .email_content import EmailContent
+from .gmail_notifier import GmailNotifier
+
+Extractor = Callable[[dict[str, Any]], EmailContent]
+
+# Below this many messages a pool costs more to start than it saves
+SERIAL_THRESHOLD = 64
+# Total sizeEstimate from which worker processes beat threads despite pickling overhead
+PROCESS_POOL_MIN_BYTES = 8 * 1024 * 1024
+# Target number of chunks per worker, so slow chunks don't leave other workers idle
+CHUNKS_PER_WORKER = 4
+
+
+def _extract_chunk(extractor: Extractor, chunk: Sequence[dict[str, Any]]) -> list[EmailContent]:
+	"""Extract a chunk of messages inside a worker."""
+	return [extractor(message) for message in chunk]
+
+
+def _chunked(messages: Sequence[dict[str, Any]], size: int) -> list[Sequence[dict[str, Any]]]:
+	"""Split messages into consecutive chunks of at most ``size`` items."""
+	return [messages[i : i + size] for i in range(0, len(messages), size)]
+
+
+def _payload_bytes(messages: Sequence[dict[str, Any]]) -> int:
+	"""Estimate total payload size from Gmail's sizeEstimate."""
+	return sum(int(message.get('sizeEstimate', 0)) for message in messages)
+
+
+def extract_messages(
+	messages: Sequence[dict[str, Any]],
+	extractor: Extractor = GmailNotifier.extract_email_content,
+	max_workers: int | None = None,
+	chunk_size: int | None = None,
+	serial_threshold: int = SERIAL_THRESHOLD,
+	process_min_bytes: int = PROCESS_POOL_MIN_BYTES,
+) -> list[EmailContent]:
+	"""Extract email content from many messages, in parallel when it pays off.
+
+	Results are returned in the same order as ``messages``.
+
+	Args:
+		messages: Gmail API message resources (format=full).
+		extractor: Picklable function converting one message to email content.
+		max_workers: Number of workers. Defaults to the CPU count.
+		chunk_size: Messages per task. Defaults to spreading
+			``CHUNKS_PER_WORKER`` chunks over each worker.
+		serial_threshold: Extract serially when there are fewer messages than this.
+		process_min_bytes: Use a process pool when the batch's total sizeEstimate
+			reaches this many bytes, otherwise a thread pool.
+	"""
+	workers = max_workers or os.cpu_count() or 1
+	if len(messages) < serial_threshold or workers == 1:
+		return _extract_chunk(extractor, messages)
+
+	if chunk_size is None:
+		chunk_size = max(1, -(-len(messages) // (workers * CHUNKS_PER_WORKER)))
+	chunks = _chunked(messages, chunk_size)
+
+	executor: Executor
+	if _payload_bytes(messages) >= process_min_bytes:
+		executor = ProcessPoolExecutor(max_workers=min(workers, len(chunks)))
+	else:
+		executor = ThreadPoolExecutor(max_workers=min(workers, len(chunks)))
+
+	with executor:
+		results: list[EmailContent] = []
+		for chunk_result in executor.map(partial(_extract_chunk, extractor), chunks):
+			results.extend(chunk_result)
+	return results
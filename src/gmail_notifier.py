@@ -1,18 +1,68 @@
 """Gmail to LINE notification module."""
 
+import argparse
 import base64
 import json
+import logging
 import os
 import pickle
+from collections.abc import Callable, Sequence
+from dataclasses import replace
+from datetime import UTC, datetime
+from email.message import Message
+from functools import partial
 from typing import Any
 
-import requests
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
 from googleapiclient.discovery import build
 
-from .config import AppConfig
+from .accounts import AccountEmail, create_auth_request, poll_accounts
+from .alerts import ALERTS_FILE, AlertAggregator
+from .attachments import AttachmentProcessor, build_attachment_processor
+from .circuit_breaker import GuardedSink, flush_outboxes
+from .config import AppConfig, GoogleConfig
+from .credentials import CredentialManager
+from .deferral import DeferralQueue, DeferredNotification
+from .email_content import EmailContent
+from .errors import RetryClass, classify, describe
+from .headers import HeaderIndex
+from .html_text import html_to_text
+from .log import configure_logging, correlate
+from .message_cache import MessageCache
+from .profiling import phase, profiled
+from .query import compile_query
+from .quota import QuotaLedger
+from .report import Outcome, RunReport, outcome_for
+from .settings import FilterSettings
+from .sinks import LineSink, SinkError, SlackSink, build_sinks, deliver
+from .sources import Source, build_sources
+from .summarizer import summarize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BODY_MAX_LENGTH = 500
+
+# Directory of the profile files written with --profile
+DEFAULT_PROFILE_DIR = 'profile'
+
+# Times a Gmail call is retried after a quota error, each time at a lower rate
+QUOTA_RETRIES = 3
+
+# Base64 characters decoded and written at a time when saving an attachment (a multiple of 4)
+ATTACHMENT_DECODE_CHUNK = 64 * 1024
+
+
+def _decode_text(data: bytes, content_type: str) -> str:
+	"""Decode a text part with the charset of its Content-Type, falling back to UTF-8."""
+	header = Message()
+	header['Content-Type'] = content_type
+	charset = header.get_content_charset() or 'utf-8'
+	try:
+		return data.decode(charset, errors='ignore')
+	except LookupError:
+		return data.decode('utf-8', errors='ignore')
 
 
 class GmailNotifier:
@@ -23,44 +73,46 @@ class GmailNotifier:
 		oauth_credentials_json: str | None = None,
 		token_file: str = 'token.pickle',
 		oauth_token: str | None = None,
+		cache: MessageCache | None = None,
+		body_max_length: int = DEFAULT_BODY_MAX_LENGTH,
+		auth_request: Request | None = None,
+		quota: QuotaLedger | None = None,
+		attachments: AttachmentProcessor | None = None,
+		filters: FilterSettings | None = None,
+		credentials: CredentialManager | None = None,
+		api_endpoint: str | None = None,
 	):
-		"""Initialize Gmail service with OAuth 2.0 credentials."""
+		"""Initialize Gmail service with OAuth 2.0 credentials.
+
+		Args:
+			cache: Optional cache of extracted content, used by get_email_content.
+			body_max_length: Number of body characters kept by get_email_content.
+			auth_request: Transport for token refreshes, shared between accounts.
+			quota: Ledger charged and paced for every Gmail call.
+			attachments: Uploads image attachments in get_email_content, if given.
+			filters: Conditions added to the search query for unread emails.
+			credentials: Shared, refreshed credentials for ``oauth_token``. A manager
+				of this client alone is used if not given.
+			api_endpoint: Base URL of the Gmail API, such as the local emulator of
+				``src.emulator``. The Google endpoint is used if not given.
+		"""
+		self.cache = cache
+		self.filters = filters or FilterSettings()
+		self.quota = quota or QuotaLedger()
+		self.attachments = attachments
+		self.body_max_length = body_max_length
+		self.auth_request = auth_request or Request()
 		if oauth_token:
 			# Use pre-generated token (for GitHub Actions)
-			self.credentials = self._load_token_from_string(oauth_token)
+			with phase('credentials'):
+				self.credentials = (credentials or CredentialManager(self.auth_request)).get(oauth_token)
 		else:
 			# Use interactive OAuth flow (for local development)
 			self.credentials = self._get_oauth_credentials(oauth_credentials_json, token_file)
-		self.service = build('gmail', 'v1', credentials=self.credentials)
-
-	def _load_token_from_string(self, token_string: str) -> Credentials:
-		"""Load credentials from base64 encoded token string."""
-		import base64
-
-		# Add padding if needed
-		missing_padding = len(token_string) % 4
-		if missing_padding:
-			token_string += '=' * (4 - missing_padding)
-		token_data = base64.b64decode(token_string.encode('utf-8'))
-		creds = pickle.loads(token_data)  # type: Credentials
-
-		# Check if credentials are expired and refresh if possible
-		if not creds.valid:
-			if creds.expired and creds.refresh_token:
-				print('Token expired, attempting to refresh...')
-				try:
-					creds.refresh(Request())
-					print('Token refreshed successfully')
-				except Exception as e:
-					raise ValueError(f'Failed to refresh token: {str(e)}. Please regenerate GOOGLE_OAUTH_TOKEN.') from e
-			else:
-				error_msg = 'Token is expired and cannot be refreshed.'
-				if not creds.refresh_token:
-					error_msg += ' No refresh_token available.'
-				error_msg += ' Please regenerate GOOGLE_OAUTH_TOKEN with offline access.'
-				raise ValueError(error_msg)
-
-		return creds
+		with phase('discovery build'):
+			self.service = build(
+				'gmail', 'v1', credentials=self.credentials, client_options={'api_endpoint': api_endpoint}
+			)
 
 	def _get_oauth_credentials(self, oauth_credentials_json: str | None, token_file: str) -> Credentials:
 		"""Get or refresh OAuth 2.0 credentials."""
@@ -75,7 +127,7 @@ class GmailNotifier:
 		# If there are no (valid) credentials available, let the user log in.
 		if not creds or not creds.valid:
 			if creds and creds.expired and creds.refresh_token:
-				creds.refresh(Request())
+				creds.refresh(self.auth_request)
 			else:
 				# Parse OAuth credentials from JSON string or file path
 				if not oauth_credentials_json:
@@ -112,62 +164,323 @@ class GmailNotifier:
 	) -> dict[str, Any] | None:
 		"""Fetch unread emails with specified label."""
 		try:
-			query = f'label:"{label}" is:unread'
-			results = self.service.users().messages().list(userId=user_id, q=query, maxResults=1).execute()
-
-			messages = results.get('messages', [])
-			if not messages:
-				print(f"No unread emails with '{label}' label found.")
+			ids, _ = self.list_message_ids(self.unread_query(label), max_results=1, user_id=user_id)
+			if not ids:
+				logger.info('No unread emails', extra={'stage': 'poll', 'label': label})
 				return None
 
 			# Get details of the first message
-			msg_id = messages[0]['id']
-			message = self.service.users().messages().get(userId=user_id, id=msg_id).execute()
+			return self.get_message(ids[0], user_id=user_id)
+
+		except Exception as e:
+			logger.warning('Fetching emails failed', extra={'stage': 'poll', 'label': label, 'error': describe(e)})
+			raise
+
+	def get_unread_email_content(
+		self, user_id: str = 'me', label: str = 'Family/お荷物滞留お知らせメール'
+	) -> EmailContent | None:
+		"""Fetch the content of the first unread email with specified label, using the cache if possible."""
+		try:
+			ids, _ = self.list_message_ids(self.unread_query(label), max_results=1, user_id=user_id)
+			if not ids:
+				logger.info('No unread emails', extra={'stage': 'poll', 'label': label})
+				return None
 
-			return message  # type: ignore[no-any-return]
+			return self.get_email_content(ids[0], user_id=user_id)
 
 		except Exception as e:
-			print(f'Error fetching emails: {str(e)}')
+			logger.warning('Fetching emails failed', extra={'stage': 'poll', 'label': label, 'error': describe(e)})
 			raise
 
-	def extract_email_content(self, message: dict[str, Any]) -> dict[str, str]:
-		"""Extract email content from message."""
-		headers = message['payload'].get('headers', [])
-		subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-		from_email = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown Sender')
+	def get_unread_thread_content(
+		self, user_id: str = 'me', label: str = 'Family/お荷物滞留お知らせメール'
+	) -> EmailContent | None:
+		"""Fetch the content of the latest unread message of the first unread thread with specified label.
 
-		body = self._extract_body(message['payload'])
+		The whole thread comes from one threads.get call, so follow-up notices in
+		the thread are not fetched or notified one by one.
+		"""
+		try:
+			thread_ids, _ = self.list_thread_ids(self.unread_query(label), max_results=1, user_id=user_id)
+			if not thread_ids:
+				logger.info('No unread threads', extra={'stage': 'poll', 'label': label})
+				return None
 
-		return {
-			'id': message['id'],
-			'subject': subject,
-			'from': from_email,
-			'body': body[:500] if body else 'No body content',  # First 500 characters
-		}
+			thread = self.get_thread(thread_ids[0], user_id=user_id)
+			message = latest_unread_message(thread)
+			logger.info(
+				'Notifying the latest message of a thread',
+				extra={
+					'stage': 'fetch',
+					'thread_id': thread['id'],
+					'msg_id': message['id'],
+					'thread_messages': len(thread['messages']),
+				},
+			)
+			if self.cache:
+				cached = self.cache.get(
+					message['id'], history_id=message.get('historyId'), body_max_length=self.body_max_length
+				)
+				if cached is not None:
+					logger.debug('Using cached content', extra={'stage': 'fetch', 'msg_id': message['id']})
+					return cached
+			return self._content_from_message(message, user_id)
 
-	def _extract_body(self, payload: dict[str, Any]) -> str:
-		"""Extract body text from email payload."""
-		body = ''
+		except Exception as e:
+			logger.warning('Fetching threads failed', extra={'stage': 'poll', 'label': label, 'error': describe(e)})
+			raise
 
-		if 'parts' in payload:
-			for part in payload['parts']:
-				if part['mimeType'] == 'text/plain':
-					data = part['body']['data']
-					body += base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-		elif payload['body'].get('data'):
-			body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8', errors='ignore')
+	def unread_query(self, label: str) -> str:
+		"""Build the search query for unread emails with a label that match the filters."""
+		return compile_query(label, self.filters, 'is:unread')
+
+	def _execute(self, method: str, request: Any) -> Any:
+		"""Execute a Gmail API request, charging its quota units to the ledger.
+
+		A quota error slows the ledger down and the request is retried, up to QUOTA_RETRIES times.
+		"""
+		attempt = 0
+		while True:
+			self.quota.acquire(method)
+			try:
+				with phase(f'gmail {method}'):
+					result = request.execute()
+			except Exception as e:
+				if classify(e) != RetryClass.QUOTA or attempt == QUOTA_RETRIES:
+					raise
+				attempt += 1
+				self.quota.record_throttled()
+				logger.warning(
+					'Gmail quota exceeded, retrying more slowly',
+					extra={'stage': 'gmail', 'method': method, 'units_per_second': self.quota.rate, 'error': str(e)},
+				)
+				continue
+			self.quota.record_success()
+			return result
+
+	def list_message_ids(
+		self, query: str, page_token: str | None = None, max_results: int = 100, user_id: str = 'me'
+	) -> tuple[list[str], str | None]:
+		"""List one page of message IDs matching a Gmail search query.
+
+		Returns:
+			The message IDs on this page and the token for the next page, if any.
+		"""
+		request: dict[str, Any] = {'userId': user_id, 'q': query, 'maxResults': max_results}
+		if page_token:
+			request['pageToken'] = page_token
+		results = self._execute('list', self.service.users().messages().list(**request))
+
+		ids = [message['id'] for message in results.get('messages', [])]
+		return ids, results.get('nextPageToken')
+
+	def list_thread_ids(
+		self, query: str, page_token: str | None = None, max_results: int = 100, user_id: str = 'me'
+	) -> tuple[list[str], str | None]:
+		"""List one page of thread IDs matching a Gmail search query.
+
+		Returns:
+			The thread IDs on this page and the token for the next page, if any.
+		"""
+		request: dict[str, Any] = {'userId': user_id, 'q': query, 'maxResults': max_results}
+		if page_token:
+			request['pageToken'] = page_token
+		results = self._execute('threads.list', self.service.users().threads().list(**request))
+
+		ids = [thread['id'] for thread in results.get('threads', [])]
+		return ids, results.get('nextPageToken')
+
+	def get_thread(self, thread_id: str, user_id: str = 'me') -> dict[str, Any]:
+		"""Fetch a thread with every message in full."""
+		thread: dict[str, Any] = self._execute(
+			'threads.get', self.service.users().threads().get(userId=user_id, id=thread_id)
+		)
+		return thread
+
+	def get_message(self, msg_id: str, user_id: str = 'me') -> dict[str, Any]:
+		"""Fetch a full message by ID."""
+		message: dict[str, Any] = self._execute('get', self.service.users().messages().get(userId=user_id, id=msg_id))
+		return message
+
+	def get_email_content(self, msg_id: str, user_id: str = 'me') -> EmailContent:
+		"""Fetch and extract a message, skipping the Gmail get call on a cache hit."""
+		if self.cache:
+			cached = self.cache.get(msg_id, body_max_length=self.body_max_length)
+			if cached is not None:
+				logger.debug('Using cached content', extra={'stage': 'fetch', 'msg_id': msg_id})
+				return cached
+
+		return self._content_from_message(self.get_message(msg_id, user_id=user_id), user_id)
+
+	def _content_from_message(self, message: dict[str, Any], user_id: str) -> EmailContent:
+		"""Extract a fetched message, upload its images and cache the result."""
+		msg_id = message['id']
+		email_content = self.extract_email_content(message, self.body_max_length)
+		if self.attachments:
+			images = self.attachments.process(
+				message, lambda attachment_id, path: self.download_attachment(msg_id, attachment_id, path, user_id)
+			)
+			if images:
+				email_content = replace(
+					email_content,
+					image_urls=tuple(image.url for image in images),
+					preview_urls=tuple(image.preview_url for image in images),
+				)
+		if self.cache:
+			self.cache.put(msg_id, message.get('historyId'), email_content, self.body_max_length)
+		return email_content
+
+	def download_attachment(self, msg_id: str, attachment_id: str, path: str, user_id: str = 'me') -> int:
+		"""Save an attachment to a file.
+
+		Gmail returns the attachment as base64url in the response, so it is decoded
+		and written in chunks rather than as one more copy of the whole file.
+
+		Returns:
+			The number of bytes written.
+		"""
+		attachment = self._execute(
+			'attachments.get',
+			self.service.users().messages().attachments().get(userId=user_id, messageId=msg_id, id=attachment_id),
+		)
+		data: str = attachment.get('data', '')
+		written = 0
+		with open(path, 'wb') as f:
+			for start in range(0, len(data), ATTACHMENT_DECODE_CHUNK):
+				chunk = data[start : start + ATTACHMENT_DECODE_CHUNK]
+				# Gmail may leave out the padding of the last chunk
+				written += f.write(base64.urlsafe_b64decode(chunk + '=' * (-len(chunk) % 4)))
+		return written
+
+	@staticmethod
+	def extract_email_content(message: dict[str, Any], body_max_length: int = DEFAULT_BODY_MAX_LENGTH) -> EmailContent:
+		"""Extract email content from message.
+
+		Key parcel fields (carrier, tracking_number, deadline, redelivery_url) are
+		summarized from the full body before it is truncated.
+		Static so it can be pickled and run in worker processes by ``src.extraction``.
+		"""
+		headers = HeaderIndex.from_message(message)
+		subject = headers.get('Subject', 'No Subject')
+		from_email = headers.get('From', 'Unknown Sender')
+
+		body = GmailNotifier._extract_body(message['payload'])
+
+		summary = summarize(body, from_email)
+		return EmailContent(
+			id=message['id'],
+			subject=subject,
+			sender=from_email,
+			body=body[:body_max_length] if body else 'No body content',
+			thread_id=message.get('threadId'),
+			history_id=message.get('historyId'),
+			date=headers.date,
+			labels=tuple(message.get('labelIds', ())),
+			carrier=summary.carrier,
+			tracking_number=summary.tracking_number,
+			deadline=summary.deadline,
+			redelivery_url=summary.redelivery_url,
+		)
 
+	@staticmethod
+	def _extract_body(payload: dict[str, Any]) -> str:
+		"""Extract body text from email payload.
+
+		Text parts are found at any depth of nested multiparts and decoded with
+		their declared charset. Messages without a text/plain part fall back to
+		their HTML converted to text. Attachments are skipped.
+		"""
+		plain: list[str] = []
+		html: list[str] = []
+		GmailNotifier._collect_text(payload, plain, html)
+		body = ''.join(plain) if plain else html_to_text(''.join(html))
 		return body.strip()
 
+	@staticmethod
+	def _collect_text(part: dict[str, Any], plain: list[str], html: list[str]) -> None:
+		"""Append the decoded text/plain and text/html parts under ``part``, depth first."""
+		if 'parts' in part:
+			for child in part['parts']:
+				GmailNotifier._collect_text(child, plain, html)
+			return
+		# Attachments, including text ones, only carry an attachmentId in format=full
+		data = part.get('body', {}).get('data')
+		if not data or part.get('filename'):
+			return
+		mime_type = part.get('mimeType', 'text/plain')
+		if mime_type not in ('text/plain', 'text/html'):
+			return
+		content_type = HeaderIndex(part.get('headers', [])).get('Content-Type', '')
+		text = _decode_text(base64.urlsafe_b64decode(data), content_type)
+		(plain if mime_type == 'text/plain' else html).append(text)
+
 	def mark_as_read(self, msg_id: str, user_id: str = 'me') -> None:
-		"""Mark email as read."""
-		try:
-			self.service.users().messages().modify(
-				userId=user_id, id=msg_id, body={'removeLabelIds': ['UNREAD']}
-			).execute()
-			print(f'Email {msg_id} marked as read')
-		except Exception as e:
-			print(f'Error marking email as read: {str(e)}')
+		"""Mark email as read.
+
+		Errors are raised so callers can report that the email will be notified again.
+		"""
+		self._execute(
+			'modify',
+			self.service.users().messages().modify(userId=user_id, id=msg_id, body={'removeLabelIds': ['UNREAD']}),
+		)
+		logger.debug('Email marked as read', extra={'stage': 'ack', 'msg_id': msg_id})
+
+	def mark_thread_as_read(self, thread_id: str, user_id: str = 'me') -> None:
+		"""Mark every message of a thread as read in one call.
+
+		Errors are raised so callers can report that the thread will be notified again.
+		"""
+		self._execute(
+			'threads.modify',
+			self.service.users().threads().modify(userId=user_id, id=thread_id, body={'removeLabelIds': ['UNREAD']}),
+		)
+		logger.debug('Thread marked as read', extra={'stage': 'ack', 'thread_id': thread_id})
+
+
+class GmailSource(Source):
+	"""Unread Gmail emails of one account: the first of each configured label."""
+
+	def __init__(
+		self, account: str, connect: Callable[[], GmailNotifier], labels: Sequence[str], whole_thread: bool = False
+	):
+		"""Initialize Gmail source.
+
+		Args:
+			account: Name of the account.
+			connect: Creates the Gmail client. It is called by poll, in the polling thread.
+			labels: Labels checked, in order.
+			whole_thread: Notify the latest unread message of each unread thread and mark the whole thread as read.
+		"""
+		self.account = account
+		self._connect = connect
+		self.labels = labels
+		self.whole_thread = whole_thread
+
+	def poll(self) -> list[AccountEmail]:
+		"""Fetch the first unread email, or thread, of each label, notifying one with several labels once."""
+		gmail_notifier = self._connect()
+		by_thread = self.whole_thread
+		get_content = gmail_notifier.get_unread_thread_content if by_thread else gmail_notifier.get_unread_email_content
+		mark_as_read = gmail_notifier.mark_thread_as_read if by_thread else gmail_notifier.mark_as_read
+		account_emails: dict[str, AccountEmail] = {}
+		for label in self.labels:
+			email_content = get_content(label=label)
+			if email_content is None:
+				continue
+			account_email = AccountEmail(self.account, label, email_content, mark_as_read, whole_thread=by_thread)
+			# An email or thread with several configured labels is notified once, for the first label
+			account_emails.setdefault(account_email.read_id, account_email)
+		return list(account_emails.values())
+
+
+def latest_unread_message(thread: dict[str, Any]) -> dict[str, Any]:
+	"""Get the most recent unread message of a thread, or its most recent message if none is unread.
+
+	Messages are ordered by ``internalDate``, the time Gmail received them.
+	"""
+	messages: list[dict[str, Any]] = thread['messages']
+	unread = [message for message in messages if 'UNREAD' in message.get('labelIds', ())]
+	return max(unread or messages, key=lambda message: int(message.get('internalDate', 0)))
 
 
 class LineNotifier:
@@ -178,95 +491,313 @@ class LineNotifier:
 		self.channel_access_token = channel_access_token
 		self.user_id = user_id
 
-	def send_notification(self, email_content: dict[str, str]) -> None:
+	def send_notification(self, email_content: EmailContent) -> None:
 		"""Send email notification to LINE."""
-		url = 'https://api.line.me/v2/bot/message/push'
-		headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {self.channel_access_token}'}
-
-		message_text = '📧 新着メール (お荷物滞留お知らせ)\n\n'
-		message_text += f'件名: {email_content["subject"]}\n'
-		message_text += f'差出人: {email_content["from"]}\n\n'
-		message_text += f'本文:\n{email_content["body"]}'
-
-		data = {'to': self.user_id, 'messages': [{'type': 'text', 'text': message_text}]}
-
-		response = requests.post(url, headers=headers, json=data)
-		response.raise_for_status()
-		print(f'LINE notification sent successfully for email: {email_content["id"]}')
+		LineSink(self.channel_access_token, [self.user_id]).send(email_content)
+		logger.debug('LINE notification sent', extra={'stage': 'deliver', 'msg_id': email_content.id, 'sink': 'line'})
 
 
 class SlackNotifier:
 	"""Slack notification handler."""
 
-	def __init__(self, bot_token: str, channel_id: str):
-		"""Initialize Slack notifier."""
+	def __init__(self, bot_token: str, channel_id: str, alerts_file: str | None = None):
+		"""Initialize Slack notifier.
+
+		Args:
+			bot_token: Slack bot token.
+			channel_id: Channel the errors are posted to.
+			alerts_file: State file of an AlertAggregator. With it, an error already
+				posted is counted instead of posted again.
+		"""
 		self.bot_token = bot_token
 		self.channel_id = channel_id
+		self.slack = SlackSink(bot_token, channel_id)
+		self.alerts = AlertAggregator(alerts_file, self.slack) if alerts_file else None
 
 	def send_error_notification(self, message: str) -> None:
 		"""Send error notification to Slack."""
-		url = 'https://slack.com/api/chat.postMessage'
-		headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {self.bot_token}'}
-
-		data = {'channel': self.channel_id, 'text': f'⚠️ Gmail to LINE Notification Failed\n\n{message}', 'mrkdwn': True}
-
-		response = requests.post(url, headers=headers, json=data)
-		response_data = response.json()
-
-		if not response_data.get('ok'):
-			print(f'Failed to send Slack notification: {response_data.get("error")}')
+		text = f'⚠️ Gmail to LINE Notification Failed\n\n{message}'
+		if self.alerts is not None:
+			self.alerts.alert(text)
+			self.alerts.flush_summaries()
+			return
+		try:
+			self.slack.post(text)
+		except SinkError as e:
+			logger.error('Slack notification failed', extra={'stage': 'alert', 'error': str(e)})
+		else:
+			logger.info('Slack notification sent', extra={'stage': 'alert'})
+
+
+def _flush_queued_notifications(sinks: list[GuardedSink]) -> None:
+	"""Deliver notifications queued by earlier runs where the circuit allows it."""
+	for name, flushed in flush_outboxes(sinks).items():
+		if isinstance(flushed, BaseException):
+			logger.warning(
+				'Queued notifications not delivered',
+				extra={'stage': 'outbox', 'sink': name, 'error': describe(flushed)},
+			)
+		elif flushed:
+			logger.info('Queued notifications delivered', extra={'stage': 'outbox', 'sink': name, 'count': flushed})
+
+
+def _deliver_to_sinks(sinks: list[GuardedSink], email_content: EmailContent) -> dict[str, BaseException]:
+	"""Fan a notification out to every sink and return the failures by sink name."""
+	results = deliver(sinks, email_content)
+	failed = {name: error for name, error in results.items() if error is not None}
+	for name, error in failed.items():
+		logger.warning(
+			'Notification not delivered',
+			extra={'stage': 'deliver', 'msg_id': email_content.id, 'sink': name, 'error': describe(error)},
+		)
+	delivered = [name for name in results if name not in failed]
+	if delivered:
+		logger.debug('Notification sent', extra={'stage': 'deliver', 'msg_id': email_content.id, 'sinks': delivered})
+	return failed
+
+
+def _check_routes(config: AppConfig, sinks: list[GuardedSink]) -> None:
+	"""Reject routes naming a destination that is not configured."""
+	configured = {sink.name for sink in sinks}
+	for route in config.settings.routes:
+		missing = [name for name in route.sinks if name not in configured]
+		if missing:
+			raise ValueError(f'Route for {route.label} uses destinations that are not configured: {", ".join(missing)}')
+
+
+def _routed_sinks(config: AppConfig, sinks: list[GuardedSink], label: str) -> list[GuardedSink]:
+	"""Get the sinks that receive emails with a label."""
+	routed = config.settings.sinks_for(label)
+	return [sink for sink in sinks if routed is None or sink.name in routed]
+
+
+def _flush_deferred(config: AppConfig, sinks: list[GuardedSink], deferral: DeferralQueue, report: RunReport) -> None:
+	"""Deliver notifications held during quiet hours as one digest per destination."""
+	deferred = deferral.load()
+	if not deferred:
+		return
+	errors: dict[str, BaseException] = {}
+	for sink in sinks:
+		contents = [item.email_content for item in deferred if sink in _routed_sinks(config, sinks, item.label)]
+		if not contents:
+			continue
+		try:
+			sink.send_digest(contents)
+		except Exception as e:
+			logger.warning(
+				'Digest not delivered',
+				extra={'stage': 'digest', 'sink': sink.name, 'count': len(contents), 'error': describe(e)},
+			)
+			errors[sink.name] = e
 		else:
-			print('Slack notification sent successfully')
+			logger.info('Digest sent', extra={'stage': 'digest', 'sink': sink.name, 'count': len(contents)})
+	# Retryable failures were queued in the sink outboxes, so the deferral queue is done
+	deferral.clear()
 
+	for item in deferred:
+		failed = {
+			sink.name: errors[sink.name] for sink in _routed_sinks(config, sinks, item.label) if sink.name in errors
+		}
+		detail = '; '.join(f'{name}: {describe(error)}' for name, error in failed.items())
+		report.add(item.email_content.id, outcome_for(failed.values()), item.account, detail or 'sent in digest')
+
+
+def _notify(
+	config: AppConfig,
+	sinks: list[GuardedSink],
+	account_email: AccountEmail,
+	report: RunReport,
+	deferral: DeferralQueue | None = None,
+) -> None:
+	"""Deliver one account's email, or defer it during quiet hours, then mark it as read and record the outcome."""
+	email_content = account_email.email_content
+	msg_id = email_content.id
+	# Add sandbox prefix to notification if in sandbox mode
+	if config.sandbox_mode:
+		email_content = replace(email_content, subject=f'[SANDBOX] {email_content.subject}')
+
+	if deferral is not None:
+		deferral.append(DeferredNotification(account_email.account, account_email.label, email_content))
+		logger.debug('Notification held until quiet hours end', extra={'stage': 'defer', 'msg_id': msg_id})
+		outcome, detail = Outcome.DEFERRED, ''
+	else:
+		# Retryable failures are queued in each sink's outbox, so the email can be marked as read
+		failed = _deliver_to_sinks(_routed_sinks(config, sinks, account_email.label), email_content)
+		outcome = outcome_for(failed.values())
+		detail = '; '.join(f'{name}: {describe(error)}' for name, error in failed.items())
 
-def main() -> None:
-	"""Main function to process Gmail notifications."""
 	try:
-		# Load configuration
-		config = AppConfig.from_env()
-		print(config.get_mode_display())
-
-		# Initialize services
-		gmail_notifier = GmailNotifier(
-			oauth_credentials_json=config.google.oauth_credentials, oauth_token=config.google.oauth_token
+		account_email.mark_as_read(account_email.read_id)
+	except Exception as e:
+		# The email stays unread and is notified again by the next run
+		logger.warning('Email not marked as read', extra={'stage': 'ack', 'msg_id': msg_id, 'error': describe(e)})
+		if outcome == Outcome.DELIVERED:
+			outcome = outcome_for([e])
+		detail = '; '.join(filter(None, [detail, f'not marked as read: {describe(e)}']))
+	report.add(msg_id, outcome, account_email.account, detail)
+	logger.info(
+		'Email processed',
+		extra={'stage': 'report', 'msg_id': msg_id, 'account': account_email.account, 'outcome': str(outcome)},
+	)
+
+
+def check_and_notify(
+	config: AppConfig, now: datetime | None = None, credentials: CredentialManager | None = None
+) -> RunReport:
+	"""Poll every account and deliver its unread email, recording one result per message.
+
+	Within the configured quiet hours, notifications are deferred instead. The
+	first check after quiet hours delivers them as one digest per destination.
+
+	Args:
+		credentials: Credentials kept across checks by a long-running process. A
+			manager for this check alone is used if not given.
+	"""
+	now = now or datetime.now(UTC)
+	auth_request = create_auth_request(pool_size=config.settings.concurrency.accounts)
+	credentials = credentials or CredentialManager(auth_request)
+	# Gmail quota limits apply per user, so each account has its own ledger
+	rate_limits = config.settings.rate_limits
+	ledgers = {
+		account.account: QuotaLedger(rate_limits.gmail_quota_per_second, rate_limits.gmail_units_per_minute)
+		for account in config.google_accounts
+	}
+	attachments = build_attachment_processor(config)
+
+	def connect(account: GoogleConfig) -> GmailNotifier:
+		return GmailNotifier(
+			oauth_credentials_json=account.oauth_credentials,
+			oauth_token=account.oauth_token,
+			cache=MessageCache(os.path.join(config.state_dir, 'messages', account.account)),
+			body_max_length=config.body_max_length,
+			auth_request=auth_request,
+			quota=ledgers[account.account],
+			credentials=credentials,
+			attachments=attachments,
+			filters=config.settings.filters,
+			api_endpoint=config.gmail_api_url,
 		)
-		line_notifier = LineNotifier(config.line.channel_access_token, config.line.user_id)
 
-		# Check for unread emails
-		message = gmail_notifier.get_unread_family_package_emails(label=config.gmail_label)
+	sources: list[Source] = [
+		GmailSource(account.account, partial(connect, account), config.settings.labels, config.settings.group_by_thread)
+		for account in config.google_accounts
+	]
+	sources += build_sources(config)
+
+	sinks = [GuardedSink.for_state_dir(sink, config.state_dir) for sink in build_sinks(config)]
+	_check_routes(config, sinks)
+	report = RunReport()
+	deferral = DeferralQueue(os.path.join(config.state_dir, 'deferred.jsonl'))
+	quiet_hours = config.settings.delivery.quiet_window()
+	held: DeferralQueue | None = None
+	if quiet_hours is not None and quiet_hours.contains(now):
+		logger.info(
+			'Quiet hours, notifications are held',
+			extra={'stage': 'defer', 'until': quiet_hours.end_after(now).isoformat()},
+		)
+		held = deferral
+	else:
+		_flush_queued_notifications(sinks)
+		_flush_deferred(config, sinks, deferral, report)
 
-		if message:
-			email_content = gmail_notifier.extract_email_content(message)
+	# Check every mailbox for unread emails, then deliver them through the same sinks
+	workers = config.settings.concurrency.accounts
+	try:
+		account_emails, poll_errors = poll_accounts(sources, lambda source: source.poll(), max_workers=workers)
+		for account, error in poll_errors.items():
+			logger.error(
+				'Polling mailbox failed', extra={'stage': 'poll', 'account': account, 'error': describe(error)}
+			)
+			report.add_error('', error, account)
+
+		for account_email in account_emails:
+			with correlate(account_email.email_content.id):
+				_notify(config, sinks, account_email, report, held)
+	finally:
+		for source in sources:
+			source.close()
+	for account, ledger in ledgers.items():
+		report.add_quota(account, ledger.usage)
+	if not account_emails:
+		logger.info('No new emails to process', extra={'stage': 'poll'})
+	return report
+
+
+def _flush_alert_summaries(config: AppConfig) -> None:
+	"""Post the due summaries of earlier Slack alerts, also on runs without errors.
+
+	The Slack error step only runs after a failure, so a recurring error that
+	stopped would otherwise never get its last repeats summarized.
+	"""
+	alerts_file = os.path.join(config.state_dir, ALERTS_FILE)
+	if not os.path.exists(alerts_file):
+		return
+	try:
+		AlertAggregator(alerts_file, SlackSink(config.slack.bot_token, config.slack.channel_id)).flush_summaries()
+	except Exception as e:
+		logger.warning('Alert summaries not posted', extra={'stage': 'alert', 'error': describe(e)})
 
-			# Add sandbox prefix to notification if in sandbox mode
-			if config.sandbox_mode:
-				email_content['subject'] = f'[SANDBOX] {email_content["subject"]}'
 
-			line_notifier.send_notification(email_content)
-			print(f'Attempting to mark email {email_content["id"]} as read...')
-			gmail_notifier.mark_as_read(email_content['id'])
+def _run() -> None:
+	"""Check every account once and write the results to the GitHub Actions outputs."""
+	config: AppConfig | None = None
+	try:
+		# Load configuration
+		config = AppConfig.from_env()
+		configure_logging(config.settings.logging)
+		logger.info(config.get_mode_display(), extra={'stage': 'start'})
 
-			status_msg = f'success{config.get_status_suffix()}'
-			with open(config.github_output_file, 'a') as f:
-				f.write(f'status={status_msg}\n')
-		else:
-			print('No new emails to process')
-			status_msg = f'no_emails{config.get_status_suffix()}'
-			with open(config.github_output_file, 'a') as f:
-				f.write(f'status={status_msg}\n')
+		report = check_and_notify(config)
 
 	except Exception as e:
-		print(f'Error in main process: {str(e)}')
+		error = describe(e)
+		logger.error('Notification check failed', extra={'stage': 'run', 'error': error})
+		# Read by the Slack error handler to group the alert with earlier ones
+		error_line = 'error=' + ' '.join(error.split()) + '\n'
 		try:
 			config = AppConfig.from_env()
 			status_msg = f'failed{config.get_status_suffix()}'
 			with open(config.github_output_file, 'a') as f:
-				f.write(f'status={status_msg}\n')
+				f.write(f'status={status_msg}\n{error_line}')
 		except Exception:
 			# Fallback if config loading fails
 			with open(os.environ.get('GITHUB_OUTPUT', '/dev/null'), 'a') as f:
-				f.write('status=failed\n')
+				f.write(f'status=failed\n{error_line}')
 		raise
+	finally:
+		if config is not None:
+			_flush_alert_summaries(config)
+
+	report.write_github_output(config.github_output_file, config.get_status_suffix())
+	report.write_step_summary(config.github_step_summary_file, 'Gmail notifications')
+	# Retry-later results are picked up by the next run; failed ones need attention
+	if report.failed:
+		raise RuntimeError(f'{len(report.failed)} of {len(report.results)} messages failed')
+
+
+def _parse_args(argv: Sequence[str] | None) -> argparse.Namespace:
+	"""Parse command line arguments."""
+	parser = argparse.ArgumentParser(description='Notify the unread Gmail emails of the configured labels.')
+	parser.add_argument(
+		'--profile',
+		nargs='?',
+		const=DEFAULT_PROFILE_DIR,
+		metavar='DIR',
+		help=f'Profile the check and write the profile to DIR (default: {DEFAULT_PROFILE_DIR})'
+		' and a summary to GITHUB_STEP_SUMMARY',
+	)
+	return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+	"""Main function to process Gmail notifications."""
+	args = _parse_args(argv)
+	if args.profile is None:
+		_run()
+		return
+	summary_path = os.environ.get('GITHUB_STEP_SUMMARY', '/dev/null')
+	with profiled(__spec__.name if __spec__ else __name__, args.profile, summary_path):
+		_run()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+"""Case-insensitive index of Gmail message headers."""
+
+from collections.abc import Iterable
+from datetime import datetime
+from email.errors import HeaderParseError
+from email.header import decode_header, make_header
+from email.utils import getaddresses, parsedate_to_datetime
+from typing import Any, overload
+
+
+def decode_encoded_words(value: str) -> str:
+	"""Decode RFC 2047 encoded words such as ``=?UTF-8?B?...?=``.
+
+	Gmail decodes most headers already. Values that cannot be decoded, for
+	example because of an unknown charset, are returned unchanged.
+	"""
+	if '=?' not in value:
+		return value
+	try:
+		return str(make_header(decode_header(value)))
+	except (HeaderParseError, LookupError, UnicodeDecodeError):
+		return value
+
+
+class HeaderIndex:
+	"""Headers of one message, indexed once by lowercase name.
+
+	Repeated headers (Received, To) keep every value in message order.
+	"""
+
+	__slots__ = ('_values',)
+
+	def __init__(self, headers: Iterable[dict[str, str]]):
+		"""Index Gmail API ``{'name': ..., 'value': ...}`` headers, decoding their values."""
+		self._values: dict[str, list[str]] = {}
+		for header in headers:
+			self._values.setdefault(header['name'].lower(), []).append(decode_encoded_words(header['value']))
+
+	@classmethod
+	def from_message(cls, message: dict[str, Any]) -> 'HeaderIndex':
+		"""Index the top-level headers of a Gmail API message."""
+		return cls(message.get('payload', {}).get('headers', []))
+
+	def __contains__(self, name: str) -> bool:
+		"""Check whether a header is present."""
+		return name.lower() in self._values
+
+	def __len__(self) -> int:
+		"""Number of distinct header names."""
+		return len(self._values)
+
+	@overload
+	def get(self, name: str) -> str | None: ...
+
+	@overload
+	def get(self, name: str, default: str) -> str: ...
+
+	def get(self, name: str, default: str | None = None) -> str | None:
+		"""Get the first value of a header."""
+		values = self._values.get(name.lower())
+		return values[0] if values else default
+
+	def get_all(self, name: str) -> list[str]:
+		"""Get every value of a header, in message order."""
+		return list(self._values.get(name.lower(), []))
+
+	def addresses(self, name: str) -> list[tuple[str, str]]:
+		"""Parse address headers (From, To, Cc) into ``(display name, address)`` pairs."""
+		return [pair for pair in getaddresses(self.get_all(name)) if pair[1]]
+
+	@property
+	def date(self) -> datetime | None:
+		"""Parsed Date header, or None if it is missing or invalid."""
+		value = self.get('Date')
+		if not value:
+			return None
+		try:
+			return parsedate_to_datetime(value)
+		except (TypeError, ValueError):
+			return None
+
+	@property
+	def message_id(self) -> str | None:
+		"""Message-ID header without its angle brackets."""
+		value = self.get('Message-ID')
+		return value.strip().strip('<>') if value else None
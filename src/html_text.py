@@ -0,0 +1,46 @@
+"""Plain text from the HTML body of emails that have no text/plain part."""
+
+import re
+from html.parser import HTMLParser
+
+# Tags that start a new line in the rendered text
+BLOCK_TAGS = frozenset({'br', 'div', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'li', 'p', 'table', 'tr'})
+
+# Tags whose content is never shown
+HIDDEN_TAGS = frozenset({'head', 'script', 'style', 'title'})
+
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+
+class _TextParser(HTMLParser):
+	"""Collects the visible text of a document, one line per block element."""
+
+	def __init__(self) -> None:
+		super().__init__(convert_charrefs=True)
+		self.chunks: list[str] = []
+		self.hidden = 0
+
+	def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+		if tag in HIDDEN_TAGS:
+			self.hidden += 1
+		elif tag in BLOCK_TAGS:
+			self.chunks.append('\n')
+
+	def handle_endtag(self, tag: str) -> None:
+		if tag in HIDDEN_TAGS:
+			self.hidden = max(self.hidden - 1, 0)
+		elif tag in BLOCK_TAGS:
+			self.chunks.append('\n')
+
+	def handle_data(self, data: str) -> None:
+		if not self.hidden:
+			self.chunks.append(data)
+
+
+def html_to_text(html: str) -> str:
+	"""Convert an HTML body to text, keeping block elements on their own lines."""
+	parser = _TextParser()
+	parser.feed(html)
+	parser.close()
+	lines = (line.strip() for line in ''.join(parser.chunks).splitlines())
+	return _BLANK_LINES.sub('\n\n', '\n'.join(lines)).strip()
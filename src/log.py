@@ -0,0 +1,152 @@
+"""Structured logging: one JSON event per stage, tagged with the email it belongs to.
+
+Modules log with ``logging.getLogger(__name__)`` and pass event fields in
+``extra`` (``stage``, ``msg_id``, ``account``, ``sink``...). Entry points call
+``configure_logging`` once the settings are loaded. Records are formatted in
+the calling thread and written to stdout by a background thread, so a slow
+terminal or log collector does not hold up delivery.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import random
+import sys
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import UTC, datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any
+
+from .settings import LoggingSettings
+
+# Attributes of every LogRecord; any other attribute was passed in ``extra`` and becomes an event field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+_correlation_id: ContextVar[str | None] = ContextVar('correlation_id', default=None)
+
+_handler: QueueHandler | None = None
+_listener: QueueListener | None = None
+
+
+@contextmanager
+def correlate(correlation_id: str) -> Iterator[None]:
+	"""Tag every event logged in this context with a correlation ID.
+
+	The ID follows the email into the sink coroutines of ``sinks.deliver``,
+	because asyncio tasks copy the context they are created in.
+	"""
+	token = _correlation_id.set(correlation_id)
+	try:
+		yield
+	finally:
+		_correlation_id.reset(token)
+
+
+class CorrelationFilter(logging.Filter):
+	"""Add the current correlation ID to records that do not set one."""
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		"""Tag the record; never drops it."""
+		if getattr(record, 'correlation_id', None) is None:
+			record.correlation_id = _correlation_id.get()
+		return True
+
+
+class SamplingFilter(logging.Filter):
+	"""Keep only a share of the events of some levels.
+
+	Levels without a rate are always kept, so warnings and errors are never
+	sampled away unless a rate is set for them.
+	"""
+
+	def __init__(self, rates: Mapping[int, float], sample: Callable[[], float] = random.random):
+		"""Initialize sampling filter.
+
+		Args:
+			rates: Level number -> share of events kept, from 0 to 1.
+			sample: Returns a number in [0, 1) for each event.
+		"""
+		super().__init__()
+		self.rates = dict(rates)
+		self._sample = sample
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		"""Keep the record with the probability set for its level."""
+		rate = self.rates.get(record.levelno)
+		return rate is None or self._sample() < rate
+
+
+class JsonFormatter(logging.Formatter):
+	"""Format a record as one line of JSON with its ``extra`` fields."""
+
+	def format(self, record: logging.LogRecord) -> str:
+		"""Serialize time, level, logger, event, correlation ID and extra fields."""
+		event: dict[str, Any] = {
+			'time': datetime.fromtimestamp(record.created, UTC).isoformat(timespec='milliseconds'),
+			'level': record.levelname,
+			'logger': record.name,
+			'event': record.getMessage(),
+		}
+		for key, value in vars(record).items():
+			if key not in _RECORD_ATTRIBUTES and value is not None:
+				event[key] = value
+		if record.exc_info:
+			event['exception'] = self.formatException(record.exc_info)
+		return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class _StdoutHandler(logging.StreamHandler):
+	"""Write to the current ``sys.stdout``, even if it was replaced after configuration."""
+
+	def emit(self, record: logging.LogRecord) -> None:
+		"""Write one formatted record."""
+		self.stream = sys.stdout
+		super().emit(record)
+
+
+class _PreformattedQueueHandler(QueueHandler):
+	"""Queue records that were already formatted in the calling thread."""
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		"""Replace the message with the formatted line, dropping what cannot cross the queue."""
+		line = self.format(record)
+		return logging.makeLogRecord({'msg': line, 'levelno': record.levelno, 'levelname': record.levelname})
+
+
+def configure_logging(settings: LoggingSettings) -> None:
+	"""Send the log events of this package to stdout as configured, replacing an earlier configuration."""
+	global _handler, _listener
+	stop_logging()
+
+	records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+	handler = _PreformattedQueueHandler(records)
+	handler.setFormatter(JsonFormatter() if settings.format == 'json' else logging.Formatter('%(message)s'))
+	handler.addFilter(CorrelationFilter())
+	if settings.sample_rates:
+		handler.addFilter(SamplingFilter({logging.getLevelName(name): rate for name, rate in settings.sample_rates}))
+	logging.getLogger().addHandler(handler)
+	logging.getLogger(__package__).setLevel(settings.level)
+
+	output = _StdoutHandler()
+	output.setFormatter(logging.Formatter('%(message)s'))
+	_listener = QueueListener(records, output)
+	_listener.start()
+	_handler = handler
+
+
+def stop_logging() -> None:
+	"""Write the buffered events and remove the handler added by ``configure_logging``."""
+	global _handler, _listener
+	if _handler is not None:
+		logging.getLogger().removeHandler(_handler)
+		logging.getLogger(__package__).setLevel(logging.NOTSET)
+		_handler = None
+	if _listener is not None:
+		_listener.stop()
+		_listener = None
+
+
+atexit.register(stop_logging)
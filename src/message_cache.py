@@ -0,0 +1,126 @@
+"""On-disk cache of extracted email content keyed by Gmail message ID."""
+
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from datetime import timedelta
+
+from .email_content import EmailContent
+
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_TTL = timedelta(days=14)
+
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^A-Za-z0-9_-]')
+
+
+class MessageCache:
+	"""Size-bounded LRU cache of extracted email content with a TTL.
+
+	Each entry is one JSON file named after the message ID and records the
+	``historyId`` it was extracted at and the body length it was cut to. Recency is tracked with the file mtime,
+	so LRU order survives between runs.
+	"""
+
+	def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, ttl: timedelta = DEFAULT_TTL):
+		"""Initialize cache, creating the directory if needed.
+
+		Args:
+			directory: Directory holding the cache entries.
+			max_bytes: Total size of entries above which least recently used ones are evicted.
+			ttl: Age after which an entry is treated as missing and removed.
+		"""
+		self.directory = directory
+		self.max_bytes = max_bytes
+		self.ttl = ttl
+		os.makedirs(directory, exist_ok=True)
+
+		entries = []
+		for name in os.listdir(directory):
+			if name.endswith('.json'):
+				stat = os.stat(os.path.join(directory, name))
+				entries.append((stat.st_mtime, name, stat.st_size))
+		# Least recently used first
+		self._sizes: OrderedDict[str, int] = OrderedDict((name, size) for _, name, size in sorted(entries))
+		self._total_bytes = sum(self._sizes.values())
+
+	def _filename(self, msg_id: str) -> str:
+		"""Map a message ID to a safe cache file name."""
+		return f'{_UNSAFE_FILENAME_CHARS.sub("_", msg_id)}.json'
+
+	def _remove(self, name: str) -> None:
+		"""Delete an entry from disk and from the size index."""
+		self._total_bytes -= self._sizes.pop(name, 0)
+		with suppress(FileNotFoundError):
+			os.remove(os.path.join(self.directory, name))
+
+	def get(
+		self, msg_id: str, history_id: str | None = None, body_max_length: int | None = None
+	) -> EmailContent | None:
+		"""Return cached content for a message, or None on a miss.
+
+		Args:
+			msg_id: Gmail message ID.
+			history_id: If given, entries extracted at a different historyId are
+				treated as stale.
+			body_max_length: If given, entries whose body was cut to another length
+				are treated as stale.
+		"""
+		name = self._filename(msg_id)
+		path = os.path.join(self.directory, name)
+		try:
+			with open(path, encoding='utf-8') as f:
+				entry = json.load(f)
+			expired = time.time() - entry['stored_at'] > self.ttl.total_seconds()
+			stale = (history_id is not None and entry['history_id'] != history_id) or (
+				body_max_length is not None and entry.get('body_max_length') != body_max_length
+			)
+			content = EmailContent.from_dict(entry['content'])
+		except (FileNotFoundError, KeyError, TypeError, ValueError):
+			# Missing, truncated or malformed entries are misses; ValueError covers JSONDecodeError
+			self._remove(name)
+			return None
+
+		if expired:
+			self._remove(name)
+			return None
+		if stale:
+			return None
+
+		os.utime(path)
+		self._sizes.move_to_end(name)
+		return content
+
+	def put(
+		self, msg_id: str, history_id: str | None, content: EmailContent, body_max_length: int | None = None
+	) -> None:
+		"""Store content for a message and evict old entries beyond ``max_bytes``.
+
+		Args:
+			msg_id: Gmail message ID.
+			history_id: historyId the content was extracted at.
+			content: Extracted content.
+			body_max_length: Length the body was cut to, checked by ``get``.
+		"""
+		name = self._filename(msg_id)
+		path = os.path.join(self.directory, name)
+		entry = {
+			'id': msg_id,
+			'history_id': history_id,
+			'body_max_length': body_max_length,
+			'stored_at': time.time(),
+			'content': content.to_dict(),
+		}
+		data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+
+		tmp_path = f'{path}.tmp'
+		with open(tmp_path, 'wb') as f:
+			f.write(data)
+		os.replace(tmp_path, path)
+
+		self._total_bytes += len(data) - self._sizes.pop(name, 0)
+		self._sizes[name] = len(data)
+		while self._total_bytes > self.max_bytes and len(self._sizes) > 1:
+			self._remove(next(iter(self._sizes)))
@@ -0,0 +1,274 @@
+"""Cold-start profile of a notification check, written to the GitHub Actions step summary.
+
+``python -m src.gmail_notifier --profile`` measures the import time of the
+module in a fresh interpreter, then runs the check under cProfile and
+tracemalloc. Code on the start-up path marks its steps with ``phase``, which
+costs nothing unless a profile is being recorded.
+
+The profile directory gets ``profile.prof`` (pstats, for flameprof, snakeviz
+or tuna) and ``importtime.log`` (``-X importtime`` output, for tuna).
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+# Rows per table of the summary
+DEFAULT_TOP = 10
+
+PROFILE_FILE = 'profile.prof'
+IMPORT_TIME_FILE = 'importtime.log'
+
+# import time: self [us] | cumulative | imported package
+IMPORT_TIME_PATTERN = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+_active: 'Profiler | None' = None
+
+
+@dataclass
+class PhaseStats:
+	"""Time spent in one phase, over every call."""
+
+	calls: int = 0
+	seconds: float = 0.0
+	slowest: float = 0.0
+
+
+@dataclass
+class ImportTime:
+	"""Import time of one module, in microseconds, including the modules it imports."""
+
+	module: str
+	self_us: int
+	cumulative_us: int
+
+
+def parse_import_times(log: str, module: str) -> tuple[ImportTime | None, list[ImportTime]]:
+	"""Find a module and its direct imports in ``-X importtime`` output.
+
+	Returns:
+		The module, or None if it was not imported, and its direct imports, slowest first.
+	"""
+	# Imports are printed after the modules they import, so children come before their parent
+	children: dict[int, list[ImportTime]] = {}
+	for line in log.splitlines():
+		match = IMPORT_TIME_PATTERN.match(line)
+		if not match:
+			continue
+		depth = len(match.group(3)) // 2
+		entry = ImportTime(match.group(4), int(match.group(1)), int(match.group(2)))
+		direct = children.pop(depth + 1, [])
+		if entry.module == module:
+			return entry, sorted(direct, key=lambda child: child.cumulative_us, reverse=True)
+		children.setdefault(depth, []).append(entry)
+	return None, []
+
+
+def measure_imports(module: str) -> str:
+	"""Import a module in a fresh interpreter with ``-X importtime`` and return the timings it printed."""
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+		cwd=root,
+		capture_output=True,
+		text=True,
+		check=False,
+	)
+	return result.stderr
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+	"""Add the time spent in the block to a phase of the profile being recorded, if any."""
+	profiler = _active
+	if profiler is None:
+		yield
+		return
+	started = time.perf_counter()
+	try:
+		yield
+	finally:
+		profiler.record(name, time.perf_counter() - started)
+
+
+def _short_path(path: str) -> str:
+	"""Shorten a source path to the part after site-packages, or to the file name."""
+	return path.rpartition('site-packages/')[2] if 'site-packages/' in path else os.path.basename(path)
+
+
+def _function_name(function: tuple[str, int, str]) -> str:
+	"""Format a pstats function key as ``file:line(name)``."""
+	path, line, name = function
+	return name if path == '~' else f'{_short_path(path)}:{line}({name})'
+
+
+def _cell(text: str) -> str:
+	"""Escape text for a Markdown table cell."""
+	return text.replace('|', '\\|')
+
+
+class Profiler:
+	"""Records phase timings, a cProfile profile and memory allocations of one run.
+
+	cProfile sees the thread that started it, and every thread on Python 3.12
+	and later. Phase timings are recorded from every thread.
+	"""
+
+	def __init__(self, top: int = DEFAULT_TOP):
+		"""Initialize profiler.
+
+		Args:
+			top: Rows per table of the summary.
+		"""
+		self.top = top
+		self.phases: dict[str, PhaseStats] = {}
+		self.seconds = 0.0
+		self.peak_bytes = 0
+		self.import_log = ''
+		self.module: str | None = None
+		self._lock = threading.Lock()
+		self._profile = cProfile.Profile()
+		self._snapshot: tracemalloc.Snapshot | None = None
+		self._started = 0.0
+
+	def record(self, name: str, seconds: float) -> None:
+		"""Add one call of a phase."""
+		with self._lock:
+			stats = self.phases.setdefault(name, PhaseStats())
+			stats.calls += 1
+			stats.seconds += seconds
+			stats.slowest = max(stats.slowest, seconds)
+
+	def measure_imports(self, module: str) -> None:
+		"""Measure the cold import time of the module that is run."""
+		self.module = module
+		self.import_log = measure_imports(module)
+
+	def start(self) -> None:
+		"""Start profiling and tracing allocations."""
+		tracemalloc.start()
+		self._started = time.perf_counter()
+		self._profile.enable()
+
+	def stop(self) -> None:
+		"""Stop profiling and keep the allocations still traced."""
+		self._profile.disable()
+		self.seconds = time.perf_counter() - self._started
+		_, self.peak_bytes = tracemalloc.get_traced_memory()
+		self._snapshot = tracemalloc.take_snapshot().filter_traces(
+			(
+				tracemalloc.Filter(False, tracemalloc.__file__),
+				tracemalloc.Filter(False, __file__),
+				tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+			)
+		)
+		tracemalloc.stop()
+
+	def write(self, directory: str) -> None:
+		"""Write the pstats profile and the import timings to a directory."""
+		os.makedirs(directory, exist_ok=True)
+		self._profile.dump_stats(os.path.join(directory, PROFILE_FILE))
+		with open(os.path.join(directory, IMPORT_TIME_FILE), 'w', encoding='utf-8') as f:
+			f.write(self.import_log)
+
+	def _import_lines(self) -> list[str]:
+		"""Import time of the module and of its slowest direct imports."""
+		if self.module is None:
+			return []
+		imported, direct = parse_import_times(self.import_log, self.module)
+		if imported is None:
+			return [f'Import time of {self.module} could not be measured', '']
+		lines = [
+			f'Import of {self.module}: {imported.cumulative_us / 1000:.1f} ms',
+			'',
+			'| Direct import | Cumulative ms | Self ms |',
+			'|---------------|---------------|---------|',
+		]
+		for entry in direct[: self.top]:
+			lines.append(f'| {entry.module} | {entry.cumulative_us / 1000:.1f} | {entry.self_us / 1000:.1f} |')
+		return [*lines, '']
+
+	def _phase_lines(self) -> list[str]:
+		"""Phases, slowest first."""
+		lines = ['| Phase | Calls | Total ms | Slowest ms |', '|-------|-------|----------|------------|']
+		for name, stats in sorted(self.phases.items(), key=lambda item: item[1].seconds, reverse=True):
+			lines.append(f'| {name} | {stats.calls} | {stats.seconds * 1000:.1f} | {stats.slowest * 1000:.1f} |')
+		return [*lines, '']
+
+	def _function_lines(self) -> list[str]:
+		"""Functions with the most cumulative time, leaving out this module."""
+		lines = [
+			'| Function | Calls | Cumulative ms | Own ms |',
+			'|----------|-------|---------------|--------|',
+		]
+		# pstats keeps (primitive calls, calls, own time, cumulative time, callers) per function
+		stats = pstats.Stats(self._profile).stats  # type: ignore[attr-defined]
+		functions = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)
+		own = os.path.abspath(__file__)
+		functions = [(function, timing) for function, timing in functions if function[0] != own]
+		for function, (_, calls, own_time, cumulative, _) in functions[: self.top]:
+			name = _cell(_function_name(function))
+			lines.append(f'| {name} | {calls} | {cumulative * 1000:.1f} | {own_time * 1000:.1f} |')
+		return [*lines, '']
+
+	def _allocation_lines(self) -> list[str]:
+		"""Source lines holding the most traced memory at the end of the run."""
+		if self._snapshot is None:
+			return []
+		lines = ['| Allocated at | KiB | Blocks |', '|--------------|-----|--------|']
+		for statistic in self._snapshot.statistics('lineno')[: self.top]:
+			frame = statistic.traceback[0]
+			where = _cell(f'{_short_path(frame.filename)}:{frame.lineno}')
+			lines.append(f'| {where} | {statistic.size / 1024:.1f} | {statistic.count} |')
+		return [*lines, '']
+
+	def to_markdown(self, title: str) -> str:
+		"""Render import times, phases, the slowest functions and the largest allocations as Markdown."""
+		lines = [
+			f'### {title}',
+			'',
+			f'Run: {self.seconds * 1000:.1f} ms, peak traced memory {self.peak_bytes / 1024 / 1024:.1f} MiB',
+			'',
+			*self._import_lines(),
+			*self._phase_lines(),
+			*self._function_lines(),
+			*self._allocation_lines(),
+		]
+		return '\n'.join(lines)
+
+	def write_step_summary(self, path: str, title: str) -> None:
+		"""Append the Markdown tables to a GITHUB_STEP_SUMMARY file."""
+		with open(path, 'a', encoding='utf-8') as f:
+			f.write(self.to_markdown(title))
+
+
+@contextmanager
+def profiled(module: str, directory: str, summary_path: str) -> Iterator[Profiler]:
+	"""Profile the block, then write the profile files and the step summary, even if the block fails.
+
+	Args:
+		module: Module that is run, whose cold import time is measured first.
+		directory: Directory for ``profile.prof`` and ``importtime.log``.
+		summary_path: GITHUB_STEP_SUMMARY file.
+	"""
+	global _active
+	profiler = Profiler()
+	profiler.measure_imports(module)
+	_active = profiler
+	profiler.start()
+	try:
+		yield profiler
+	finally:
+		profiler.stop()
+		_active = None
+		profiler.write(directory)
+		profiler.write_step_summary(summary_path, f'Profile of {module}')
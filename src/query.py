@@ -0,0 +1,117 @@
+"""Compilation of notification filters into Gmail search queries, and their evaluation for other mail sources."""
+
+import re
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+from email.utils import parseaddr
+
+from .settings import FilterSettings
+
+# Terms made of these characters need no quotes in a Gmail query
+BARE_TERM_PATTERN = re.compile(r'[^\s"(){}:]+')
+
+# Size units understood by larger: and smaller:, largest first
+SIZE_UNITS = (('M', 1024 * 1024), ('K', 1024))
+
+# Days in the units of newer_than:, approximating months and years as Gmail does
+NEWER_THAN_DAYS = {'d': 1, 'm': 30, 'y': 365}
+
+
+def quote_term(term: str) -> str:
+	"""Quote a search term containing spaces or query syntax, so it is matched as one phrase."""
+	if BARE_TERM_PATTERN.fullmatch(term):
+		return term
+	return '"' + term.replace('"', ' ').strip() + '"'
+
+
+def _any_of(operator: str, terms: Iterable[str]) -> str | None:
+	"""Build one ``operator:`` condition matching any of the terms, or None without terms.
+
+	Gmail treats terms in braces as OR, which keeps the query shorter than ``a OR b``.
+	"""
+	quoted = list(dict.fromkeys(quote_term(term) for term in terms))
+	if not quoted:
+		return None
+	if len(quoted) == 1:
+		return f'{operator}:{quoted[0]}'
+	return f'{operator}:{{{" ".join(quoted)}}}'
+
+
+def _covers(domain: str, sender: str) -> bool:
+	"""Check whether ``from:domain`` already matches ``sender``, an address or a subdomain."""
+	return sender != domain and (sender.endswith(f'@{domain}') or sender.endswith(f'.{domain}'))
+
+
+def minimal_senders(senders: Iterable[str]) -> list[str]:
+	"""Normalize a sender allowlist and drop entries matched by another entry.
+
+	Entries are lowercased, a leading ``@`` of a domain is removed, and an
+	address or subdomain is dropped when its domain is listed as well.
+	"""
+	normalized = list(dict.fromkeys(sender.strip().lower().removeprefix('@') for sender in senders))
+	domains = [sender for sender in normalized if '@' not in sender]
+	return [sender for sender in normalized if not any(_covers(domain, sender) for domain in domains)]
+
+
+def format_size(size: int) -> str:
+	"""Format a byte count for larger: and smaller:, using K or M when it divides evenly."""
+	for unit, factor in SIZE_UNITS:
+		if size % factor == 0:
+			return f'{size // factor}{unit}'
+	return str(size)
+
+
+def compile_query(label: str, filters: FilterSettings, *terms: str) -> str:
+	"""Compile the search query for a label, its filters and extra terms such as ``is:unread``.
+
+	Args:
+		label: Gmail label name.
+		filters: Conditions from the [filters] settings.
+		terms: Terms added as they are.
+
+	Returns:
+		A ``q`` string for users.messages.list and users.threads.list.
+	"""
+	conditions = [
+		f'label:"{label}"',
+		*terms,
+		_any_of('from', minimal_senders(filters.senders)),
+		_any_of('subject', filters.subject_keywords),
+		f'newer_than:{filters.newer_than}' if filters.newer_than else None,
+		f'larger:{format_size(filters.larger_than)}' if filters.larger_than else None,
+		f'smaller:{format_size(filters.smaller_than)}' if filters.smaller_than else None,
+	]
+	return ' '.join(condition for condition in conditions if condition)
+
+
+def _sender_matches(sender: str, address: str) -> bool:
+	"""Check whether an address matches a sender allowlist entry, as ``from:`` does."""
+	return address == sender or _covers(sender, address)
+
+
+def matches_filters(
+	filters: FilterSettings, sender: str, subject: str, date: datetime | None, size: int, now: datetime
+) -> bool:
+	"""Check an email against the filters, for sources that cannot run a Gmail search.
+
+	Args:
+		filters: Conditions from the [filters] settings.
+		sender: From header.
+		subject: Subject header.
+		date: Date of the email; an email without one passes ``newer_than``.
+		size: Size of the raw email in bytes.
+		now: Current time, timezone-aware.
+	"""
+	if filters.senders:
+		address = parseaddr(sender)[1].lower()
+		if not any(_sender_matches(entry, address) for entry in minimal_senders(filters.senders)):
+			return False
+	if filters.subject_keywords and not any(keyword.lower() in subject.lower() for keyword in filters.subject_keywords):
+		return False
+	if filters.newer_than and date is not None:
+		days = int(filters.newer_than[:-1]) * NEWER_THAN_DAYS[filters.newer_than[-1]]
+		if date <= now - timedelta(days=days):
+			return False
+	if filters.larger_than and size <= filters.larger_than:
+		return False
+	return not (filters.smaller_than and size >= filters.smaller_than)
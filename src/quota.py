@@ -0,0 +1,146 @@
+"""Gmail API quota accounting and adaptive pacing."""
+
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+# Gmail API quota units per users.messages method, and per users.threads method with a "threads." prefix
+GMAIL_QUOTA_COSTS = {
+	'list': 5,
+	'get': 5,
+	'modify': 5,
+	'batchModify': 50,
+	'attachments.get': 5,
+	'threads.list': 10,
+	'threads.get': 10,
+	'threads.modify': 10,
+}
+
+# Gmail allows 15,000 quota units per user per minute
+DEFAULT_UNITS_PER_MINUTE = 15000
+
+# Share of the per-minute limit spent before calls are slowed down
+PER_MINUTE_HEADROOM = 0.8
+
+# After a quota error the rate never drops below this share of the configured rate
+MIN_RATE_SHARE = 1 / 16
+
+# Share of the configured rate regained after each successful call
+RATE_RECOVERY_SHARE = 1 / 20
+
+MINUTE = 60.0
+
+
+@dataclass
+class QuotaUsage:
+	"""Quota units spent by one Gmail account."""
+
+	units: int = 0
+	calls: dict[str, int] = field(default_factory=dict)
+	peak_units_per_minute: int = 0
+	throttled: int = 0
+
+
+class QuotaLedger:
+	"""Records the quota units of every Gmail call and paces calls to stay under the limits.
+
+	Calls are paced by a token bucket of ``units_per_second`` and by a rolling
+	one-minute budget below ``units_per_minute``, so the per-user limit is not
+	reached in the first place. A quota error halves the bucket rate; each
+	successful call restores part of it. Safe to share between threads.
+	"""
+
+	def __init__(
+		self,
+		units_per_second: float | None = None,
+		units_per_minute: int = DEFAULT_UNITS_PER_MINUTE,
+		clock: Callable[[], float] = time.monotonic,
+		sleep: Callable[[float], None] = time.sleep,
+	):
+		"""Initialize quota ledger.
+
+		Args:
+			units_per_second: Sustained quota units allowed per second, or None to only
+				apply the per-minute budget. The bucket holds one second's worth of units.
+			units_per_minute: Per-user Gmail limit of quota units per minute.
+		"""
+		if units_per_second is not None and units_per_second <= 0:
+			raise ValueError('units_per_second must be positive')
+		if units_per_minute <= 0:
+			raise ValueError('units_per_minute must be positive')
+		self.units_per_second = units_per_second
+		self.units_per_minute = units_per_minute
+		self.rate = units_per_second
+		self.usage = QuotaUsage()
+		self._clock = clock
+		self._sleep = sleep
+		self._lock = threading.Lock()
+		self._available = units_per_second or 0.0
+		self._updated = clock()
+		# (time charged, units) of the calls in the last minute
+		self._window: deque[tuple[float, int]] = deque()
+		self._window_units = 0
+
+	def _bucket_delay(self, now: float, units: int) -> float:
+		"""Take units from the token bucket and return how long to wait for them."""
+		if self.rate is None:
+			return 0.0
+		self._available = min(self.rate, self._available + (now - self._updated) * self.rate)
+		self._updated = now
+		self._available -= units
+		return -self._available / self.rate if self._available < 0 else 0.0
+
+	def _minute_delay(self, now: float, units: int) -> float:
+		"""Return how long to wait until the last minute leaves room for ``units`` under the headroom."""
+		while self._window and self._window[0][0] <= now - MINUTE:
+			self._window_units -= self._window.popleft()[1]
+		excess = self._window_units + units - self.units_per_minute * PER_MINUTE_HEADROOM
+		if excess <= 0:
+			return 0.0
+		for charged_at, charged_units in self._window:
+			excess -= charged_units
+			if excess <= 0:
+				return max(0.0, charged_at + MINUTE - now)
+		return 0.0
+
+	def acquire(self, method: str) -> None:
+		"""Charge one call, blocking until the limits allow it.
+
+		Args:
+			method: Gmail API method name, a key of GMAIL_QUOTA_COSTS.
+		"""
+		units = GMAIL_QUOTA_COSTS[method]
+		with self._lock:
+			now = self._clock()
+			delay = max(self._bucket_delay(now, units), self._minute_delay(now, units))
+			charged_at = now + delay
+			self._window.append((charged_at, units))
+			self._window_units += units
+			self.usage.units += units
+			self.usage.calls[method] = self.usage.calls.get(method, 0) + 1
+			in_minute = sum(call_units for at, call_units in self._window if at > charged_at - MINUTE)
+			self.usage.peak_units_per_minute = max(self.usage.peak_units_per_minute, in_minute)
+		if delay > 0:
+			self._sleep(delay)
+
+	def record_throttled(self) -> None:
+		"""Halve the rate after a quota error and wait a second before the next call."""
+		with self._lock:
+			self.usage.throttled += 1
+			if self.units_per_second is not None and self.rate is not None:
+				self.rate = max(self.units_per_second * MIN_RATE_SHARE, self.rate / 2)
+				self._available = min(self._available, 0.0) - self.rate
+			else:
+				# Without a configured rate, start pacing at the per-second average of the budget
+				self.rate = self.units_per_minute * PER_MINUTE_HEADROOM / MINUTE
+				self._available = -self.rate
+				self._updated = self._clock()
+
+	def record_success(self) -> None:
+		"""Restore part of the rate after a successful call."""
+		if self.units_per_second is None or self.rate is None or self.rate >= self.units_per_second:
+			return
+		with self._lock:
+			self.rate = min(self.units_per_second, self.rate + self.units_per_second * RATE_RECOVERY_SHARE)
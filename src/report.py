@@ -0,0 +1,141 @@
+"""Per-message results of a run, written to GitHub Actions outputs and the step summary."""
+
+import json
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass
+from enum import StrEnum
+
+from .errors import classify, describe
+from .quota import QuotaUsage
+
+
+class Outcome(StrEnum):
+	"""Result of processing one message."""
+
+	DELIVERED = 'delivered'
+	SKIPPED = 'skipped'
+	RETRY_LATER = 'retry_later'
+	FAILED = 'failed'
+	DEFERRED = 'deferred'
+
+
+def outcome_for(errors: Iterable[BaseException]) -> Outcome:
+	"""Derive the outcome of a message from the errors raised while processing it.
+
+	Returns:
+		DELIVERED without errors, RETRY_LATER if every error is retryable, FAILED otherwise.
+	"""
+	retry_classes = [classify(error) for error in errors]
+	if not retry_classes:
+		return Outcome.DELIVERED
+	if all(retry_class.retryable for retry_class in retry_classes):
+		return Outcome.RETRY_LATER
+	return Outcome.FAILED
+
+
+@dataclass
+class MessageResult:
+	"""Outcome of one message. An empty message_id means the whole account failed."""
+
+	message_id: str
+	outcome: Outcome
+	account: str = ''
+	detail: str = ''
+
+
+class RunReport:
+	"""Collects message results for a run."""
+
+	def __init__(self) -> None:
+		"""Initialize empty report."""
+		self.results: list[MessageResult] = []
+		self.quota: dict[str, QuotaUsage] = {}
+
+	def add(self, message_id: str, outcome: Outcome, account: str = '', detail: str = '') -> MessageResult:
+		"""Record the outcome of a message."""
+		result = MessageResult(message_id, outcome, account, detail)
+		self.results.append(result)
+		return result
+
+	def add_error(self, message_id: str, error: BaseException, account: str = '') -> MessageResult:
+		"""Record a message that could not be processed, classifying the error."""
+		return self.add(message_id, outcome_for([error]), account, describe(error))
+
+	def add_quota(self, account: str, usage: QuotaUsage) -> None:
+		"""Record the Gmail quota units an account spent."""
+		self.quota[account] = usage
+
+	def quota_units(self) -> int:
+		"""Total Gmail quota units spent by every account."""
+		return sum(usage.units for usage in self.quota.values())
+
+	def counts(self) -> dict[Outcome, int]:
+		"""Count results per outcome, including outcomes that did not occur."""
+		counts = dict.fromkeys(Outcome, 0)
+		for result in self.results:
+			counts[result.outcome] += 1
+		return counts
+
+	@property
+	def failed(self) -> list[MessageResult]:
+		"""Results that need attention because retrying later will not help."""
+		return [result for result in self.results if result.outcome == Outcome.FAILED]
+
+	def status(self) -> str:
+		"""Summarize the run as failed, queued, success, deferred or no_emails."""
+		counts = self.counts()
+		if counts[Outcome.FAILED]:
+			return 'failed'
+		if counts[Outcome.RETRY_LATER]:
+			return 'queued'
+		if counts[Outcome.DELIVERED]:
+			return 'success'
+		if counts[Outcome.DEFERRED]:
+			return 'deferred'
+		return 'no_emails'
+
+	def write_github_output(self, path: str, status_suffix: str = '') -> None:
+		"""Append status, per-outcome counts, the results and Gmail quota usage to a GITHUB_OUTPUT file."""
+		with open(path, 'a', encoding='utf-8') as f:
+			f.write(f'status={self.status()}{status_suffix}\n')
+			for outcome, count in self.counts().items():
+				f.write(f'{outcome}={count}\n')
+			f.write(f'results={json.dumps([asdict(result) for result in self.results], ensure_ascii=False)}\n')
+			f.write(f'quota_units={self.quota_units()}\n')
+			quota = {account: asdict(usage) for account, usage in self.quota.items()}
+			f.write(f'quota={json.dumps(quota, ensure_ascii=False)}\n')
+
+	def to_markdown(self, title: str) -> str:
+		"""Render the report as a Markdown table."""
+		counts = ', '.join(f'{outcome}: {count}' for outcome, count in self.counts().items())
+		lines = [
+			f'### {title}',
+			'',
+			counts,
+			'',
+			'| Account | Message | Outcome | Detail |',
+			'|---------|---------|---------|--------|',
+		]
+		for result in self.results:
+			detail = result.detail.replace('|', '\\|').replace('\n', ' ')
+			lines.append(f'| {result.account or "-"} | {result.message_id or "-"} | {result.outcome} | {detail} |')
+		if self.quota:
+			lines += [
+				'',
+				f'Gmail quota units: {self.quota_units()}',
+				'',
+				'| Account | Units | Calls | Peak units/min | Throttled |',
+				'|---------|-------|-------|----------------|-----------|',
+			]
+			for account, usage in self.quota.items():
+				calls = ', '.join(f'{method}: {count}' for method, count in usage.calls.items())
+				peak = usage.peak_units_per_minute
+				lines.append(f'| {account or "-"} | {usage.units} | {calls} | {peak} | {usage.throttled} |')
+		return '\n'.join(lines) + '\n'
+
+	def write_step_summary(self, path: str, title: str) -> None:
+		"""Append the Markdown tables to a GITHUB_STEP_SUMMARY file, if there are results or quota usage."""
+		if not self.results and not self.quota:
+			return
+		with open(path, 'a', encoding='utf-8') as f:
+			f.write(self.to_markdown(title))
@@ -0,0 +1,217 @@
+"""In-process scheduling: cron expressions, jittered intervals and quiet hours."""
+
+import logging
+import random
+import threading
+from collections.abc import Callable, Sequence
+from datetime import UTC, date, datetime, time, timedelta, tzinfo
+
+logger = logging.getLogger(__name__)
+
+# Cron field -> (lowest, highest) allowed value
+CRON_FIELDS = (('minute', 0, 59), ('hour', 0, 23), ('day', 1, 31), ('month', 1, 12), ('weekday', 0, 7))
+
+# Days searched for the next cron match; covers expressions that only match on 29 February
+CRON_SEARCH_DAYS = 366 * 8
+
+
+def _parse_cron_field(field: str, name: str, low: int, high: int) -> frozenset[int]:
+	"""Parse one cron field with lists, ranges and steps (``1,5``, ``8-21``, ``*/5``)."""
+	values: set[int] = set()
+	for part in field.split(','):
+		range_part, has_step, step_part = part.partition('/')
+		try:
+			step = int(step_part) if has_step else 1
+			if range_part == '*':
+				start, end = low, high
+			elif '-' in range_part:
+				start_text, end_text = range_part.split('-', 1)
+				start, end = int(start_text), int(end_text)
+			else:
+				start = int(range_part)
+				end = high if has_step else start
+		except ValueError as e:
+			raise ValueError(f'Invalid cron {name} field: {field!r}') from e
+		if step < 1 or not low <= start <= end <= high:
+			raise ValueError(f'Cron {name} field out of range {low}-{high}: {field!r}')
+		values.update(range(start, end + 1, step))
+	return frozenset(values)
+
+
+class CronSchedule:
+	"""Five-field cron expression (minute hour day month weekday) evaluated in a timezone.
+
+	Weekdays are 0-7 with Sunday as 0 or 7. As in cron, when both day and
+	weekday are restricted, a day matching either one matches.
+	"""
+
+	def __init__(self, expression: str, tz: tzinfo = UTC):
+		"""Initialize cron schedule.
+
+		Raises:
+			ValueError: If the expression is not valid.
+		"""
+		fields = expression.split()
+		if len(fields) != len(CRON_FIELDS):
+			raise ValueError(f'Cron expression needs {len(CRON_FIELDS)} fields: {expression!r}')
+		minutes, hours, days, months, weekdays = (
+			_parse_cron_field(field, name, low, high)
+			for field, (name, low, high) in zip(fields, CRON_FIELDS, strict=True)
+		)
+		self.expression = expression
+		self.tz = tz
+		self.minutes = sorted(minutes)
+		self.hours = sorted(hours)
+		self.days = days
+		self.months = months
+		self.weekdays = frozenset(weekday % 7 for weekday in weekdays)
+		self._any_day = fields[2] == '*'
+		self._any_weekday = fields[4] == '*'
+
+	def _day_matches(self, day: date) -> bool:
+		"""Check the day, month and weekday fields."""
+		if day.month not in self.months:
+			return False
+		day_match = day.day in self.days
+		weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+		if self._any_day or self._any_weekday:
+			return day_match and weekday_match
+		return day_match or weekday_match
+
+	def next_after(self, moment: datetime) -> datetime:
+		"""Get the first matching minute strictly after ``moment``."""
+		local = moment.astimezone(self.tz)
+		day = local.date()
+		for _ in range(CRON_SEARCH_DAYS):
+			if self._day_matches(day):
+				for hour in self.hours:
+					for minute in self.minutes:
+						candidate = datetime(day.year, day.month, day.day, hour, minute, tzinfo=self.tz)
+						if candidate > local:
+							return candidate
+			day += timedelta(days=1)
+		raise ValueError(f'Cron expression never matches: {self.expression!r}')
+
+
+class IntervalSchedule:
+	"""Fixed interval plus a random delay, so several instances do not check in lockstep."""
+
+	def __init__(self, interval: timedelta, jitter: timedelta = timedelta(0), rng: random.Random | None = None):
+		"""Initialize interval schedule.
+
+		Args:
+			interval: Time between runs.
+			jitter: Upper bound of the random delay added to each interval.
+			rng: Random number generator, for tests.
+		"""
+		if interval <= timedelta(0):
+			raise ValueError('Interval must be positive')
+		if jitter < timedelta(0):
+			raise ValueError('Jitter must not be negative')
+		self.interval = interval
+		self.jitter = jitter
+		self._rng = rng or random.Random()
+
+	def next_after(self, moment: datetime) -> datetime:
+		"""Get the next run time after ``moment``."""
+		return moment + self.interval + timedelta(seconds=self._rng.uniform(0, self.jitter.total_seconds()))
+
+
+Schedule = CronSchedule | IntervalSchedule
+
+
+class QuietHours:
+	"""Daily window, possibly crossing midnight, during which nothing should run or be pushed."""
+
+	def __init__(self, start: time, end: time, tz: tzinfo = UTC):
+		"""Initialize quiet hours from ``start`` (inclusive) to ``end`` (exclusive)."""
+		if start == end:
+			raise ValueError('Quiet hours must not start and end at the same time')
+		self.start = start
+		self.end = end
+		self.tz = tz
+
+	@classmethod
+	def parse(cls, window: str, tz: tzinfo = UTC) -> 'QuietHours':
+		"""Parse a ``HH:MM-HH:MM`` window such as ``22:00-07:00``."""
+		try:
+			start_text, end_text = window.split('-')
+			return cls(time.fromisoformat(start_text.strip()), time.fromisoformat(end_text.strip()), tz)
+		except ValueError as e:
+			raise ValueError(f'Quiet hours must look like 22:00-07:00: {window!r}') from e
+
+	def contains(self, moment: datetime) -> bool:
+		"""Check whether ``moment`` falls inside the window."""
+		local_time = moment.astimezone(self.tz).time()
+		if self.start < self.end:
+			return self.start <= local_time < self.end
+		return local_time >= self.start or local_time < self.end
+
+	def end_after(self, moment: datetime) -> datetime:
+		"""Get the first end of the window after ``moment``."""
+		local = moment.astimezone(self.tz)
+		end = datetime.combine(local.date(), self.end, tzinfo=self.tz)
+		return end if end > local else end + timedelta(days=1)
+
+
+class Scheduler:
+	"""Runs a job at the earliest time any schedule allows, outside quiet hours.
+
+	A run that would fall inside quiet hours is moved to the end of the window.
+	"""
+
+	def __init__(
+		self,
+		schedules: Sequence[Schedule],
+		quiet_hours: QuietHours | None = None,
+		clock: Callable[[], datetime] = lambda: datetime.now(UTC),
+		wait: Callable[[threading.Event, float], bool] = lambda stop, seconds: stop.wait(seconds),
+	):
+		"""Initialize scheduler.
+
+		Args:
+			schedules: Schedules combined into one; the earliest next run wins.
+			quiet_hours: Window in which runs are postponed.
+			clock: Current time, timezone-aware.
+			wait: Waits up to the given seconds and returns True if stopped.
+		"""
+		self._clock = clock
+		self._wait = wait
+		self.update(schedules, quiet_hours)
+
+	def update(self, schedules: Sequence[Schedule], quiet_hours: QuietHours | None = None) -> None:
+		"""Replace the schedules, taking effect from the next run."""
+		if not schedules:
+			raise ValueError('At least one schedule is required')
+		self.schedules = list(schedules)
+		self.quiet_hours = quiet_hours
+
+	def next_run(self, now: datetime) -> datetime:
+		"""Get the next run time after ``now``."""
+		next_run = min(schedule.next_after(now) for schedule in self.schedules)
+		if self.quiet_hours and self.quiet_hours.contains(next_run):
+			next_run = self.quiet_hours.end_after(next_run)
+		return next_run
+
+	def run(self, job: Callable[[], None], stop: threading.Event | None = None, max_runs: int | None = None) -> int:
+		"""Run ``job`` on schedule until ``stop`` is set or ``max_runs`` is reached.
+
+		An exception from the job is logged and does not stop the scheduler.
+
+		Returns:
+			Number of runs.
+		"""
+		stop = stop or threading.Event()
+		runs = 0
+		while max_runs is None or runs < max_runs:
+			now = self._clock()
+			next_run = self.next_run(now)
+			logger.info('Next check scheduled', extra={'stage': 'schedule', 'next_run': next_run.isoformat()})
+			if self._wait(stop, max(0.0, (next_run - now).total_seconds())):
+				break
+			try:
+				job()
+			except Exception:
+				logger.exception('Scheduled check failed', extra={'stage': 'schedule'})
+			runs += 1
+		return runs
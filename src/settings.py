@@ -0,0 +1,614 @@
+"""Notifier settings loaded from a TOML or YAML file.
+
+Settings that tune behaviour (labels, filters, routes, other mail sources, rate
+limits, concurrency, templates, the check schedule, quiet hours, attachments and logging) live in a
+file named by ``NOTIFIER_CONFIG``. Secrets stay in environment variables.
+Without a file, the defaults below are used.
+"""
+
+import logging
+import os
+import re
+import tomllib
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .quota import DEFAULT_UNITS_PER_MINUTE
+from .scheduler import CronSchedule, QuietHours
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LABEL = 'Family/お荷物滞留お知らせメール'
+DEFAULT_GMAIL_QUOTA_PER_SECOND = 50.0
+DEFAULT_ACCOUNT_WORKERS = 8
+
+# Names of the destinations created by sinks.build_sinks
+SINK_NAMES = ('line', 'slack', 'discord', 'webhook', 'file')
+
+# Mailboxes read besides Gmail, created by sources.build_sources
+SOURCE_TYPES = ('imap', 'mbox')
+SOURCE_KEYS = {
+	'imap': ('name', 'type', 'label', 'host', 'port', 'username', 'password_env', 'mailbox', 'ssl', 'idle'),
+	'mbox': ('name', 'type', 'label', 'path'),
+}
+DEFAULT_IMAP_PASSWORD_ENV = 'IMAP_PASSWORD'
+# Source names become state file names and account names in reports
+SOURCE_NAME_PATTERN = re.compile(r'[A-Za-z0-9_.-]+')
+
+# Fields available to the notification template
+TEMPLATE_FIELDS = ('subject', 'sender', 'details')
+DEFAULT_NOTIFICATION_TEMPLATE = '📧 新着メール (お荷物滞留お知らせ)\n\n件名: {subject}\n差出人: {sender}\n\n{details}'
+
+# LINE accepts image files up to 10 MB; larger attachments are not downloaded
+DEFAULT_ATTACHMENT_MAX_BYTES = 10 * 1024 * 1024
+# LINE push requests carry 5 messages: the text plus up to 4 images
+DEFAULT_ATTACHMENT_MAX_IMAGES = 4
+DEFAULT_IMAGE_MAX_DIMENSION = 1024
+DEFAULT_PREVIEW_MAX_DIMENSION = 240
+
+# Log levels that can be set and sampled, lowest first
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+LOG_FORMATS = ('json', 'text')
+
+# Gmail newer_than: windows, a count of days, months or years
+NEWER_THAN_PATTERN = re.compile(r'[1-9][0-9]*[dmy]')
+
+# Same times as the GitHub Actions cron entries (7:00, 12:00 and 17:00 JST)
+DEFAULT_TIMEZONE = 'Asia/Tokyo'
+DEFAULT_CRON = ('0 7 * * *', '0 12 * * *', '0 17 * * *')
+
+
+def _section(data: dict[str, Any], key: str) -> dict[str, Any]:
+	"""Get a table from the settings file, rejecting anything else."""
+	value = data.get(key, {})
+	if not isinstance(value, dict):
+		raise ValueError(f'[{key}] must be a table')
+	return value
+
+
+def _reject_unknown(data: dict[str, Any], known: tuple[str, ...], where: str) -> None:
+	"""Reject misspelled keys instead of silently ignoring them."""
+	unknown = sorted(set(data) - set(known))
+	if unknown:
+		raise ValueError(f'Unknown setting in {where}: {", ".join(unknown)}')
+
+
+def _positive_number(data: dict[str, Any], key: str, default: float, where: str) -> float:
+	"""Read a positive int or float."""
+	value = data.get(key, default)
+	if isinstance(value, bool) or not isinstance(value, int | float) or value <= 0:
+		raise ValueError(f'{where}.{key} must be a positive number')
+	return float(value)
+
+
+def _positive_int(data: dict[str, Any], key: str, default: int, where: str) -> int:
+	"""Read a positive int."""
+	value = data.get(key, default)
+	if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+		raise ValueError(f'{where}.{key} must be a positive integer')
+	return value
+
+
+def _timezone(data: dict[str, Any], where: str) -> str:
+	"""Read an IANA timezone name."""
+	timezone = data.get('timezone', DEFAULT_TIMEZONE)
+	if not isinstance(timezone, str):
+		raise ValueError(f'{where}.timezone must be a string')
+	try:
+		ZoneInfo(timezone)
+	except (ZoneInfoNotFoundError, ValueError) as e:
+		raise ValueError(f'{where}.timezone is unknown: {timezone}') from e
+	return timezone
+
+
+def _string_list(value: Any, where: str) -> tuple[str, ...]:
+	"""Read a non-empty list of non-empty strings."""
+	if not isinstance(value, list) or not value or not all(isinstance(item, str) and item for item in value):
+		raise ValueError(f'{where} must be a non-empty list of strings')
+	return tuple(value)
+
+
+@dataclass(frozen=True, slots=True)
+class Route:
+	"""Destinations that receive emails with a label."""
+
+	label: str
+	sinks: tuple[str, ...]
+
+	@classmethod
+	def from_dict(cls, data: Any, index: int) -> 'Route':
+		"""Create a Route from one [[routes]] entry."""
+		where = f'routes[{index}]'
+		if not isinstance(data, dict):
+			raise ValueError(f'{where} must be a table')
+		_reject_unknown(data, ('label', 'sinks'), where)
+		label = data.get('label')
+		if not isinstance(label, str) or not label:
+			raise ValueError(f'{where}.label is required')
+		sinks = _string_list(data.get('sinks'), f'{where}.sinks')
+		unknown = [sink for sink in sinks if sink not in SINK_NAMES]
+		if unknown:
+			raise ValueError(f'{where}.sinks has unknown destinations: {", ".join(unknown)}')
+		return cls(label=label, sinks=sinks)
+
+
+def _string(data: dict[str, Any], key: str, where: str, default: str | None = None) -> str:
+	"""Read a non-empty string, required unless it has a default."""
+	value = data.get(key, default)
+	if value is None:
+		raise ValueError(f'{where}.{key} is required')
+	if not isinstance(value, str) or not value:
+		raise ValueError(f'{where}.{key} must be a non-empty string')
+	return value
+
+
+def _bool(data: dict[str, Any], key: str, default: bool, where: str) -> bool:
+	"""Read true or false."""
+	value = data.get(key, default)
+	if not isinstance(value, bool):
+		raise ValueError(f'{where}.{key} must be true or false')
+	return value
+
+
+@dataclass(frozen=True, slots=True)
+class SourceSettings:
+	"""A mailbox read besides Gmail, whose unread emails are notified as ``label``.
+
+	``type`` is ``imap`` for a folder on an IMAP server, whose password is read
+	from the environment variable named by ``password_env``, or ``mbox`` for an
+	mbox file that is scanned from where the previous check stopped.
+	"""
+
+	name: str
+	type: str
+	label: str
+	path: str | None = None
+	host: str | None = None
+	port: int | None = None
+	username: str | None = None
+	password_env: str = DEFAULT_IMAP_PASSWORD_ENV
+	mailbox: str = 'INBOX'
+	ssl: bool = True
+	idle: bool = True
+
+	@classmethod
+	def from_dict(cls, data: Any, index: int, labels: tuple[str, ...]) -> 'SourceSettings':
+		"""Create SourceSettings from one [[sources]] entry; ``label`` defaults to the first of ``labels``."""
+		where = f'sources[{index}]'
+		if not isinstance(data, dict):
+			raise ValueError(f'{where} must be a table')
+		source_type = data.get('type')
+		if source_type not in SOURCE_TYPES:
+			raise ValueError(f'{where}.type must be one of {", ".join(SOURCE_TYPES)}')
+		_reject_unknown(data, SOURCE_KEYS[source_type], where)
+		name = _string(data, 'name', where)
+		if not SOURCE_NAME_PATTERN.fullmatch(name):
+			raise ValueError(f'{where}.name may only contain letters, digits, ".", "_" and "-"')
+		label = data.get('label', labels[0])
+		if label not in labels:
+			raise ValueError(f'{where}.label does not match any of labels')
+		if source_type == 'mbox':
+			return cls(name=name, type=source_type, label=label, path=_string(data, 'path', where))
+		ssl = _bool(data, 'ssl', True, where)
+		return cls(
+			name=name,
+			type=source_type,
+			label=label,
+			host=_string(data, 'host', where),
+			port=_positive_int(data, 'port', 993 if ssl else 143, where),
+			username=_string(data, 'username', where),
+			password_env=_string(data, 'password_env', where, DEFAULT_IMAP_PASSWORD_ENV),
+			mailbox=_string(data, 'mailbox', where, 'INBOX'),
+			ssl=ssl,
+			idle=_bool(data, 'idle', True, where),
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimits:
+	"""Gmail quota units spent per second and per minute, for each account."""
+
+	gmail_quota_per_second: float = DEFAULT_GMAIL_QUOTA_PER_SECOND
+	gmail_units_per_minute: int = DEFAULT_UNITS_PER_MINUTE
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'RateLimits':
+		"""Create RateLimits from the [rate_limits] table."""
+		_reject_unknown(data, ('gmail_quota_per_second', 'gmail_units_per_minute'), '[rate_limits]')
+		return cls(
+			gmail_quota_per_second=_positive_number(
+				data, 'gmail_quota_per_second', DEFAULT_GMAIL_QUOTA_PER_SECOND, 'rate_limits'
+			),
+			gmail_units_per_minute=_positive_int(
+				data, 'gmail_units_per_minute', DEFAULT_UNITS_PER_MINUTE, 'rate_limits'
+			),
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class Concurrency:
+	"""Worker limits. ``extraction_workers`` of None lets src.extraction decide."""
+
+	accounts: int = DEFAULT_ACCOUNT_WORKERS
+	extraction_workers: int | None = None
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'Concurrency':
+		"""Create Concurrency from the [concurrency] table."""
+		_reject_unknown(data, ('accounts', 'extraction_workers'), '[concurrency]')
+		return cls(
+			accounts=_positive_int(data, 'accounts', DEFAULT_ACCOUNT_WORKERS, 'concurrency'),
+			extraction_workers=(
+				_positive_int(data, 'extraction_workers', 1, 'concurrency') if 'extraction_workers' in data else None
+			),
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class Templates:
+	"""Message templates. ``notification`` may use {subject}, {sender} and {details}."""
+
+	notification: str = DEFAULT_NOTIFICATION_TEMPLATE
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'Templates':
+		"""Create Templates from the [templates] table, checking every placeholder."""
+		_reject_unknown(data, ('notification',), '[templates]')
+		notification = data.get('notification', DEFAULT_NOTIFICATION_TEMPLATE)
+		if not isinstance(notification, str):
+			raise ValueError('templates.notification must be a string')
+		try:
+			notification.format_map(dict.fromkeys(TEMPLATE_FIELDS, ''))
+		except (KeyError, IndexError, ValueError) as e:
+			raise ValueError(
+				f'templates.notification is invalid ({e!r}); available fields: {", ".join(TEMPLATE_FIELDS)}'
+			) from e
+		return cls(notification=notification)
+
+
+@dataclass(frozen=True, slots=True)
+class AttachmentSettings:
+	"""Image attachments sent to LINE as image messages. Disabled by default."""
+
+	enabled: bool = False
+	max_bytes: int = DEFAULT_ATTACHMENT_MAX_BYTES
+	max_images: int = DEFAULT_ATTACHMENT_MAX_IMAGES
+	max_dimension: int = DEFAULT_IMAGE_MAX_DIMENSION
+	preview_dimension: int = DEFAULT_PREVIEW_MAX_DIMENSION
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'AttachmentSettings':
+		"""Create AttachmentSettings from the [attachments] table."""
+		_reject_unknown(
+			data, ('enabled', 'max_bytes', 'max_images', 'max_dimension', 'preview_dimension'), '[attachments]'
+		)
+		enabled = data.get('enabled', False)
+		if not isinstance(enabled, bool):
+			raise ValueError('attachments.enabled must be true or false')
+		max_images = _positive_int(data, 'max_images', DEFAULT_ATTACHMENT_MAX_IMAGES, 'attachments')
+		if max_images > DEFAULT_ATTACHMENT_MAX_IMAGES:
+			raise ValueError(f'attachments.max_images must be at most {DEFAULT_ATTACHMENT_MAX_IMAGES}')
+		return cls(
+			enabled=enabled,
+			max_bytes=_positive_int(data, 'max_bytes', DEFAULT_ATTACHMENT_MAX_BYTES, 'attachments'),
+			max_images=max_images,
+			max_dimension=_positive_int(data, 'max_dimension', DEFAULT_IMAGE_MAX_DIMENSION, 'attachments'),
+			preview_dimension=_positive_int(data, 'preview_dimension', DEFAULT_PREVIEW_MAX_DIMENSION, 'attachments'),
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class FilterSettings:
+	"""Conditions an unread email must meet to be notified, compiled into the Gmail search query.
+
+	Other sources check them against the headers of each email. Emails that do not match are
+	never listed or fetched. Empty settings match every email.
+	Sizes are in bytes and, like Gmail's larger: and smaller:, exclude the bound itself.
+	"""
+
+	senders: tuple[str, ...] = ()
+	subject_keywords: tuple[str, ...] = ()
+	newer_than: str | None = None
+	larger_than: int | None = None
+	smaller_than: int | None = None
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'FilterSettings':
+		"""Create FilterSettings from the [filters] table."""
+		_reject_unknown(data, ('senders', 'subject_keywords', 'newer_than', 'larger_than', 'smaller_than'), '[filters]')
+		newer_than = data.get('newer_than')
+		if newer_than is not None and (not isinstance(newer_than, str) or not NEWER_THAN_PATTERN.fullmatch(newer_than)):
+			raise ValueError('filters.newer_than must be a number of days, months or years such as 7d, 2m or 1y')
+		settings = cls(
+			senders=_string_list(data['senders'], 'filters.senders') if 'senders' in data else (),
+			subject_keywords=(
+				_string_list(data['subject_keywords'], 'filters.subject_keywords') if 'subject_keywords' in data else ()
+			),
+			newer_than=newer_than,
+			larger_than=_positive_int(data, 'larger_than', 1, 'filters') if 'larger_than' in data else None,
+			smaller_than=_positive_int(data, 'smaller_than', 1, 'filters') if 'smaller_than' in data else None,
+		)
+		if settings.larger_than and settings.smaller_than and settings.larger_than >= settings.smaller_than:
+			raise ValueError('filters.larger_than must be less than filters.smaller_than')
+		return settings
+
+
+@dataclass(frozen=True, slots=True)
+class ScheduleSettings:
+	"""When the long-running mode (src.daemon) checks for new emails.
+
+	Checks run at every ``cron`` time and, if ``interval_minutes`` is set, also
+	every interval plus up to ``jitter_seconds``. Checks due within
+	``quiet_hours`` (``HH:MM-HH:MM``) wait until the window ends.
+	"""
+
+	timezone: str = DEFAULT_TIMEZONE
+	cron: tuple[str, ...] = DEFAULT_CRON
+	interval_minutes: float | None = None
+	jitter_seconds: float = 0.0
+	quiet_hours: str | None = None
+
+	@property
+	def tz(self) -> ZoneInfo:
+		"""Timezone the cron expressions and quiet hours are evaluated in."""
+		return ZoneInfo(self.timezone)
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'ScheduleSettings':
+		"""Create ScheduleSettings from the [schedule] table, parsing every expression."""
+		_reject_unknown(data, ('timezone', 'cron', 'interval_minutes', 'jitter_seconds', 'quiet_hours'), '[schedule]')
+		timezone = _timezone(data, 'schedule')
+		tz = ZoneInfo(timezone)
+
+		cron = _string_list(data['cron'], 'schedule.cron') if 'cron' in data else DEFAULT_CRON
+		for expression in cron:
+			CronSchedule(expression, tz)
+
+		jitter_seconds = data.get('jitter_seconds', 0.0)
+		if isinstance(jitter_seconds, bool) or not isinstance(jitter_seconds, int | float) or jitter_seconds < 0:
+			raise ValueError('schedule.jitter_seconds must be a number of at least 0')
+
+		quiet_hours = data.get('quiet_hours')
+		if quiet_hours is not None:
+			if not isinstance(quiet_hours, str):
+				raise ValueError('schedule.quiet_hours must be a string such as 22:00-07:00')
+			QuietHours.parse(quiet_hours, tz)
+
+		return cls(
+			timezone=timezone,
+			cron=cron,
+			interval_minutes=(
+				_positive_number(data, 'interval_minutes', 1, 'schedule') if 'interval_minutes' in data else None
+			),
+			jitter_seconds=float(jitter_seconds),
+			quiet_hours=quiet_hours,
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class LoggingSettings:
+	"""Log output. ``sample_rates`` keeps only that share of the events of a level, such as per-email successes."""
+
+	format: str = 'json'
+	level: str = 'INFO'
+	sample_rates: tuple[tuple[str, float], ...] = ()
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'LoggingSettings':
+		"""Create LoggingSettings from the [logging] table."""
+		_reject_unknown(data, ('format', 'level', 'sample_rates'), '[logging]')
+		log_format = data.get('format', 'json')
+		if log_format not in LOG_FORMATS:
+			raise ValueError(f'logging.format must be one of {", ".join(LOG_FORMATS)}')
+		level = data.get('level', 'INFO')
+		if level not in LOG_LEVELS:
+			raise ValueError(f'logging.level must be one of {", ".join(LOG_LEVELS)}')
+		rates = _section(data, 'sample_rates')
+		for name, rate in rates.items():
+			if name not in LOG_LEVELS:
+				raise ValueError(f'logging.sample_rates has an unknown level: {name}')
+			if isinstance(rate, bool) or not isinstance(rate, int | float) or not 0 <= rate <= 1:
+				raise ValueError(f'logging.sample_rates.{name} must be a number from 0 to 1')
+		return cls(
+			format=log_format,
+			level=level,
+			sample_rates=tuple((name, float(rate)) for name, rate in rates.items()),
+		)
+
+
+@dataclass(frozen=True, slots=True)
+class DeliverySettings:
+	"""Notifications found within ``quiet_hours`` (``HH:MM-HH:MM``) are held and sent as one digest afterwards."""
+
+	quiet_hours: str | None = None
+	timezone: str = DEFAULT_TIMEZONE
+
+	def quiet_window(self) -> QuietHours | None:
+		"""Get the quiet hours, or None if notifications are never held."""
+		return QuietHours.parse(self.quiet_hours, ZoneInfo(self.timezone)) if self.quiet_hours else None
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'DeliverySettings':
+		"""Create DeliverySettings from the [delivery] table."""
+		_reject_unknown(data, ('quiet_hours', 'timezone'), '[delivery]')
+		settings = cls(quiet_hours=data.get('quiet_hours'), timezone=_timezone(data, 'delivery'))
+		if settings.quiet_hours is not None and not isinstance(settings.quiet_hours, str):
+			raise ValueError('delivery.quiet_hours must be a string such as 22:00-07:00')
+		settings.quiet_window()
+		return settings
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+	"""Validated notifier settings."""
+
+	labels: tuple[str, ...] = (DEFAULT_LABEL,)
+	group_by_thread: bool = False
+	filters: FilterSettings = field(default_factory=FilterSettings)
+	routes: tuple[Route, ...] = ()
+	sources: tuple[SourceSettings, ...] = ()
+	rate_limits: RateLimits = field(default_factory=RateLimits)
+	concurrency: Concurrency = field(default_factory=Concurrency)
+	templates: Templates = field(default_factory=Templates)
+	schedule: ScheduleSettings = field(default_factory=ScheduleSettings)
+	delivery: DeliverySettings = field(default_factory=DeliverySettings)
+	attachments: AttachmentSettings = field(default_factory=AttachmentSettings)
+	logging: LoggingSettings = field(default_factory=LoggingSettings)
+
+	@classmethod
+	def from_dict(cls, data: dict[str, Any]) -> 'Settings':
+		"""Create Settings from parsed file contents.
+
+		Raises:
+			ValueError: If a setting is unknown, has the wrong type or is inconsistent.
+		"""
+		_reject_unknown(
+			data,
+			(
+				'labels',
+				'group_by_thread',
+				'filters',
+				'routes',
+				'sources',
+				'rate_limits',
+				'concurrency',
+				'templates',
+				'schedule',
+				'delivery',
+				'attachments',
+				'logging',
+			),
+			'settings',
+		)
+		labels = _string_list(data['labels'], 'labels') if 'labels' in data else (DEFAULT_LABEL,)
+		group_by_thread = data.get('group_by_thread', False)
+		if not isinstance(group_by_thread, bool):
+			raise ValueError('group_by_thread must be true or false')
+
+		routes_data = data.get('routes', [])
+		if not isinstance(routes_data, list):
+			raise ValueError('routes must be a list of tables')
+		routes = tuple(Route.from_dict(route, index) for index, route in enumerate(routes_data))
+		for route in routes:
+			if route.label not in labels:
+				raise ValueError(f'Route for {route.label} does not match any of labels')
+		if len({route.label for route in routes}) != len(routes):
+			raise ValueError('Each label can have only one route')
+
+		sources_data = data.get('sources', [])
+		if not isinstance(sources_data, list):
+			raise ValueError('sources must be a list of tables')
+		sources = tuple(SourceSettings.from_dict(source, index, labels) for index, source in enumerate(sources_data))
+		if len({source.name for source in sources}) != len(sources):
+			raise ValueError('Each source needs a different name')
+
+		return cls(
+			labels=labels,
+			group_by_thread=group_by_thread,
+			filters=FilterSettings.from_dict(_section(data, 'filters')),
+			routes=routes,
+			sources=sources,
+			rate_limits=RateLimits.from_dict(_section(data, 'rate_limits')),
+			concurrency=Concurrency.from_dict(_section(data, 'concurrency')),
+			templates=Templates.from_dict(_section(data, 'templates')),
+			schedule=ScheduleSettings.from_dict(_section(data, 'schedule')),
+			delivery=DeliverySettings.from_dict(_section(data, 'delivery')),
+			attachments=AttachmentSettings.from_dict(_section(data, 'attachments')),
+			logging=LoggingSettings.from_dict(_section(data, 'logging')),
+		)
+
+	def sinks_for(self, label: str) -> tuple[str, ...] | None:
+		"""Get the destinations routed for a label, or None to use every destination."""
+		return next((route.sinks for route in self.routes if route.label == label), None)
+
+
+def _parse_yaml(text: str, path: str) -> Any:
+	"""Parse YAML with the optional PyYAML package."""
+	try:
+		import yaml
+	except ImportError as e:
+		raise ValueError('YAML settings require PyYAML. Install it with: uv sync --extra yaml') from e
+	try:
+		return yaml.safe_load(text)
+	except yaml.YAMLError as e:
+		raise ValueError(f'Failed to parse {path}: {e}') from e
+
+
+def load_settings(path: str) -> Settings:
+	"""Load and validate a .toml, .yaml or .yml settings file.
+
+	Raises:
+		ValueError: If the file cannot be parsed or is invalid.
+	"""
+	with open(path, encoding='utf-8') as f:
+		text = f.read()
+	try:
+		if path.endswith('.toml'):
+			data = tomllib.loads(text)
+		elif path.endswith(('.yaml', '.yml')):
+			data = _parse_yaml(text, path) or {}
+		else:
+			raise ValueError(f'Settings file must be .toml, .yaml or .yml: {path}')
+	except tomllib.TOMLDecodeError as e:
+		raise ValueError(f'Failed to parse {path}: {e}') from e
+	if not isinstance(data, dict):
+		raise ValueError(f'{path} must contain a table of settings')
+	return Settings.from_dict(data)
+
+
+def settings_from_env() -> Settings:
+	"""Load the file named by NOTIFIER_CONFIG, or return the defaults if it is not set."""
+	path = os.environ.get('NOTIFIER_CONFIG')
+	return load_settings(path) if path else Settings()
+
+
+class SettingsWatcher:
+	"""Reloads a settings file when its modification time changes.
+
+	Long-running processes call ``poll`` between checks. An invalid edit is
+	reported and the last valid settings stay in effect.
+	"""
+
+	def __init__(self, path: str, settings: Settings, loader: Callable[[str], Settings] = load_settings):
+		"""Initialize watcher.
+
+		Args:
+			path: Settings file to watch.
+			settings: Settings currently in effect, loaded from ``path``.
+			loader: Function loading and validating the file.
+		"""
+		self.path = path
+		self.settings = settings
+		self._loader = loader
+		self._mtime_ns = self._stat()
+
+	def _stat(self) -> int | None:
+		"""Get the file modification time, or None if it is missing."""
+		try:
+			return os.stat(self.path).st_mtime_ns
+		except FileNotFoundError:
+			return None
+
+	def poll(self) -> Settings | None:
+		"""Reload the file if it changed.
+
+		Returns:
+			The new settings if they were reloaded, otherwise None.
+		"""
+		mtime_ns = self._stat()
+		if mtime_ns is None or mtime_ns == self._mtime_ns:
+			return None
+		self._mtime_ns = mtime_ns
+		try:
+			settings = self._loader(self.path)
+		except (OSError, ValueError) as e:
+			logger.warning(
+				'Keeping previous settings, the file is invalid',
+				extra={'stage': 'settings', 'path': self.path, 'error': str(e)},
+			)
+			return None
+		self.settings = settings
+		logger.info('Reloaded settings', extra={'stage': 'settings', 'path': self.path})
+		return settings
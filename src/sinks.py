@@ -0,0 +1,304 @@
+"""Notification destinations behind a common Sink interface."""
+
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from typing import Any
+
+import requests
+
+from .config import AppConfig
+from .email_content import EmailContent
+from .errors import SLACK_ERROR_CLASSES, NotifierError, RetryClass
+from .settings import DEFAULT_NOTIFICATION_TEMPLATE
+from .summarizer import FIELD_LABELS
+
+DEFAULT_TIMEOUT = 10.0
+
+LINE_PUSH_URL = 'https://api.line.me/v2/bot/message/push'
+LINE_MULTICAST_URL = 'https://api.line.me/v2/bot/message/multicast'
+SLACK_POST_MESSAGE_URL = 'https://slack.com/api/chat.postMessage'
+
+# LINE accepts at most 5 message objects per push/multicast request
+LINE_MAX_MESSAGES_PER_REQUEST = 5
+LINE_MAX_TEXT_LENGTH = 5000
+DISCORD_MAX_CONTENT_LENGTH = 2000
+
+DIGEST_SEPARATOR = '\n\n――――――――\n\n'
+
+
+class SinkError(NotifierError):
+	"""Raised when a destination rejects a notification."""
+
+
+def post_json(url: str, data: Any, token: str | None = None, timeout: float = DEFAULT_TIMEOUT) -> requests.Response:
+	"""POST a JSON body, with a bearer token if given."""
+	headers = {'Content-Type': 'application/json'}
+	if token:
+		headers['Authorization'] = f'Bearer {token}'
+	return requests.post(url, headers=headers, json=data, timeout=timeout)
+
+
+def format_notification_text(email_content: EmailContent, template: str = DEFAULT_NOTIFICATION_TEMPLATE) -> str:
+	"""Format email content as the plain text notification shared by chat destinations.
+
+	Args:
+		email_content: Email content to format.
+		template: Text with {subject}, {sender} and {details} placeholders.
+	"""
+	if email_content.has_summary():
+		# Key fields were found, so send them instead of the body
+		details = '\n'.join(
+			f'{label}: {value}' for key, label in FIELD_LABELS if (value := getattr(email_content, key)) is not None
+		)
+	else:
+		details = f'本文:\n{email_content.body}'
+	return template.format(subject=email_content.subject, sender=email_content.sender, details=details)
+
+
+def line_image_messages(email_content: EmailContent) -> list[dict[str, str]]:
+	"""Build LINE image messages for the attachments uploaded by ``src.attachments``, if any."""
+	return [
+		{'type': 'image', 'originalContentUrl': url, 'previewImageUrl': preview}
+		for url, preview in zip(email_content.image_urls, email_content.preview_urls, strict=True)
+	]
+
+
+def format_digest_texts(
+	email_contents: Sequence[EmailContent], template: str = DEFAULT_NOTIFICATION_TEMPLATE, max_length: int = 0
+) -> list[str]:
+	"""Format several notifications as a digest with a heading, packed into as few texts as possible.
+
+	Args:
+		email_contents: Email contents to include, oldest first.
+		template: Text template for each notification.
+		max_length: Longest text allowed by the destination, or 0 for no limit.
+	"""
+	texts = [f'🌙 静かな時間帯に届いたメール ({len(email_contents)}件)']
+	for content in email_contents:
+		notification = format_notification_text(content, template)
+		if max_length:
+			notification = notification[:max_length]
+		combined = f'{texts[-1]}{DIGEST_SEPARATOR}{notification}'
+		if max_length and len(combined) > max_length:
+			texts.append(notification)
+		else:
+			texts[-1] = combined
+	return texts
+
+
+class Sink(ABC):
+	"""A notification destination.
+
+	Implementations provide a blocking ``send_batch``; the async methods run it in
+	a worker thread so several sinks can be awaited concurrently.
+	"""
+
+	name = 'sink'
+
+	@abstractmethod
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Deliver several notifications, batching requests where the API allows it."""
+
+	def request_groups(self, email_contents: Sequence[EmailContent]) -> list[list[EmailContent]]:
+		"""Split notifications into the groups ``send_batch`` delivers with one request each, in order.
+
+		A failure part way through a batch leaves the earlier groups delivered.
+		Destinations that send a batch in one request keep it as one group.
+		"""
+		return [list(email_contents)] if email_contents else []
+
+	def send(self, email_content: EmailContent) -> None:
+		"""Deliver one notification."""
+		self.send_batch([email_content])
+
+	def send_digest(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Deliver notifications held back during quiet hours.
+
+		Chat destinations combine them into a single digest; others send them as a batch.
+		"""
+		self.send_batch(email_contents)
+
+	async def asend(self, email_content: EmailContent) -> None:
+		"""Deliver one notification without blocking the event loop."""
+		await asyncio.to_thread(self.send, email_content)
+
+	async def asend_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Deliver several notifications without blocking the event loop."""
+		await asyncio.to_thread(self.send_batch, email_contents)
+
+
+class LineSink(Sink):
+	"""LINE Messaging API push (one user) or multicast (several users)."""
+
+	name = 'line'
+
+	def __init__(
+		self, channel_access_token: str, user_ids: Sequence[str], template: str = DEFAULT_NOTIFICATION_TEMPLATE
+	):
+		"""Initialize LINE sink."""
+		if not user_ids:
+			raise ValueError('At least one LINE user ID is required')
+		self.channel_access_token = channel_access_token
+		self.user_ids = list(user_ids)
+		self.template = template
+
+	def _messages(self, email_content: EmailContent) -> list[dict[str, str]]:
+		"""Build the text of a notification, cut to LINE's length limit, followed by its uploaded image attachments."""
+		text = {'type': 'text', 'text': format_notification_text(email_content, self.template)[:LINE_MAX_TEXT_LENGTH]}
+		return [text, *line_image_messages(email_content)]
+
+	def request_groups(self, email_contents: Sequence[EmailContent]) -> list[list[EmailContent]]:
+		"""Pack notifications into pushes of at most five message objects, without splitting one."""
+		groups: list[list[EmailContent]] = []
+		size = LINE_MAX_MESSAGES_PER_REQUEST
+		for content in email_contents:
+			count = len(self._messages(content))
+			if size + count > LINE_MAX_MESSAGES_PER_REQUEST:
+				groups.append([])
+				size = 0
+			groups[-1].append(content)
+			size += count
+		return groups
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Send one text per notification, followed by its uploaded image attachments, one push per group."""
+		for group in self.request_groups(email_contents):
+			self._push([message for content in group for message in self._messages(content)])
+
+	def send_digest(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Send the notifications as one digest, usually a single push of up to five texts."""
+		texts = format_digest_texts(email_contents, self.template, LINE_MAX_TEXT_LENGTH)
+		self._push([{'type': 'text', 'text': text} for text in texts])
+
+	def _push(self, messages: Sequence[dict[str, str]]) -> None:
+		"""Push message objects, up to five per request."""
+		url, to = (LINE_PUSH_URL, self.user_ids[0]) if len(self.user_ids) == 1 else (LINE_MULTICAST_URL, self.user_ids)
+		for i in range(0, len(messages), LINE_MAX_MESSAGES_PER_REQUEST):
+			chunk = list(messages[i : i + LINE_MAX_MESSAGES_PER_REQUEST])
+			post_json(url, {'to': to, 'messages': chunk}, self.channel_access_token).raise_for_status()
+
+
+class SlackSink(Sink):
+	"""Slack chat.postMessage."""
+
+	name = 'slack'
+
+	def __init__(self, bot_token: str, channel_id: str, template: str = DEFAULT_NOTIFICATION_TEMPLATE):
+		"""Initialize Slack sink."""
+		self.bot_token = bot_token
+		self.channel_id = channel_id
+		self.template = template
+
+	def post(self, text: str, thread_ts: str | None = None) -> dict[str, Any]:
+		"""Post a message and return the API response, raising SinkError if it is not ok."""
+		data: dict[str, Any] = {'channel': self.channel_id, 'text': text, 'mrkdwn': True}
+		if thread_ts:
+			data['thread_ts'] = thread_ts
+		response_data: dict[str, Any] = post_json(SLACK_POST_MESSAGE_URL, data, self.bot_token).json()
+		if not response_data.get('ok'):
+			error = str(response_data.get('error'))
+			raise SinkError(f'Slack API error: {error}', SLACK_ERROR_CLASSES.get(error, RetryClass.PERMANENT))
+		return response_data
+
+	def request_groups(self, email_contents: Sequence[EmailContent]) -> list[list[EmailContent]]:
+		"""Post each notification on its own."""
+		return [[content] for content in email_contents]
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Post one message per notification (chat.postMessage has no batch form)."""
+		for content in email_contents:
+			self.post(format_notification_text(content, self.template))
+
+	def send_digest(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Post the notifications as one digest message."""
+		for text in format_digest_texts(email_contents, self.template):
+			self.post(text)
+
+
+class WebhookSink(Sink):
+	"""Discord webhook, or a generic webhook receiving the raw email content as JSON."""
+
+	name = 'webhook'
+
+	def __init__(self, url: str, discord: bool = False, template: str = DEFAULT_NOTIFICATION_TEMPLATE):
+		"""Initialize webhook sink.
+
+		Args:
+			url: Webhook URL.
+			discord: Post Discord ``content`` messages instead of raw JSON.
+			template: Text template for Discord messages.
+		"""
+		self.url = url
+		self.discord = discord
+		self.template = template
+		self.name = 'discord' if discord else 'webhook'
+
+	def request_groups(self, email_contents: Sequence[EmailContent]) -> list[list[EmailContent]]:
+		"""Post each notification on its own to Discord, or all of them at once to a generic webhook."""
+		if self.discord:
+			return [[content] for content in email_contents]
+		return super().request_groups(email_contents)
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Post one Discord message per notification, or one JSON array for a generic webhook."""
+		if self.discord:
+			for content in email_contents:
+				text = format_notification_text(content, self.template)[:DISCORD_MAX_CONTENT_LENGTH]
+				post_json(self.url, {'content': text}).raise_for_status()
+		else:
+			post_json(self.url, [content.to_dict() for content in email_contents]).raise_for_status()
+
+
+class FileSink(Sink):
+	"""Appends notifications as JSON lines to a local file (for tests and dry runs)."""
+
+	name = 'file'
+
+	def __init__(self, path: str):
+		"""Initialize file sink."""
+		self.path = path
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		"""Append one JSON line per notification."""
+		directory = os.path.dirname(self.path)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		with open(self.path, 'a', encoding='utf-8') as f:
+			for content in email_contents:
+				f.write(content.to_json() + '\n')
+
+
+def build_sinks(config: AppConfig) -> list[Sink]:
+	"""Create the LINE sink plus every optional destination configured."""
+	template = config.settings.templates.notification
+	sinks: list[Sink] = [LineSink(config.line.channel_access_token, config.line.user_ids, template)]
+	destinations = config.destinations
+	if destinations.slack_channel_id:
+		sinks.append(SlackSink(config.slack.bot_token, destinations.slack_channel_id, template))
+	if destinations.discord_webhook_url:
+		sinks.append(WebhookSink(destinations.discord_webhook_url, discord=True, template=template))
+	if destinations.webhook_url:
+		sinks.append(WebhookSink(destinations.webhook_url))
+	if destinations.file_path:
+		sinks.append(FileSink(destinations.file_path))
+	return sinks
+
+
+async def fan_out(sinks: Sequence[Sink], email_content: EmailContent) -> dict[str, BaseException | None]:
+	"""Send one notification to every sink concurrently.
+
+	Returns:
+		Sink name -> the exception it raised, or None if delivery succeeded.
+	"""
+	results = await asyncio.gather(*(sink.asend(email_content) for sink in sinks), return_exceptions=True)
+	return {
+		sink.name: result if isinstance(result, BaseException) else None
+		for sink, result in zip(sinks, results, strict=True)
+	}
+
+
+def deliver(sinks: Sequence[Sink], email_content: EmailContent) -> dict[str, BaseException | None]:
+	"""Blocking wrapper around fan_out."""
+	return asyncio.run(fan_out(sinks, email_content))
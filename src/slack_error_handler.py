@@ -1,43 +1,76 @@
 """Slack error notification handler."""
 
+import json
+import logging
 import os
 
-import requests
-
+from .alerts import ALERTS_FILE, AlertAggregator
 from .config import SlackConfig
+from .log import configure_logging, stop_logging
+from .report import Outcome
+from .settings import LoggingSettings, settings_from_env
+from .sinks import SlackSink
+
+logger = logging.getLogger(__name__)
+
+
+def failure_details() -> list[str]:
+	"""Collect the errors of the failed run from the notifier step outputs.
+
+	NOTIFIER_RESULTS holds the per-message results and NOTIFIER_ERROR the error
+	that stopped the run, as written to GITHUB_OUTPUT by the notifier.
+	"""
+	details = []
+	results = json.loads(os.environ.get('NOTIFIER_RESULTS') or '[]')
+	for result in results:
+		if result.get('outcome') == Outcome.FAILED:
+			account = result.get('account') or '-'
+			details.append(f'{account}: {result.get("detail", "")}')
+	if error := os.environ.get('NOTIFIER_ERROR'):
+		details.append(error)
+	return details
 
 
 def send_slack_error_notification() -> None:
-	"""Send error notification to Slack when workflow fails."""
+	"""Send error notification to Slack when workflow fails.
+
+	Each distinct error is posted once; repeats in later runs are counted and
+	summarized in the thread of the first alert.
+	"""
 	try:
 		slack_config = SlackConfig.from_env()
 	except ValueError as e:
-		print(f'Slack configuration error: {e}')
+		logger.error('Slack configuration error', extra={'stage': 'alert', 'error': str(e)})
 		return
 
-	url = 'https://slack.com/api/chat.postMessage'
-	headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {slack_config.bot_token}'}
+	state_dir = os.environ.get('NOTIFIER_STATE_DIR', '.notifier-state')
+	alerts = AlertAggregator(
+		os.path.join(state_dir, ALERTS_FILE), SlackSink(slack_config.bot_token, slack_config.channel_id)
+	)
 
 	# Build error message
 	github_repo = os.environ.get('GITHUB_REPOSITORY', '')
 	run_id = os.environ.get('GITHUB_RUN_ID', '')
 	workflow_url = f'https://github.com/{github_repo}/actions/runs/{run_id}'
-	error_message = f'Workflow failed: {workflow_url}\nPlease check the logs for details.'
-
-	data = {
-		'channel': slack_config.channel_id,
-		'text': f'⚠️ Gmail to LINE Notification Failed\n\n{error_message}',
-		'mrkdwn': True,
-	}
+	footer = f'Workflow: {workflow_url}\nPlease check the logs for details.'
+	for detail in failure_details() or ['Workflow failed']:
+		alerts.alert(f'⚠️ Gmail to LINE Notification Failed\n\n{detail}\n\n{footer}')
+	alerts.flush_summaries()
 
-	response = requests.post(url, headers=headers, json=data)
-	response_data = response.json()
 
-	if not response_data.get('ok'):
-		print(f'Failed to send Slack notification: {response_data.get("error")}')
-	else:
-		print('Slack notification sent successfully')
+def main() -> None:
+	"""Send the Slack error notification with logging configured like the notifier."""
+	try:
+		logging_settings = settings_from_env().logging
+	except (OSError, ValueError):
+		# An invalid settings file may be what failed the run, so it must not stop the alert
+		logging_settings = LoggingSettings()
+	configure_logging(logging_settings)
+	try:
+		send_slack_error_notification()
+	finally:
+		stop_logging()
 
 
 if __name__ == '__main__':
-	send_slack_error_notification()
+	main()
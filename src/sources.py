@@ -0,0 +1,575 @@
+"""Mailboxes polled for unread emails behind a common Source interface.
+
+Gmail accounts are read by ``gmail_notifier.GmailSource``. This module adds
+the mailboxes of the [[sources]] settings: IMAP folders, with IMAP IDLE so the
+long-running mode can check as soon as mail arrives, and mbox archives, read
+through a memory map so multi-GB files are scanned without loading them.
+Every source produces the same ``AccountEmail`` records, so their emails go
+through the same routes, sinks and reports as Gmail ones.
+"""
+
+import email
+import email.policy
+import hashlib
+import imaplib
+import json
+import logging
+import mmap
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from datetime import UTC, datetime, timedelta
+from email.message import EmailMessage
+from email.parser import BytesHeaderParser
+
+from .accounts import AccountEmail
+from .config import AppConfig
+from .email_content import EmailContent
+from .errors import AuthError, PermanentError, RetryClass, TransientError, classify, describe
+from .headers import HeaderIndex
+from .html_text import html_to_text
+from .query import NEWER_THAN_DAYS, matches_filters
+from .settings import FilterSettings, SourceSettings
+from .summarizer import summarize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BODY_MAX_LENGTH = 500
+DEFAULT_IMAP_PORT = 993
+DEFAULT_IMAP_TIMEOUT = 30.0
+
+# Unread IMAP messages whose headers are fetched per request while looking for one matching the filters
+IMAP_HEADER_BATCH = 50
+IMAP_FILTER_HEADERS = '(UID RFC822.SIZE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT DATE)])'
+IMAP_FETCH_PATTERN = re.compile(rb'UID (\d+)|RFC822\.SIZE (\d+)')
+IMAP_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+# Servers may end IDLE after 30 minutes, so it is renewed before that
+IDLE_RENEW_SECONDS = 29 * 60
+IDLE_RETRY_SECONDS = 60.0
+IDLE_TAG = b'idle'
+IDLE_NEW_MAIL_PATTERN = re.compile(rb'\* \d+ EXISTS')
+
+# An mbox message starts with a "From " line at the start of the file or of a line
+MBOX_SEPARATOR = b'\nFrom '
+
+
+def _now() -> datetime:
+	return datetime.now(UTC)
+
+
+def _aware(date: datetime | None) -> datetime | None:
+	"""Treat a Date header without a usable offset as UTC."""
+	return date.replace(tzinfo=UTC) if date is not None and date.tzinfo is None else date
+
+
+def content_from_bytes(
+	raw: bytes, msg_id: str, body_max_length: int = DEFAULT_BODY_MAX_LENGTH, labels: tuple[str, ...] = ()
+) -> EmailContent:
+	"""Extract an RFC 822 email into the record ``GmailNotifier.extract_email_content`` makes of Gmail messages."""
+	message = email.message_from_bytes(raw, policy=email.policy.default)
+	headers = HeaderIndex({'name': name, 'value': str(value)} for name, value in message.items())
+	sender = headers.get('From', 'Unknown Sender')
+	body = ''
+	if isinstance(message, EmailMessage) and (part := message.get_body(preferencelist=('plain', 'html'))) is not None:
+		text = str(part.get_content())
+		body = (html_to_text(text) if part.get_content_type() == 'text/html' else text).strip()
+	summary = summarize(body, sender)
+	return EmailContent(
+		id=msg_id,
+		subject=headers.get('Subject', 'No Subject'),
+		sender=sender,
+		body=body[:body_max_length] if body else 'No body content',
+		date=headers.date,
+		labels=labels,
+		carrier=summary.carrier,
+		tracking_number=summary.tracking_number,
+		deadline=summary.deadline,
+		redelivery_url=summary.redelivery_url,
+	)
+
+
+class Source(ABC):
+	"""A mailbox polled for unread emails. ``account`` names it in logs and reports."""
+
+	account: str
+
+	@abstractmethod
+	def poll(self) -> list[AccountEmail]:
+		"""Fetch the unread emails to notify in this check, each with the way to mark it as read."""
+
+	def close(self) -> None:  # noqa: B027
+		"""Release connections kept between poll and mark_as_read. Sources without any do nothing."""
+
+
+class MboxSource(Source):
+	"""Unread emails of an mbox file, oldest first.
+
+	The file is memory-mapped and only the headers of each message are parsed
+	until one is unread and matches the filters, so archives larger than memory
+	can be scanned. The file is never modified: the offset up to which every
+	message has been handled is saved in ``state_file`` and the next check
+	continues from there, which also picks up messages appended since.
+	"""
+
+	def __init__(
+		self,
+		account: str,
+		path: str,
+		label: str,
+		state_file: str,
+		filters: FilterSettings | None = None,
+		body_max_length: int = DEFAULT_BODY_MAX_LENGTH,
+		clock: Callable[[], datetime] = _now,
+	):
+		"""Initialize mbox source.
+
+		Args:
+			account: Name of the source.
+			path: mbox file.
+			label: Label its emails are notified as.
+			state_file: JSON file holding the scan offset between checks.
+			filters: Conditions an email must meet to be notified.
+			body_max_length: Number of body characters kept.
+			clock: Current time, timezone-aware, for ``newer_than``.
+		"""
+		self.account = account
+		self.path = path
+		self.label = label
+		self.state_file = state_file
+		self.filters = filters or FilterSettings()
+		self.body_max_length = body_max_length
+		self._clock = clock
+		# Message ID -> offset after the message, for mark_as_read
+		self._ends: dict[str, int] = {}
+
+	def offset(self) -> int:
+		"""Get the offset of the first message not handled yet."""
+		if not os.path.exists(self.state_file):
+			return 0
+		with open(self.state_file, encoding='utf-8') as f:
+			return int(json.load(f)['offset'])
+
+	def _save(self, offset: int) -> None:
+		"""Persist the scan offset."""
+		os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+		tmp_path = f'{self.state_file}.tmp'
+		with open(tmp_path, 'w', encoding='utf-8') as f:
+			json.dump({'path': self.path, 'offset': offset}, f)
+		os.replace(tmp_path, self.state_file)
+
+	@staticmethod
+	def _messages(mapped: mmap.mmap, start: int) -> Iterator[tuple[int, int]]:
+		"""Yield the start and end offsets of each message from ``start``, the start of a message."""
+		size = len(mapped)
+		while start < size:
+			separator = mapped.find(MBOX_SEPARATOR, start)
+			end = size if separator < 0 else separator + 1
+			yield start, end
+			start = end
+
+	@staticmethod
+	def _headers(mapped: mmap.mmap, start: int, end: int) -> HeaderIndex:
+		"""Parse the headers of the message between the offsets, after its "From " line."""
+		first_line = mapped.find(b'\n', start, end)
+		header_start = end if first_line < 0 else first_line + 1
+		blank_line = mapped.find(b'\n\n', header_start, end)
+		if blank_line < 0:
+			blank_line = mapped.find(b'\n\r\n', header_start, end)
+		header_end = end if blank_line < 0 else blank_line + 1
+		parsed = BytesHeaderParser(policy=email.policy.default).parsebytes(mapped[header_start:header_end])
+		return HeaderIndex({'name': name, 'value': str(value)} for name, value in parsed.items())
+
+	@staticmethod
+	def is_unread(headers: HeaderIndex) -> bool:
+		"""Check the read state in the Status header, or in X-Gmail-Labels of a Google Takeout export."""
+		gmail_labels = headers.get('X-Gmail-Labels')
+		if gmail_labels is not None:
+			return 'unread' in (label.strip().lower() for label in gmail_labels.split(','))
+		return 'R' not in headers.get('Status', '')
+
+	def poll(self) -> list[AccountEmail]:
+		"""Find the first unread email after the saved offset that matches the filters."""
+		with open(self.path, 'rb') as f:
+			size = os.fstat(f.fileno()).st_size
+			start = self.offset()
+			if start > size:
+				logger.warning(
+					'mbox file is smaller than the saved offset, scanning it again',
+					extra={'stage': 'poll', 'account': self.account, 'path': self.path},
+				)
+				start = 0
+			if start == size:
+				return []
+			with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mapped:
+				for message_start, message_end in self._messages(mapped, start):
+					headers = self._headers(mapped, message_start, message_end)
+					if not self.is_unread(headers) or not matches_filters(
+						self.filters,
+						headers.get('From', ''),
+						headers.get('Subject', ''),
+						_aware(headers.date),
+						message_end - message_start,
+						self._clock(),
+					):
+						continue
+					# Skipped messages are not scanned again
+					self._save(message_start)
+					raw = mapped[mapped.find(b'\n', message_start, message_end) + 1 : message_end]
+					# Offsets repeat across files and rescans, so the ID names the source and the content
+					msg_id = f'mbox-{self.account}-{hashlib.sha1(raw).hexdigest()[:16]}'
+					email_content = content_from_bytes(raw, msg_id, self.body_max_length, (self.label,))
+					self._ends[email_content.id] = message_end
+					return [AccountEmail(self.account, self.label, email_content, self.mark_as_read)]
+		self._save(size)
+		return []
+
+	def mark_as_read(self, msg_id: str) -> None:
+		"""Continue the next scan after a notified message."""
+		self._save(self._ends.pop(msg_id))
+		logger.debug('Email marked as read', extra={'stage': 'ack', 'msg_id': msg_id, 'account': self.account})
+
+
+def _since(now: datetime, newer_than: str) -> str:
+	"""Format the IMAP SEARCH date of a ``newer_than`` window."""
+	day = (now - timedelta(days=int(newer_than[:-1]) * NEWER_THAN_DAYS[newer_than[-1]])).date()
+	return f'{day.day}-{IMAP_MONTHS[day.month - 1]}-{day.year}'
+
+
+class ImapSource(Source):
+	"""Unread emails of an IMAP folder, newest first.
+
+	Emails are fetched with BODY.PEEK, so they stay unread until mark_as_read
+	sets their \\Seen flag. The connection opened by poll is kept for
+	mark_as_read until ``close``. ``idle`` waits on a second connection.
+	"""
+
+	def __init__(
+		self,
+		account: str,
+		host: str,
+		username: str,
+		password: str,
+		label: str,
+		port: int = DEFAULT_IMAP_PORT,
+		mailbox: str = 'INBOX',
+		use_ssl: bool = True,
+		filters: FilterSettings | None = None,
+		body_max_length: int = DEFAULT_BODY_MAX_LENGTH,
+		timeout: float = DEFAULT_IMAP_TIMEOUT,
+		clock: Callable[[], datetime] = _now,
+	):
+		"""Initialize IMAP source.
+
+		Args:
+			account: Name of the source.
+			host: IMAP server.
+			username: Login name.
+			password: Login password.
+			label: Label its emails are notified as.
+			port: IMAP port.
+			mailbox: Folder to read.
+			use_ssl: Whether to connect with TLS.
+			filters: Conditions an email must meet to be notified.
+			body_max_length: Number of body characters kept.
+			timeout: Socket timeout in seconds, except while waiting in IDLE.
+			clock: Current time, timezone-aware, for ``newer_than``.
+		"""
+		self.account = account
+		self.host = host
+		self.username = username
+		self.password = password
+		self.label = label
+		self.port = port
+		self.mailbox = mailbox
+		self.use_ssl = use_ssl
+		self.filters = filters or FilterSettings()
+		self.body_max_length = body_max_length
+		self.timeout = timeout
+		self._clock = clock
+		self._connection: imaplib.IMAP4 | None = None
+		self._idle_connection: imaplib.IMAP4 | None = None
+		self._idle_lock = threading.Lock()
+		self._interrupted = False
+
+	def _connect(self) -> imaplib.IMAP4:
+		"""Open and log in a new connection."""
+		imap_class = imaplib.IMAP4_SSL if self.use_ssl else imaplib.IMAP4
+		connection = imap_class(self.host, self.port, timeout=self.timeout)
+		try:
+			connection.login(self.username, self.password)
+		except imaplib.IMAP4.error as e:
+			connection.shutdown()
+			raise AuthError(f'IMAP login to {self.host} failed: {e}') from e
+		return connection
+
+	@contextmanager
+	def _errors(self, action: str) -> Iterator[None]:
+		"""Raise IMAP errors as NotifierErrors, dropping a connection the server aborted."""
+		try:
+			yield
+		except imaplib.IMAP4.abort as e:
+			self.close()
+			raise TransientError(f'IMAP {action} on {self.host} failed: {e}') from e
+		except imaplib.IMAP4.error as e:
+			raise PermanentError(f'IMAP {action} on {self.host} failed: {e}') from e
+
+	def _select(self, connection: imaplib.IMAP4) -> str:
+		"""Select the folder and return its UIDVALIDITY."""
+		status, data = connection.select(f'"{self.mailbox}"')
+		if status != 'OK':
+			raise PermanentError(f'IMAP folder {self.mailbox} cannot be selected: {data}')
+		_, validity = connection.response('UIDVALIDITY')
+		return validity[0].decode('ascii') if validity and validity[0] else '0'
+
+	def _open(self) -> tuple[imaplib.IMAP4, str]:
+		"""Get the kept connection with the folder selected, and the UIDVALIDITY of the folder."""
+		if self._connection is None:
+			self._connection = self._connect()
+		return self._connection, self._select(self._connection)
+
+	@staticmethod
+	def _uid(response: bytes) -> tuple[str, int] | None:
+		"""Parse the UID and size of a FETCH response."""
+		matches = IMAP_FETCH_PATTERN.findall(response)
+		uid = next((uid for uid, _ in matches if uid), None)
+		size = next((size for _, size in matches if size), b'0')
+		return (uid.decode('ascii'), int(size)) if uid else None
+
+	def _find(self, connection: imaplib.IMAP4, uids: list[bytes]) -> str | None:
+		"""Find the newest unread message matching the filters, by its headers only."""
+		now = self._clock()
+		for start in range(0, len(uids), IMAP_HEADER_BATCH):
+			batch = b','.join(uids[start : start + IMAP_HEADER_BATCH]).decode('ascii')
+			_, data = connection.uid('FETCH', batch, IMAP_FILTER_HEADERS)
+			candidates = []
+			for item in data:
+				if not isinstance(item, tuple) or (parsed := self._uid(item[0])) is None:
+					continue
+				message = BytesHeaderParser(policy=email.policy.default).parsebytes(item[1])
+				headers = HeaderIndex({'name': name, 'value': str(value)} for name, value in message.items())
+				sender, subject = headers.get('From', ''), headers.get('Subject', '')
+				if matches_filters(self.filters, sender, subject, _aware(headers.date), parsed[1], now):
+					candidates.append(int(parsed[0]))
+			if candidates:
+				return str(max(candidates))
+		return None
+
+	def poll(self) -> list[AccountEmail]:
+		"""Find the newest unread email of the folder that matches the filters."""
+		with self._errors('poll'):
+			connection, validity = self._open()
+			criteria = ['UNSEEN']
+			if self.filters.newer_than:
+				criteria += ['SINCE', _since(self._clock(), self.filters.newer_than)]
+			_, data = connection.uid('SEARCH', *criteria)
+			uids = sorted(data[0].split() if data and data[0] else [], key=int, reverse=True)
+			uid = self._find(connection, uids)
+			if uid is None:
+				logger.info('No unread emails', extra={'stage': 'poll', 'account': self.account})
+				return []
+			_, data = connection.uid('FETCH', uid, '(BODY.PEEK[])')
+		raw = next(item[1] for item in data if isinstance(item, tuple))
+		email_content = content_from_bytes(
+			raw, f'imap-{self.account}-{validity}-{uid}', self.body_max_length, (self.label,)
+		)
+		return [AccountEmail(self.account, self.label, email_content, self.mark_as_read)]
+
+	def mark_as_read(self, msg_id: str) -> None:
+		"""Set the \\Seen flag of a polled email.
+
+		Raises:
+			PermanentError: If the folder was recreated since, so the UID no longer names the email.
+		"""
+		validity, uid = msg_id.rsplit('-', 2)[1:]
+		with self._errors('mark as read'):
+			connection, current = self._open()
+			if current != validity:
+				raise PermanentError(f'IMAP folder {self.mailbox} was recreated, {msg_id} cannot be marked as read')
+			status, data = connection.uid('STORE', uid, '+FLAGS', '(\\Seen)')
+		if status != 'OK':
+			raise PermanentError(f'IMAP STORE of {msg_id} failed: {data}')
+		logger.debug('Email marked as read', extra={'stage': 'ack', 'msg_id': msg_id, 'account': self.account})
+
+	def close(self) -> None:
+		"""Log out the connection kept since poll."""
+		connection, self._connection = self._connection, None
+		if connection is not None:
+			try:
+				connection.logout()
+			except (OSError, imaplib.IMAP4.error):
+				connection.shutdown()
+
+	def _idle_open(self) -> imaplib.IMAP4 | None:
+		"""Get the IDLE connection, or None once interrupted."""
+		with self._idle_lock:
+			if self._interrupted:
+				return None
+			if self._idle_connection is None:
+				connection = self._connect()
+				if 'IDLE' not in connection.capabilities:
+					connection.shutdown()
+					raise PermanentError(f'IMAP server {self.host} does not support IDLE')
+				self._select(connection)
+				self._idle_connection = connection
+			return self._idle_connection
+
+	def close_idle(self) -> None:
+		"""Close the IDLE connection, so the next ``idle`` reconnects and a blocked one fails."""
+		with self._idle_lock:
+			connection, self._idle_connection = self._idle_connection, None
+		if connection is not None:
+			connection.shutdown()
+
+	def idle(self, timeout: float) -> bool:
+		"""Wait with IMAP IDLE until the server reports new mail or ``timeout`` seconds pass.
+
+		Returns:
+			True if new mail arrived, False on timeout or after ``interrupt``.
+		"""
+		with self._errors('IDLE'):
+			connection = self._idle_open()
+			if connection is None:
+				return False
+			connection.send(IDLE_TAG + b' IDLE\r\n')
+			if not connection.readline().startswith(b'+'):
+				raise TransientError(f'IMAP server {self.host} refused IDLE')
+			connection.sock.settimeout(timeout)
+			try:
+				while not IDLE_NEW_MAIL_PATTERN.match(line := connection.readline()):
+					if not line:
+						raise TransientError(f'IMAP server {self.host} closed the IDLE connection')
+			except TimeoutError:
+				# A socket that timed out cannot be read again, so the next wait reconnects
+				self.close_idle()
+				return False
+			connection.sock.settimeout(self.timeout)
+			connection.send(b'DONE\r\n')
+			while not (line := connection.readline()).startswith(IDLE_TAG + b' '):
+				if not line:
+					raise TransientError(f'IMAP server {self.host} closed the IDLE connection')
+		return True
+
+	def interrupt(self) -> None:
+		"""Stop a wait in ``idle`` from another thread, and any later one."""
+		with self._idle_lock:
+			self._interrupted = True
+		self.close_idle()
+
+
+class IdleWatcher:
+	"""Sets an event whenever an IMAP folder receives mail, from a background thread.
+
+	The long-running mode waits on the event besides its schedule, so IMAP
+	sources are checked as soon as mail arrives.
+	"""
+
+	def __init__(
+		self,
+		source: ImapSource,
+		new_mail: threading.Event,
+		renew: float = IDLE_RENEW_SECONDS,
+		retry_delay: float = IDLE_RETRY_SECONDS,
+	):
+		"""Initialize watcher.
+
+		Args:
+			source: Folder to watch. Its IDLE connection is used by this watcher alone.
+			new_mail: Event set when mail arrives.
+			renew: Seconds after which IDLE is restarted.
+			retry_delay: Seconds to wait before reconnecting after an error.
+		"""
+		self.source = source
+		self.new_mail = new_mail
+		self.renew = renew
+		self.retry_delay = retry_delay
+		self._stopped = threading.Event()
+		self._thread = threading.Thread(target=self._run, name=f'idle-{source.account}', daemon=True)
+
+	def start(self) -> None:
+		"""Start watching."""
+		self._thread.start()
+
+	def stop(self) -> None:
+		"""Stop watching and wait for the thread to end."""
+		self._stopped.set()
+		self.source.interrupt()
+		if self._thread.is_alive():
+			self._thread.join()
+
+	def _run(self) -> None:
+		while not self._stopped.is_set():
+			try:
+				if self.source.idle(self.renew):
+					logger.info('New mail', extra={'stage': 'idle', 'account': self.source.account})
+					self.new_mail.set()
+			except Exception as e:
+				if self._stopped.is_set():
+					return
+				if classify(e) in (RetryClass.AUTH, RetryClass.PERMANENT):
+					logger.error(
+						'IMAP IDLE stopped, checking on schedule only',
+						extra={'stage': 'idle', 'account': self.source.account, 'error': describe(e)},
+					)
+					return
+				logger.warning(
+					'IMAP IDLE failed, reconnecting',
+					extra={'stage': 'idle', 'account': self.source.account, 'error': describe(e)},
+				)
+				self.source.close_idle()
+				self._stopped.wait(self.retry_delay)
+
+
+def build_source(settings: SourceSettings, config: AppConfig) -> Source:
+	"""Create the source of one [[sources]] entry.
+
+	Raises:
+		ValueError: If the password of an IMAP source is not set.
+	"""
+	filters = config.settings.filters
+	if settings.type == 'mbox':
+		assert settings.path is not None
+		state_file = os.path.join(config.state_dir, 'sources', f'{settings.name}.json')
+		return MboxSource(settings.name, settings.path, settings.label, state_file, filters, config.body_max_length)
+	password = os.environ.get(settings.password_env)
+	if not password:
+		raise ValueError(f'{settings.password_env} is required for the IMAP source {settings.name}')
+	assert settings.host is not None and settings.username is not None and settings.port is not None
+	return ImapSource(
+		settings.name,
+		settings.host,
+		settings.username,
+		password,
+		settings.label,
+		port=settings.port,
+		mailbox=settings.mailbox,
+		use_ssl=settings.ssl,
+		filters=filters,
+		body_max_length=config.body_max_length,
+	)
+
+
+def build_sources(config: AppConfig) -> list[Source]:
+	"""Create every source of the [[sources]] settings.
+
+	Raises:
+		ValueError: If a source has the name of a Gmail account, or an IMAP password is not set.
+	"""
+	accounts = {account.account for account in config.google_accounts}
+	for settings in config.settings.sources:
+		if settings.name in accounts:
+			raise ValueError(f'Source {settings.name} has the name of a Gmail account')
+	return [build_source(settings, config) for settings in config.settings.sources]
+
+
+def build_idle_watchers(config: AppConfig, new_mail: threading.Event) -> list[IdleWatcher]:
+	"""Create a watcher, with a connection of its own, for every IMAP source with ``idle`` enabled."""
+	watchers = []
+	for settings in config.settings.sources:
+		source = build_source(settings, config) if settings.type == 'imap' and settings.idle else None
+		if isinstance(source, ImapSource):
+			watchers.append(IdleWatcher(source, new_mail))
+	return watchers
@@ -0,0 +1,85 @@
+"""Key field extraction from parcel notice emails."""
+
+import re
+from dataclasses import dataclass
+
+# Carrier name -> pattern matched against the sender and body
+CARRIER_RULES: tuple[tuple[str, re.Pattern[str]], ...] = (
+	('ヤマト運輸', re.compile(r'ヤマト運輸|クロネコ|kuronekoyamato', re.IGNORECASE)),
+	('佐川急便', re.compile(r'佐川急便|sagawa', re.IGNORECASE)),
+	('日本郵便', re.compile(r'日本郵便|ゆうパック|japanpost|post\.japanpost', re.IGNORECASE)),
+	('西濃運輸', re.compile(r'西濃運輸|seino', re.IGNORECASE)),
+	('Amazon', re.compile(r'Amazon(?:\.co\.jp)?|アマゾン', re.IGNORECASE)),
+)
+
+TRACKING_NUMBER_PATTERN = re.compile(
+	r'(?:伝票番号|追跡番号|お問い合わせ番号|お問合せ番号|問い合わせ番号|送り状番号)[^0-9\n]{0,10}(\d[\d-]{8,18}\d)'
+)
+
+DEADLINE_PATTERN = re.compile(
+	r'(?:保管期限|お預かり期限|保管期間|期限)[^0-9\n]{0,10}'
+	r'(\d{4}[/年-]\d{1,2}[/月-]\d{1,2}日?|\d{1,2}月\d{1,2}日|\d{1,2}/\d{1,2})'
+)
+
+URL_PATTERN = re.compile(r'https?://[^\s<>"\')]+')
+REDELIVERY_HINT_PATTERN = re.compile(r'再配達|redeliver|saihaitatsu', re.IGNORECASE)
+
+
+# Summary field -> label shown in notifications, in display order
+FIELD_LABELS: tuple[tuple[str, str], ...] = (
+	('carrier', '運送会社'),
+	('tracking_number', '伝票番号'),
+	('deadline', '保管期限'),
+	('redelivery_url', '再配達'),
+)
+
+
+@dataclass
+class ParcelSummary:
+	"""Key fields of a parcel notice. Fields not found are None."""
+
+	carrier: str | None = None
+	tracking_number: str | None = None
+	deadline: str | None = None
+	redelivery_url: str | None = None
+
+	def is_empty(self) -> bool:
+		"""Check whether no field was found."""
+		return not (self.carrier or self.tracking_number or self.deadline or self.redelivery_url)
+
+	def to_dict(self) -> dict[str, str]:
+		"""Return the found fields only."""
+		return {key: value for key, value in vars(self).items() if value}
+
+
+def _find_redelivery_url(body: str) -> str | None:
+	"""Find the first URL on a line that mentions redelivery (the URL itself included)."""
+	for url in URL_PATTERN.finditer(body):
+		line_start = body.rfind('\n', 0, url.start()) + 1
+		line_end = body.find('\n', url.end())
+		if REDELIVERY_HINT_PATTERN.search(body, line_start, line_end if line_end != -1 else len(body)):
+			return url.group(0)
+	return None
+
+
+def summarize(body: str, sender: str = '') -> ParcelSummary:
+	"""Extract carrier, tracking number, deadline and redelivery URL from an email.
+
+	Args:
+		body: Full plain text body.
+		sender: From header, used as the first hint for the carrier.
+	"""
+	carrier = next(
+		(name for name, pattern in CARRIER_RULES if pattern.search(sender)),
+		None,
+	) or next((name for name, pattern in CARRIER_RULES if pattern.search(body)), None)
+
+	tracking_number = TRACKING_NUMBER_PATTERN.search(body)
+	deadline = DEADLINE_PATTERN.search(body)
+
+	return ParcelSummary(
+		carrier=carrier,
+		tracking_number=tracking_number.group(1) if tracking_number else None,
+		deadline=deadline.group(1) if deadline else None,
+		redelivery_url=_find_redelivery_url(body),
+	)
@@ -6,9 +6,17 @@ from unittest.mock import patch
 
 import pytest
 
+from src.log import stop_logging
 from tests.fixtures.mock_data import get_mock_env_vars
 
 
+@pytest.fixture(autouse=True)
+def reset_logging():
+	"""configure_logging を呼んだテストのログ設定を後続のテストに残さない"""
+	yield
+	stop_logging()
+
+
 @pytest.fixture
 def mock_env_vars():
 	"""テスト用環境変数をセットアップ"""
@@ -40,7 +48,7 @@ def temp_github_output():
 @pytest.fixture
 def mock_gmail_service():
 	"""Gmail APIサービスのモック"""
-	with patch('src.gmail_notifier.pickle'), patch('src.gmail_notifier.build') as mock_build:
+	with patch('src.credentials.pickle'), patch('src.gmail_notifier.build') as mock_build:
 		yield mock_build
 
 
@@ -49,3 +57,11 @@ def mock_requests():
 	"""requestsモジュールのモック"""
 	with patch('requests.post') as mock_post:
 		yield mock_post
+
+
+@pytest.fixture(scope='session')
+def synthetic_mailbox():
+	"""合成メールボックス (Gmail API形式のメッセージ 1000 件)"""
+	from tests.fixtures.mailbox_generator import generate_mailbox
+
+	return generate_mailbox(count=1000, seed=0)
@@ -0,0 +1,215 @@
+"""スケールテスト用の合成メールボックス生成器
+
+Gmail API の ``users.messages.get`` (format=full) と同じ形のメッセージを大量に生成する。
+乱数シードを固定すれば同じコーパスが再現されるため、pytest のフィクスチャと
+ベンチマーク (``scripts/benchmark_extraction.py``) の両方から利用できる。
+"""
+
+import base64
+import random
+from collections.abc import Iterator
+from typing import Any
+
+# 生成するメッセージの種類と出現比率
+MESSAGE_KINDS: dict[str, int] = {
+	'plain': 35,
+	'alternative': 25,
+	'nested_mixed': 15,
+	'html_only': 10,
+	'large_plain': 5,
+	'mixed_charset': 10,
+}
+
+CHARSETS = ('utf-8', 'iso-2022-jp', 'shift_jis', 'euc-jp')
+
+SENDERS = (
+	'ヤマト運輸 <info@kuronekoyamato.example.jp>',
+	'佐川急便 <no-reply@sagawa.example.jp>',
+	'日本郵便 <delivery@post.example.jp>',
+	'Amazon.co.jp <shipment-tracking@amazon.example.jp>',
+)
+
+CARRIERS = ('ヤマト運輸', '佐川急便', '日本郵便')
+
+ATTACHMENT_TYPES = (
+	('image/png', 'slip.png'),
+	('image/jpeg', 'qrcode.jpg'),
+	('application/pdf', 'notice.pdf'),
+)
+
+_PARAGRAPH = (
+	'{carrier}です。お荷物をお届けにあがりましたが、ご不在のため持ち帰りました。\n'
+	'お問い合わせ伝票番号: {tracking}\n'
+	'保管期限: {month}月{day}日\n'
+	'再配達のご依頼はこちら: https://redelivery.example.jp/r/{tracking}\n'
+)
+
+
+def _encode(data: bytes) -> str:
+	"""Gmail API と同じ base64url 形式でエンコード"""
+	return base64.urlsafe_b64encode(data).decode('ascii')
+
+
+def _text_body(rng: random.Random, repeat: int = 1) -> str:
+	"""通知本文らしいテキストを生成"""
+	tracking = '-'.join(f'{rng.randrange(10000):04d}' for _ in range(3))
+	paragraph = _PARAGRAPH.format(
+		carrier=rng.choice(CARRIERS),
+		tracking=tracking,
+		month=rng.randint(1, 12),
+		day=rng.randint(1, 28),
+	)
+	return paragraph * repeat
+
+
+def _html_body(text: str) -> str:
+	"""テキスト本文から HTML 本文を生成"""
+	lines = ''.join(f'<p>{line}</p>' for line in text.splitlines())
+	return f'<html><head><meta charset="utf-8"></head><body>{lines}</body></html>'
+
+
+def _text_part(mime_type: str, text: str, charset: str = 'utf-8', part_id: str = '0') -> dict[str, Any]:
+	"""テキストパートを生成"""
+	data = text.encode(charset, errors='replace')
+	return {
+		'partId': part_id,
+		'mimeType': mime_type,
+		'filename': '',
+		'headers': [
+			{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'},
+			{'name': 'Content-Transfer-Encoding', 'value': 'base64'},
+		],
+		'body': {'size': len(data), 'data': _encode(data)},
+	}
+
+
+def _attachment_part(rng: random.Random, msg_index: int, part_id: str) -> dict[str, Any]:
+	"""添付ファイルパートを生成 (format=full と同様に本文は attachmentId 参照)"""
+	mime_type, filename = rng.choice(ATTACHMENT_TYPES)
+	return {
+		'partId': part_id,
+		'mimeType': mime_type,
+		'filename': filename,
+		'headers': [
+			{'name': 'Content-Type', 'value': f'{mime_type}; name="{filename}"'},
+			{'name': 'Content-Disposition', 'value': f'attachment; filename="{filename}"'},
+		],
+		'body': {'attachmentId': f'att_{msg_index:06d}_{part_id}', 'size': rng.randint(10_000, 2_000_000)},
+	}
+
+
+def _multipart(mime_type: str, parts: list[dict[str, Any]], part_id: str = '') -> dict[str, Any]:
+	"""multipart コンテナを生成"""
+	return {
+		'partId': part_id,
+		'mimeType': mime_type,
+		'filename': '',
+		'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; boundary="b_{part_id or "root"}"'}],
+		'body': {'size': 0},
+		'parts': parts,
+	}
+
+
+def _build_payload(rng: random.Random, kind: str, msg_index: int) -> dict[str, Any]:
+	"""種類に応じたペイロードを生成"""
+	if kind == 'plain':
+		return _text_part('text/plain', _text_body(rng), part_id='')
+	if kind == 'large_plain':
+		return _text_part('text/plain', _text_body(rng, repeat=rng.randint(500, 2000)), part_id='')
+	if kind == 'html_only':
+		return _text_part('text/html', _html_body(_text_body(rng)), part_id='')
+	if kind == 'alternative':
+		text = _text_body(rng)
+		return _multipart(
+			'multipart/alternative',
+			[_text_part('text/plain', text, part_id='0'), _text_part('text/html', _html_body(text), part_id='1')],
+		)
+	if kind == 'mixed_charset':
+		charset = rng.choice(CHARSETS[1:])
+		text = _text_body(rng)
+		return _multipart(
+			'multipart/alternative',
+			[
+				_text_part('text/plain', text, charset=charset, part_id='0'),
+				_text_part('text/html', _html_body(text), part_id='1'),
+			],
+		)
+	# nested_mixed: multipart/mixed > (multipart/alternative > text + html) + 添付ファイル
+	text = _text_body(rng)
+	alternative = _multipart(
+		'multipart/alternative',
+		[
+			_text_part('text/plain', text, charset=rng.choice(CHARSETS), part_id='0.0'),
+			_text_part('text/html', _html_body(text), part_id='0.1'),
+		],
+		part_id='0',
+	)
+	attachments = [_attachment_part(rng, msg_index, str(i + 1)) for i in range(rng.randint(1, 3))]
+	return _multipart('multipart/mixed', [alternative, *attachments])
+
+
+def choose_kind(rng: random.Random) -> str:
+	"""MESSAGE_KINDS の比率でメッセージの種類を選択"""
+	return rng.choices(list(MESSAGE_KINDS), weights=list(MESSAGE_KINDS.values()))[0]
+
+
+def generate_message(rng: random.Random, index: int, kind: str | None = None) -> dict[str, Any]:
+	"""Gmail API 形式のメッセージを 1 件生成
+
+	Args:
+		rng: 乱数生成器。
+		index: メッセージ番号。ID やスレッド ID の生成に使用する。
+		kind: メッセージの種類。省略時は MESSAGE_KINDS の比率で選択する。
+	"""
+	if kind is None:
+		kind = choose_kind(rng)
+
+	payload = _build_payload(rng, kind, index)
+	internal_date = 1_704_067_200_000 + index * 60_000
+	payload['headers'] = [
+		{'name': 'Subject', 'value': f'お荷物お預かりのお知らせ #{index}'},
+		{'name': 'From', 'value': rng.choice(SENDERS)},
+		{'name': 'To', 'value': 'family@example.com'},
+		{'name': 'Date', 'value': 'Mon, 1 Jan 2024 12:00:00 +0900'},
+		{'name': 'Message-ID', 'value': f'<synthetic-{index}@example.jp>'},
+		*payload['headers'],
+	]
+
+	return {
+		'id': f'synthetic_{index:06d}',
+		'threadId': f'thread_{index // 3:06d}',
+		'labelIds': ['UNREAD', 'Label_1'],
+		'snippet': 'お荷物をお届けにあがりましたが、ご不在のため持ち帰りました。',
+		'historyId': str(100_000 + index),
+		'internalDate': str(internal_date),
+		'sizeEstimate': _size_estimate(payload),
+		'payload': payload,
+	}
+
+
+def _size_estimate(payload: dict[str, Any]) -> int:
+	"""パートの本文サイズ合計"""
+	size = int(payload.get('body', {}).get('size', 0))
+	for part in payload.get('parts', []):
+		size += _size_estimate(part)
+	return size
+
+
+def iter_mailbox(count: int, seed: int = 0) -> Iterator[tuple[str, dict[str, Any]]]:
+	"""合成メッセージを種類と組にして 1 件ずつ生成
+
+	種類はベンチマークの集計用で、Gmail API の形を保つためメッセージには含めない。
+
+	Args:
+		count: 生成するメッセージ数。
+		seed: 乱数シード。同じ値なら同じコーパスを生成する。
+	"""
+	rng = random.Random(seed)
+	for index in range(count):
+		kind = choose_kind(rng)
+		yield kind, generate_message(rng, index, kind)
+
+
+def generate_mailbox(count: int = 1000, seed: int = 0) -> list[dict[str, Any]]:
+	"""合成メッセージのリストを生成"""
+	return [message for _, message in iter_mailbox(count, seed)]
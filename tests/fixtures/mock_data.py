@@ -4,6 +4,8 @@ import base64
 import json
 from typing import Any
 
+from src.email_content import EmailContent
+
 # Gmail APIモックデータ
 MOCK_GMAIL_MESSAGE = {
 	'id': 'mock_message_id_12345',
@@ -111,7 +113,7 @@ def get_mock_env_vars() -> dict[str, str]:
 
 
 def create_test_email_content(
-	subject: str = 'テストメール', from_email: str = 'test@example.com', body: str = 'テスト本文'
-) -> dict[str, str]:
+	subject: str = 'テストメール', from_email: str = 'test@example.com', body: str = 'テスト本文', **fields: Any
+) -> EmailContent:
 	"""カスタムテスト用メールコンテンツを作成"""
-	return {'id': 'custom_test_id', 'subject': subject, 'from': from_email, 'body': body}
+	return EmailContent(id='custom_test_id', subject=subject, sender=from_email, body=body, **fields)
@@ -0,0 +1,93 @@
+"""Tests for accounts module."""
+
+import threading
+
+import pytest
+from requests.adapters import HTTPAdapter
+
+from src.accounts import AccountEmail, create_auth_request, poll_accounts
+from src.config import GoogleConfig
+from src.email_content import EmailContent
+
+
+def _account(name: str) -> GoogleConfig:
+	return GoogleConfig(oauth_token=f'token_{name}', oauth_credentials=None, account=name)
+
+
+class TestPollAccounts:
+	"""Tests for poll_accounts."""
+
+	def test_poll_accounts_concurrently_in_account_order(self):
+		"""Test every account is polled in parallel and emails keep the account order."""
+		accounts = [_account(name) for name in ('alice', 'bob', 'carol')]
+		barrier = threading.Barrier(len(accounts), timeout=5)
+		read: list[str] = []
+
+		def poll(account):
+			# Every poll must be running at the same time to pass the barrier
+			barrier.wait()
+			if account.account == 'bob':
+				return []
+			return [
+				AccountEmail(
+					account.account, 'Family/test', EmailContent(f'{account.account}_msg', '', '', ''), read.append
+				)
+			]
+
+		account_emails, errors = poll_accounts(accounts, poll)
+
+		assert errors == {}
+		assert [account_email.account for account_email in account_emails] == ['alice', 'carol']
+		account_emails[0].mark_as_read(account_emails[0].email_content.id)
+		assert read == ['alice_msg']
+
+	def test_poll_accounts_isolates_failures(self):
+		"""Test a failing account is reported without losing the other accounts' emails."""
+		accounts = [_account('alice'), _account('bob')]
+
+		def poll(account):
+			if account.account == 'alice':
+				raise ValueError('Failed to refresh token')
+			return [
+				AccountEmail(account.account, 'Family/test', EmailContent('bob_msg', '', '', ''), lambda msg_id: None)
+			]
+
+		account_emails, errors = poll_accounts(accounts, poll)
+
+		assert [account_email.account for account_email in account_emails] == ['bob']
+		assert list(errors) == ['alice']
+		with pytest.raises(ValueError, match='Failed to refresh token'):
+			raise errors['alice']
+
+	def test_poll_accounts_limits_workers(self):
+		"""Test no more than max_workers accounts are polled at once."""
+		accounts = [_account(f'user{i}') for i in range(6)]
+		lock = threading.Lock()
+		running = 0
+		peak = 0
+
+		def poll(account):
+			nonlocal running, peak
+			with lock:
+				running += 1
+				peak = max(peak, running)
+			threading.Event().wait(0.01)
+			with lock:
+				running -= 1
+			return []
+
+		poll_accounts(accounts, poll, max_workers=2)
+
+		assert peak <= 2
+
+
+class TestCreateAuthRequest:
+	"""Tests for create_auth_request."""
+
+	def test_create_auth_request_pool_size(self):
+		"""Test the shared session keeps a connection pool sized for the accounts."""
+		auth_request = create_auth_request(pool_size=4)
+
+		adapter = auth_request.session.get_adapter('https://oauth2.googleapis.com/token')
+		assert isinstance(adapter, HTTPAdapter)
+		assert adapter.poolmanager.connection_pool_kw['maxsize'] == 4
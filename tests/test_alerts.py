@@ -0,0 +1,117 @@
+"""Tests for alerts module."""
+
+import json
+from datetime import timedelta
+
+import responses
+
+from src.alerts import AlertAggregator, fingerprint
+from src.sinks import SlackSink
+
+SLACK_URL = 'https://slack.com/api/chat.postMessage'
+
+DAY = 24 * 60 * 60
+
+
+class FakeClock:
+	"""Clock advanced by the test."""
+
+	def __init__(self) -> None:
+		self.now = 1_700_000_000.0
+
+	def __call__(self) -> float:
+		return self.now
+
+
+def _aggregator(tmp_path, clock: FakeClock) -> AlertAggregator:
+	return AlertAggregator(
+		str(tmp_path / 'alerts.json'),
+		SlackSink('test_token', 'test_channel'),
+		window=timedelta(days=7),
+		summary_interval=timedelta(days=1),
+		clock=clock,
+	)
+
+
+def _bodies() -> list[dict]:
+	return [json.loads(call.request.body or b'') for call in responses.calls]
+
+
+class TestFingerprint:
+	"""Tests for fingerprint."""
+
+	def test_volatile_parts_are_ignored(self):
+		"""Test URLs, IDs and numbers do not change the fingerprint."""
+		first = fingerprint('alice: [auth] Token expired at 07:00\nhttps://github.com/o/r/actions/runs/111')
+		second = fingerprint('alice:  [auth] token expired at 12:00\nhttps://github.com/o/r/actions/runs/222')
+		assert first == second
+
+	def test_different_errors_differ(self):
+		"""Test different messages get different fingerprints."""
+		assert fingerprint('[auth] Token expired') != fingerprint('[quota] Rate limit exceeded')
+
+
+class TestAlertAggregator:
+	"""Tests for AlertAggregator."""
+
+	@responses.activate
+	def test_repeats_are_suppressed_and_summarized_in_thread(self, tmp_path):
+		"""Test a repeated error is posted once and its repeats are replied in the thread once a day."""
+		responses.add(responses.POST, SLACK_URL, json={'ok': True, 'ts': '111.1'}, status=200)
+		clock = FakeClock()
+
+		assert _aggregator(tmp_path, clock).alert('[auth] Token expired') is True
+		for _ in range(2):
+			clock.now += 60 * 60
+			# A new aggregator per run, as in GitHub Actions
+			aggregator = _aggregator(tmp_path, clock)
+			assert aggregator.alert('[auth] Token expired') is False
+			aggregator.flush_summaries()
+
+		assert len(responses.calls) == 1
+
+		clock.now += DAY
+		_aggregator(tmp_path, clock).flush_summaries()
+
+		bodies = _bodies()
+		assert len(bodies) == 2
+		assert 'thread_ts' not in bodies[0]
+		assert bodies[1]['thread_ts'] == '111.1'
+		assert bodies[1]['text'].startswith('Occurred 2 more times since')
+		assert '(3 in total' in bodies[1]['text']
+
+	@responses.activate
+	def test_error_is_posted_again_after_the_window(self, tmp_path):
+		"""Test an error that stopped for the whole window is forgotten and posted as a new alert."""
+		responses.add(responses.POST, SLACK_URL, json={'ok': True, 'ts': '111.1'}, status=200)
+		clock = FakeClock()
+		aggregator = _aggregator(tmp_path, clock)
+		aggregator.alert('[auth] Token expired')
+
+		clock.now += 8 * DAY
+		aggregator.flush_summaries()
+		assert aggregator.records == {}
+
+		assert aggregator.alert('[auth] Token expired') is True
+		assert len(responses.calls) == 2
+
+	@responses.activate
+	def test_different_errors_are_posted_separately(self, tmp_path):
+		"""Test each fingerprint gets its own alert."""
+		responses.add(responses.POST, SLACK_URL, json={'ok': True, 'ts': '111.1'}, status=200)
+		aggregator = _aggregator(tmp_path, FakeClock())
+
+		assert aggregator.alert('[auth] Token expired') is True
+		assert aggregator.alert('[quota] Rate limit exceeded') is True
+		assert len(aggregator.records) == 2
+
+	@responses.activate
+	def test_failed_post_is_retried_by_the_next_occurrence(self, tmp_path, caplog):
+		"""Test an alert Slack rejected is not recorded, so it is not suppressed next time."""
+		responses.add(responses.POST, SLACK_URL, json={'ok': False, 'error': 'ratelimited'}, status=200)
+		responses.add(responses.POST, SLACK_URL, json={'ok': True, 'ts': '111.1'}, status=200)
+		aggregator = _aggregator(tmp_path, FakeClock())
+
+		assert aggregator.alert('[auth] Token expired') is False
+		assert aggregator.alert('[auth] Token expired') is True
+		assert caplog.records[0].getMessage() == 'Slack notification failed'
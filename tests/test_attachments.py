@@ -0,0 +1,155 @@
+"""Tests for attachments module."""
+
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+import responses
+
+from src.attachments import AttachmentProcessor, ImageStore, build_attachment_processor, downscale, find_image_parts
+from src.config import ImageHostConfig
+from src.settings import AttachmentSettings, Settings
+
+HOST = ImageHostConfig(upload_url='https://img.example/upload', public_url='https://cdn.example/img', token='t')
+
+# Smallest valid PNG header is enough for the processor without Pillow
+PNG_BYTES = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+
+def _message(*parts):
+	return {'id': 'msg1', 'payload': {'mimeType': 'multipart/mixed', 'parts': list(parts)}}
+
+
+def _image_part(attachment_id, size=100, mime_type='image/png'):
+	return {
+		'mimeType': mime_type,
+		'filename': f'{attachment_id}.png',
+		'body': {'attachmentId': attachment_id, 'size': size},
+	}
+
+
+def _download(data):
+	def download(attachment_id, path):
+		with open(path, 'wb') as f:
+			return f.write(data)
+
+	return Mock(side_effect=download)
+
+
+@pytest.fixture
+def no_pillow(monkeypatch):
+	"""Pillowがない環境として画像をそのまま扱う"""
+	monkeypatch.setattr('src.attachments.downscale', lambda source, destination, max_dimension: source)
+
+
+class TestFindImageParts:
+	"""Tests for find_image_parts."""
+
+	def test_nested_parts(self):
+		"""Test image attachments are found in nested multiparts, and inline text is ignored."""
+		payload = _message(
+			{'mimeType': 'text/plain', 'body': {'data': 'aGk='}},
+			{'mimeType': 'multipart/related', 'parts': [_image_part('a'), {'mimeType': 'image/gif', 'body': {}}]},
+			_image_part('b', mime_type='image/jpeg'),
+		)['payload']
+
+		parts = find_image_parts(payload)
+
+		assert [(part.attachment_id, part.mime_type) for part in parts] == [('a', 'image/png'), ('b', 'image/jpeg')]
+
+
+class TestAttachmentProcessor:
+	"""Tests for AttachmentProcessor."""
+
+	@responses.activate
+	def test_same_image_is_uploaded_once(self, tmp_path, no_pillow):
+		"""Test an image already uploaded is found by its hash and not uploaded again."""
+		responses.add(responses.PUT, responses.matchers.re.compile(r'https://img\.example/upload/.*'), status=200)
+		store = ImageStore(HOST, str(tmp_path / 'attachments' / 'index.json'))
+		processor = AttachmentProcessor(AttachmentSettings(enabled=True), store)
+
+		first = processor.process(_message(_image_part('a')), _download(PNG_BYTES))
+		second = processor.process(_message(_image_part('b')), _download(PNG_BYTES))
+
+		assert len(responses.calls) == 2
+		assert responses.calls[0].request.headers['Authorization'] == 'Bearer t'
+		assert first == second
+		(image,) = first
+		assert image.url.startswith('https://cdn.example/img/')
+		assert image.url.endswith('.png')
+		assert json.loads((tmp_path / 'attachments' / 'index.json').read_text())
+
+	def test_oversized_attachment_is_not_downloaded(self, tmp_path):
+		"""Test attachments over max_bytes are skipped before downloading."""
+		processor = AttachmentProcessor(
+			AttachmentSettings(enabled=True, max_bytes=50), ImageStore(HOST, str(tmp_path / 'index.json'))
+		)
+		download = _download(PNG_BYTES)
+
+		assert processor.process(_message(_image_part('a', size=51)), download) == []
+		download.assert_not_called()
+
+	@responses.activate
+	def test_max_images_and_failures(self, tmp_path, no_pillow):
+		"""Test only max_images attachments are processed and a failing one is skipped."""
+		responses.add(responses.PUT, responses.matchers.re.compile(r'https://img\.example/upload/.*'), status=200)
+		processor = AttachmentProcessor(
+			AttachmentSettings(enabled=True, max_images=2), ImageStore(HOST, str(tmp_path / 'index.json'))
+		)
+		fails = iter([True, False])
+
+		def flaky_download(attachment_id, path):
+			if next(fails):
+				raise ConnectionError('reset')
+			with open(path, 'wb') as f:
+				return f.write(PNG_BYTES)
+
+		download = Mock(side_effect=flaky_download)
+
+		result = processor.process(_message(_image_part('a'), _image_part('b'), _image_part('c')), download)
+
+		assert download.call_count == 2
+		assert len(result) == 1
+
+	def test_large_image_without_pillow_is_skipped(self, tmp_path, no_pillow):
+		"""Test an image that needs resizing is skipped when Pillow is not installed."""
+		processor = AttachmentProcessor(
+			AttachmentSettings(enabled=True), ImageStore(HOST, str(tmp_path / 'index.json'))
+		)
+
+		result = processor.process(_message(_image_part('a')), _download(PNG_BYTES + b'\x00' * 1024 * 1024))
+
+		assert result == []
+
+	def test_downscale_with_pillow(self, tmp_path):
+		"""Test images are shrunk to fit the maximum dimension."""
+		image_module = pytest.importorskip('PIL.Image')
+		source = tmp_path / 'source.png'
+		image_module.new('RGB', (2000, 1000)).save(source)
+
+		destination = downscale(str(source), str(tmp_path / 'image.jpg'), 1024)
+
+		with image_module.open(destination) as image:
+			assert image.size == (1024, 512)
+
+
+class TestBuildAttachmentProcessor:
+	"""Tests for build_attachment_processor."""
+
+	def test_disabled_by_default(self, tmp_path):
+		"""Test no processor is built unless attachments are enabled."""
+		config = Mock(settings=Settings(), image_host=HOST, state_dir=str(tmp_path))
+		assert build_attachment_processor(config) is None
+
+	def test_enabled_without_image_host(self, tmp_path):
+		"""Test enabling attachments without IMAGE_UPLOAD_URL is an error."""
+		settings = Settings(attachments=AttachmentSettings(enabled=True))
+		config = Mock(
+			settings=settings,
+			image_host=ImageHostConfig(upload_url=None, public_url=None, token=None),
+			state_dir=str(tmp_path),
+		)
+		with pytest.raises(ValueError, match='IMAGE_UPLOAD_URL'):
+			build_attachment_processor(config)
+		assert not os.path.exists(tmp_path / 'attachments')
@@ -0,0 +1,164 @@
+"""Tests for backfill module."""
+
+import base64
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src.backfill import Backfill, BackfillCheckpoint
+from src.errors import PermanentError
+from src.report import Outcome
+from src.settings import FilterSettings
+
+JST = ZoneInfo('Asia/Tokyo')
+AFTER = datetime(2025, 1, 1, tzinfo=JST)
+BEFORE = datetime(2025, 1, 15, tzinfo=JST)
+
+
+def _message(msg_id):
+	return {
+		'id': msg_id,
+		'payload': {
+			'headers': [{'name': 'Subject', 'value': f'Subject {msg_id}'}],
+			'body': {'data': base64.urlsafe_b64encode(msg_id.encode()).decode()},
+		},
+	}
+
+
+def _gmail(pages):
+	"""Mock GmailNotifier serving pages keyed by (window_start_epoch, page_token)."""
+	gmail = Mock()
+
+	def list_message_ids(query, page_token=None, max_results=100):
+		after = int(query.split('after:')[1].split()[0])
+		return pages.get((after, page_token), ([], None))
+
+	gmail.list_message_ids.side_effect = list_message_ids
+	gmail.get_message.side_effect = _message
+	return gmail
+
+
+class TestBackfill:
+	"""Tests for Backfill."""
+
+	def _backfill(self, gmail, deliver, tmp_path):
+		return Backfill(gmail, deliver, str(tmp_path / 'checkpoint.json'), window=timedelta(days=7))
+
+	def test_build_query(self):
+		"""Test window queries use epoch second bounds."""
+		query = Backfill.build_query('Family/test', AFTER, BEFORE)
+		assert query == f'label:"Family/test" after:{int(AFTER.timestamp())} before:{int(BEFORE.timestamp())}'
+
+	def test_build_query_applies_filters_except_newer_than(self):
+		"""Test the filters of the regular check narrow the backfill, while the window replaces newer_than."""
+		filters = FilterSettings(senders=('yamato.example.jp',), subject_keywords=('不在',), newer_than='7d')
+
+		query = Backfill.build_query('Family/test', AFTER, BEFORE, filters)
+
+		assert query == (
+			f'label:"Family/test" after:{int(AFTER.timestamp())} before:{int(BEFORE.timestamp())}'
+			' from:yamato.example.jp subject:不在'
+		)
+
+	def test_run_walks_windows_and_pages(self, tmp_path):
+		"""Test every window and page is delivered in order."""
+		second_window = int((AFTER + timedelta(days=7)).timestamp())
+		gmail = _gmail(
+			{
+				(int(AFTER.timestamp()), None): (['a', 'b'], 'page2'),
+				(int(AFTER.timestamp()), 'page2'): (['c'], None),
+				(second_window, None): (['d'], None),
+			}
+		)
+		delivered = []
+
+		def deliver(content):
+			delivered.append(content.id)
+			return Outcome.DELIVERED
+
+		total = self._backfill(gmail, deliver, tmp_path).run('Family/test', AFTER, BEFORE)
+
+		assert delivered == ['a', 'b', 'c', 'd']
+		assert total == 4
+		checkpoint = BackfillCheckpoint.load(str(tmp_path / 'checkpoint.json'))
+		assert checkpoint is not None
+		assert checkpoint.completed
+
+	def test_run_resumes_after_interruption(self, tmp_path):
+		"""Test a run stopped by a transient Gmail error resumes at the first undelivered message."""
+		gmail = _gmail(
+			{
+				(int(AFTER.timestamp()), None): (['a', 'b'], 'page2'),
+				(int(AFTER.timestamp()), 'page2'): (['c'], None),
+			}
+		)
+		delivered = []
+		failed: list[str] = []
+
+		def flaky_get_message(msg_id):
+			if msg_id == 'c' and 'c' not in failed:
+				failed.append('c')
+				raise ConnectionError('Gmail is unreachable')
+			return _message(msg_id)
+
+		def deliver(content):
+			delivered.append(content.id)
+			return Outcome.DELIVERED
+
+		gmail.get_message.side_effect = flaky_get_message
+		backfill = self._backfill(gmail, deliver, tmp_path)
+		with pytest.raises(ConnectionError):
+			backfill.run('Family/test', AFTER, BEFORE)
+
+		total = backfill.run('Family/test', AFTER, BEFORE)
+
+		assert delivered == ['a', 'b', 'c']
+		assert total == 3
+
+	def test_run_records_bad_messages_and_continues(self, tmp_path):
+		"""Test a deleted message and a rejected delivery do not stop the backfill."""
+		gmail = _gmail({(int(AFTER.timestamp()), None): (['a', 'gone', 'bad', 'd'], None)})
+
+		def get_message(msg_id):
+			if msg_id == 'gone':
+				raise PermanentError('Requested entity was not found')
+			return _message(msg_id)
+
+		def deliver(content):
+			if content.id == 'bad':
+				raise PermanentError('Webhook rejected the payload')
+			return Outcome.RETRY_LATER if content.id == 'd' else Outcome.DELIVERED
+
+		gmail.get_message.side_effect = get_message
+		backfill = self._backfill(gmail, deliver, tmp_path)
+
+		total = backfill.run('Family/test', AFTER, BEFORE)
+
+		assert total == 1
+		assert [(result.message_id, result.outcome) for result in backfill.report.results] == [
+			('a', Outcome.DELIVERED),
+			('gone', Outcome.SKIPPED),
+			('bad', Outcome.FAILED),
+			('d', Outcome.RETRY_LATER),
+		]
+
+	def test_run_completed_checkpoint_is_noop(self, tmp_path):
+		"""Test a completed backfill does not call Gmail again."""
+		gmail = _gmail({})
+		backfill = self._backfill(gmail, Mock(), tmp_path)
+		backfill.run('Family/test', AFTER, BEFORE)
+		gmail.reset_mock()
+
+		backfill.run('Family/test', AFTER, BEFORE)
+
+		gmail.list_message_ids.assert_not_called()
+
+	def test_run_rejects_foreign_checkpoint(self, tmp_path):
+		"""Test a checkpoint for another range is not silently reused."""
+		backfill = self._backfill(_gmail({}), Mock(), tmp_path)
+		backfill.run('Family/test', AFTER, BEFORE)
+
+		with pytest.raises(ValueError, match='different backfill'):
+			backfill.run('Family/other', AFTER, BEFORE)
@@ -0,0 +1,241 @@
+"""Tests for cassette module."""
+
+import base64
+import json
+from pathlib import Path
+from unittest.mock import Mock
+
+import httplib2
+import pytest
+import requests
+import responses
+
+from src.cassette import (
+	Cassette,
+	CassetteMismatchError,
+	Interaction,
+	Player,
+	Recorder,
+	Scrubber,
+	main,
+	replay,
+)
+from src.gmail_notifier import GmailNotifier
+
+CASSETTE_PATH = Path(__file__).parent / 'fixtures' / 'cassettes' / 'notification.json'
+
+RECORD_ENV = {
+	'LINE_CHANNEL_ACCESS_TOKEN': 'line-secret',
+	'LINE_USER_ID': 'Uaaaa,Ubbbb',
+	'SLACK_CHANNEL_ID': 'C123',
+	'NOTIFY_WEBHOOK_URL': 'https://hooks.example/secret-path',
+	'GOOGLE_OAUTH_TOKENS': '{"alice": "token-a", "bob": "token-b"}',
+}
+
+
+class TestScrubber:
+	"""Tests for Scrubber."""
+
+	def test_secrets_are_replaced(self):
+		"""Test secret values, items of comma-separated values and URLs get placeholders."""
+		scrubber = Scrubber({'LINE_USER_ID': 'Uaaaa,Ubbbb', 'NOTIFY_WEBHOOK_URL': 'https://hooks.example/secret'})
+
+		assert scrubber.scrub('{"to": ["Uaaaa", "Ubbbb"]}') == (
+			'{"to": ["scrubbed-line-user-id-1", "scrubbed-line-user-id-2"]}'
+		)
+		assert scrubber.scrub('https://hooks.example/secret') == 'https://scrubbed.invalid/notify-webhook-url'
+
+	def test_oauth_fields_are_replaced(self):
+		"""Test tokens in token refresh requests and responses are replaced."""
+		scrubber = Scrubber({})
+
+		assert scrubber.scrub('grant_type=refresh_token&refresh_token=1//abc&client_secret=xyz') == (
+			'grant_type=refresh_token&refresh_token=scrubbed&client_secret=scrubbed'
+		)
+		assert scrubber.scrub('{"access_token": "ya29.abc", "expires_in": 3599}') == (
+			'{"access_token": "scrubbed", "expires_in": 3599}'
+		)
+
+
+class TestRecorder:
+	"""Tests for Recorder."""
+
+	@responses.activate
+	def test_records_requests_without_secrets(self):
+		"""Test requests traffic is recorded with secrets and credential headers removed."""
+		responses.add(responses.POST, 'https://hooks.example/secret-path', json={'ok': True}, status=202)
+		recorder = Recorder(RECORD_ENV, keep_mail=True)
+
+		with recorder.recording() as cassette:
+			requests.post(
+				'https://hooks.example/secret-path',
+				json={'to': 'Uaaaa'},
+				headers={'Authorization': 'Bearer line-secret'},
+				timeout=5,
+			)
+
+		(interaction,) = cassette.interactions
+		assert interaction.url == 'https://scrubbed.invalid/notify-webhook-url'
+		assert interaction.status == 202
+		assert interaction.request_body == '{"to": "scrubbed-line-user-id-1"}'
+		assert 'authorization' not in interaction.headers
+		assert cassette.accounts == ['alice', 'bob']
+		assert cassette.environment['LINE_CHANNEL_ACCESS_TOKEN'] == 'scrubbed-line-channel-access-token'
+		assert cassette.environment['SLACK_CHANNEL_ID'] == 'C123'
+		assert 'GOOGLE_OAUTH_TOKENS' not in cassette.environment
+		assert 'line-secret' not in json.dumps(cassette.interactions[0].__dict__)
+
+	def test_mail_content_is_scrubbed(self, monkeypatch):
+		"""Test Gmail message content and notification request bodies are not recorded by default."""
+		body = 'ヤマト運輸です。お問い合わせ伝票番号: 1234-5678-9012 山田太郎様'
+		message = {
+			'id': 'msg1',
+			'snippet': body[:20],
+			'payload': {
+				'mimeType': 'multipart/mixed',
+				'headers': [
+					{'name': 'From', 'value': 'taro@example.jp'},
+					{'name': 'Date', 'value': 'Mon, 1 Jan 2024 12:00:00 +0900'},
+				],
+				'parts': [
+					{
+						'mimeType': 'text/plain',
+						'filename': '',
+						'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+					},
+					{'mimeType': 'image/png', 'filename': '山田様.png', 'body': {'attachmentId': 'att1', 'size': 10}},
+				],
+			},
+		}
+		fake = Mock(return_value=(httplib2.Response({'status': '200'}), json.dumps(message).encode()))
+		monkeypatch.setattr(httplib2.Http, 'request', fake)
+		recorder = Recorder({})
+
+		with recorder.recording() as cassette:
+			httplib2.Http().request('https://gmail.googleapis.com/gmail/v1/users/me/messages/msg1', 'GET', body)
+
+		(interaction,) = cassette.interactions
+		recorded = json.loads(interaction.body)
+		assert interaction.request_body is None
+		assert '山田' not in interaction.body
+		assert 'taro@example.jp' not in interaction.body
+		assert GmailNotifier.extract_email_content(recorded).body == 'scrubbed'
+		assert recorded['payload']['headers'][1]['value'] == 'Mon, 1 Jan 2024 12:00:00 +0900'
+		assert recorded['payload']['parts'][1] == {
+			'mimeType': 'image/png',
+			'filename': 'scrubbed.png',
+			'body': {'attachmentId': 'att1', 'size': 10},
+		}
+
+	def test_records_httplib2(self, monkeypatch):
+		"""Test Gmail API traffic through httplib2 is recorded, binary bodies as base64."""
+		fake = Mock(return_value=(httplib2.Response({'status': '200'}), b'\xff\xd8'))
+		monkeypatch.setattr(httplib2.Http, 'request', fake)
+		recorder = Recorder({})
+
+		with recorder.recording() as cassette:
+			httplib2.Http().request('https://gmail.googleapis.com/gmail/v1/users/me/messages', 'GET')
+
+		(interaction,) = cassette.interactions
+		assert interaction.base64_body is True
+		assert interaction.content == b'\xff\xd8'
+		assert httplib2.Http.request is fake
+
+
+class TestPlayer:
+	"""Tests for Player."""
+
+	def _cassette(self):
+		return Cassette(
+			interactions=[
+				Interaction('POST', 'https://api.example/push', 200, '{"n": 1}', elapsed=0.5),
+				Interaction('POST', 'https://api.example/push', 500, '{"n": 2}', elapsed=0.25),
+				Interaction('GET', 'https://gmail.example/messages', 200, '{}', {'content-type': 'application/json'}),
+			]
+		)
+
+	def test_repeated_requests_replay_in_order(self):
+		"""Test repeated requests get the recorded responses in order, with scaled latency."""
+		sleep = Mock()
+		player = Player(self._cassette(), latency_scale=2, sleep=sleep)
+
+		with player.playing():
+			first = requests.post('https://api.example/push', timeout=5)
+			second = requests.post('https://api.example/push', timeout=5)
+			response, content = httplib2.Http().request('https://gmail.example/messages', 'GET')
+
+		assert (first.status_code, first.json()) == (200, {'n': 1})
+		assert (second.status_code, second.json()) == (500, {'n': 2})
+		assert (response.status, content) == (200, b'{}')
+		assert [call.args[0] for call in sleep.call_args_list] == [1.0, 0.5, 0.0]
+		assert player.unplayed == 0
+
+	def test_unknown_request_raises(self):
+		"""Test a request missing from the cassette raises and is recorded as a miss."""
+		player = Player(self._cassette())
+
+		with player.playing(), pytest.raises(CassetteMismatchError):
+			requests.get('https://api.example/push', timeout=5)
+
+		assert player.misses == ['GET https://api.example/push']
+		assert player.unplayed == 3
+
+
+class TestCassette:
+	"""Tests for Cassette."""
+
+	def test_save_and_load(self, tmp_path):
+		"""Test a cassette survives a save and load."""
+		path = tmp_path / 'run.json'
+		cassette = Cassette.load(str(CASSETTE_PATH))
+
+		cassette.save(str(path))
+
+		assert Cassette.load(str(path)) == cassette
+
+	def test_unsupported_version(self, tmp_path):
+		"""Test cassettes from another format version are rejected."""
+		path = tmp_path / 'run.json'
+		path.write_text('{"version": 99, "interactions": []}', encoding='utf-8')
+
+		with pytest.raises(ValueError, match='Unsupported cassette version'):
+			Cassette.load(str(path))
+
+	def test_timing_profile_groups_ids(self):
+		"""Test calls for different message IDs are grouped under one endpoint."""
+		cassette = Cassette(
+			interactions=[
+				Interaction(
+					'GET', 'https://gmail.example/users/me/messages/18c0f3a9b2d4e5f6?alt=json', 200, '', elapsed=1
+				),
+				Interaction(
+					'GET', 'https://gmail.example/users/me/messages/18c0f3a9b2d4e5f7?alt=json', 200, '', elapsed=2
+				),
+			]
+		)
+
+		(timing,) = cassette.timing_profile()
+
+		assert timing.endpoint == 'GET gmail.example/users/me/messages/{id}'
+		assert (timing.calls, timing.seconds) == (2, 3)
+
+
+class TestReplay:
+	"""Tests for replaying a whole notification check."""
+
+	def test_replay_main(self, temp_github_output, capsys):
+		"""Test the recorded check is replayed offline and succeeds."""
+		main(['replay', str(CASSETTE_PATH)])
+
+		with open(temp_github_output) as f:
+			assert 'status=success' in f.read()
+		assert 'Replayed 4 requests, 0 recorded requests were not made' in capsys.readouterr().out
+
+	def test_replay_reports_unplayed_mismatch(self, temp_github_output):
+		"""Test a run making requests that were not recorded fails the replay."""
+		cassette = Cassette.load(str(CASSETTE_PATH))
+		# Drop the LINE push, so the notification has nothing to answer it
+		cassette.interactions = [i for i in cassette.interactions if 'api.line.me' not in i.url]
+
+		with pytest.raises(CassetteMismatchError, match='1 requests were not in the cassette'):
+			replay(cassette)
@@ -0,0 +1,291 @@
+"""Tests for circuit_breaker module."""
+
+from collections.abc import Sequence
+from dataclasses import replace
+from datetime import timedelta
+
+import pytest
+
+from src.circuit_breaker import (
+	CircuitBreaker,
+	CircuitOpenError,
+	CircuitState,
+	GuardedSink,
+	Outbox,
+	flush_outboxes,
+)
+from src.email_content import EmailContent
+from src.errors import PermanentError
+from src.sinks import Sink
+from tests.fixtures.mock_data import create_test_email_content
+
+
+class FakeSink(Sink):
+	"""Sink recording batches and digests, failing while ``failing`` is set."""
+
+	name = 'fake'
+
+	def __init__(self):
+		self.batches: list[list[str]] = []
+		self.digests: list[list[str]] = []
+		self.failing = False
+
+	def send_batch(self, email_contents: Sequence[EmailContent]) -> None:
+		if self.failing:
+			raise ConnectionError('endpoint down')
+		self.batches.append([content.id for content in email_contents])
+
+	def send_digest(self, email_contents: Sequence[EmailContent]) -> None:
+		if self.failing:
+			raise ConnectionError('endpoint down')
+		self.digests.append([content.id for content in email_contents])
+
+
+def _content(msg_id):
+	return replace(create_test_email_content(), id=msg_id)
+
+
+class Clock:
+	"""Manually advanced clock."""
+
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class TestCircuitBreaker:
+	"""Tests for CircuitBreaker."""
+
+	def test_opens_after_threshold(self, tmp_path):
+		"""Test consecutive failures open the circuit."""
+		breaker = CircuitBreaker(str(tmp_path / 'line.json'), failure_threshold=2)
+
+		breaker.record_failure()
+		assert breaker.allow_request()
+		breaker.record_failure()
+
+		assert breaker.state == CircuitState.OPEN
+		assert not breaker.allow_request()
+
+	def test_state_persists_between_runs(self, tmp_path):
+		"""Test a new instance loads the saved state."""
+		path = str(tmp_path / 'line.json')
+		CircuitBreaker(path, failure_threshold=1).record_failure()
+
+		assert CircuitBreaker(path).state == CircuitState.OPEN
+
+	def test_half_open_probe(self, tmp_path):
+		"""Test a probe is allowed after the reset timeout and its result decides the state."""
+		clock = Clock()
+		path = str(tmp_path / 'line.json')
+		breaker = CircuitBreaker(path, failure_threshold=1, reset_timeout=timedelta(minutes=10), clock=clock)
+		breaker.record_failure()
+
+		clock.now += 601
+		assert breaker.allow_request()
+		assert CircuitBreaker(path).state == CircuitState.HALF_OPEN
+		breaker.record_failure()
+		assert CircuitBreaker(path).state == CircuitState.OPEN
+		assert not breaker.allow_request()
+
+		clock.now += 601
+		assert breaker.allow_request()
+		breaker.record_success()
+		assert CircuitBreaker(path).state == CircuitState.CLOSED
+
+	def test_interrupted_probe_is_retried(self, tmp_path):
+		"""Test a half-open state saved by a killed run allows a new probe after the reset timeout."""
+		clock = Clock()
+		path = str(tmp_path / 'line.json')
+		breaker = CircuitBreaker(path, failure_threshold=1, reset_timeout=timedelta(minutes=10), clock=clock)
+		breaker.record_failure()
+		clock.now += 601
+		assert breaker.allow_request()
+
+		restored = CircuitBreaker(path, reset_timeout=timedelta(minutes=10), clock=clock)
+		assert restored.state == CircuitState.HALF_OPEN
+		assert not restored.allow_request()
+		clock.now += 601
+		assert restored.allow_request()
+
+
+class TestGuardedSink:
+	"""Tests for GuardedSink and flush_outboxes."""
+
+	def _guarded(self, tmp_path, sink, clock=None):
+		breaker = CircuitBreaker(str(tmp_path / 'circuit.json'), failure_threshold=1, clock=clock or Clock())
+		return GuardedSink(sink, breaker, Outbox(str(tmp_path / 'outbox.jsonl')))
+
+	def test_failure_queues_and_raises(self, tmp_path):
+		"""Test a failed delivery is queued and the error propagates."""
+		sink = FakeSink()
+		sink.failing = True
+		guarded = self._guarded(tmp_path, sink)
+
+		with pytest.raises(ConnectionError):
+			guarded.send(_content('a'))
+
+		assert [content.id for content in guarded.outbox.load()] == ['a']
+
+	def test_permanent_error_is_not_queued(self, tmp_path):
+		"""Test a rejected notification is neither queued nor counted against the circuit."""
+		sink = FakeSink()
+		guarded = self._guarded(tmp_path, sink)
+
+		def reject(email_contents):
+			raise PermanentError('payload rejected')
+
+		sink.send_batch = reject  # type: ignore[method-assign]
+
+		with pytest.raises(PermanentError):
+			guarded.send(_content('a'))
+
+		assert guarded.outbox.load() == []
+		assert CircuitBreaker(str(tmp_path / 'circuit.json')).state == CircuitState.CLOSED
+
+	def test_permanent_error_settles_a_probe(self, tmp_path):
+		"""Test a probe answered with a permanent error closes the circuit instead of leaving it half-open."""
+		clock = Clock()
+		sink = FakeSink()
+		sink.failing = True
+		guarded = self._guarded(tmp_path, sink, clock)
+		with pytest.raises(ConnectionError):
+			guarded.send(_content('a'))
+		clock.now += 3600
+
+		def reject(email_contents):
+			raise PermanentError('payload rejected')
+
+		sink.send_batch = reject  # type: ignore[method-assign]
+		with pytest.raises(PermanentError):
+			guarded.send(_content('b'))
+
+		assert CircuitBreaker(str(tmp_path / 'circuit.json')).state == CircuitState.CLOSED
+		assert guarded.breaker.allow_request()
+
+	def test_open_circuit_fails_fast(self, tmp_path):
+		"""Test an open circuit queues without calling the destination."""
+		sink = FakeSink()
+		sink.failing = True
+		guarded = self._guarded(tmp_path, sink)
+		with pytest.raises(ConnectionError):
+			guarded.send(_content('a'))
+		sink.failing = False
+
+		with pytest.raises(CircuitOpenError):
+			guarded.send(_content('b'))
+
+		assert sink.batches == []
+		assert [content.id for content in guarded.outbox.load()] == ['a', 'b']
+
+	def test_recovery_sends_queue_first(self, tmp_path):
+		"""Test the first allowed request delivers queued notifications in order."""
+		clock = Clock()
+		sink = FakeSink()
+		sink.failing = True
+		guarded = self._guarded(tmp_path, sink, clock)
+		with pytest.raises(ConnectionError):
+			guarded.send(_content('a'))
+		sink.failing = False
+		clock.now += 3600
+
+		guarded.send(_content('b'))
+
+		assert sink.batches == [['a', 'b']]
+		assert guarded.outbox.load() == []
+		assert guarded.breaker.state == CircuitState.CLOSED
+
+	def test_partial_failure_keeps_only_undelivered(self, tmp_path):
+		"""Test notifications delivered before a request failed are not queued to be sent again."""
+		sink = FakeSink()
+		sink.request_groups = lambda email_contents: [[content] for content in email_contents]  # type: ignore[method-assign]
+		guarded = self._guarded(tmp_path, sink)
+		guarded.outbox.extend([_content('a')])
+		send_batch = sink.send_batch
+
+		def fail_on_c(email_contents):
+			if email_contents[0].id == 'c':
+				raise ConnectionError('endpoint down')
+			send_batch(email_contents)
+
+		sink.send_batch = fail_on_c  # type: ignore[method-assign]
+
+		with pytest.raises(ConnectionError):
+			guarded.send_batch([_content('b'), _content('c'), _content('d')])
+
+		assert sink.batches == [['a'], ['b']]
+		assert [content.id for content in guarded.outbox.load()] == ['c', 'd']
+
+	def test_rejected_queued_notification_does_not_block_later_sends(self, tmp_path, caplog):
+		"""Test a queued notification rejected for good is dropped and the notifications behind it are delivered."""
+		sink = FakeSink()
+		sink.request_groups = lambda email_contents: [[content] for content in email_contents]  # type: ignore[method-assign]
+		guarded = self._guarded(tmp_path, sink)
+		guarded.outbox.extend([_content('a')])
+		send_batch = sink.send_batch
+
+		def reject_a(email_contents):
+			if email_contents[0].id == 'a':
+				raise PermanentError('payload rejected')
+			send_batch(email_contents)
+
+		sink.send_batch = reject_a  # type: ignore[method-assign]
+
+		guarded.send_batch([_content('b')])
+		guarded.send_batch([_content('c'), _content('d')])
+
+		assert sink.batches == [['b'], ['c'], ['d']]
+		assert guarded.outbox.load() == []
+		assert [record.getMessage() for record in caplog.records] == ['Queued notifications rejected']
+
+	def test_rejected_new_notification_is_raised_after_the_rest_is_sent(self, tmp_path):
+		"""Test a new notification rejected for good is raised once the other groups were delivered."""
+		sink = FakeSink()
+		sink.request_groups = lambda email_contents: [[content] for content in email_contents]  # type: ignore[method-assign]
+		guarded = self._guarded(tmp_path, sink)
+		send_batch = sink.send_batch
+
+		def reject_b(email_contents):
+			if email_contents[0].id == 'b':
+				raise PermanentError('payload rejected')
+			send_batch(email_contents)
+
+		sink.send_batch = reject_b  # type: ignore[method-assign]
+
+		with pytest.raises(PermanentError):
+			guarded.send_batch([_content('a'), _content('b'), _content('c')])
+
+		assert sink.batches == [['a'], ['c']]
+		assert guarded.outbox.load() == []
+
+	def test_send_digest_includes_queue_and_queues_on_failure(self, tmp_path):
+		"""Test a digest carries queued notifications and is queued itself when delivery fails."""
+		sink = FakeSink()
+		guarded = self._guarded(tmp_path, sink)
+		guarded.outbox.extend([_content('a')])
+
+		guarded.send_digest([_content('b'), _content('c')])
+		sink.failing = True
+		with pytest.raises(ConnectionError):
+			guarded.send_digest([_content('d')])
+
+		assert sink.digests == [['a', 'b', 'c']]
+		assert [content.id for content in guarded.outbox.load()] == ['d']
+
+	def test_flush_outboxes(self, tmp_path):
+		"""Test flushing reports delivered counts and open circuits."""
+		healthy = self._guarded(tmp_path / 'healthy', FakeSink())
+		healthy.outbox.extend([_content('a'), _content('a'), _content('b')])
+		broken_sink = FakeSink()
+		broken_sink.failing = True
+		broken = self._guarded(tmp_path / 'broken', broken_sink)
+		broken.name = 'broken'
+		with pytest.raises(ConnectionError):
+			broken.send(_content('c'))
+
+		results = flush_outboxes([healthy, broken])
+
+		assert results['fake'] == 2
+		assert isinstance(results['broken'], CircuitOpenError)
@@ -5,7 +5,7 @@ from unittest.mock import patch
 
 import pytest
 
-from src.config import AppConfig, GoogleConfig, LineConfig, SlackConfig
+from src.config import AppConfig, DestinationConfig, GoogleConfig, ImageHostConfig, LineConfig, SlackConfig
 
 
 class TestGoogleConfig:
@@ -25,6 +25,32 @@ class TestGoogleConfig:
 		assert config.oauth_token is None
 		assert config.oauth_credentials is None
 
+	@patch.dict(os.environ, {'GOOGLE_OAUTH_TOKEN': 'test_token'}, clear=True)
+	def test_accounts_from_env_single_token(self):
+		"""Test accounts_from_env falls back to the single GOOGLE_OAUTH_TOKEN account."""
+		accounts = GoogleConfig.accounts_from_env()
+		assert [(account.account, account.oauth_token) for account in accounts] == [('default', 'test_token')]
+
+	@patch.dict(
+		os.environ,
+		{'GOOGLE_OAUTH_TOKENS': '{"alice": "token_a", "bob": "token_b"}', 'GOOGLE_OAUTH_CREDENTIALS': 'test_creds'},
+		clear=True,
+	)
+	def test_accounts_from_env_multiple_tokens(self):
+		"""Test accounts_from_env creates one config per GOOGLE_OAUTH_TOKENS entry."""
+		accounts = GoogleConfig.accounts_from_env()
+		assert [(account.account, account.oauth_token) for account in accounts] == [
+			('alice', 'token_a'),
+			('bob', 'token_b'),
+		]
+		assert all(account.oauth_credentials == 'test_creds' for account in accounts)
+
+	@pytest.mark.parametrize('tokens', ['not json', '[]', '{}', '{"../x": "token"}', '{"alice": ""}'])
+	def test_accounts_from_env_invalid_tokens(self, tokens):
+		"""Test accounts_from_env rejects malformed GOOGLE_OAUTH_TOKENS."""
+		with patch.dict(os.environ, {'GOOGLE_OAUTH_TOKENS': tokens}, clear=True), pytest.raises(ValueError):
+			GoogleConfig.accounts_from_env()
+
 
 class TestLineConfig:
 	"""Tests for LineConfig."""
@@ -71,6 +97,11 @@ class TestLineConfig:
 		with pytest.raises(ValueError, match='Environment variable LINE_USER_ID is required'):
 			LineConfig.from_env(sandbox_mode=False)
 
+	def test_user_ids_multicast(self):
+		"""Test comma-separated user IDs are split for multicast."""
+		config = LineConfig(channel_access_token='token', user_id='U1, U2,')
+		assert config.user_ids == ['U1', 'U2']
+
 
 class TestSlackConfig:
 	"""Tests for SlackConfig."""
@@ -95,6 +126,40 @@ class TestSlackConfig:
 			SlackConfig.from_env()
 
 
+class TestDestinationConfig:
+	"""Tests for DestinationConfig."""
+
+	@patch.dict(os.environ, {}, clear=True)
+	def test_from_env_without_values(self):
+		"""Test no optional destination is configured by default."""
+		config = DestinationConfig.from_env()
+		assert config == DestinationConfig(
+			slack_channel_id=None, discord_webhook_url=None, webhook_url=None, file_path=None
+		)
+
+	@patch.dict(os.environ, {'NOTIFY_WEBHOOK_URL': 'https://hooks.example/notify'}, clear=True)
+	def test_from_env_with_webhook(self):
+		"""Test DestinationConfig.from_env reads the generic webhook URL."""
+		assert DestinationConfig.from_env().webhook_url == 'https://hooks.example/notify'
+
+
+class TestImageHostConfig:
+	"""Tests for ImageHostConfig."""
+
+	@patch.dict(os.environ, {'IMAGE_UPLOAD_URL': 'https://img.example/upload'}, clear=True)
+	def test_public_url_defaults_to_upload_url(self):
+		"""Test images are served from the upload URL unless IMAGE_PUBLIC_URL is set."""
+		config = ImageHostConfig.from_env()
+		assert config.public_url == 'https://img.example/upload'
+		assert config.token is None
+
+	@patch.dict(os.environ, {'IMAGE_UPLOAD_URL': 'http://img.example/upload'}, clear=True)
+	def test_public_url_must_be_https(self):
+		"""Test a plain HTTP URL is rejected, since LINE only fetches HTTPS images."""
+		with pytest.raises(ValueError, match='must be an https:// URL'):
+			ImageHostConfig.from_env()
+
+
 class TestAppConfig:
 	"""Tests for AppConfig."""
 
@@ -115,6 +180,7 @@ class TestAppConfig:
 		assert config.sandbox_mode is False
 		assert config.github_output_file == '/tmp/output'
 		assert config.gmail_label == 'Family/お荷物滞留お知らせメール'
+		assert config.body_max_length == 500
 		assert config.line.channel_access_token == 'prod_token'
 		assert config.line.user_id == 'prod_user'
 
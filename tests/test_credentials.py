@@ -0,0 +1,130 @@
+"""Tests for credentials module."""
+
+import base64
+import logging
+import pickle
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from src.credentials import CredentialManager, replay_token
+from src.errors import AuthError
+
+
+def _token(expires_in: timedelta | None, refresh_token: str | None = 'refresh') -> str:
+	expiry = datetime.now(UTC).replace(tzinfo=None) + expires_in if expires_in is not None else None
+	creds = Credentials(token='access', refresh_token=refresh_token, expiry=expiry)
+	return base64.b64encode(pickle.dumps(creds)).decode('ascii')
+
+
+def _refresh(creds, request):
+	"""Stand-in for Credentials.refresh that issues a token valid for an hour."""
+	creds.token = 'refreshed'
+	creds.expiry = datetime.now(UTC).replace(tzinfo=None) + timedelta(hours=1)
+
+
+class TestCredentialManager:
+	"""Tests for CredentialManager."""
+
+	def test_same_token_is_loaded_once(self):
+		"""Test every client of a token shares one Credentials object."""
+		manager = CredentialManager()
+		token = _token(timedelta(hours=1))
+
+		assert manager.get(token) is manager.get(token)
+		assert manager.get(token).token == 'access'
+
+	def test_token_expiring_soon_is_refreshed(self):
+		"""Test a token expiring within the margin is refreshed before it is used."""
+		manager = CredentialManager(refresh_margin=timedelta(minutes=10))
+
+		with patch.object(Credentials, 'refresh', autospec=True, side_effect=_refresh) as refresh:
+			creds = manager.get(_token(timedelta(minutes=5)))
+
+		refresh.assert_called_once()
+		assert creds.token == 'refreshed'
+
+	def test_concurrent_refreshes_are_single_flight(self):
+		"""Test workers needing a refresh at the same time wait for one refresh."""
+		manager = CredentialManager()
+		token = _token(timedelta(hours=1))
+		manager.get(token)
+		manager.refresh_margin = timedelta(hours=2)
+		started = threading.Barrier(4)
+
+		def slow_refresh(creds, request):
+			time.sleep(0.05)
+			_refresh(creds, request)
+			manager.refresh_margin = timedelta(minutes=10)
+
+		def worker():
+			started.wait()
+			manager.get(token)
+
+		with patch.object(Credentials, 'refresh', autospec=True, side_effect=slow_refresh) as refresh:
+			threads = [threading.Thread(target=worker) for _ in range(4)]
+			for thread in threads:
+				thread.start()
+			for thread in threads:
+				thread.join()
+
+		refresh.assert_called_once()
+
+	def test_expired_token_without_refresh_token(self):
+		"""Test an expired token that cannot be refreshed raises AuthError."""
+		with pytest.raises(AuthError, match='No refresh_token available'):
+			CredentialManager().get(_token(timedelta(hours=-1), refresh_token=None))
+
+	def test_refresh_failure_raises_auth_error(self):
+		"""Test a failed refresh is raised as AuthError."""
+		with (
+			patch.object(Credentials, 'refresh', side_effect=ValueError('invalid_grant')),
+			pytest.raises(AuthError, match='Failed to refresh token: invalid_grant'),
+		):
+			CredentialManager().get(_token(timedelta(hours=-1)))
+
+	def test_background_refresher(self):
+		"""Test the background thread refreshes loaded tokens before they expire."""
+		manager = CredentialManager()
+		creds = manager.get(_token(timedelta(hours=1)))
+		manager.refresh_margin = timedelta(hours=2)
+		refreshed = threading.Event()
+
+		def refresh(creds, request):
+			_refresh(creds, request)
+			manager.refresh_margin = timedelta(minutes=10)
+			refreshed.set()
+
+		with patch.object(Credentials, 'refresh', autospec=True, side_effect=refresh):
+			manager.start(interval=timedelta(milliseconds=10))
+			try:
+				assert refreshed.wait(timeout=5)
+			finally:
+				manager.stop()
+
+		assert creds.token == 'refreshed'
+
+	def test_refresh_expiring_reports_failures(self, caplog):
+		"""Test background refresh failures are logged and counted, not raised."""
+		manager = CredentialManager()
+		manager.get(_token(timedelta(hours=1)))
+		manager.refresh_margin = timedelta(hours=2)
+
+		with patch.object(Credentials, 'refresh', side_effect=ValueError('invalid_grant')):
+			assert manager.refresh_expiring() == 1
+
+		assert [record.getMessage() for record in caplog.records if record.levelno == logging.WARNING] == [
+			'Background token refresh failed'
+		]
+
+	def test_replay_token_needs_no_refresh(self):
+		"""Test the replay token loads as valid credentials without contacting Google."""
+		with patch.object(Credentials, 'refresh') as refresh:
+			creds = CredentialManager().get(replay_token())
+
+		assert creds.token == 'scrubbed'
+		refresh.assert_not_called()
@@ -0,0 +1,68 @@
+"""Tests for daemon module."""
+
+import os
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from src.config import AppConfig
+from src.daemon import Daemon, build_schedules
+from src.report import Outcome, RunReport
+from src.scheduler import CronSchedule, IntervalSchedule
+from src.settings import DeliverySettings, ScheduleSettings, Settings, SettingsWatcher, load_settings
+
+
+class TestDaemon:
+	"""Tests for Daemon."""
+
+	def test_build_schedules(self):
+		"""Test cron entries, the jittered interval and quiet hours are all built."""
+		schedules, quiet_hours = build_schedules(
+			Settings(
+				schedule=ScheduleSettings(
+					cron=('0 7 * * *',), interval_minutes=5, jitter_seconds=30, quiet_hours='22:00-07:00'
+				)
+			)
+		)
+
+		assert isinstance(schedules[0], CronSchedule)
+		assert isinstance(schedules[1], IntervalSchedule)
+		assert schedules[1].jitter == timedelta(seconds=30)
+		assert quiet_hours is not None
+
+	def test_build_schedules_checks_when_delivery_quiet_hours_end(self):
+		"""Test a check is scheduled when held notifications can be sent."""
+		schedules, _ = build_schedules(Settings(delivery=DeliverySettings(quiet_hours='22:00-06:30')))
+
+		assert isinstance(schedules[-1], CronSchedule)
+		assert schedules[-1].expression == '30 6 * * *'
+
+	def test_check_reloads_settings(self, mock_env_vars, tmp_path):
+		"""Test an edited settings file changes the labels and schedule before the next check."""
+		path = tmp_path / 'notifier.toml'
+		path.write_text('labels = ["Family/parcels"]\n', encoding='utf-8')
+		with patch.dict(os.environ, {'NOTIFIER_CONFIG': str(path)}):
+			config = AppConfig.from_env()
+		daemon = Daemon(config, SettingsWatcher(str(path), config.settings))
+		path.write_text('labels = ["Family/school"]\n\n[schedule]\ninterval_minutes = 5\n', encoding='utf-8')
+		os.utime(path, ns=(0, 1))
+		report = RunReport()
+		report.add('id', Outcome.DELIVERED)
+
+		with patch('src.daemon.check_and_notify', return_value=report) as check_and_notify:
+			daemon.check()
+
+		check_and_notify.assert_called_once_with(config, credentials=daemon.credentials)
+		assert config.settings == load_settings(str(path))
+		assert any(isinstance(schedule, IntervalSchedule) for schedule in daemon.scheduler.schedules)
+
+	def test_new_mail_ends_the_wait_early(self, mock_env_vars):
+		"""Test an IMAP IDLE notice starts the next check before its scheduled time."""
+		daemon = Daemon(AppConfig.from_env())
+		daemon.new_mail.set()
+		started = time.monotonic()
+
+		assert daemon._wait(threading.Event(), 60) is False
+		assert time.monotonic() - started < 5
+		assert not daemon.new_mail.is_set()
@@ -0,0 +1,32 @@
+"""Tests for deferral module."""
+
+from dataclasses import replace
+
+from src.deferral import DeferralQueue, DeferredNotification
+from tests.fixtures.mock_data import create_test_email_content
+
+
+class TestDeferralQueue:
+	"""Tests for DeferralQueue."""
+
+	def test_append_load_and_clear(self, tmp_path):
+		"""Test deferred notifications persist in order and are cleared."""
+		queue = DeferralQueue(str(tmp_path / 'state' / 'deferred.jsonl'))
+		first = DeferredNotification('alice', 'Family/parcels', replace(create_test_email_content(), id='a'))
+		second = DeferredNotification('bob', 'Family/school', replace(create_test_email_content(), id='b'))
+
+		assert queue.append(first)
+		assert queue.append(second)
+
+		assert DeferralQueue(queue.path).load() == [first, second]
+		queue.clear()
+		assert queue.load() == []
+
+	def test_append_skips_duplicates(self, tmp_path):
+		"""Test an email found again before it was marked as read is deferred once."""
+		queue = DeferralQueue(str(tmp_path / 'deferred.jsonl'))
+		notification = DeferredNotification('alice', 'Family/parcels', create_test_email_content())
+
+		assert queue.append(notification)
+		assert not queue.append(notification)
+		assert len(queue.load()) == 1
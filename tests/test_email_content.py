@@ -0,0 +1,61 @@
+"""Tests for email_content module."""
+
+from dataclasses import FrozenInstanceError, replace
+from datetime import UTC, datetime
+
+import pytest
+
+from src.email_content import EmailContent
+
+
+class TestEmailContent:
+	"""Tests for EmailContent."""
+
+	def test_json_round_trip(self):
+		"""Test every field, including the date and tuples, survives to_json and from_json."""
+		content = EmailContent(
+			'm1',
+			'お荷物のお届け',
+			'info@example.jp',
+			'本文',
+			thread_id='t1',
+			date=datetime(2026, 3, 1, 9, 30, tzinfo=UTC),
+			labels=('INBOX', 'UNREAD'),
+			tracking_number='1234-5678-9012',
+			image_urls=('https://img.example/a.jpg',),
+		)
+
+		assert EmailContent.from_json(content.to_json()) == content
+		assert 'お荷物' in content.to_json()
+
+	def test_to_dict_leaves_out_empty_fields(self):
+		"""Test optional fields that are None or empty are not written."""
+		assert EmailContent('m1', 'Subject', 'a@example.com', 'Body').to_dict() == {
+			'id': 'm1',
+			'subject': 'Subject',
+			'sender': 'a@example.com',
+			'body': 'Body',
+		}
+
+	def test_from_dict_accepts_legacy_records(self):
+		"""Test records of the older dict format, with 'from' and unknown keys, still load."""
+		content = EmailContent.from_dict(
+			{'id': 'm1', 'subject': 'S', 'from': 'a@example.com', 'body': 'B', 'obsolete': 'x'}
+		)
+
+		assert content == EmailContent('m1', 'S', 'a@example.com', 'B')
+
+	def test_has_summary(self):
+		"""Test the carrier alone is not a summary, but a key field is."""
+		content = EmailContent('m1', 'S', 'a@example.com', 'B', carrier='ヤマト運輸')
+
+		assert not content.has_summary()
+		assert replace(content, deadline='3月15日').has_summary()
+
+	def test_is_immutable_and_slotted(self):
+		"""Test fields cannot be reassigned and instances have no __dict__."""
+		content = EmailContent('m1', 'S', 'a@example.com', 'B')
+
+		with pytest.raises(FrozenInstanceError):
+			content.subject = 'changed'  # type: ignore[misc]
+		assert not hasattr(content, '__dict__')
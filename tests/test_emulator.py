@@ -0,0 +1,212 @@
+"""Tests for emulator module."""
+
+import base64
+import json
+import mailbox
+import urllib.error
+import urllib.request
+from email.message import EmailMessage
+from typing import Any
+
+import pytest
+
+from src.credentials import replay_token
+from src.emulator import GmailEmulator, Mailbox, QueryError
+from src.gmail_notifier import GmailNotifier
+
+LABEL = 'Family/parcels'
+
+NOW = 1_704_326_400.0  # 2024-01-04 00:00 UTC
+
+
+def _message(
+	subject: str, sender: str = 'notice@example.com', date: str = 'Mon, 01 Jan 2024 09:00:00 +0000', **headers: str
+) -> EmailMessage:
+	message = EmailMessage()
+	message['From'] = sender
+	message['Subject'] = subject
+	message['Date'] = date
+	for name, value in headers.items():
+		message[name.replace('_', '-')] = value
+	message.set_content(f'{subject} body')
+	return message
+
+
+@pytest.fixture
+def mbox_path(tmp_path):
+	"""Write an mbox with a thread of two unread notices, a read notice and an unlabeled message."""
+	path = str(tmp_path / 'mailbox.mbox')
+	box = mailbox.mbox(path)
+	box.add(_message('Parcel held', message_id='<1@example.com>', x_gmail_labels=f'Unread,Inbox,{LABEL}'))
+	box.add(
+		_message(
+			'Re: Parcel held',
+			date='Tue, 02 Jan 2024 09:00:00 +0000',
+			in_reply_to='<1@example.com>',
+			x_gmail_labels=f'Unread,{LABEL}',
+		)
+	)
+	box.add(_message('Old notice', date='Sun, 31 Dec 2023 09:00:00 +0000', x_gmail_labels=f'Opened,{LABEL}'))
+	box.add(_message('Newsletter', sender='news@example.org', x_gmail_labels='Unread,Inbox'))
+	box.close()
+	return path
+
+
+@pytest.fixture
+def emulator(mbox_path):
+	"""Serve the mbox on a free port."""
+	with GmailEmulator(Mailbox.load(mbox_path, clock=lambda: NOW)) as server:
+		yield server
+
+
+def _call(emulator: GmailEmulator, path: str, body: dict[str, Any] | None = None) -> Any:
+	data = json.dumps(body).encode('utf-8') if body is not None else None
+	request = urllib.request.Request(f'{emulator.url}gmail/v1/users/me/{path}', data=data)
+	with urllib.request.urlopen(request) as response:
+		content = response.read()
+	return json.loads(content) if content else None
+
+
+def _subjects(box: Mailbox, query: str) -> list[str]:
+	return [message.header('Subject') for message in box.search(query)]
+
+
+class TestMailbox:
+	"""Tests for Mailbox."""
+
+	def test_load_reads_labels_threads_and_read_state(self, mbox_path):
+		"""Test X-Gmail-Labels become label IDs and replies join the thread of their message."""
+		box = Mailbox.load(mbox_path)
+
+		by_subject = {message.header('Subject'): message for message in box.messages.values()}
+		first, reply = by_subject['Parcel held'], by_subject['Re: Parcel held']
+		old, newsletter = by_subject['Old notice'], by_subject['Newsletter']
+		assert box.label_names['Label_1'] == LABEL
+		assert reply.label_ids == {'UNREAD', 'Label_1'}
+		assert old.label_ids == {'Label_1'}
+		assert newsletter.label_ids == {'UNREAD', 'INBOX'}
+		assert first.thread_id == reply.thread_id != newsletter.thread_id
+
+	def test_load_maildir_uses_flags_and_labels(self, tmp_path):
+		"""Test Maildir messages are unread unless seen, with the labels given."""
+		maildir = mailbox.Maildir(str(tmp_path / 'Maildir'))
+		maildir.add(_message('New'))
+		seen = mailbox.MaildirMessage(_message('Seen'))
+		seen.set_subdir('cur')
+		seen.add_flag('S')
+		maildir.add(seen)
+
+		box = Mailbox.load(str(tmp_path / 'Maildir'), [LABEL])
+
+		assert _subjects(box, f'label:"{LABEL}" is:unread') == ['New']
+		assert sorted(_subjects(box, f'label:{LABEL}')) == ['New', 'Seen']
+
+	@pytest.mark.parametrize(
+		('query', 'expected'),
+		[
+			(f'label:"{LABEL}" is:unread', ['Re: Parcel held', 'Parcel held']),
+			(f'label:{LABEL} is:read', ['Old notice']),
+			('is:unread -label:inbox', ['Re: Parcel held']),
+			('from:{news@example.org other@example.org}', ['Newsletter']),
+			('subject:"parcel held" newer_than:2d', ['Re: Parcel held']),
+			('before:1704067200', ['Old notice']),
+			('smaller:1', []),
+		],
+	)
+	def test_search(self, mbox_path, query, expected):
+		"""Test the query terms the notifier compiles."""
+		box = Mailbox.load(mbox_path, clock=lambda: NOW)
+
+		assert _subjects(box, query) == expected
+
+	def test_search_rejects_unsupported_terms(self, mbox_path):
+		"""Test free text and unknown operators are rejected rather than ignored."""
+		box = Mailbox.load(mbox_path)
+
+		with pytest.raises(QueryError):
+			box.search('parcel')
+		with pytest.raises(QueryError):
+			box.search('has:attachment')
+
+
+class TestGmailEmulator:
+	"""Tests for GmailEmulator."""
+
+	def test_gmail_notifier_reads_and_marks_emails(self, emulator):
+		"""Test GmailNotifier works end to end against the emulator."""
+		notifier = GmailNotifier(oauth_token=replay_token(), api_endpoint=emulator.url)
+
+		first = notifier.get_unread_email_content(label=LABEL)
+		assert first is not None
+		assert first.subject == 'Re: Parcel held'
+		assert first.body == 'Re: Parcel held body'
+		notifier.mark_as_read(first.id)
+
+		second = notifier.get_unread_email_content(label=LABEL)
+		assert second is not None
+		assert second.subject == 'Parcel held'
+		notifier.mark_as_read(second.id)
+
+		assert notifier.get_unread_email_content(label=LABEL) is None
+
+	def test_gmail_notifier_reads_threads(self, emulator):
+		"""Test thread mode notifies the latest message and marks the whole thread as read."""
+		notifier = GmailNotifier(oauth_token=replay_token(), api_endpoint=emulator.url)
+
+		content = notifier.get_unread_thread_content(label=LABEL)
+		assert content is not None
+		assert content.subject == 'Re: Parcel held'
+		assert content.thread_id is not None
+		notifier.mark_thread_as_read(content.thread_id)
+
+		assert notifier.get_unread_thread_content(label=LABEL) is None
+
+	def test_batch_modify_is_recorded_in_history(self, emulator):
+		"""Test batchModify changes labels and history.list reports the changes."""
+		start = emulator.mailbox.history_id
+		ids = [item['id'] for item in _call(emulator, 'messages?q=is:unread')['messages']]
+
+		assert _call(emulator, 'messages/batchModify', {'ids': ids, 'removeLabelIds': ['UNREAD']}) is None
+
+		assert 'messages' not in _call(emulator, 'messages?q=is:unread')
+		history = _call(emulator, f'history?startHistoryId={start}&historyTypes=labelRemoved&labelId=UNREAD')
+		assert len(history['history']) == 3
+		assert all(record['labelsRemoved'][0]['labelIds'] == ['UNREAD'] for record in history['history'])
+		assert int(history['historyId']) == start + 3
+
+	def test_inserted_messages_are_in_history(self, emulator):
+		"""Test messages.insert adds an unread message and a messagesAdded record."""
+		start = emulator.mailbox.history_id
+		raw = base64.urlsafe_b64encode(_message('Parcel delivered').as_bytes()).decode('ascii')
+
+		inserted = _call(emulator, 'messages', {'raw': raw, 'labelIds': ['UNREAD', LABEL]})
+
+		history = _call(emulator, f'history?startHistoryId={start}')
+		assert history['history'][0]['messagesAdded'][0]['message']['id'] == inserted['id']
+		assert set(inserted['labelIds']) == {'UNREAD', 'Label_1'}
+
+	def test_formats_and_paging(self, emulator):
+		"""Test the get formats and list pages."""
+		page = _call(emulator, f'messages?q=label:{LABEL}&maxResults=2')
+		assert len(page['messages']) == 2
+		rest = _call(emulator, f'messages?q=label:{LABEL}&maxResults=2&pageToken={page["nextPageToken"]}')
+		assert len(rest['messages']) == 1
+		assert 'nextPageToken' not in rest
+
+		msg_id = page['messages'][0]['id']
+		metadata = _call(emulator, f'messages/{msg_id}?format=metadata&metadataHeaders=Subject')
+		assert metadata['payload']['headers'] == [{'name': 'Subject', 'value': 'Re: Parcel held'}]
+		assert 'payload' not in _call(emulator, f'messages/{msg_id}?format=minimal')
+		raw = _call(emulator, f'messages/{msg_id}?format=raw')['raw']
+		assert b'Subject: Re: Parcel held' in base64.urlsafe_b64decode(raw)
+
+	def test_errors_use_gmail_format(self, emulator):
+		"""Test unknown IDs and unsupported queries are answered like Gmail."""
+		with pytest.raises(urllib.error.HTTPError) as not_found:
+			_call(emulator, 'messages/missing')
+		with pytest.raises(urllib.error.HTTPError) as bad_request:
+			_call(emulator, 'messages?q=has:attachment')
+
+		assert not_found.value.code == 404
+		assert json.loads(not_found.value.read())['error']['status'] == 'NOT_FOUND'
+		assert bad_request.value.code == 400
@@ -0,0 +1,85 @@
+"""Tests for errors module."""
+
+import json
+from unittest.mock import Mock
+
+import pytest
+import requests
+from google.auth.exceptions import RefreshError
+from googleapiclient.errors import HttpError
+
+from src.errors import AuthError, NotifierError, QuotaError, RetryClass, classify, classify_status, describe
+
+
+def _http_error(status, reason=''):
+	content = json.dumps({'error': {'code': status, 'message': 'error', 'errors': [{'reason': reason}]}}).encode()
+	return HttpError(Mock(status=status, reason=''), content)
+
+
+def _requests_error(status):
+	response = requests.Response()
+	response.status_code = status
+	return requests.HTTPError(response=response)
+
+
+class TestClassify:
+	"""Tests for classify and classify_status."""
+
+	@pytest.mark.parametrize(
+		('status', 'expected'),
+		[
+			(400, RetryClass.PERMANENT),
+			(401, RetryClass.AUTH),
+			(403, RetryClass.AUTH),
+			(404, RetryClass.PERMANENT),
+			(408, RetryClass.TRANSIENT),
+			(429, RetryClass.QUOTA),
+			(500, RetryClass.TRANSIENT),
+			(503, RetryClass.TRANSIENT),
+		],
+	)
+	def test_classify_status(self, status, expected):
+		"""Test HTTP status codes map to retry classes."""
+		assert classify_status(status) == expected
+
+	def test_gmail_quota_reason_on_403(self):
+		"""Test a Gmail 403 with a rate limit reason is a quota error, not an auth error."""
+		assert classify(_http_error(403, 'userRateLimitExceeded')) == RetryClass.QUOTA
+		assert classify(_http_error(403, 'insufficientPermissions')) == RetryClass.AUTH
+
+	def test_gmail_error_info_reason(self):
+		"""Test quota reasons in ErrorInfo details are recognized."""
+		content = json.dumps(
+			{'error': {'code': 403, 'message': 'Quota exceeded', 'details': [{'reason': 'RATE_LIMIT_EXCEEDED'}]}}
+		).encode()
+		assert classify(HttpError(Mock(status=403, reason=''), content)) == RetryClass.QUOTA
+
+	def test_gmail_not_found_is_permanent(self):
+		"""Test a deleted message is a permanent error."""
+		assert classify(_http_error(404, 'notFound')) == RetryClass.PERMANENT
+
+	def test_requests_errors(self):
+		"""Test requests HTTP and connection errors are classified."""
+		assert classify(_requests_error(429)) == RetryClass.QUOTA
+		assert classify(_requests_error(502)) == RetryClass.TRANSIENT
+		assert classify(requests.ConnectionError('reset')) == RetryClass.TRANSIENT
+		assert classify(requests.Timeout('slow')) == RetryClass.TRANSIENT
+
+	def test_other_errors(self):
+		"""Test typed, auth library and unknown errors are classified."""
+		assert classify(QuotaError('limit')) == RetryClass.QUOTA
+		assert classify(NotifierError('override', RetryClass.TRANSIENT)) == RetryClass.TRANSIENT
+		assert classify(RefreshError('invalid_grant')) == RetryClass.AUTH
+		assert classify(TimeoutError()) == RetryClass.TRANSIENT
+		assert classify(KeyError('subject')) == RetryClass.PERMANENT
+
+	def test_retryable(self):
+		"""Test only quota and transient errors are retryable."""
+		assert [retry_class for retry_class in RetryClass if retry_class.retryable] == [
+			RetryClass.QUOTA,
+			RetryClass.TRANSIENT,
+		]
+
+	def test_describe(self):
+		"""Test errors are described with their retry class."""
+		assert describe(AuthError('token expired')) == '[auth] token expired'
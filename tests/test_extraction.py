@@ -0,0 +1,53 @@
+"""Tests for extraction module."""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from src.extraction import extract_messages
+from src.gmail_notifier import GmailNotifier
+
+
+class TestExtractMessages:
+	"""Tests for extract_messages."""
+
+	def test_serial_below_threshold(self, synthetic_mailbox):
+		"""Test small batches are extracted without any pool."""
+		messages = synthetic_mailbox[:10]
+
+		with (
+			patch('src.extraction.ProcessPoolExecutor') as mock_process_pool,
+			patch('src.extraction.ThreadPoolExecutor') as mock_thread_pool,
+		):
+			results = extract_messages(messages, serial_threshold=64)
+
+		mock_process_pool.assert_not_called()
+		mock_thread_pool.assert_not_called()
+		assert results == [GmailNotifier.extract_email_content(message) for message in messages]
+
+	def test_thread_pool_for_small_payloads(self, synthetic_mailbox):
+		"""Test small payloads use threads and keep input order."""
+		messages = synthetic_mailbox[:200]
+
+		with (
+			patch('src.extraction.ProcessPoolExecutor') as mock_process_pool,
+			patch('src.extraction.ThreadPoolExecutor', wraps=ThreadPoolExecutor) as mock_thread_pool,
+		):
+			results = extract_messages(messages, max_workers=4, chunk_size=7, process_min_bytes=10**12)
+
+		mock_process_pool.assert_not_called()
+		mock_thread_pool.assert_called_once_with(max_workers=4)
+		assert [result.id for result in results] == [message['id'] for message in messages]
+
+	def test_process_pool_for_large_payloads(self, synthetic_mailbox):
+		"""Test large payloads fan out to processes and keep input order."""
+		results = extract_messages(synthetic_mailbox, max_workers=2, process_min_bytes=1)
+
+		assert results == [GmailNotifier.extract_email_content(message) for message in synthetic_mailbox]
+
+	def test_single_worker_is_serial(self, synthetic_mailbox):
+		"""Test a single worker never starts a pool."""
+		with patch('src.extraction.ThreadPoolExecutor') as mock_thread_pool:
+			results = extract_messages(synthetic_mailbox[:100], max_workers=1)
+
+		mock_thread_pool.assert_not_called()
+		assert len(results) == 100
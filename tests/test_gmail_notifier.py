@@ -2,18 +2,44 @@
 
 import base64
 import json
+import mailbox
+import os
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta
+from email.message import EmailMessage
 from unittest.mock import Mock, patch
+from zoneinfo import ZoneInfo
 
+import pytest
 import responses
-
-from src.gmail_notifier import GmailNotifier, LineNotifier, SlackNotifier
+from googleapiclient.errors import HttpError
+
+from src.config import AppConfig
+from src.email_content import EmailContent
+from src.errors import AuthError
+from src.gmail_notifier import (
+	QUOTA_RETRIES,
+	GmailNotifier,
+	LineNotifier,
+	SlackNotifier,
+	check_and_notify,
+	latest_unread_message,
+	main,
+)
+from src.message_cache import MessageCache
+from src.quota import QuotaLedger
+from src.report import Outcome
+from src.settings import FilterSettings
+from tests.fixtures.mailbox_generator import MESSAGE_KINDS, iter_mailbox
+from tests.fixtures.mock_data import create_test_email_content
 
 
 class TestGmailNotifier:
 	"""Tests for GmailNotifier class."""
 
 	@patch('src.gmail_notifier.build')
-	@patch('src.gmail_notifier.pickle')
+	@patch('src.credentials.pickle')
 	def test_init_with_oauth_token(self, mock_pickle, mock_build):
 		"""Test GmailNotifier initialization with OAuth token."""
 		# Mock OAuth token
@@ -24,10 +50,10 @@ class TestGmailNotifier:
 		GmailNotifier(oauth_token=oauth_token)
 
 		mock_pickle.loads.assert_called_once()
-		mock_build.assert_called_once_with('gmail', 'v1', credentials=mock_creds)
+		mock_build.assert_called_once_with('gmail', 'v1', credentials=mock_creds, client_options={'api_endpoint': None})
 
 	@patch('src.gmail_notifier.build')
-	@patch('src.gmail_notifier.pickle')
+	@patch('src.credentials.pickle')
 	def test_get_unread_family_package_emails_no_messages(self, mock_pickle, mock_build):
 		"""Test get_unread_family_package_emails when no messages found."""
 		mock_service = Mock()
@@ -49,7 +75,7 @@ class TestGmailNotifier:
 		assert calls[-1] == ((), {'userId': 'me', 'q': expected_query, 'maxResults': 1})
 
 	@patch('src.gmail_notifier.build')
-	@patch('src.gmail_notifier.pickle')
+	@patch('src.credentials.pickle')
 	def test_get_unread_family_package_emails_with_message(self, mock_pickle, mock_build):
 		"""Test get_unread_family_package_emails when message is found."""
 		mock_service = Mock()
@@ -75,6 +101,126 @@ class TestGmailNotifier:
 		assert len(calls) > 0
 		assert calls[-1] == ((), {'userId': 'me', 'id': 'test_id'})
 
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_get_unread_email_content_applies_filters(self, mock_pickle, mock_build):
+		"""Test the filters are part of the list query, so other emails are never fetched."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().messages().list().execute.return_value = {}
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(
+			oauth_token=oauth_token, filters=FilterSettings(senders=('example.jp',), newer_than='3d')
+		)
+
+		assert notifier.get_unread_email_content(label='Family/parcels') is None
+		calls = mock_service.users().messages().list.call_args_list
+		expected_query = 'label:"Family/parcels" is:unread from:example.jp newer_than:3d'
+		assert calls[-1] == ((), {'userId': 'me', 'q': expected_query, 'maxResults': 1})
+		mock_service.users().messages().get.assert_not_called()
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_list_message_ids_with_page_token(self, mock_pickle, mock_build):
+		"""Test list_message_ids passes the page token and returns the next one."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().messages().list().execute.return_value = {
+			'messages': [{'id': 'a'}, {'id': 'b'}],
+			'nextPageToken': 'next',
+		}
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(oauth_token=oauth_token)
+
+		ids, next_page_token = notifier.list_message_ids('label:test', page_token='current', max_results=50)
+
+		assert ids == ['a', 'b']
+		assert next_page_token == 'next'
+		calls = mock_service.users().messages().list.call_args_list
+		assert calls[-1] == ((), {'userId': 'me', 'q': 'label:test', 'maxResults': 50, 'pageToken': 'current'})
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_get_unread_thread_content(self, mock_pickle, mock_build):
+		"""Test a thread is fetched in one call and its latest unread message is extracted."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().threads().list().execute.return_value = {'threads': [{'id': 'thread_1'}]}
+
+		def message(msg_id, subject, internal_date):
+			headers = [{'name': 'Subject', 'value': subject}]
+			return {
+				'id': msg_id,
+				'threadId': 'thread_1',
+				'labelIds': ['UNREAD'],
+				'internalDate': internal_date,
+				'payload': {'headers': headers, 'body': {}},
+			}
+
+		mock_service.users().threads().get().execute.return_value = {
+			'id': 'thread_1',
+			'messages': [message('m1', 'Notice', '1000'), message('m2', 'Reminder', '2000')],
+		}
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(oauth_token=oauth_token)
+
+		result = notifier.get_unread_thread_content(label='Family/parcels')
+
+		assert result is not None
+		assert (result.id, result.thread_id, result.subject) == ('m2', 'thread_1', 'Reminder')
+		assert mock_service.users().threads().list.call_args_list[-1] == (
+			(),
+			{'userId': 'me', 'q': 'label:"Family/parcels" is:unread', 'maxResults': 1},
+		)
+		assert mock_service.users().threads().get.call_args_list[-1] == ((), {'userId': 'me', 'id': 'thread_1'})
+		assert notifier.quota.usage.calls == {'threads.list': 1, 'threads.get': 1}
+
+	def test_latest_unread_message(self):
+		"""Test read messages are skipped unless the whole thread is read."""
+		read = {'id': 'reply', 'labelIds': ['SENT'], 'internalDate': '3000'}
+		unread = [
+			{'id': 'late', 'labelIds': ['UNREAD'], 'internalDate': '2000'},
+			{'id': 'early', 'labelIds': ['UNREAD'], 'internalDate': '1000'},
+		]
+
+		assert latest_unread_message({'messages': [*unread, read]})['id'] == 'late'
+		assert latest_unread_message({'messages': [read, {'id': 'old', 'internalDate': '10'}]})['id'] == 'reply'
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_get_email_content_uses_cache(self, mock_pickle, mock_build, tmp_path):
+		"""Test a cached message is not fetched from Gmail again."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().messages().get().execute.return_value = {
+			'id': 'test_id',
+			'historyId': '42',
+			'payload': {'headers': [], 'body': {'data': base64.urlsafe_b64encode(b'Cached body').decode()}},
+		}
+		mock_service.users().messages().get.reset_mock()
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(oauth_token=oauth_token, cache=MessageCache(str(tmp_path)))
+
+		first = notifier.get_email_content('test_id')
+		second = notifier.get_email_content('test_id')
+
+		assert first == second
+		assert second.body == 'Cached body'
+		assert mock_service.users().messages().get.call_count == 1
+
+		# A new BODY_MAX_LENGTH makes the cached body stale
+		shorter = GmailNotifier(oauth_token=oauth_token, cache=MessageCache(str(tmp_path)), body_max_length=6)
+		assert shorter.get_email_content('test_id').body == 'Cached'
+		assert mock_service.users().messages().get.call_count == 2
+
 	def test_extract_email_content(self):
 		"""Test extract_email_content method."""
 		message = {
@@ -91,10 +237,47 @@ class TestGmailNotifier:
 		notifier = GmailNotifier.__new__(GmailNotifier)
 		result = notifier.extract_email_content(message)
 
-		assert result['id'] == 'test_id'
-		assert result['subject'] == 'Test Subject'
-		assert result['from'] == 'test@example.com'
-		assert result['body'] == 'Test body content'
+		assert result.id == 'test_id'
+		assert result.subject == 'Test Subject'
+		assert result.sender == 'test@example.com'
+		assert result.body == 'Test body content'
+
+	def test_extract_email_content_decodes_headers(self):
+		"""Test header names are matched case-insensitively and encoded words are decoded."""
+		message = {
+			'id': 'test_id',
+			'payload': {
+				'headers': [
+					{'name': 'subject', 'value': '=?UTF-8?B?44GK6I2354mp?='},
+					{'name': 'FROM', 'value': 'test@example.com'},
+				],
+				'body': {},
+			},
+		}
+
+		result = GmailNotifier.extract_email_content(message)
+
+		assert result.subject == 'お荷物'
+		assert result.sender == 'test@example.com'
+
+	def test_extract_email_content_summary_and_truncation(self):
+		"""Test key fields come from the full body even when it is truncated."""
+		body = 'お知らせ\n' * 200 + 'お問い合わせ伝票番号: 1234-5678-9012\n保管期限: 3月15日\n'
+		message = {
+			'id': 'test_id',
+			'payload': {
+				'headers': [{'name': 'From', 'value': 'ヤマト運輸 <info@kuronekoyamato.example.jp>'}],
+				'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+			},
+		}
+
+		result = GmailNotifier.extract_email_content(message, body_max_length=100)
+
+		assert len(result.body) == 100
+		assert result.carrier == 'ヤマト運輸'
+		assert result.tracking_number == '1234-5678-9012'
+		assert result.deadline == '3月15日'
+		assert result.redelivery_url is None
 
 	def test_extract_body_with_parts(self):
 		"""Test _extract_body with multipart message."""
@@ -111,8 +294,49 @@ class TestGmailNotifier:
 
 		assert result == 'Part 1 Part 3'
 
+	def test_extract_body_nested_charset_and_html(self):
+		"""Test nested parts are decoded with their charset, and HTML is used only without plain text."""
+
+		def part(mime_type, text, charset='utf-8', **extra):
+			return {
+				'mimeType': mime_type,
+				'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="{charset}"'}],
+				'body': {'data': base64.urlsafe_b64encode(text.encode(charset)).decode()},
+				**extra,
+			}
+
+		html = part(
+			'text/html', '<html><head><title>件名</title></head><body><p>不在票</p><p>伝票番号</p></body></html>'
+		)
+		nested = {
+			'mimeType': 'multipart/mixed',
+			'parts': [
+				{'mimeType': 'multipart/alternative', 'parts': [part('text/plain', 'ご不在連絡', 'iso-2022-jp'), html]},
+				part('text/plain', '添付ファイル', filename='note.txt'),
+				{'mimeType': 'text/plain', 'filename': '', 'body': {'attachmentId': 'att_1', 'size': 10}},
+			],
+		}
+
+		assert GmailNotifier._extract_body(nested) == 'ご不在連絡'
+		assert GmailNotifier._extract_body(html) == '不在票\n\n伝票番号'
+		assert GmailNotifier._extract_body(part('text/plain', '保管期限', 'shift_jis')) == '保管期限'
+
+	def test_extract_email_content_synthetic_mailbox(self):
+		"""Test extract_email_content reads the notice text of every synthetic message kind."""
+		kinds_and_messages = list(iter_mailbox(count=300, seed=0))
+
+		results = [GmailNotifier.extract_email_content(message) for _, message in kinds_and_messages]
+
+		assert {kind for kind, _ in kinds_and_messages} == set(MESSAGE_KINDS)
+		for (kind, message), result in zip(kinds_and_messages, results, strict=True):
+			assert result.id == message['id']
+			assert len(result.body) <= 500
+			assert '伝票番号' in result.body, kind
+			assert '<' not in result.body, kind
+			assert result.tracking_number is not None, kind
+
 	@patch('src.gmail_notifier.build')
-	@patch('src.gmail_notifier.pickle')
+	@patch('src.credentials.pickle')
 	def test_mark_as_read(self, mock_pickle, mock_build):
 		"""Test mark_as_read method."""
 		mock_service = Mock()
@@ -130,6 +354,93 @@ class TestGmailNotifier:
 		assert len(calls) > 0
 		assert calls[-1] == ((), {'userId': 'me', 'id': 'test_id', 'body': {'removeLabelIds': ['UNREAD']}})
 
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_mark_thread_as_read(self, mock_pickle, mock_build):
+		"""Test the whole thread is marked as read with one threads.modify call."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(oauth_token=oauth_token)
+
+		notifier.mark_thread_as_read('thread_1')
+
+		calls = mock_service.users().threads().modify.call_args_list
+		assert calls[-1] == ((), {'userId': 'me', 'id': 'thread_1', 'body': {'removeLabelIds': ['UNREAD']}})
+		assert notifier.quota.usage.calls == {'threads.modify': 1}
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_mark_as_read_raises(self, mock_pickle, mock_build):
+		"""Test mark_as_read errors are raised instead of being swallowed."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().messages().modify().execute.side_effect = ConnectionError('reset')
+
+		mock_pickle.loads.return_value = Mock()
+		oauth_token = base64.b64encode(b'test_token').decode('utf-8')
+		notifier = GmailNotifier(oauth_token=oauth_token)
+
+		with pytest.raises(ConnectionError):
+			notifier.mark_as_read('test_id')
+
+	@patch('src.gmail_notifier.ATTACHMENT_DECODE_CHUNK', 8)
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_download_attachment_decodes_in_chunks(self, mock_pickle, mock_build, tmp_path):
+		"""Test attachment data is decoded chunk by chunk, including unpadded base64url."""
+		data = bytes(range(256)) * 3 + b'tail'
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		encoded = base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+		mock_service.users().messages().attachments().get().execute.return_value = {'size': len(data), 'data': encoded}
+
+		mock_pickle.loads.return_value = Mock()
+		quota = QuotaLedger()
+		notifier = GmailNotifier(oauth_token=base64.b64encode(b'test_token').decode('utf-8'), quota=quota)
+		path = tmp_path / 'attachment'
+
+		assert notifier.download_attachment('test_id', 'att1', str(path)) == len(data)
+		assert path.read_bytes() == data
+		assert quota.usage.calls == {'attachments.get': 1}
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_quota_error_is_retried_slower(self, mock_pickle, mock_build):
+		"""Test a 429 slows the quota ledger down and the call is retried."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		rate_limited = HttpError(Mock(status=429, reason=''), b'{}')
+		mock_service.users().messages().get().execute.side_effect = [rate_limited, {'id': 'test_id'}]
+
+		mock_pickle.loads.return_value = Mock()
+		quota = QuotaLedger(50, sleep=Mock())
+		notifier = GmailNotifier(oauth_token=base64.b64encode(b'test_token').decode('utf-8'), quota=quota)
+
+		assert notifier.get_message('test_id') == {'id': 'test_id'}
+		assert quota.usage.calls == {'get': 2}
+		assert quota.usage.throttled == 1
+		# Halved by the quota error, then partly restored by the successful retry
+		assert quota.rate == 27.5
+
+	@patch('src.gmail_notifier.build')
+	@patch('src.credentials.pickle')
+	def test_quota_error_is_raised_after_retries(self, mock_pickle, mock_build):
+		"""Test a quota error that persists is raised after QUOTA_RETRIES retries."""
+		mock_service = Mock()
+		mock_build.return_value = mock_service
+		mock_service.users().messages().get().execute.side_effect = HttpError(Mock(status=429, reason=''), b'{}')
+
+		mock_pickle.loads.return_value = Mock()
+		quota = QuotaLedger(50, sleep=Mock())
+		notifier = GmailNotifier(oauth_token=base64.b64encode(b'test_token').decode('utf-8'), quota=quota)
+
+		with pytest.raises(HttpError):
+			notifier.get_message('test_id')
+		assert quota.usage.calls == {'get': QUOTA_RETRIES + 1}
+
 
 class TestLineNotifier:
 	"""Tests for LineNotifier class."""
@@ -146,7 +457,7 @@ class TestLineNotifier:
 		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={'message': 'ok'}, status=200)
 
 		notifier = LineNotifier('test_token', 'test_user_id')
-		email_content = {'id': 'test_id', 'subject': 'Test Subject', 'from': 'test@example.com', 'body': 'Test body'}
+		email_content = EmailContent('test_id', 'Test Subject', 'test@example.com', 'Test body')
 
 		notifier.send_notification(email_content)
 
@@ -164,6 +475,30 @@ class TestLineNotifier:
 		assert 'test@example.com' in body['messages'][0]['text']
 		assert 'Test body' in body['messages'][0]['text']
 
+	@responses.activate
+	def test_send_notification_with_summary(self):
+		"""Test key fields replace the body in the LINE message."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={'message': 'ok'}, status=200)
+
+		notifier = LineNotifier('test_token', 'test_user_id')
+		email_content = EmailContent(
+			'test_id',
+			'Test Subject',
+			'test@example.com',
+			'Long body text',
+			carrier='ヤマト運輸',
+			tracking_number='1234-5678-9012',
+		)
+
+		notifier.send_notification(email_content)
+
+		request = responses.calls[0].request
+		body_str = request.body.decode('utf-8') if isinstance(request.body, bytes) else request.body
+		body = json.loads(body_str) if body_str else {}
+		text = body['messages'][0]['text']
+		assert '運送会社: ヤマト運輸\n伝票番号: 1234-5678-9012' in text
+		assert 'Long body text' not in text
+
 
 class TestSlackNotifier:
 	"""Tests for SlackNotifier class."""
@@ -206,3 +541,206 @@ class TestSlackNotifier:
 		notifier.send_error_notification('Test error message')
 
 		assert len(responses.calls) == 1
+
+	@responses.activate
+	def test_send_error_notification_with_alerts_file_posts_each_error_once(self, tmp_path):
+		"""Test errors already posted are counted instead of posted again."""
+		responses.add(
+			responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True, 'ts': '1.0'}, status=200
+		)
+
+		notifier = SlackNotifier('test_token', 'test_channel', alerts_file=str(tmp_path / 'alerts.json'))
+		notifier.send_error_notification('Token expired for account 1')
+		notifier.send_error_notification('Token expired for account 2')
+
+		assert len(responses.calls) == 1
+		assert next(iter(notifier.alerts.records.values())).count == 2  # type: ignore[union-attr]
+
+
+class TestMain:
+	"""Tests for main function."""
+
+	@responses.activate
+	def test_failed_account_does_not_stop_others(self, mock_env_vars, tmp_path):
+		"""Test one failing mailbox is reported while the other is still delivered."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		env = {
+			'GOOGLE_OAUTH_TOKENS': '{"alice": "token_a", "bob": "token_b"}',
+			'GITHUB_OUTPUT': str(tmp_path / 'output'),
+			'GITHUB_STEP_SUMMARY': str(tmp_path / 'summary.md'),
+			'NOTIFIER_STATE_DIR': str(tmp_path / 'state'),
+		}
+
+		def create_notifier(**kwargs):
+			if kwargs['oauth_token'] == 'token_b':
+				raise AuthError('Token is expired and cannot be refreshed.')
+			notifier = Mock()
+			notifier.get_unread_email_content.return_value = create_test_email_content()
+			return notifier
+
+		with (
+			patch.dict(os.environ, env),
+			patch('src.gmail_notifier.GmailNotifier', side_effect=create_notifier),
+			pytest.raises(RuntimeError, match='1 of 2 messages failed'),
+		):
+			main([])
+
+		assert len(responses.calls) == 1
+		output = (tmp_path / 'output').read_text().splitlines()
+		assert output[:5] == ['status=failed', 'delivered=1', 'skipped=0', 'retry_later=0', 'failed=1']
+		assert 'quota=' in output[-1]
+		summary = (tmp_path / 'summary.md').read_text()
+		assert '| alice | custom_test_id | delivered |  |' in summary
+		assert '| bob | - | failed | [auth] Token is expired and cannot be refreshed. |' in summary
+
+	@responses.activate
+	def test_labels_are_routed_to_their_destinations(self, mock_env_vars, tmp_path):
+		"""Test each configured label is polled and delivered only to its routed destinations."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text(
+			'labels = ["Family/parcels", "Family/school"]\n\n[[routes]]\nlabel = "Family/school"\nsinks = ["file"]\n',
+			encoding='utf-8',
+		)
+		env = {
+			'NOTIFIER_CONFIG': str(settings_path),
+			'NOTIFY_FILE_PATH': str(tmp_path / 'notifications.jsonl'),
+			'GITHUB_OUTPUT': str(tmp_path / 'output'),
+			'NOTIFIER_STATE_DIR': str(tmp_path / 'state'),
+		}
+		emails = {'Family/parcels': replace(create_test_email_content(), id='parcel')}
+		emails['Family/school'] = replace(create_test_email_content(), id='school')
+		notifier = Mock()
+		notifier.get_unread_email_content.side_effect = lambda label: emails[label]
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			main([])
+
+		# The unrouted label goes to every destination, the routed one only to the file
+		assert len(responses.calls) == 1
+		lines = (tmp_path / 'notifications.jsonl').read_text().splitlines()
+		assert [json.loads(line)['id'] for line in lines] == ['parcel', 'school']
+		assert (tmp_path / 'output').read_text().startswith('status=success\n')
+
+	@responses.activate
+	def test_alert_summaries_are_posted_on_runs_without_errors(self, mock_env_vars, tmp_path):
+		"""Test repeats of an earlier alert are summarized in its thread even when the run succeeds."""
+		responses.add(responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True}, status=200)
+		state_dir = tmp_path / 'state'
+		state_dir.mkdir()
+		record = {
+			'message': '[auth] Token expired',
+			'thread_ts': '111.1',
+			'first_seen': 1.0,
+			'last_seen': time.time() - 60,
+			'summarized_at': 1.0,
+			'count': 3,
+			'unreported': 2,
+		}
+		(state_dir / 'alerts.json').write_text(json.dumps({'abc': record}), encoding='utf-8')
+		env = {'NOTIFIER_STATE_DIR': str(state_dir), 'GITHUB_OUTPUT': str(tmp_path / 'output')}
+		notifier = Mock()
+		notifier.get_unread_email_content.return_value = None
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			main([])
+
+		(call,) = responses.calls
+		body = json.loads(call.request.body or b'')
+		assert body['thread_ts'] == '111.1'
+		assert body['text'].startswith('Occurred 2 more times since')
+		assert json.loads((state_dir / 'alerts.json').read_text())['abc']['unreported'] == 0
+
+	def test_profile_writes_profile_and_summary(self, mock_env_vars, tmp_path):
+		"""Test --profile adds the cold-start profile to the step summary and writes the profile files."""
+		env = {
+			'GITHUB_OUTPUT': str(tmp_path / 'output'),
+			'GITHUB_STEP_SUMMARY': str(tmp_path / 'summary.md'),
+			'NOTIFIER_STATE_DIR': str(tmp_path / 'state'),
+		}
+		notifier = Mock()
+		notifier.get_unread_email_content.return_value = None
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			main(['--profile', str(tmp_path / 'profile')])
+
+		assert (tmp_path / 'profile' / 'profile.prof').exists()
+		summary = (tmp_path / 'summary.md').read_text()
+		assert '### Profile of src.gmail_notifier' in summary
+		assert 'Import of src.gmail_notifier:' in summary
+
+	@responses.activate
+	def test_group_by_thread_notifies_each_thread_once(self, mock_env_vars, tmp_path):
+		"""Test a thread found under two labels is delivered once and acknowledged as a whole."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text(
+			'labels = ["Family/parcels", "Family/urgent"]\ngroup_by_thread = true\n', encoding='utf-8'
+		)
+		env = {'NOTIFIER_CONFIG': str(settings_path), 'NOTIFIER_STATE_DIR': str(tmp_path / 'state')}
+		notifier = Mock()
+		notifier.get_unread_thread_content.return_value = create_test_email_content(thread_id='thread_1')
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			report = check_and_notify(AppConfig.from_env())
+
+		assert report.status() == 'success'
+		assert len(responses.calls) == 1
+		notifier.get_unread_email_content.assert_not_called()
+		notifier.mark_thread_as_read.assert_called_once_with('thread_1')
+		notifier.mark_as_read.assert_not_called()
+
+	@responses.activate
+	def test_quiet_hours_defer_then_send_digest(self, mock_env_vars, tmp_path):
+		"""Test emails found in quiet hours are marked as read and pushed as one digest afterwards."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text('[delivery]\nquiet_hours = "22:00-07:00"\n', encoding='utf-8')
+		env = {'NOTIFIER_CONFIG': str(settings_path), 'NOTIFIER_STATE_DIR': str(tmp_path / 'state')}
+		emails = iter([replace(create_test_email_content(), id=f'm{i}') for i in range(2)] + [None])
+		notifier = Mock()
+		notifier.get_unread_email_content.side_effect = lambda label: next(emails)
+		night = datetime(2025, 3, 10, 23, 0, tzinfo=ZoneInfo('Asia/Tokyo'))
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			config = AppConfig.from_env()
+			reports = [check_and_notify(config, night + timedelta(hours=hours)) for hours in (0, 1, 8)]
+
+		assert [report.status() for report in reports] == ['deferred', 'deferred', 'success']
+		assert notifier.mark_as_read.call_count == 2
+		assert len(responses.calls) == 1
+		texts = [message['text'] for message in json.loads(responses.calls[0].request.body or '')['messages']]
+		assert len(texts) == 1
+		assert texts[0].startswith('🌙 静かな時間帯に届いたメール (2件)')
+		assert [(result.message_id, result.outcome) for result in reports[2].results] == [
+			('m0', Outcome.DELIVERED),
+			('m1', Outcome.DELIVERED),
+		]
+
+	@responses.activate
+	def test_mbox_source_is_notified_with_gmail(self, mock_env_vars, tmp_path):
+		"""Test a [[sources]] mbox is polled and delivered next to the Gmail account, and reported under its name."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		message = EmailMessage()
+		message['From'] = 'notice@example.com'
+		message['Subject'] = 'Parcel held'
+		message.set_content('Parcel held body')
+		box = mailbox.mbox(str(tmp_path / 'archive.mbox'))
+		box.add(message)
+		box.close()
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text(
+			f'[[sources]]\nname = "archive"\ntype = "mbox"\npath = "{tmp_path / "archive.mbox"}"\n', encoding='utf-8'
+		)
+		env = {'NOTIFIER_CONFIG': str(settings_path), 'NOTIFIER_STATE_DIR': str(tmp_path / 'state')}
+		notifier = Mock()
+		notifier.get_unread_email_content.return_value = None
+
+		with patch.dict(os.environ, env), patch('src.gmail_notifier.GmailNotifier', return_value=notifier):
+			config = AppConfig.from_env()
+			reports = [check_and_notify(config) for _ in range(2)]
+
+		assert [(result.account, result.outcome) for result in reports[0].results] == [('archive', Outcome.DELIVERED)]
+		assert reports[1].results == []
+		texts = [message['text'] for message in json.loads(responses.calls[0].request.body or '')['messages']]
+		assert '件名: Parcel held' in texts[0]
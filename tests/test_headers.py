@@ -0,0 +1,66 @@
+"""Tests for headers module."""
+
+from datetime import datetime, timedelta, timezone
+
+from src.headers import HeaderIndex, decode_encoded_words
+from tests.fixtures.mock_data import MOCK_GMAIL_MESSAGE
+
+
+def _index(*headers):
+	return HeaderIndex({'name': name, 'value': value} for name, value in headers)
+
+
+class TestHeaderIndex:
+	"""Tests for HeaderIndex."""
+
+	def test_lookup_is_case_insensitive(self):
+		"""Test headers are found whatever the case of their name."""
+		headers = _index(('SUBJECT', 'Hello'), ('message-id', '<abc@example.jp>'))
+
+		assert headers.get('Subject') == 'Hello'
+		assert 'subject' in headers
+		assert headers.message_id == 'abc@example.jp'
+		assert headers.get('To') is None
+		assert headers.get('To', 'nobody') == 'nobody'
+
+	def test_repeated_headers_keep_order(self):
+		"""Test every value of a repeated header is kept, and get returns the first."""
+		headers = _index(('Received', 'a'), ('To', 'Alice <alice@example.com>'), ('Received', 'b'))
+
+		assert headers.get_all('received') == ['a', 'b']
+		assert headers.get('Received') == 'a'
+		assert len(headers) == 2
+
+	def test_addresses(self):
+		"""Test address headers are parsed into display names and addresses."""
+		headers = _index(('To', 'Alice <alice@example.com>, bob@example.com'), ('Cc', 'undisclosed-recipients:;'))
+
+		assert headers.addresses('To') == [('Alice', 'alice@example.com'), ('', 'bob@example.com')]
+		assert headers.addresses('Cc') == []
+
+	def test_date(self):
+		"""Test the Date header is parsed with its time zone, and invalid dates give None."""
+		headers = HeaderIndex.from_message(MOCK_GMAIL_MESSAGE)
+
+		assert headers.date == datetime(2024, 1, 1, 12, 0, tzinfo=timezone(timedelta(hours=9)))
+		assert _index(('Date', 'yesterday')).date is None
+		assert _index().date is None
+
+	def test_from_message_without_headers(self):
+		"""Test a message without headers gives an empty index."""
+		assert len(HeaderIndex.from_message({'id': 'x', 'payload': {}})) == 0
+
+
+class TestDecodeEncodedWords:
+	"""Tests for decode_encoded_words."""
+
+	def test_decodes_base64_and_quoted_printable(self):
+		"""Test RFC 2047 encoded words are decoded, including ISO-2022-JP."""
+		assert decode_encoded_words('=?UTF-8?B?44GK6I2354mp?=') == 'お荷物'
+		assert decode_encoded_words('=?ISO-2022-JP?B?GyRCJCoyWUoqGyhC?=') == 'お荷物'
+		assert decode_encoded_words('=?utf-8?q?caf=C3=A9?= ok') == 'café ok'
+
+	def test_undecodable_value_is_kept(self):
+		"""Test values with an unknown charset are returned unchanged."""
+		assert decode_encoded_words('=?x-unknown?B?YWJj?=') == '=?x-unknown?B?YWJj?='
+		assert decode_encoded_words('plain = text') == 'plain = text'
@@ -0,0 +1,19 @@
+"""Tests for html_text module."""
+
+from src.html_text import html_to_text
+
+
+class TestHtmlToText:
+	"""Tests for html_to_text."""
+
+	def test_block_elements_become_lines(self):
+		"""Test paragraphs and line breaks each start a new line."""
+		html = '<div><p>ご不在連絡</p><p>伝票番号: 1234<br>保管期限: 3月15日</p></div>'
+
+		assert html_to_text(html) == 'ご不在連絡\n\n伝票番号: 1234\n保管期限: 3月15日'
+
+	def test_hidden_content_and_entities(self):
+		"""Test head, style and script content is dropped and entities are unescaped."""
+		html = '<html><head><title>t</title><style>p {}</style></head><body><script>x()</script>A &amp; B</body></html>'
+
+		assert html_to_text(html) == 'A & B'
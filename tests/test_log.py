@@ -0,0 +1,128 @@
+"""Tests for log module."""
+
+import asyncio
+import json
+import logging
+import sys
+
+from src.log import CorrelationFilter, JsonFormatter, SamplingFilter, configure_logging, correlate, stop_logging
+from src.settings import LoggingSettings
+
+
+def _record(level: int = logging.INFO, msg: str = 'Email processed', **extra: object) -> logging.LogRecord:
+	record = logging.makeLogRecord({'name': 'src.test', 'levelno': level, 'levelname': logging.getLevelName(level)})
+	record.msg = msg
+	record.__dict__.update(extra)
+	return record
+
+
+class TestJsonFormatter:
+	"""Tests for JsonFormatter."""
+
+	def test_format_includes_extra_fields(self):
+		"""Test the event, level, logger and extra fields are written as one JSON object."""
+		line = JsonFormatter().format(_record(stage='notify', msg_id='m1', outcome='delivered'))
+
+		event = json.loads(line)
+		assert event['event'] == 'Email processed'
+		assert event['level'] == 'INFO'
+		assert event['logger'] == 'src.test'
+		assert event['stage'] == 'notify'
+		assert event['msg_id'] == 'm1'
+		assert event['outcome'] == 'delivered'
+		assert 'time' in event
+		assert 'exception' not in event
+		assert '\n' not in line
+
+	def test_format_includes_exception(self):
+		"""Test the traceback of a logged exception is written in the event."""
+		try:
+			raise ValueError('boom')
+		except ValueError:
+			record = _record(logging.ERROR, 'Failed', exc_info=sys.exc_info())
+
+		event = json.loads(JsonFormatter().format(record))
+
+		assert 'ValueError: boom' in event['exception']
+
+
+class TestCorrelation:
+	"""Tests for correlate and CorrelationFilter."""
+
+	def test_correlation_id_is_added_inside_context(self):
+		"""Test records get the correlation ID of the current context only."""
+		correlation = CorrelationFilter()
+		with correlate('m1'):
+			inside = _record()
+			correlation.filter(inside)
+		outside = _record()
+		correlation.filter(outside)
+
+		assert vars(inside)['correlation_id'] == 'm1'
+		assert vars(outside)['correlation_id'] is None
+
+	def test_correlation_id_follows_asyncio_tasks(self):
+		"""Test tasks created inside the context log with its correlation ID."""
+		correlation = CorrelationFilter()
+
+		async def log() -> str | None:
+			record = _record()
+			correlation.filter(record)
+			correlation_id: str | None = vars(record)['correlation_id']
+			return correlation_id
+
+		async def run() -> list[str | None]:
+			with correlate('m2'):
+				return list(await asyncio.gather(log(), log()))
+
+		assert asyncio.run(run()) == ['m2', 'm2']
+
+
+class TestSamplingFilter:
+	"""Tests for SamplingFilter."""
+
+	def test_only_sampled_levels_are_dropped(self):
+		"""Test a rate keeps that share of its level and other levels are always kept."""
+		samples = iter([0.05, 0.5])
+		sampling = SamplingFilter({logging.INFO: 0.1}, sample=lambda: next(samples))
+
+		assert sampling.filter(_record(logging.INFO)) is True
+		assert sampling.filter(_record(logging.INFO)) is False
+		assert sampling.filter(_record(logging.ERROR)) is True
+
+
+class TestConfigureLogging:
+	"""Tests for configure_logging."""
+
+	def test_events_are_written_to_stdout(self, capsys):
+		"""Test events of the package are written as JSON once the queue is flushed."""
+		configure_logging(LoggingSettings(level='DEBUG'))
+		logger = logging.getLogger('src.test')
+		with correlate('m1'):
+			logger.debug('Sink delivered', extra={'stage': 'sink', 'sink': 'line'})
+		stop_logging()
+
+		event = json.loads(capsys.readouterr().out)
+		assert event['event'] == 'Sink delivered'
+		assert event['correlation_id'] == 'm1'
+		assert event['sink'] == 'line'
+
+	def test_level_and_sample_rates_apply(self, capsys):
+		"""Test events below the level and sampled away events are not written."""
+		configure_logging(LoggingSettings(format='text', level='INFO', sample_rates=(('WARNING', 0.0),)))
+		logger = logging.getLogger('src.test')
+		logger.debug('Hidden')
+		logger.warning('Sampled away')
+		logger.info('Shown')
+		stop_logging()
+
+		assert capsys.readouterr().out == 'Shown\n'
+
+	def test_reconfiguring_replaces_the_handler(self, capsys):
+		"""Test configuring twice does not write events twice."""
+		configure_logging(LoggingSettings(format='text'))
+		configure_logging(LoggingSettings(format='text'))
+		logging.getLogger('src.test').info('Once')
+		stop_logging()
+
+		assert capsys.readouterr().out == 'Once\n'
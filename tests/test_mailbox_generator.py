@@ -0,0 +1,56 @@
+"""Tests for the synthetic mailbox generator fixture."""
+
+import base64
+import random
+
+from tests.fixtures.mailbox_generator import MESSAGE_KINDS, generate_mailbox, generate_message, iter_mailbox
+
+
+def _walk(payload):
+	yield payload
+	for part in payload.get('parts', []):
+		yield from _walk(part)
+
+
+class TestMailboxGenerator:
+	"""Tests for generate_mailbox and generate_message."""
+
+	def test_generate_mailbox_is_deterministic(self):
+		"""Test the same seed produces the same corpus."""
+		assert generate_mailbox(count=50, seed=7) == generate_mailbox(count=50, seed=7)
+		assert generate_mailbox(count=50, seed=7) != generate_mailbox(count=50, seed=8)
+
+	def test_synthetic_mailbox_covers_all_kinds(self, synthetic_mailbox):
+		"""Test the session fixture contains every message kind."""
+		assert len(synthetic_mailbox) == 1000
+		assert {kind for kind, _ in iter_mailbox(count=1000, seed=0)} == set(MESSAGE_KINDS)
+		assert len({message['id'] for message in synthetic_mailbox}) == 1000
+
+	def test_messages_have_only_gmail_api_keys(self, synthetic_mailbox):
+		"""Test generated messages carry no keys the Gmail API never returns."""
+		keys = {'id', 'threadId', 'labelIds', 'snippet', 'historyId', 'internalDate', 'sizeEstimate', 'payload'}
+
+		assert all(message.keys() == keys for message in synthetic_mailbox)
+
+	def test_nested_mixed_has_attachments(self):
+		"""Test nested multipart messages carry attachment references."""
+		message = generate_message(random.Random(0), 1, kind='nested_mixed')
+		parts = list(_walk(message['payload']))
+
+		assert message['payload']['mimeType'] == 'multipart/mixed'
+		assert any(part['mimeType'] == 'multipart/alternative' for part in parts)
+		attachments = [part for part in parts if part['filename']]
+		assert attachments
+		assert all('attachmentId' in part['body'] for part in attachments)
+
+	def test_mixed_charset_body_is_encoded_in_declared_charset(self):
+		"""Test mixed-charset parts decode with their declared charset."""
+		message = generate_message(random.Random(0), 2, kind='mixed_charset')
+		text_part = message['payload']['parts'][0]
+		content_type = next(h['value'] for h in text_part['headers'] if h['name'] == 'Content-Type')
+		charset = content_type.split('charset="')[1].rstrip('"')
+
+		decoded = base64.urlsafe_b64decode(text_part['body']['data']).decode(charset)
+
+		assert charset != 'utf-8'
+		assert '伝票番号' in decoded
@@ -0,0 +1,97 @@
+"""Tests for message_cache module."""
+
+import json
+import os
+import time
+from datetime import timedelta
+
+from src.email_content import EmailContent
+from src.message_cache import MessageCache
+
+
+def _content(msg_id, body='body'):
+	return EmailContent(msg_id, 'Subject', 'test@example.com', body)
+
+
+class TestMessageCache:
+	"""Tests for MessageCache."""
+
+	def test_put_and_get(self, tmp_path):
+		"""Test stored content is returned on the next lookup."""
+		cache = MessageCache(str(tmp_path))
+		cache.put('abc123', '1000', _content('abc123'))
+
+		assert cache.get('abc123') == _content('abc123')
+		assert cache.get('missing') is None
+
+	def test_get_survives_new_instance(self, tmp_path):
+		"""Test entries persist between runs."""
+		MessageCache(str(tmp_path)).put('abc123', '1000', _content('abc123'))
+
+		assert MessageCache(str(tmp_path)).get('abc123') == _content('abc123')
+
+	def test_get_with_different_history_id_is_stale(self, tmp_path):
+		"""Test an entry for another historyId is not returned."""
+		cache = MessageCache(str(tmp_path))
+		cache.put('abc123', '1000', _content('abc123'))
+
+		assert cache.get('abc123', history_id='1000') == _content('abc123')
+		assert cache.get('abc123', history_id='2000') is None
+
+	def test_get_with_different_body_max_length_is_stale(self, tmp_path):
+		"""Test an entry whose body was cut to another length is not returned."""
+		cache = MessageCache(str(tmp_path))
+		cache.put('abc123', '1000', _content('abc123'), body_max_length=500)
+
+		assert cache.get('abc123', body_max_length=500) == _content('abc123')
+		assert cache.get('abc123', body_max_length=1000) is None
+
+	def test_expired_entry_is_removed(self, tmp_path):
+		"""Test entries older than the TTL are dropped."""
+		cache = MessageCache(str(tmp_path), ttl=timedelta(hours=1))
+		cache.put('abc123', '1000', _content('abc123'))
+		path = tmp_path / 'abc123.json'
+		entry = json.loads(path.read_text())
+		entry['stored_at'] = time.time() - 7200
+		path.write_text(json.dumps(entry))
+
+		assert cache.get('abc123') is None
+		assert not path.exists()
+
+	def test_malformed_entry_is_a_miss(self, tmp_path):
+		"""Test entries with valid JSON but the wrong shape are dropped."""
+		cache = MessageCache(str(tmp_path))
+		for msg_id, entry in [
+			('no-content', {'history_id': '1000', 'stored_at': time.time()}),
+			('bad-content', {'history_id': '1000', 'stored_at': time.time(), 'content': {'subject': 'Subject'}}),
+			(
+				'bad-date',
+				{'history_id': None, 'stored_at': time.time(), 'content': {**_content('x').to_dict(), 'date': 'x'}},
+			),
+			('not-a-dict', ['abc']),
+		]:
+			path = tmp_path / f'{msg_id}.json'
+			path.write_text(json.dumps(entry))
+
+			assert cache.get(msg_id) is None
+			assert not path.exists()
+
+	def test_evicts_least_recently_used(self, tmp_path):
+		"""Test the least recently used entry is evicted when over max_bytes."""
+		cache = MessageCache(str(tmp_path), max_bytes=900)
+		cache.put('a', None, _content('a', 'x' * 200))
+		cache.put('b', None, _content('b', 'x' * 200))
+		cache.get('a')
+		cache.put('c', None, _content('c', 'x' * 200))
+
+		assert cache.get('b') is None
+		assert cache.get('a') is not None
+		assert cache.get('c') is not None
+
+	def test_unsafe_message_id_stays_in_directory(self, tmp_path):
+		"""Test message IDs cannot escape the cache directory."""
+		cache = MessageCache(str(tmp_path))
+		cache.put('../evil', None, _content('../evil'))
+
+		assert os.listdir(tmp_path) == ['___evil.json']
+		assert cache.get('../evil') == _content('../evil')
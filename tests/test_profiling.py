@@ -0,0 +1,82 @@
+"""Tests for profiling module."""
+
+import json
+import pstats
+
+import pytest
+
+from src.profiling import IMPORT_TIME_FILE, PROFILE_FILE, ImportTime, Profiler, parse_import_times, phase, profiled
+
+IMPORT_TIME_LOG = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 | site
+import time:        30 |         30 |     json.scanner
+import time:       200 |        230 |   json.decoder
+import time:        50 |         50 |   json.encoder
+import time:        40 |        320 | json
+import time:        10 |         10 |   src
+import time:       500 |        830 | src.gmail_notifier
+"""
+
+
+class TestParseImportTimes:
+	"""Tests for parse_import_times."""
+
+	def test_module_and_direct_imports(self):
+		"""Test the module is found with its direct imports only, slowest first."""
+		imported, direct = parse_import_times(IMPORT_TIME_LOG, 'json')
+
+		assert imported == ImportTime('json', 40, 320)
+		assert direct == [ImportTime('json.decoder', 200, 230), ImportTime('json.encoder', 50, 50)]
+
+	def test_siblings_are_not_children(self):
+		"""Test imports of an earlier top-level module are not counted as direct imports."""
+		imported, direct = parse_import_times(IMPORT_TIME_LOG, 'src.gmail_notifier')
+
+		assert imported == ImportTime('src.gmail_notifier', 500, 830)
+		assert direct == [ImportTime('src', 10, 10)]
+
+	def test_missing_module(self):
+		"""Test a module that was not imported is reported as None."""
+		assert parse_import_times(IMPORT_TIME_LOG, 'yaml') == (None, [])
+
+
+class TestProfiler:
+	"""Tests for Profiler."""
+
+	def test_profiled_writes_files_and_summary(self, tmp_path):
+		"""Test phases, functions and allocations of the block are written to the profile and summary."""
+		summary = tmp_path / 'summary.md'
+
+		with profiled('json', str(tmp_path / 'profile'), str(summary)) as profiler:
+			for _ in range(2):
+				with phase('gmail list'):
+					json.dumps([{'id': str(i)} for i in range(1000)])
+
+		assert profiler.phases['gmail list'].calls == 2
+		assert pstats.Stats(str(tmp_path / 'profile' / PROFILE_FILE)).get_stats_profile().func_profiles
+		assert 'import time:' in (tmp_path / 'profile' / IMPORT_TIME_FILE).read_text()
+		text = summary.read_text()
+		assert '### Profile of json' in text
+		assert 'Import of json:' in text
+		assert '| gmail list | 2 |' in text
+		assert '| Function | Calls | Cumulative ms | Own ms |' in text
+		assert '| Allocated at | KiB | Blocks |' in text
+
+	def test_profiled_writes_summary_when_the_block_fails(self, tmp_path):
+		"""Test a failed run still gets its profile."""
+		summary = tmp_path / 'summary.md'
+
+		with pytest.raises(RuntimeError), profiled('json', str(tmp_path), str(summary)):
+			raise RuntimeError('check failed')
+
+		assert (tmp_path / PROFILE_FILE).exists()
+		assert '### Profile of json' in summary.read_text()
+
+	def test_record_accumulates_calls(self):
+		"""Test each call of a phase adds to its total and keeps the slowest."""
+		profiler = Profiler()
+		profiler.record('gmail get', 0.25)
+		profiler.record('gmail get', 0.5)
+
+		stats = profiler.phases['gmail get']
+		assert (stats.calls, stats.seconds, stats.slowest) == (2, 0.75, 0.5)
@@ -0,0 +1,111 @@
+"""Tests for query module."""
+
+from datetime import UTC, datetime
+
+import pytest
+
+from src.query import compile_query, format_size, matches_filters, minimal_senders, quote_term
+from src.settings import FilterSettings
+
+
+class TestQuoteTerm:
+	"""Tests for quote_term."""
+
+	@pytest.mark.parametrize(
+		('term', 'expected'),
+		[
+			('不在', '不在'),
+			('info@example.jp', 'info@example.jp'),
+			('お届け予定 変更', '"お届け予定 変更"'),
+			('key:value', '"key:value"'),
+			('say "hi"', '"say  hi"'),
+		],
+	)
+	def test_quote_term(self, term, expected):
+		"""Test only terms with spaces or query syntax are quoted."""
+		assert quote_term(term) == expected
+
+
+class TestMinimalSenders:
+	"""Tests for minimal_senders."""
+
+	def test_drops_covered_and_duplicate_senders(self):
+		"""Test addresses and subdomains of a listed domain, and duplicates, are dropped."""
+		senders = [
+			'Info@Yamato.example.jp',
+			'@yamato.example.jp',
+			'mail.yamato.example.jp',
+			'a@sagawa.example',
+			'A@sagawa.example',
+		]
+
+		assert minimal_senders(senders) == ['yamato.example.jp', 'a@sagawa.example']
+
+	def test_similar_domain_is_kept(self):
+		"""Test a domain that only ends with the same letters is not treated as covered."""
+		assert minimal_senders(['example.jp', 'notexample.jp']) == ['example.jp', 'notexample.jp']
+
+
+class TestCompileQuery:
+	"""Tests for compile_query."""
+
+	def test_without_filters(self):
+		"""Test empty filters leave the label query unchanged."""
+		assert compile_query('Family/parcels', FilterSettings(), 'is:unread') == 'label:"Family/parcels" is:unread'
+
+	def test_every_filter(self):
+		"""Test every filter becomes one condition, with alternatives in braces."""
+		filters = FilterSettings(
+			senders=('yamato.example.jp', 'info@yamato.example.jp', 'post@japanpost.example'),
+			subject_keywords=('不在', 'お届け予定 変更', '不在'),
+			newer_than='7d',
+			larger_than=1000,
+			smaller_than=10 * 1024 * 1024,
+		)
+
+		assert compile_query('Family/parcels', filters, 'is:unread') == (
+			'label:"Family/parcels" is:unread from:{yamato.example.jp post@japanpost.example} '
+			'subject:{不在 "お届け予定 変更"} newer_than:7d larger:1000 smaller:10M'
+		)
+
+	def test_single_alternative_has_no_braces(self):
+		"""Test one sender or keyword is written without braces."""
+		filters = FilterSettings(senders=('post@japanpost.example',), subject_keywords=('不在',))
+
+		assert compile_query('L', filters) == 'label:"L" from:post@japanpost.example subject:不在'
+
+	@pytest.mark.parametrize(('size', 'expected'), [(2048, '2K'), (3 * 1024 * 1024, '3M'), (1500, '1500')])
+	def test_format_size(self, size, expected):
+		"""Test sizes use the largest unit that divides them evenly."""
+		assert format_size(size) == expected
+
+
+class TestMatchesFilters:
+	"""Tests for matches_filters."""
+
+	NOW = datetime(2024, 1, 10, tzinfo=UTC)
+
+	@pytest.mark.parametrize(
+		('filters', 'expected'),
+		[
+			(FilterSettings(), True),
+			(FilterSettings(senders=('yamato.example.jp',)), True),
+			(FilterSettings(senders=('post@japanpost.example',)), False),
+			(FilterSettings(subject_keywords=('不在', 'delivery')), True),
+			(FilterSettings(subject_keywords=('変更',)), False),
+			(FilterSettings(newer_than='7d'), True),
+			(FilterSettings(newer_than='3d'), False),
+			(FilterSettings(larger_than=1000), True),
+			(FilterSettings(smaller_than=2000), False),
+		],
+	)
+	def test_matches_as_the_compiled_query(self, filters, expected):
+		"""Test each filter is evaluated as Gmail evaluates its search term."""
+		sender = 'ヤマト運輸 <Info@Mail.Yamato.Example.JP>'
+		date = datetime(2024, 1, 5, tzinfo=UTC)
+
+		assert matches_filters(filters, sender, 'ご不在連絡 Delivery', date, 2000, self.NOW) is expected
+
+	def test_email_without_date_passes_newer_than(self):
+		"""Test an email whose date cannot be read is not dropped by newer_than."""
+		assert matches_filters(FilterSettings(newer_than='1d'), 'a@example.com', 'x', None, 1, self.NOW)
@@ -0,0 +1,97 @@
+"""Tests for quota module."""
+
+from unittest.mock import Mock
+
+import pytest
+
+from src.quota import QuotaLedger
+
+
+class Clock:
+	"""Manually advanced clock."""
+
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+class TestQuotaLedger:
+	"""Tests for QuotaLedger."""
+
+	def test_usage_is_counted_per_method(self):
+		"""Test every call is charged its Gmail quota units."""
+		ledger = QuotaLedger()
+
+		ledger.acquire('list')
+		ledger.acquire('get')
+		ledger.acquire('get')
+		ledger.acquire('batchModify')
+
+		assert ledger.usage.units == 65
+		assert ledger.usage.calls == {'list': 1, 'get': 2, 'batchModify': 1}
+		assert ledger.usage.peak_units_per_minute == 65
+
+	def test_acquire_within_budget_does_not_sleep(self):
+		"""Test acquiring less than the bucket never sleeps."""
+		sleep = Mock()
+		ledger = QuotaLedger(50, clock=lambda: 0.0, sleep=sleep)
+
+		for _ in range(10):
+			ledger.acquire('get')
+
+		sleep.assert_not_called()
+
+	def test_acquire_over_budget_sleeps_for_deficit(self):
+		"""Test exceeding the bucket sleeps for the missing units."""
+		sleep = Mock()
+		ledger = QuotaLedger(50, clock=lambda: 0.0, sleep=sleep)
+
+		ledger.acquire('batchModify')
+		ledger.acquire('get')
+
+		sleep.assert_called_once_with(0.1)
+
+	def test_per_minute_budget_waits_for_oldest_calls(self):
+		"""Test calls slow down before the per-minute limit instead of hitting it."""
+		clock = Clock()
+		sleep = Mock()
+		ledger = QuotaLedger(units_per_minute=100, clock=clock, sleep=sleep)
+
+		for second in range(17):
+			clock.now = float(second)
+			ledger.acquire('get')
+
+		# 80 units fit under the 80% headroom; the 17th call waits for the first to leave the window
+		sleep.assert_called_once_with(44.0)
+		assert ledger.usage.peak_units_per_minute == 80
+
+	def test_quota_error_halves_rate_then_recovers(self):
+		"""Test the rate drops after a quota error and climbs back on success."""
+		ledger = QuotaLedger(40, clock=lambda: 0.0, sleep=Mock())
+
+		ledger.record_throttled()
+		ledger.record_throttled()
+		assert ledger.rate == 10
+		assert ledger.usage.throttled == 2
+
+		for _ in range(20):
+			ledger.record_success()
+		assert ledger.rate == 40
+
+	def test_quota_error_paces_unlimited_ledger(self):
+		"""Test a ledger without a configured rate starts pacing after a quota error."""
+		sleep = Mock()
+		ledger = QuotaLedger(units_per_minute=600, clock=lambda: 0.0, sleep=sleep)
+
+		ledger.record_throttled()
+		ledger.acquire('get')
+
+		assert ledger.rate == 8.0
+		sleep.assert_called_once()
+
+	def test_invalid_rate(self):
+		"""Test non-positive rates are rejected."""
+		with pytest.raises(ValueError):
+			QuotaLedger(0)
@@ -0,0 +1,100 @@
+"""Tests for report module."""
+
+import json
+
+from src.errors import PermanentError, TransientError
+from src.quota import QuotaUsage
+from src.report import Outcome, RunReport, outcome_for
+
+
+class TestOutcomeFor:
+	"""Tests for outcome_for."""
+
+	def test_outcome_for(self):
+		"""Test outcomes follow the retry classes of the errors."""
+		assert outcome_for([]) == Outcome.DELIVERED
+		assert outcome_for([TransientError('down'), ConnectionError()]) == Outcome.RETRY_LATER
+		assert outcome_for([TransientError('down'), PermanentError('rejected')]) == Outcome.FAILED
+
+
+class TestRunReport:
+	"""Tests for RunReport."""
+
+	def _report(self):
+		report = RunReport()
+		report.add('a', Outcome.DELIVERED, 'alice')
+		report.add('b', Outcome.RETRY_LATER, 'alice', 'line: [transient] down')
+		report.add_error('', PermanentError('bad | token'), 'bob')
+		return report
+
+	def test_status(self):
+		"""Test the run status reflects the worst outcome."""
+		report = RunReport()
+		assert report.status() == 'no_emails'
+		report.add('d', Outcome.DEFERRED)
+		assert report.status() == 'deferred'
+		report.add('a', Outcome.DELIVERED)
+		assert report.status() == 'success'
+		report.add('b', Outcome.RETRY_LATER)
+		assert report.status() == 'queued'
+		report.add('c', Outcome.FAILED)
+		assert report.status() == 'failed'
+		assert [result.message_id for result in report.failed] == ['c']
+
+	def test_write_github_output(self, tmp_path):
+		"""Test status, counts and results are appended as outputs."""
+		path = tmp_path / 'output'
+
+		self._report().write_github_output(str(path), '_sandbox')
+
+		lines = path.read_text().splitlines()
+		assert lines[:6] == [
+			'status=failed_sandbox',
+			'delivered=1',
+			'skipped=0',
+			'retry_later=1',
+			'failed=1',
+			'deferred=0',
+		]
+		results = json.loads(lines[6].removeprefix('results='))
+		assert results[2] == {
+			'message_id': '',
+			'outcome': 'failed',
+			'account': 'bob',
+			'detail': '[permanent] bad | token',
+		}
+
+	def test_write_step_summary(self, tmp_path):
+		"""Test the step summary is a Markdown table with escaped cells."""
+		path = tmp_path / 'summary.md'
+
+		self._report().write_step_summary(str(path), 'Gmail notifications')
+
+		summary = path.read_text()
+		assert summary.startswith('### Gmail notifications\n')
+		assert '| alice | b | retry_later | line: [transient] down |' in summary
+		assert '| bob | - | failed | [permanent] bad \\| token |' in summary
+
+	def test_empty_report_writes_no_summary(self, tmp_path):
+		"""Test a run without messages leaves the step summary untouched."""
+		path = tmp_path / 'summary.md'
+
+		RunReport().write_step_summary(str(path), 'Gmail notifications')
+
+		assert not path.exists()
+
+	def test_quota_usage_is_reported(self, tmp_path):
+		"""Test Gmail quota usage is written to the outputs and the step summary, even without messages."""
+		report = RunReport()
+		report.add_quota('alice', QuotaUsage(units=15, calls={'list': 2, 'modify': 1}, peak_units_per_minute=15))
+		report.add_quota('bob', QuotaUsage(units=5, calls={'list': 1}, peak_units_per_minute=5, throttled=1))
+		output = tmp_path / 'output'
+		summary = tmp_path / 'summary.md'
+
+		report.write_github_output(str(output))
+		report.write_step_summary(str(summary), 'Gmail notifications')
+
+		lines = output.read_text().splitlines()
+		assert lines[7] == 'quota_units=20'
+		assert json.loads(lines[8].removeprefix('quota='))['bob']['throttled'] == 1
+		assert '| alice | 15 | list: 2, modify: 1 | 15 | 0 |' in summary.read_text()
@@ -0,0 +1,174 @@
+"""Tests for scheduler module."""
+
+import random
+import threading
+from datetime import UTC, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from src.scheduler import CronSchedule, IntervalSchedule, QuietHours, Scheduler
+
+JST = ZoneInfo('Asia/Tokyo')
+
+
+class FakeClock:
+	"""Clock that advances only when the scheduler waits."""
+
+	def __init__(self, now: datetime):
+		self.now = now
+		self.waits: list[float] = []
+
+	def __call__(self) -> datetime:
+		return self.now
+
+	def wait(self, stop: threading.Event, seconds: float) -> bool:
+		self.waits.append(seconds)
+		self.now += timedelta(seconds=seconds)
+		return stop.is_set()
+
+
+class TestCronSchedule:
+	"""Tests for CronSchedule."""
+
+	def test_next_after_in_timezone(self):
+		"""Test the default three daily checks are evaluated in JST."""
+		schedules = [CronSchedule(expression, JST) for expression in ('0 7 * * *', '0 12 * * *', '0 17 * * *')]
+		now = datetime(2025, 3, 10, 4, 0, tzinfo=UTC)  # 13:00 JST
+
+		assert min(schedule.next_after(now) for schedule in schedules) == datetime(2025, 3, 10, 17, 0, tzinfo=JST)
+
+	def test_next_after_is_strictly_later(self):
+		"""Test a check at the exact scheduled minute schedules the next one."""
+		schedule = CronSchedule('*/15 * * * *')
+
+		assert schedule.next_after(datetime(2025, 3, 10, 9, 15, tzinfo=UTC)) == datetime(2025, 3, 10, 9, 30, tzinfo=UTC)
+
+	def test_ranges_lists_and_weekdays(self):
+		"""Test ranges, lists and weekday restrictions (Sunday is 0 or 7)."""
+		schedule = CronSchedule('0 9,18 * * 1-5')
+		friday_evening = datetime(2025, 3, 14, 19, 0, tzinfo=UTC)
+
+		assert schedule.next_after(friday_evening) == datetime(2025, 3, 17, 9, 0, tzinfo=UTC)
+		assert CronSchedule('0 0 * * 7').next_after(friday_evening) == datetime(2025, 3, 16, 0, 0, tzinfo=UTC)
+
+	def test_day_or_weekday(self):
+		"""Test a restricted day and weekday match either, as in cron."""
+		schedule = CronSchedule('0 0 1 * 1')
+
+		assert schedule.next_after(datetime(2025, 3, 1, 12, 0, tzinfo=UTC)) == datetime(2025, 3, 3, 0, 0, tzinfo=UTC)
+
+	@pytest.mark.parametrize(
+		('expression', 'message'),
+		[
+			('0 7 * *', 'needs 5 fields'),
+			('60 * * * *', 'minute field out of range'),
+			('0 7 * * mon', 'Invalid cron weekday field'),
+			('*/0 * * * *', 'minute field out of range'),
+		],
+	)
+	def test_invalid_expression(self, expression, message):
+		"""Test invalid expressions are rejected."""
+		with pytest.raises(ValueError, match=message):
+			CronSchedule(expression)
+
+	def test_never_matching_expression(self):
+		"""Test an impossible date is reported instead of looping forever."""
+		with pytest.raises(ValueError, match='never matches'):
+			CronSchedule('0 0 31 2 *').next_after(datetime(2025, 1, 1, tzinfo=UTC))
+
+
+class TestIntervalSchedule:
+	"""Tests for IntervalSchedule."""
+
+	def test_jitter_stays_within_bounds(self):
+		"""Test the jittered delay is between the interval and interval plus jitter."""
+		schedule = IntervalSchedule(timedelta(minutes=5), timedelta(seconds=30), random.Random(1))
+		now = datetime(2025, 3, 10, 9, 0, tzinfo=UTC)
+
+		delays = {schedule.next_after(now) - now for _ in range(20)}
+
+		assert all(timedelta(minutes=5) <= delay <= timedelta(minutes=5, seconds=30) for delay in delays)
+		assert len(delays) > 1
+
+	def test_invalid_interval(self):
+		"""Test a non-positive interval is rejected."""
+		with pytest.raises(ValueError, match='Interval must be positive'):
+			IntervalSchedule(timedelta(0))
+
+
+class TestQuietHours:
+	"""Tests for QuietHours."""
+
+	def test_window_across_midnight(self):
+		"""Test a window crossing midnight and its end time."""
+		quiet_hours = QuietHours.parse('22:00-07:00', JST)
+		late = datetime(2025, 3, 10, 23, 30, tzinfo=JST)
+
+		assert quiet_hours.contains(late)
+		assert quiet_hours.contains(datetime(2025, 3, 11, 6, 59, tzinfo=JST))
+		assert not quiet_hours.contains(datetime(2025, 3, 11, 7, 0, tzinfo=JST))
+		assert quiet_hours.end_after(late) == datetime(2025, 3, 11, 7, 0, tzinfo=JST)
+
+	def test_window_within_day(self):
+		"""Test a window that does not cross midnight."""
+		quiet_hours = QuietHours(time(12), time(13))
+
+		assert quiet_hours.contains(datetime(2025, 3, 10, 12, 30, tzinfo=UTC))
+		assert not quiet_hours.contains(datetime(2025, 3, 10, 13, 0, tzinfo=UTC))
+
+	def test_invalid_window(self):
+		"""Test malformed windows are rejected."""
+		with pytest.raises(ValueError, match='must look like 22:00-07:00'):
+			QuietHours.parse('22:00')
+
+
+class TestScheduler:
+	"""Tests for Scheduler."""
+
+	def test_next_run_uses_earliest_schedule(self):
+		"""Test the earliest of several schedules wins."""
+		scheduler = Scheduler([CronSchedule('0 12 * * *'), IntervalSchedule(timedelta(minutes=5))])
+		now = datetime(2025, 3, 10, 9, 0, tzinfo=UTC)
+
+		assert scheduler.next_run(now) == datetime(2025, 3, 10, 9, 5, tzinfo=UTC)
+
+	def test_next_run_skips_quiet_hours(self):
+		"""Test a run due in quiet hours is moved to the end of the window."""
+		scheduler = Scheduler([IntervalSchedule(timedelta(minutes=5))], QuietHours.parse('22:00-07:00', JST))
+
+		assert scheduler.next_run(datetime(2025, 3, 10, 21, 58, tzinfo=JST)) == datetime(2025, 3, 11, 7, 0, tzinfo=JST)
+
+	def test_run_waits_between_jobs(self):
+		"""Test jobs run at each scheduled time and a failing job does not stop the loop."""
+		clock = FakeClock(datetime(2025, 3, 10, 9, 0, tzinfo=UTC))
+		scheduler = Scheduler([CronSchedule('*/10 * * * *')], clock=clock, wait=clock.wait)
+		run_times = []
+
+		def job():
+			run_times.append(clock.now)
+			if len(run_times) == 1:
+				raise RuntimeError('boom')
+
+		assert scheduler.run(job, max_runs=3) == 3
+		assert run_times == [datetime(2025, 3, 10, 9, minute, tzinfo=UTC) for minute in (10, 20, 30)]
+		assert clock.waits == [600.0, 600.0, 600.0]
+
+	def test_run_stops_when_requested(self):
+		"""Test setting the stop event ends the loop without running the job again."""
+		clock = FakeClock(datetime(2025, 3, 10, 9, 0, tzinfo=UTC))
+		scheduler = Scheduler([IntervalSchedule(timedelta(minutes=1))], clock=clock, wait=clock.wait)
+		stop = threading.Event()
+		runs = []
+
+		def job():
+			runs.append(clock.now)
+			stop.set()
+
+		assert scheduler.run(job, stop) == 1
+		assert len(runs) == 1
+
+	def test_requires_a_schedule(self):
+		"""Test a scheduler without schedules is rejected."""
+		with pytest.raises(ValueError, match='At least one schedule'):
+			Scheduler([])
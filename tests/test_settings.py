@@ -0,0 +1,241 @@
+"""Tests for settings module."""
+
+import os
+from dataclasses import FrozenInstanceError
+from unittest.mock import patch
+
+import pytest
+
+from src.settings import (
+	DEFAULT_LABEL,
+	FilterSettings,
+	LoggingSettings,
+	Route,
+	Settings,
+	SettingsWatcher,
+	SourceSettings,
+	load_settings,
+	settings_from_env,
+)
+
+SETTINGS_TOML = """
+labels = ["Family/parcels", "Family/school"]
+group_by_thread = true
+
+[[routes]]
+label = "Family/school"
+sinks = ["slack"]
+
+[[sources]]
+name = "work"
+type = "imap"
+label = "Family/school"
+host = "imap.example.com"
+username = "me@example.com"
+ssl = false
+
+[[sources]]
+name = "archive"
+type = "mbox"
+path = "archive.mbox"
+
+[filters]
+senders = ["yamato.example.jp"]
+newer_than = "7d"
+smaller_than = 1048576
+
+[rate_limits]
+gmail_quota_per_second = 25
+
+[concurrency]
+accounts = 2
+extraction_workers = 4
+
+[templates]
+notification = "{subject} ({sender})\\n{details}"
+
+[schedule]
+timezone = "UTC"
+cron = ["*/30 8-20 * * 1-5"]
+interval_minutes = 5
+jitter_seconds = 30
+quiet_hours = "22:00-07:00"
+
+[delivery]
+quiet_hours = "23:00-06:00"
+
+[logging]
+format = "text"
+level = "DEBUG"
+
+[logging.sample_rates]
+DEBUG = 0.1
+"""
+
+
+class TestSettings:
+	"""Tests for Settings loading and validation."""
+
+	def test_defaults(self):
+		"""Test the defaults match the behaviour without a settings file."""
+		settings = Settings()
+		assert settings.labels == (DEFAULT_LABEL,)
+		assert settings.sinks_for(DEFAULT_LABEL) is None
+		assert settings.rate_limits.gmail_quota_per_second == 50.0
+		assert settings.concurrency.extraction_workers is None
+		assert settings.schedule.cron == ('0 7 * * *', '0 12 * * *', '0 17 * * *')
+		assert settings.schedule.timezone == 'Asia/Tokyo'
+		assert settings.schedule.interval_minutes is None
+		assert settings.delivery.quiet_window() is None
+		assert settings.attachments.enabled is False
+		assert settings.group_by_thread is False
+		assert settings.logging == LoggingSettings(format='json', level='INFO')
+
+	def test_load_toml(self, tmp_path):
+		"""Test every section is loaded from TOML."""
+		path = tmp_path / 'notifier.toml'
+		path.write_text(SETTINGS_TOML, encoding='utf-8')
+
+		settings = load_settings(str(path))
+
+		assert settings.labels == ('Family/parcels', 'Family/school')
+		assert settings.group_by_thread is True
+		assert settings.filters == FilterSettings(senders=('yamato.example.jp',), newer_than='7d', smaller_than=1048576)
+		assert settings.routes == (Route(label='Family/school', sinks=('slack',)),)
+		assert settings.sinks_for('Family/school') == ('slack',)
+		assert settings.sinks_for('Family/parcels') is None
+		assert settings.sources == (
+			SourceSettings(
+				name='work',
+				type='imap',
+				label='Family/school',
+				host='imap.example.com',
+				port=143,
+				username='me@example.com',
+				ssl=False,
+			),
+			SourceSettings(name='archive', type='mbox', label='Family/parcels', path='archive.mbox'),
+		)
+		assert settings.rate_limits.gmail_quota_per_second == 25.0
+		assert settings.concurrency.accounts == 2
+		assert settings.concurrency.extraction_workers == 4
+		assert settings.templates.notification == '{subject} ({sender})\n{details}'
+		assert settings.schedule.cron == ('*/30 8-20 * * 1-5',)
+		assert settings.schedule.interval_minutes == 5.0
+		assert settings.schedule.jitter_seconds == 30.0
+		assert settings.schedule.quiet_hours == '22:00-07:00'
+		assert settings.delivery.quiet_hours == '23:00-06:00'
+		assert settings.logging == LoggingSettings(format='text', level='DEBUG', sample_rates=(('DEBUG', 0.1),))
+
+	def test_load_yaml(self, tmp_path):
+		"""Test YAML files are loaded like TOML."""
+		pytest.importorskip('yaml')
+		path = tmp_path / 'notifier.yaml'
+		path.write_text('labels: [Family/parcels]\nconcurrency:\n  accounts: 3\n', encoding='utf-8')
+
+		settings = load_settings(str(path))
+
+		assert settings.labels == ('Family/parcels',)
+		assert settings.concurrency.accounts == 3
+
+	def test_settings_are_frozen_and_slotted(self):
+		"""Test settings cannot be changed after validation."""
+		settings = Settings()
+		with pytest.raises(FrozenInstanceError):
+			settings.labels = ()  # type: ignore[misc]
+		assert not hasattr(settings, '__dict__')
+
+	@pytest.mark.parametrize(
+		('data', 'message'),
+		[
+			({'label': ['x']}, 'Unknown setting in settings: label'),
+			({'labels': []}, 'labels must be a non-empty list'),
+			({'group_by_thread': 1}, 'group_by_thread must be true or false'),
+			({'filters': {'senders': []}}, 'filters.senders must be a non-empty list'),
+			({'filters': {'newer_than': '7 days'}}, 'filters.newer_than must be'),
+			({'filters': {'larger_than': 100, 'smaller_than': 100}}, 'filters.larger_than must be less than'),
+			({'routes': [{'label': DEFAULT_LABEL, 'sinks': ['sms']}]}, 'unknown destinations: sms'),
+			({'routes': [{'label': 'Other', 'sinks': ['line']}]}, 'does not match any of labels'),
+			({'sources': {'name': 'work'}}, 'sources must be a list of tables'),
+			({'sources': [{'name': 'work', 'type': 'pop3'}]}, r'sources\[0\].type must be one of imap, mbox'),
+			({'sources': [{'name': 'work', 'type': 'mbox'}]}, r'sources\[0\].path is required'),
+			({'sources': [{'name': 'a/b', 'type': 'mbox', 'path': 'x'}]}, r'sources\[0\].name may only contain'),
+			({'sources': [{'name': 'a', 'type': 'mbox', 'path': 'x', 'host': 'h'}]}, 'Unknown setting'),
+			({'sources': [{'name': 'a', 'type': 'imap', 'host': 'h', 'username': 'u', 'idle': 1}]}, 'idle must be'),
+			({'sources': [{'name': 'a', 'type': 'mbox', 'path': 'x'}] * 2}, 'Each source needs a different name'),
+			({'rate_limits': {'gmail_quota_per_second': 0}}, 'must be a positive number'),
+			({'concurrency': {'accounts': 'many'}}, 'must be a positive integer'),
+			({'templates': {'notification': '{subject} {body}'}}, 'templates.notification is invalid'),
+			({'schedule': {'cron': ['0 25 * * *']}}, 'Cron hour field out of range'),
+			({'schedule': {'timezone': 'Mars/Olympus'}}, 'schedule.timezone is unknown'),
+			({'schedule': {'quiet_hours': '10pm-7am'}}, 'Quiet hours must look like'),
+			({'schedule': {'jitter_seconds': -1}}, 'schedule.jitter_seconds must be'),
+			({'delivery': {'quiet_hours': '22:00'}}, 'Quiet hours must look like'),
+			({'logging': {'format': 'xml'}}, 'logging.format must be one of json, text'),
+			({'logging': {'level': 'info'}}, 'logging.level must be one of'),
+			({'logging': {'sample_rates': {'TRACE': 0.5}}}, 'logging.sample_rates has an unknown level: TRACE'),
+			({'logging': {'sample_rates': {'INFO': 1.5}}}, 'logging.sample_rates.INFO must be a number from 0 to 1'),
+			({'delivery': {'timezone': 9}}, 'delivery.timezone must be a string'),
+			({'attachments': {'enabled': 'yes'}}, 'attachments.enabled must be true or false'),
+			({'attachments': {'max_images': 5}}, 'attachments.max_images must be at most 4'),
+			({'attachments': {'max_bytes': 0}}, 'attachments.max_bytes must be'),
+		],
+	)
+	def test_from_dict_rejects_invalid(self, data, message):
+		"""Test invalid settings are rejected with a message naming the setting."""
+		with pytest.raises(ValueError, match=message):
+			Settings.from_dict(data)
+
+	def test_settings_from_env(self, tmp_path):
+		"""Test NOTIFIER_CONFIG selects the settings file."""
+		path = tmp_path / 'notifier.toml'
+		path.write_text('labels = ["Family/parcels"]\n', encoding='utf-8')
+
+		with patch.dict(os.environ, {'NOTIFIER_CONFIG': str(path)}):
+			assert settings_from_env().labels == ('Family/parcels',)
+		with patch.dict(os.environ, {}, clear=True):
+			assert settings_from_env() == Settings()
+
+
+class TestSettingsWatcher:
+	"""Tests for SettingsWatcher."""
+
+	def _write(self, path, text, mtime_ns):
+		path.write_text(text, encoding='utf-8')
+		os.utime(path, ns=(mtime_ns, mtime_ns))
+
+	def test_poll_reloads_changed_file(self, tmp_path):
+		"""Test a changed file is reloaded once."""
+		path = tmp_path / 'notifier.toml'
+		self._write(path, 'labels = ["A"]\n', 1_000_000_000)
+		watcher = SettingsWatcher(str(path), load_settings(str(path)))
+
+		assert watcher.poll() is None
+		self._write(path, 'labels = ["B"]\n', 2_000_000_000)
+
+		reloaded = watcher.poll()
+		assert reloaded is not None
+		assert reloaded.labels == ('B',)
+		assert watcher.settings.labels == ('B',)
+		assert watcher.poll() is None
+
+	def test_poll_keeps_settings_on_invalid_file(self, tmp_path):
+		"""Test an invalid edit keeps the previous settings."""
+		path = tmp_path / 'notifier.toml'
+		self._write(path, 'labels = ["A"]\n', 1_000_000_000)
+		watcher = SettingsWatcher(str(path), load_settings(str(path)))
+		self._write(path, 'labels = [', 2_000_000_000)
+
+		assert watcher.poll() is None
+		assert watcher.settings.labels == ('A',)
+
+	def test_poll_keeps_settings_on_malformed_yaml(self, tmp_path):
+		"""Test a YAML syntax error is reported like an invalid TOML file."""
+		pytest.importorskip('yaml')
+		path = tmp_path / 'notifier.yaml'
+		self._write(path, 'labels: [A]\n', 1_000_000_000)
+		watcher = SettingsWatcher(str(path), load_settings(str(path)))
+		self._write(path, 'labels: [A\n  concurrency: {', 2_000_000_000)
+
+		assert watcher.poll() is None
+		assert watcher.settings.labels == ('A',)
@@ -0,0 +1,268 @@
+"""Tests for sinks module."""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+import requests
+import responses
+
+from src.config import AppConfig
+from src.errors import RetryClass
+from src.sinks import (
+	LINE_MAX_TEXT_LENGTH,
+	FileSink,
+	LineSink,
+	SinkError,
+	SlackSink,
+	WebhookSink,
+	build_sinks,
+	deliver,
+	format_digest_texts,
+	format_notification_text,
+)
+from tests.fixtures.mock_data import create_test_email_content
+
+
+def _json_body(call):
+	body = call.request.body
+	return json.loads(body.decode('utf-8') if isinstance(body, bytes) else body)
+
+
+class TestLineSink:
+	"""Tests for LineSink."""
+
+	@responses.activate
+	def test_push_single_user(self):
+		"""Test a single user ID uses the push endpoint."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+
+		LineSink('test_token', ['U1']).send(create_test_email_content())
+
+		assert len(responses.calls) == 1
+		assert responses.calls[0].request.headers['Authorization'] == 'Bearer test_token'
+		assert _json_body(responses.calls[0])['to'] == 'U1'
+
+	@responses.activate
+	def test_multicast_several_users(self):
+		"""Test several user IDs use the multicast endpoint."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/multicast', json={}, status=200)
+
+		LineSink('test_token', ['U1', 'U2']).send(create_test_email_content())
+
+		assert _json_body(responses.calls[0])['to'] == ['U1', 'U2']
+
+	@responses.activate
+	def test_send_batch_packs_five_messages_per_request(self):
+		"""Test batches are split into requests of at most five messages."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+
+		LineSink('test_token', ['U1']).send_batch([create_test_email_content(subject=f'S{i}') for i in range(7)])
+
+		assert [len(_json_body(call)['messages']) for call in responses.calls] == [5, 2]
+
+	def test_request_groups_keep_each_notification_in_one_push(self):
+		"""Test a notification and its images are never split across pushes."""
+		with_images = create_test_email_content(
+			subject='images',
+			image_urls=('https://img.example/a.jpg', 'https://img.example/b.jpg'),
+			preview_urls=('https://img.example/a-preview.jpg', 'https://img.example/b-preview.jpg'),
+		)
+		contents = [create_test_email_content(subject='S0'), create_test_email_content(subject='S1'), with_images]
+
+		groups = LineSink('test_token', ['U1']).request_groups([*contents, create_test_email_content(subject='S2')])
+
+		assert [[content.subject for content in group] for group in groups] == [['S0', 'S1', 'images'], ['S2']]
+
+	@responses.activate
+	def test_long_text_is_truncated(self):
+		"""Test a notification text longer than LINE allows is cut to the limit."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+
+		content = create_test_email_content(body='あ' * (LINE_MAX_TEXT_LENGTH + 100))
+
+		LineSink('test_token', ['U1']).send(content)
+
+		text = _json_body(responses.calls[0])['messages'][0]['text']
+		assert len(text) == LINE_MAX_TEXT_LENGTH
+		assert text == format_notification_text(content)[:LINE_MAX_TEXT_LENGTH]
+
+	@responses.activate
+	def test_image_attachments_follow_text(self):
+		"""Test uploaded image attachments are sent as image messages after the text."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+		content = create_test_email_content(
+			image_urls=('https://img.example/a.jpg', 'https://img.example/b.jpg'),
+			preview_urls=('https://img.example/a-preview.jpg', 'https://img.example/b-preview.jpg'),
+		)
+
+		LineSink('test_token', ['U1']).send(content)
+
+		messages = _json_body(responses.calls[0])['messages']
+		assert [message['type'] for message in messages] == ['text', 'image', 'image']
+		assert messages[2] == {
+			'type': 'image',
+			'originalContentUrl': 'https://img.example/b.jpg',
+			'previewImageUrl': 'https://img.example/b-preview.jpg',
+		}
+
+	@responses.activate
+	def test_send_digest_is_one_push(self):
+		"""Test a digest of several notifications is pushed as one text in one request."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=200)
+
+		LineSink('test_token', ['U1']).send_digest([create_test_email_content(subject=f'S{i}') for i in range(7)])
+
+		assert len(responses.calls) == 1
+		messages = _json_body(responses.calls[0])['messages']
+		assert len(messages) == 1
+		assert messages[0]['text'].startswith('🌙 静かな時間帯に届いたメール (7件)')
+		assert all(f'件名: S{i}' in messages[0]['text'] for i in range(7))
+
+	def test_format_digest_texts_respects_max_length(self):
+		"""Test long digests are split into several texts within the limit."""
+		contents = [create_test_email_content(subject=f'S{i}', body='x' * 300) for i in range(4)]
+
+		texts = format_digest_texts(contents, '{subject}: {details}', max_length=700)
+
+		assert len(texts) > 1
+		assert all(len(text) <= 700 for text in texts)
+		assert sum(text.count(': 本文') for text in texts) == 4
+
+	@responses.activate
+	def test_http_error_raises(self):
+		"""Test LINE errors propagate."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=401)
+
+		with pytest.raises(requests.HTTPError):
+			LineSink('test_token', ['U1']).send(create_test_email_content())
+
+	def test_requires_user_id(self):
+		"""Test an empty recipient list is rejected."""
+		with pytest.raises(ValueError):
+			LineSink('test_token', [])
+
+
+class TestSlackSink:
+	"""Tests for SlackSink."""
+
+	@responses.activate
+	def test_post_in_thread(self):
+		"""Test thread_ts is passed through."""
+		responses.add(responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True, 'ts': '1.2'})
+
+		result = SlackSink('xoxb', 'C1').post('hello', thread_ts='1.0')
+
+		assert result['ts'] == '1.2'
+		assert _json_body(responses.calls[0])['thread_ts'] == '1.0'
+
+	@responses.activate
+	def test_not_ok_raises(self):
+		"""Test Slack API errors raise SinkError."""
+		responses.add(responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': False, 'error': 'nope'})
+
+		with pytest.raises(SinkError, match='nope') as exc_info:
+			SlackSink('xoxb', 'C1').send(create_test_email_content())
+		assert exc_info.value.retry_class == RetryClass.PERMANENT
+
+	@responses.activate
+	def test_rate_limited_is_quota_error(self):
+		"""Test Slack error codes map to a retry class."""
+		responses.add(
+			responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': False, 'error': 'ratelimited'}
+		)
+
+		with pytest.raises(SinkError) as exc_info:
+			SlackSink('xoxb', 'C1').post('hello')
+		assert exc_info.value.retry_class == RetryClass.QUOTA
+
+
+class TestWebhookSink:
+	"""Tests for WebhookSink."""
+
+	@responses.activate
+	def test_discord_content(self):
+		"""Test Discord receives the formatted text as content."""
+		responses.add(responses.POST, 'https://discord.example/webhook', status=204)
+		content = create_test_email_content()
+
+		WebhookSink('https://discord.example/webhook', discord=True).send(content)
+
+		assert _json_body(responses.calls[0]) == {'content': format_notification_text(content)}
+
+	@responses.activate
+	def test_discord_custom_template(self):
+		"""Test a configured template replaces the default notification text."""
+		responses.add(responses.POST, 'https://discord.example/webhook', status=204)
+		content = create_test_email_content(subject='S', from_email='F', body='B')
+
+		WebhookSink('https://discord.example/webhook', discord=True, template='{sender}: {subject}\n{details}').send(
+			content
+		)
+
+		assert _json_body(responses.calls[0]) == {'content': 'F: S\n本文:\nB'}
+
+	@responses.activate
+	def test_generic_batch_is_one_request(self):
+		"""Test a generic webhook receives the whole batch as one JSON array."""
+		responses.add(responses.POST, 'https://hooks.example/notify', status=200)
+		contents = [create_test_email_content(subject='A'), create_test_email_content(subject='B')]
+
+		WebhookSink('https://hooks.example/notify').send_batch(contents)
+
+		assert len(responses.calls) == 1
+		assert _json_body(responses.calls[0]) == [content.to_dict() for content in contents]
+		assert _json_body(responses.calls[0])[0]['sender'] == 'test@example.com'
+
+
+class TestFileSink:
+	"""Tests for FileSink."""
+
+	def test_appends_json_lines(self, tmp_path):
+		"""Test each notification is appended as one JSON line."""
+		path = tmp_path / 'out' / 'notifications.jsonl'
+		sink = FileSink(str(path))
+
+		sink.send(create_test_email_content(subject='A'))
+		sink.send(create_test_email_content(subject='B'))
+
+		lines = path.read_text(encoding='utf-8').splitlines()
+		assert [json.loads(line)['subject'] for line in lines] == ['A', 'B']
+
+
+class TestDeliver:
+	"""Tests for build_sinks and deliver."""
+
+	@patch.dict(
+		os.environ,
+		{
+			'LINE_CHANNEL_ACCESS_TOKEN': 'token',
+			'LINE_USER_ID': 'U1,U2',
+			'SLACK_BOT_TOKEN': 'xoxb',
+			'SLACK_CHANNEL_ID': 'C_ERRORS',
+			'SLACK_NOTIFY_CHANNEL_ID': 'C_NOTIFY',
+			'DISCORD_WEBHOOK_URL': 'https://discord.example/webhook',
+			'NOTIFY_FILE_PATH': '/tmp/notifications.jsonl',
+		},
+		clear=True,
+	)
+	def test_build_sinks(self):
+		"""Test every configured destination gets a sink."""
+		sinks = build_sinks(AppConfig.from_env())
+
+		assert [sink.name for sink in sinks] == ['line', 'slack', 'discord', 'file']
+		assert sinks[0].user_ids == ['U1', 'U2']  # type: ignore[attr-defined]
+		assert sinks[1].channel_id == 'C_NOTIFY'  # type: ignore[attr-defined]
+
+	@responses.activate
+	def test_deliver_isolates_failures(self, tmp_path):
+		"""Test one failing sink does not stop the others."""
+		responses.add(responses.POST, 'https://api.line.me/v2/bot/message/push', json={}, status=500)
+		path = tmp_path / 'notifications.jsonl'
+
+		results = deliver([LineSink('token', ['U1']), FileSink(str(path))], create_test_email_content())
+
+		assert isinstance(results['line'], requests.HTTPError)
+		assert results['file'] is None
+		assert path.exists()
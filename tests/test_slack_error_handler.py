@@ -6,7 +6,7 @@ from unittest.mock import patch
 
 import responses
 
-from src.slack_error_handler import send_slack_error_notification
+from src.slack_error_handler import main, send_slack_error_notification
 
 
 class TestSlackErrorHandler:
@@ -22,11 +22,12 @@ class TestSlackErrorHandler:
 			'GITHUB_RUN_ID': '12345',
 		},
 	)
-	def test_send_slack_error_notification_success(self):
+	def test_send_slack_error_notification_success(self, tmp_path):
 		"""Test successful error notification."""
 		responses.add(responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True}, status=200)
 
-		send_slack_error_notification()
+		with patch.dict(os.environ, {'NOTIFIER_STATE_DIR': str(tmp_path)}):
+			send_slack_error_notification()
 
 		assert len(responses.calls) == 1
 		request = responses.calls[0].request
@@ -49,11 +50,12 @@ class TestSlackErrorHandler:
 		},
 		clear=True,
 	)
-	def test_send_slack_error_notification_no_github_info(self):
+	def test_send_slack_error_notification_no_github_info(self, tmp_path):
 		"""Test error notification without GitHub info."""
 		responses.add(responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True}, status=200)
 
-		send_slack_error_notification()
+		with patch.dict(os.environ, {'NOTIFIER_STATE_DIR': str(tmp_path)}):
+			send_slack_error_notification()
 
 		assert len(responses.calls) == 1
 		request = responses.calls[0].request
@@ -65,8 +67,7 @@ class TestSlackErrorHandler:
 		assert expected_url in actual_text, f"Expected '{expected_url}' in '{actual_text}'"
 
 	@responses.activate
-	@patch.dict(os.environ, {'SLACK_BOT_TOKEN': 'test_token', 'SLACK_CHANNEL_ID': 'test_channel'})
-	def test_send_slack_error_notification_api_failure(self, capsys):
+	def test_send_slack_error_notification_api_failure(self, tmp_path, caplog):
 		"""Test error notification when Slack API fails."""
 		responses.add(
 			responses.POST,
@@ -75,7 +76,59 @@ class TestSlackErrorHandler:
 			status=200,
 		)
 
-		send_slack_error_notification()
+		env = {'SLACK_BOT_TOKEN': 'test_token', 'SLACK_CHANNEL_ID': 'test_channel', 'NOTIFIER_STATE_DIR': str(tmp_path)}
+		with patch.dict(os.environ, env):
+			send_slack_error_notification()
 
-		captured = capsys.readouterr()
-		assert 'Failed to send Slack notification: channel_not_found' in captured.out
+		(record,) = caplog.records
+		assert record.getMessage() == 'Slack notification failed'
+		assert record.error == 'Slack API error: channel_not_found'
+
+	@responses.activate
+	def test_each_failed_result_is_alerted_once(self, tmp_path):
+		"""Test each distinct error of the run is posted, and repeats in a later run are not."""
+		responses.add(
+			responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True, 'ts': '1.0'}, status=200
+		)
+		results = [
+			{'message_id': 'm1', 'outcome': 'failed', 'account': 'alice', 'detail': '[auth] Token is expired'},
+			{'message_id': 'm2', 'outcome': 'delivered', 'account': 'bob', 'detail': ''},
+		]
+		env = {
+			'SLACK_BOT_TOKEN': 'test_token',
+			'SLACK_CHANNEL_ID': 'test_channel',
+			'NOTIFIER_STATE_DIR': str(tmp_path),
+			'NOTIFIER_RESULTS': json.dumps(results),
+			'NOTIFIER_ERROR': '[permanent] 1 of 2 messages failed',
+		}
+
+		with patch.dict(os.environ, env):
+			send_slack_error_notification()
+			send_slack_error_notification()
+
+		texts = [json.loads(call.request.body or b'')['text'] for call in responses.calls]
+		assert len(texts) == 2
+		assert 'alice: [auth] Token is expired' in texts[0]
+		assert '[permanent] 1 of 2 messages failed' in texts[1]
+		assert (tmp_path / 'alerts.json').exists()
+
+	@responses.activate
+	def test_main_writes_json_events(self, tmp_path, capsys):
+		"""Test the entry point configures logging, even when the settings file is invalid."""
+		responses.add(
+			responses.POST, 'https://slack.com/api/chat.postMessage', json={'ok': True, 'ts': '1.0'}, status=200
+		)
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text('labels = [', encoding='utf-8')
+		env = {
+			'SLACK_BOT_TOKEN': 'test_token',
+			'SLACK_CHANNEL_ID': 'test_channel',
+			'NOTIFIER_STATE_DIR': str(tmp_path),
+			'NOTIFIER_CONFIG': str(settings_path),
+		}
+
+		with patch.dict(os.environ, env):
+			main()
+
+		events = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+		assert [event['event'] for event in events] == ['Slack notification sent']
@@ -0,0 +1,341 @@
+"""Tests for sources module."""
+
+import mailbox
+import os
+import queue
+import re
+import select
+import socketserver
+import threading
+from contextlib import suppress
+from datetime import UTC, datetime
+from email.message import EmailMessage
+from unittest.mock import patch
+
+import pytest
+
+from src.config import AppConfig
+from src.errors import AuthError, PermanentError
+from src.settings import FilterSettings
+from src.sources import IdleWatcher, ImapSource, MboxSource, build_idle_watchers, build_sources, content_from_bytes
+
+LABEL = 'Family/parcels'
+
+NOW = datetime(2024, 1, 4, tzinfo=UTC)
+
+MBOX_SOURCE = '[[sources]]\nname = "archive"\ntype = "mbox"\npath = "archive.mbox"\n'
+IMAP_SOURCE = '[[sources]]\nname = "work"\ntype = "imap"\nhost = "imap.example.com"\nusername = "me"\n'
+
+
+def _message(subject: str, sender: str = 'notice@example.com', date: str = 'Mon, 01 Jan 2024 09:00:00 +0000') -> bytes:
+	message = EmailMessage()
+	message['From'] = sender
+	message['Subject'] = subject
+	message['Date'] = date
+	message.set_content(f'{subject} body')
+	return message.as_bytes()
+
+
+def _add(path: str, subject: str, status: str = '', sender: str = 'notice@example.com') -> None:
+	box = mailbox.mbox(path)
+	message = mailbox.mboxMessage(_message(subject, sender))
+	if status:
+		message.set_flags(status)
+	box.add(message)
+	box.close()
+
+
+def _mbox_source(tmp_path, filters: FilterSettings | None = None) -> MboxSource:
+	return MboxSource(
+		'archive',
+		str(tmp_path / 'archive.mbox'),
+		LABEL,
+		str(tmp_path / 'state' / 'archive.json'),
+		filters,
+		clock=lambda: NOW,
+	)
+
+
+def _subjects(source: MboxSource | ImapSource) -> list[str]:
+	"""Poll and mark every email as read, as check_and_notify does, until none is left."""
+	subjects = []
+	while emails := source.poll():
+		subjects.append(emails[0].email_content.subject)
+		emails[0].mark_as_read(emails[0].email_content.id)
+	return subjects
+
+
+class TestContentFromBytes:
+	"""Tests for content_from_bytes."""
+
+	def test_html_only_email_body_is_converted_to_text(self):
+		"""Test an email without a text/plain part uses its HTML as text."""
+		message = EmailMessage()
+		message['From'] = 'notice@example.com'
+		message['Subject'] = 'Parcel held'
+		message.set_content('<html><body><p>Parcel held</p><p>Tracking</p></body></html>', subtype='html')
+
+		assert content_from_bytes(message.as_bytes(), 'm1').body == 'Parcel held\n\nTracking'
+
+
+class TestMboxSource:
+	"""Tests for MboxSource."""
+
+	def test_unread_emails_matching_filters_are_polled_oldest_first(self, tmp_path):
+		"""Test read and filtered out emails are skipped, and notified ones are not polled again."""
+		path = str(tmp_path / 'archive.mbox')
+		_add(path, 'Parcel held')
+		_add(path, 'Parcel delivered', status='RO')
+		_add(path, 'Newsletter', sender='news@example.org')
+		_add(path, 'Parcel returned')
+		source = _mbox_source(tmp_path, FilterSettings(senders=('example.com',)))
+
+		emails = source.poll()
+
+		assert emails[0].account == 'archive'
+		assert emails[0].label == LABEL
+		assert emails[0].email_content.body == 'Parcel held body'
+		assert emails[0].email_content.labels == (LABEL,)
+		emails[0].mark_as_read(emails[0].email_content.id)
+		assert _subjects(source) == ['Parcel returned']
+
+	def test_scan_resumes_from_the_saved_offset(self, tmp_path):
+		"""Test a new source continues where the previous check stopped and finds appended emails."""
+		path = str(tmp_path / 'archive.mbox')
+		_add(path, 'Parcel held')
+		assert _subjects(_mbox_source(tmp_path)) == ['Parcel held']
+
+		_add(path, 'Parcel returned')
+
+		assert _subjects(_mbox_source(tmp_path)) == ['Parcel returned']
+		assert _mbox_source(tmp_path).poll() == []
+
+	def test_email_not_marked_as_read_is_polled_again(self, tmp_path):
+		"""Test an email whose notification failed is retried by the next check."""
+		_add(str(tmp_path / 'archive.mbox'), 'Parcel held')
+
+		first = _mbox_source(tmp_path).poll()
+		second = _mbox_source(tmp_path).poll()
+
+		assert first[0].email_content.id == second[0].email_content.id
+
+	def test_ids_differ_across_sources_and_rescans(self, tmp_path):
+		"""Test emails at the same offset get different IDs in another source or a replaced file."""
+		path = tmp_path / 'archive.mbox'
+		_add(str(path), 'Parcel held')
+		first = _mbox_source(tmp_path).poll()[0].email_content.id
+		other = MboxSource('other', str(path), LABEL, str(tmp_path / 'state' / 'other.json')).poll()
+
+		path.unlink()
+		_add(str(path), 'Parcel delivered')
+
+		assert first.startswith('mbox-archive-')
+		assert other[0].email_content.id != first
+		assert _mbox_source(tmp_path).poll()[0].email_content.id != first
+
+	def test_replaced_file_is_scanned_again(self, tmp_path):
+		"""Test a file smaller than the saved offset is scanned from the start."""
+		path = tmp_path / 'archive.mbox'
+		_add(str(path), 'Parcel held')
+		_add(str(path), 'Parcel returned')
+		assert len(_subjects(_mbox_source(tmp_path))) == 2
+
+		path.unlink()
+		_add(str(path), 'Parcel delivered')
+
+		assert _subjects(_mbox_source(tmp_path)) == ['Parcel delivered']
+
+
+class FakeImapHandler(socketserver.StreamRequestHandler):
+	"""Answers the IMAP commands ImapSource sends, from the messages of its server."""
+
+	server: 'FakeImapServer'
+
+	def _send(self, *lines: bytes) -> None:
+		self.wfile.write(b''.join(line + b'\r\n' for line in lines))
+
+	def _fetch(self, uids: str, items: str) -> list[bytes]:
+		lines = []
+		for uid in (int(uid) for uid in uids.split(',')):
+			raw = self.server.messages[uid]
+			data = raw.split(b'\n\n', 1)[0] + b'\n\n' if 'HEADER' in items else raw
+			lines.append(
+				f'* {uid} FETCH (UID {uid} RFC822.SIZE {len(raw)} BODY[] {{{len(data)}}}'.encode()
+				+ b'\r\n'
+				+ data
+				+ b')'
+			)
+		return lines
+
+	def _idle(self, tag: str) -> None:
+		self._send(b'+ idling')
+		while not select.select([self.connection], [], [], 0.05)[0]:
+			with suppress(queue.Empty):
+				self._send(self.server.pushes.get_nowait())
+		if self.rfile.readline().strip() == b'DONE':
+			self._send(f'{tag} OK IDLE terminated'.encode())
+
+	def handle(self) -> None:
+		"""Answer commands until the client disconnects."""
+		self._send(b'* OK fake IMAP ready')
+		while line := self.rfile.readline():
+			tag, command = line.decode().rstrip('\r\n').split(' ', 1)
+			lines: list[bytes] = []
+			if command == 'CAPABILITY':
+				lines = [b'* CAPABILITY IMAP4rev1 IDLE']
+			elif command.startswith('LOGIN') and not command.endswith(' "secret"'):
+				self._send(f'{tag} NO invalid credentials'.encode())
+				continue
+			elif command.startswith('SELECT'):
+				lines = [
+					f'* {len(self.server.messages)} EXISTS'.encode(),
+					f'* OK [UIDVALIDITY {self.server.validity}]'.encode(),
+				]
+			elif command.startswith('UID SEARCH'):
+				unseen = [str(uid) for uid in self.server.messages if uid not in self.server.seen]
+				lines = [' '.join(['* SEARCH', *unseen]).encode()]
+			elif match := re.fullmatch(r'UID FETCH (\S+) (.+)', command):
+				lines = self._fetch(match[1], match[2])
+			elif match := re.fullmatch(r'UID STORE (\d+) \+FLAGS \(\\Seen\)', command):
+				self.server.seen.add(int(match[1]))
+			elif command == 'IDLE':
+				self._idle(tag)
+				continue
+			elif command == 'LOGOUT':
+				lines = [b'* BYE']
+			self._send(*lines, f'{tag} OK done'.encode())
+
+
+class FakeImapServer(socketserver.ThreadingTCPServer):
+	"""IMAP server holding one folder."""
+
+	daemon_threads = True
+
+	def __init__(self) -> None:
+		super().__init__(('127.0.0.1', 0), FakeImapHandler)
+		self.messages: dict[int, bytes] = {}
+		self.seen: set[int] = set()
+		self.validity = 7
+		# Untagged responses sent to clients in IDLE
+		self.pushes: queue.Queue[bytes] = queue.Queue()
+
+
+@pytest.fixture
+def imap_server():
+	"""Serve a folder with two notices and a newsletter."""
+	server = FakeImapServer()
+	server.messages = {
+		1: _message('Parcel held'),
+		2: _message('Newsletter', sender='news@example.org'),
+		3: _message('Parcel returned', date='Tue, 02 Jan 2024 09:00:00 +0000'),
+	}
+	thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+	thread.start()
+	yield server
+	server.shutdown()
+	server.server_close()
+
+
+def _imap_source(server: FakeImapServer, password: str = 'secret', filters: FilterSettings | None = None) -> ImapSource:
+	return ImapSource(
+		'work',
+		'127.0.0.1',
+		'user',
+		password,
+		LABEL,
+		port=server.server_address[1],
+		use_ssl=False,
+		filters=filters,
+		timeout=5,
+		clock=lambda: NOW,
+	)
+
+
+class TestImapSource:
+	"""Tests for ImapSource."""
+
+	def test_unread_emails_matching_filters_are_polled_newest_first(self, imap_server):
+		"""Test emails are fetched without being marked and flagged \\Seen by mark_as_read."""
+		source = _imap_source(imap_server, filters=FilterSettings(senders=('notice@example.com',), newer_than='7d'))
+
+		emails = source.poll()
+
+		assert emails[0].email_content.id == 'imap-work-7-3'
+		assert emails[0].email_content.body == 'Parcel returned body'
+		assert imap_server.seen == set()
+		emails[0].mark_as_read(emails[0].email_content.id)
+		assert _subjects(source) == ['Parcel held']
+		assert imap_server.seen == {1, 3}
+		source.close()
+
+	def test_recreated_folder_is_not_marked(self, imap_server):
+		"""Test a UID from a previous UIDVALIDITY is not flagged."""
+		source = _imap_source(imap_server)
+		emails = source.poll()
+		imap_server.validity = 8
+
+		with pytest.raises(PermanentError):
+			emails[0].mark_as_read(emails[0].email_content.id)
+		assert imap_server.seen == set()
+
+	def test_login_failure_is_an_auth_error(self, imap_server):
+		"""Test rejected credentials are reported as AuthError."""
+		with pytest.raises(AuthError):
+			_imap_source(imap_server, password='wrong').poll()
+
+	def test_idle(self, imap_server):
+		"""Test idle returns True on new mail and False on timeout."""
+		source = _imap_source(imap_server)
+		imap_server.pushes.put(b'* 4 EXISTS')
+
+		assert source.idle(5) is True
+		assert source.idle(0.1) is False
+		source.interrupt()
+
+
+class TestIdleWatcher:
+	"""Tests for IdleWatcher."""
+
+	def test_new_mail_sets_the_event_until_stopped(self, imap_server):
+		"""Test the event is set on new mail and stop ends a wait in IDLE."""
+		new_mail = threading.Event()
+		watcher = IdleWatcher(_imap_source(imap_server), new_mail)
+		watcher.start()
+
+		imap_server.pushes.put(b'* 4 EXISTS')
+
+		assert new_mail.wait(5)
+		watcher.stop()
+		assert not watcher._thread.is_alive()
+
+
+class TestBuildSources:
+	"""Tests for build_sources and build_idle_watchers."""
+
+	def _config(self, tmp_path, sources: str) -> AppConfig:
+		settings_path = tmp_path / 'notifier.toml'
+		settings_path.write_text(f'labels = ["{LABEL}"]\n{sources}', encoding='utf-8')
+		env = {'NOTIFIER_CONFIG': str(settings_path), 'NOTIFIER_STATE_DIR': str(tmp_path / 'state')}
+		with patch.dict(os.environ, env):
+			return AppConfig.from_env()
+
+	def test_sources_are_built_from_settings(self, mock_env_vars, tmp_path):
+		"""Test each entry becomes a source and IMAP ones with idle get a watcher."""
+		config = self._config(tmp_path, MBOX_SOURCE + IMAP_SOURCE)
+
+		with patch.dict(os.environ, {'IMAP_PASSWORD': 'secret'}):
+			archive, work = build_sources(config)
+			watchers = build_idle_watchers(config, threading.Event())
+
+		assert isinstance(archive, MboxSource)
+		assert archive.state_file == str(tmp_path / 'state' / 'sources' / 'archive.json')
+		assert isinstance(work, ImapSource)
+		assert (work.port, work.password) == (993, 'secret')
+		assert [watcher.source.account for watcher in watchers] == ['work']
+
+	def test_missing_imap_password_is_rejected(self, mock_env_vars, tmp_path):
+		"""Test an IMAP source needs its password environment variable."""
+		config = self._config(tmp_path, IMAP_SOURCE)
+
+		with patch.dict(os.environ, {'IMAP_PASSWORD': ''}), pytest.raises(ValueError, match='IMAP_PASSWORD'):
+			build_sources(config)
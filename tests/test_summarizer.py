@@ -0,0 +1,52 @@
+"""Tests for summarizer module."""
+
+from src.summarizer import ParcelSummary, summarize
+
+YAMATO_BODY = """ヤマト運輸です。お荷物をお届けにあがりましたが、ご不在のため持ち帰りました。
+お問い合わせ伝票番号: 1234-5678-9012
+保管期限: 3月15日
+詳細はこちら: https://example.jp/info
+再配達のご依頼はこちら: https://redelivery.example.jp/r/123456789012
+"""
+
+
+class TestSummarize:
+	"""Tests for summarize."""
+
+	def test_summarize_extracts_all_fields(self):
+		"""Test every key field is found in a typical notice."""
+		summary = summarize(YAMATO_BODY)
+
+		assert summary == ParcelSummary(
+			carrier='ヤマト運輸',
+			tracking_number='1234-5678-9012',
+			deadline='3月15日',
+			redelivery_url='https://redelivery.example.jp/r/123456789012',
+		)
+
+	def test_summarize_prefers_sender_for_carrier(self):
+		"""Test the sender decides the carrier before the body does."""
+		summary = summarize(YAMATO_BODY, sender='佐川急便 <no-reply@sagawa.example.jp>')
+		assert summary.carrier == '佐川急便'
+
+	def test_summarize_full_date_deadline(self):
+		"""Test deadlines with a year are recognised."""
+		summary = summarize('お預かり期限：2025/03/15 まで')
+		assert summary.deadline == '2025/03/15'
+
+	def test_summarize_redelivery_url_hint_in_url(self):
+		"""Test a URL is taken as redelivery URL when the URL itself says so."""
+		summary = summarize('こちら https://www.example.jp/saihaitatsu?no=1')
+		assert summary.redelivery_url == 'https://www.example.jp/saihaitatsu?no=1'
+
+	def test_summarize_nothing_found(self):
+		"""Test an unrelated body yields an empty summary."""
+		summary = summarize('こんにちは。今日は良い天気ですね。https://example.jp')
+
+		assert summary.is_empty()
+		assert summary.to_dict() == {}
+
+	def test_summarize_beyond_truncation_point(self):
+		"""Test fields after the first 500 characters are still found."""
+		summary = summarize('お知らせ\n' * 200 + YAMATO_BODY)
+		assert summary.tracking_number == '1234-5678-9012'